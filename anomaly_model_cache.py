@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异常检测模型缓存
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-08
+
+功能:
+1. 按数据源持久化已训练的 StandardScaler + IsolationForest
+2. 为训练数据生成漂移指纹（数据内容哈希、特征列、均值、标准差）
+3. 数据内容哈希与训练时一致时直接复用模型，不再计算统计量；
+   内容变化但漂移未超过阈值且模型未过期时也复用模型，只做打分
+"""
+
+import pandas as pd
+import numpy as np
+import logging
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Any
+from dataclasses import dataclass, asdict, fields
+from state_paths import resolve_state_path
+
+try:
+    import joblib
+    JOBLIB_AVAILABLE = True
+except ImportError:
+    JOBLIB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DriftFingerprint:
+    """训练数据漂移指纹"""
+    features: List[str]
+    means: List[float]
+    stds: List[float]
+    n_rows: int
+    params: Dict[str, Any]
+    created_at: str
+    content_hash: Optional[str] = None  # 数据源内容哈希（注册中心的文件哈希或数据帧哈希）
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'DriftFingerprint':
+        """读取指纹文件（忽略旧版本中已不使用的字段，如分位数）"""
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+
+class AnomalyModelCache:
+    """IsolationForest 模型缓存"""
+
+    def __init__(self, cache_dir: str = 'model_cache', drift_threshold: float = 0.25,
+                 max_age_days: int = 30):
+        self.cache_dir = resolve_state_path(cache_dir)
+        self.drift_threshold = drift_threshold
+        self.max_age_days = max_age_days
+        self.logger = logging.getLogger(f"{__name__}.AnomalyModelCache")
+
+    @staticmethod
+    def fingerprint(data: pd.DataFrame, params: Dict[str, Any],
+                    content_hash: Optional[str] = None) -> DriftFingerprint:
+        """计算训练数据的漂移指纹（均值、标准差各一次线性扫描）"""
+        values = data.to_numpy(dtype=float)
+        return DriftFingerprint(
+            features=[str(col) for col in data.columns],
+            means=values.mean(axis=0).tolist(),
+            stds=values.std(axis=0).tolist(),
+            n_rows=len(data),
+            params=params,
+            created_at=datetime.now().isoformat(),
+            content_hash=content_hash
+        )
+
+    def is_unchanged(self, cached: DriftFingerprint, content_hash: Optional[str], features: List[str],
+                     params: Dict[str, Any]) -> bool:
+        """数据内容哈希、特征列和参数都与训练时一致且模型未过期（无需计算漂移）"""
+        return (content_hash is not None and cached.content_hash == content_hash
+                and cached.features == [str(col) for col in features] and cached.params == params
+                and not self._expired(cached))
+
+    def _expired(self, cached: DriftFingerprint) -> bool:
+        return (datetime.now() - datetime.fromisoformat(cached.created_at)).days > self.max_age_days
+
+    @staticmethod
+    def drift_score(reference: DriftFingerprint, current: DriftFingerprint) -> float:
+        """
+        漂移分数：各特征均值偏移（以参考标准差为单位）和标准差对数比的最大值
+
+        特征列或模型参数变化时返回无穷大，强制重新训练。
+        """
+        if reference.features != current.features or reference.params != current.params:
+            return float('inf')
+
+        ref_means = np.asarray(reference.means)
+        ref_stds = np.asarray(reference.stds)
+        cur_means = np.asarray(current.means)
+        cur_stds = np.asarray(current.stds)
+
+        scale = np.where(ref_stds > 0, ref_stds, 1.0)
+        mean_shift = np.abs(cur_means - ref_means) / scale
+        std_ratio = np.abs(np.log((cur_stds + 1e-12) / (ref_stds + 1e-12)))
+        std_ratio = np.where((ref_stds == 0) & (cur_stds == 0), 0.0, std_ratio)
+
+        return float(max(mean_shift.max(initial=0.0), std_ratio.max(initial=0.0)))
+
+    def _paths(self, source_name: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, f"{source_name}_isolation_forest")
+        return f"{base}.joblib", f"{base}.fingerprint.json"
+
+    def load(self, source_name: str) -> Optional[Tuple[Any, Any, DriftFingerprint]]:
+        """读取缓存的 (scaler, forest, 指纹)"""
+        model_path, fingerprint_path = self._paths(source_name)
+        if not JOBLIB_AVAILABLE or not (os.path.exists(model_path) and os.path.exists(fingerprint_path)):
+            return None
+
+        try:
+            with open(fingerprint_path, 'r', encoding='utf-8') as f:
+                fingerprint = DriftFingerprint.from_dict(json.load(f))
+            scaler, forest = joblib.load(model_path)
+            return scaler, forest, fingerprint
+        except Exception as e:
+            self.logger.warning(f"读取 {source_name} 模型缓存失败: {e}")
+            return None
+
+    def save(self, source_name: str, scaler: Any, forest: Any, fingerprint: DriftFingerprint):
+        """保存模型与指纹"""
+        if not JOBLIB_AVAILABLE:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        model_path, fingerprint_path = self._paths(source_name)
+        try:
+            joblib.dump((scaler, forest), model_path)
+            with open(fingerprint_path, 'w', encoding='utf-8') as f:
+                json.dump(asdict(fingerprint), f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            self.logger.warning(f"保存 {source_name} 模型缓存失败: {e}")
+
+    def is_reusable(self, cached: DriftFingerprint, current: DriftFingerprint) -> Tuple[bool, float]:
+        """判断缓存模型能否复用，返回 (能否复用, 漂移分数)"""
+        drift = self.drift_score(cached, current)
+        return drift <= self.drift_threshold and not self._expired(cached), drift
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准回归测试
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-13
+
+功能:
+1. 在固定种子的合成数据上重复运行各热点工作负载（预热后多次计时）
+2. 按提交（git commit）把耗时分布保存到本地 SQLite，作为后续提交的基线；
+   工作区有未提交修改时以 HEAD 的干净运行为基线
+3. 用 Mann-Whitney U 检验和中位数比值的自助法置信区间判断回归，区分噪声与真实变慢
+4. 输出逐阶段对比报告；有工作负载超出容差变慢时以非零状态码退出
+
+退出码: 0 无回归，1 检测到性能回归，2 工作负载运行失败
+"""
+
+import pandas as pd
+import numpy as np
+import logging
+import argparse
+import sqlite3
+import subprocess
+import json
+import os
+import sys
+import time
+import gc
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Callable, Tuple
+from dataclasses import dataclass, asdict
+from scipy import stats
+
+from dataset_registry import DatasetRegistry
+from synthetic_data_generator import SyntheticDataGenerator, SyntheticDataConfig
+from optimized_data_importer import OptimizedDataImporter, ETLConfig
+from optimized_production_sales_ratio import ProductionSalesRatioAnalyzer
+from data_quality_monitor import DataQualityMonitor
+from enhanced_data_quality_monitor import EnhancedDataQualityMonitor
+from state_paths import resolve_state_path
+
+logger = logging.getLogger(__name__)
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_ERROR = 2
+
+
+@dataclass
+class Workload:
+    """一个基准工作负载：setup 在计时外执行，run 为被计时部分"""
+    name: str
+    description: str
+    setup: Callable[[DatasetRegistry], Any]
+    run: Callable[[Any], Any]
+
+
+@dataclass
+class WorkloadComparison:
+    """单个工作负载与基线的对比结果"""
+    workload: str
+    status: str  # 'regression', 'improvement', 'unchanged', 'no_baseline', 'error'
+    current_median: float
+    current_samples: int
+    baseline_commit: Optional[str] = None
+    baseline_median: Optional[float] = None
+    baseline_samples: int = 0
+    ratio: Optional[float] = None
+    ci_low: Optional[float] = None
+    ci_high: Optional[float] = None
+    p_slower: Optional[float] = None
+    p_faster: Optional[float] = None
+    error: Optional[str] = None
+
+
+def _importer(registry: DatasetRegistry) -> OptimizedDataImporter:
+    return OptimizedDataImporter(ETLConfig(excel_folder='.'), registry=registry)
+
+
+def _cleaned_frames(registry: DatasetRegistry) -> Tuple[OptimizedDataImporter, pd.DataFrame, pd.DataFrame, Dict[str, float]]:
+    importer = _importer(registry)
+    production = importer.load_and_clean_excel('', 'production')
+    sales = importer.load_and_clean_excel('', 'sales')
+    inventory = importer.load_and_clean_excel('', 'inventory')
+    initial = inventory.set_index('product_name')['inventory_level'].to_dict() if not inventory.empty else {}
+    return importer, production, sales, initial
+
+
+def _enhanced_monitor(registry: DatasetRegistry) -> EnhancedDataQualityMonitor:
+    return EnhancedDataQualityMonitor(registry=registry, stats_db_path=None,
+                                      model_cache_dir=None, history_db_path=None)
+
+
+# 热点工作负载（均关闭跨运行持久化，保证重复运行之间互不影响）
+WORKLOADS: Dict[str, Workload] = {
+    workload.name: workload for workload in [
+        Workload(
+            'load_clean_sales', '销售数据过滤、列映射与验证',
+            setup=_importer,
+            run=lambda importer: importer.load_and_clean_excel('', 'sales')
+        ),
+        Workload(
+            'dynamic_inventory', '按产品逐日推算动态库存',
+            setup=_cleaned_frames,
+            run=lambda ctx: ctx[0].calculate_dynamic_inventory(ctx[1], ctx[2], ctx[3])
+        ),
+        Workload(
+            'ratio_calculation', '产销率分析',
+            setup=lambda registry: ProductionSalesRatioAnalyzer(registry=registry),
+            run=lambda analyzer: analyzer.calculate_production_sales_ratio(*analyzer.load_and_validate_data())
+        ),
+        Workload(
+            'quality_check', '基础数据质量检查',
+            setup=lambda registry: registry,
+            run=lambda registry: DataQualityMonitor(registry=registry, fingerprint_dir=None,
+                                                    sketch_db_path=None).run_quality_check()
+        ),
+        Workload(
+            'rule_evaluation', '声明式业务规则执行',
+            setup=lambda registry: (_enhanced_monitor(registry).rule_set, registry.get('sales')),
+            run=lambda ctx: ctx[0].evaluate(ctx[1], 'sales')
+        ),
+        Workload(
+            'enhanced_quality_check', '增强型数据质量检查',
+            setup=lambda registry: registry,
+            run=lambda registry: _enhanced_monitor(registry).run_enhanced_quality_check()
+        ),
+    ]
+}
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _git(*args) -> Optional[str]:
+    """在仓库目录执行 git 命令，失败时返回 None"""
+    try:
+        output = subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() if output.returncode == 0 else None
+
+
+def git_revision() -> Dict[str, Any]:
+    """当前提交、分支和工作区是否有未提交修改"""
+    return {
+        'commit': _git('rev-parse', 'HEAD') or 'unknown',
+        'branch': _git('rev-parse', '--abbrev-ref', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no'))
+    }
+
+
+def resolve_commit(ref: str) -> str:
+    """把分支名、标签或短哈希解析为完整提交哈希"""
+    return _git('rev-parse', '--verify', f"{ref}^{{commit}}") or ref
+
+
+class BenchmarkStore:
+    """按提交保存基准耗时分布的 SQLite 存储"""
+
+    def __init__(self, db_path: str = 'benchmark_baselines.db'):
+        self.db_path = resolve_state_path(db_path)
+        self.logger = logging.getLogger(f"{__name__}.BenchmarkStore")
+        self._ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS benchmark_runs (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    workload TEXT NOT NULL,
+                    commit_hash TEXT NOT NULL,
+                    dirty INTEGER NOT NULL,
+                    branch TEXT,
+                    created_at TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    repeats INTEGER NOT NULL,
+                    config TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS benchmark_samples (
+                    run_id INTEGER NOT NULL,
+                    iteration INTEGER NOT NULL,
+                    seconds REAL NOT NULL,
+                    PRIMARY KEY (run_id, iteration)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_benchmark_runs_workload "
+                         "ON benchmark_runs (workload, commit_hash, ts)")
+
+    def save(self, workload: str, samples: List[float], revision: Dict[str, Any], config: Dict[str, Any]) -> int:
+        """保存一次运行的全部样本"""
+        now = datetime.now()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO benchmark_runs (workload, commit_hash, dirty, branch, created_at, ts, repeats, config) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (workload, revision['commit'], int(revision['dirty']), revision.get('branch'),
+                 now.isoformat(), now.timestamp(), len(samples), json.dumps(config, sort_keys=True))
+            )
+            run_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO benchmark_samples (run_id, iteration, seconds) VALUES (?, ?, ?)",
+                [(run_id, i, seconds) for i, seconds in enumerate(samples)]
+            )
+        return run_id
+
+    def baseline(self, workload: str, config: Dict[str, Any], commit: Optional[str] = None,
+                 exclude_commit: Optional[str] = None, clean_only: bool = False) -> Tuple[Optional[str], List[float]]:
+        """
+        取基线样本：指定 commit 时取该提交最近一次运行，否则取最近一次不属于 exclude_commit 的运行
+
+        只比较配置（数据规模、重复次数等）相同的运行；优先使用干净工作区的记录，clean_only 时只用干净记录。
+        """
+        query = "SELECT run_id, commit_hash FROM benchmark_runs WHERE workload = ? AND config = ?"
+        params: List[Any] = [workload, json.dumps(config, sort_keys=True)]
+        if commit is not None:
+            query += " AND commit_hash = ?"
+            params.append(commit)
+        elif exclude_commit is not None:
+            query += " AND commit_hash != ?"
+            params.append(exclude_commit)
+        if clean_only:
+            query += " AND dirty = 0"
+        query += " ORDER BY dirty ASC, ts DESC LIMIT 1"
+
+        with self._connect() as conn:
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                return None, []
+            samples = conn.execute(
+                "SELECT seconds FROM benchmark_samples WHERE run_id = ? ORDER BY iteration", (row['run_id'],)
+            ).fetchall()
+        return row['commit_hash'], [sample['seconds'] for sample in samples]
+
+
+def compare_samples(workload: str, current: List[float], baseline: List[float],
+                    baseline_commit: Optional[str], tolerance: float, alpha: float,
+                    bootstrap: int = 2000, seed: int = 0) -> WorkloadComparison:
+    """
+    比较当前样本与基线样本
+
+    回归：单侧 Mann-Whitney U 检验（当前更慢）p < alpha，且中位数比值的自助法 95% 置信区间
+    下限超过 1 + tolerance（即有把握变慢幅度超出容差，而不只是中位数偶然越过容差）；改进同理。
+    """
+    current_arr = np.asarray(current, dtype=float)
+    result = WorkloadComparison(
+        workload=workload,
+        status='no_baseline',
+        current_median=float(np.median(current_arr)),
+        current_samples=len(current_arr)
+    )
+    if len(baseline) == 0:
+        return result
+
+    baseline_arr = np.asarray(baseline, dtype=float)
+    result.baseline_commit = baseline_commit
+    result.baseline_median = float(np.median(baseline_arr))
+    result.baseline_samples = len(baseline_arr)
+    result.ratio = result.current_median / result.baseline_median if result.baseline_median > 0 else np.inf
+
+    rng = np.random.default_rng(seed)
+    current_boot = np.median(rng.choice(current_arr, (bootstrap, len(current_arr))), axis=1)
+    baseline_boot = np.median(rng.choice(baseline_arr, (bootstrap, len(baseline_arr))), axis=1)
+    ratios = current_boot / np.maximum(baseline_boot, np.finfo(float).tiny)
+    result.ci_low, result.ci_high = (float(v) for v in np.percentile(ratios, [2.5, 97.5]))
+
+    if len(current_arr) >= 2 and len(baseline_arr) >= 2:
+        result.p_slower = float(stats.mannwhitneyu(current_arr, baseline_arr, alternative='greater').pvalue)
+        result.p_faster = float(stats.mannwhitneyu(current_arr, baseline_arr, alternative='less').pvalue)
+
+    if result.p_slower is not None and result.p_slower < alpha and result.ci_low > 1 + tolerance:
+        result.status = 'regression'
+    elif result.p_faster is not None and result.p_faster < alpha and result.ci_high < 1 - tolerance:
+        result.status = 'improvement'
+    else:
+        result.status = 'unchanged'
+    return result
+
+
+class BenchmarkRunner:
+    """重复运行工作负载并与按提交保存的基线比较"""
+
+    def __init__(self, workloads: Optional[List[str]] = None, repeats: int = 7, warmup: int = 1,
+                 sales_rows: int = 5000, n_products: int = 40, n_days: int = 30,
+                 tolerance: float = 0.10, alpha: float = 0.05,
+                 db_path: str = 'benchmark_baselines.db', seed: int = 42):
+        names = workloads or list(WORKLOADS)
+        unknown = set(names) - set(WORKLOADS)
+        if unknown:
+            raise ValueError(f"未知的工作负载: {sorted(unknown)}")
+
+        self.workloads = [WORKLOADS[name] for name in names]
+        self.repeats = repeats
+        self.warmup = warmup
+        self.data_config = SyntheticDataConfig(
+            n_products=n_products,
+            n_days=n_days,
+            sales_rows=sales_rows,
+            production_rows=max(1, sales_rows // 3),
+            seed=seed
+        )
+        self.tolerance = tolerance
+        self.alpha = alpha
+        self.store = BenchmarkStore(db_path)
+        self.logger = logging.getLogger(f"{__name__}.BenchmarkRunner")
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """决定样本是否可比的配置（写入基线记录）"""
+        return {
+            'sales_rows': self.data_config.sales_rows,
+            'production_rows': self.data_config.production_rows,
+            'n_products': self.data_config.n_products,
+            'n_days': self.data_config.n_days,
+            'seed': self.data_config.seed,
+            'warmup': self.warmup
+        }
+
+    def _build_registry(self) -> DatasetRegistry:
+        datasets = SyntheticDataGenerator(self.data_config).generate_all()
+        registry = DatasetRegistry('.')
+        for source_name in ('sales', 'inventory', 'production'):
+            registry.register(source_name, datasets[source_name], step='synthetic')
+        return registry
+
+    def measure(self, workload: Workload, registry: DatasetRegistry) -> List[float]:
+        """预热后重复计时，返回每次耗时（秒）"""
+        context = workload.setup(registry)
+        for _ in range(self.warmup):
+            workload.run(context)
+
+        samples = []
+        for _ in range(self.repeats):
+            gc.collect()
+            start = time.perf_counter()
+            workload.run(context)
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    def baseline_for(self, workload_name: str, revision: Dict[str, Any],
+                     baseline_commit: Optional[str] = None) -> Tuple[Optional[str], List[float]]:
+        """
+        选择基线：指定提交时用该提交；工作区有未提交修改时用 HEAD 的干净运行；
+        工作区干净（或 HEAD 没有干净运行）时用最近一次其他提交的运行
+        """
+        if baseline_commit:
+            return self.store.baseline(workload_name, self.config, commit=baseline_commit)
+        if revision['dirty']:
+            commit, samples = self.store.baseline(workload_name, self.config, commit=revision['commit'],
+                                                  clean_only=True)
+            if samples:
+                return commit, samples
+        return self.store.baseline(workload_name, self.config, exclude_commit=revision['commit'])
+
+    def run(self, baseline_ref: Optional[str] = None, save: bool = True) -> Dict[str, Any]:
+        """运行全部工作负载并生成对比结果"""
+        revision = git_revision()
+        baseline_commit = resolve_commit(baseline_ref) if baseline_ref else None
+
+        registry = self._build_registry()
+        comparisons = []
+        samples_by_workload = {}
+
+        for workload in self.workloads:
+            self.logger.info(f"运行 {workload.name}（{workload.description}），{self.repeats} 次...")
+            try:
+                samples = self.measure(workload, registry)
+            except Exception as e:
+                self.logger.error(f"{workload.name} 运行失败: {e}")
+                comparisons.append(WorkloadComparison(workload.name, 'error', 0.0, 0, error=str(e)))
+                continue
+
+            samples_by_workload[workload.name] = samples
+            commit, baseline = self.baseline_for(workload.name, revision, baseline_commit)
+            comparisons.append(compare_samples(workload.name, samples, baseline, commit,
+                                               self.tolerance, self.alpha))
+            if save:
+                self.store.save(workload.name, samples, revision, self.config)
+
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'commit': revision['commit'],
+            'branch': revision['branch'],
+            'dirty': revision['dirty'],
+            'config': self.config,
+            'repeats': self.repeats,
+            'tolerance': self.tolerance,
+            'alpha': self.alpha,
+            'samples': samples_by_workload,
+            'comparisons': [asdict(c) for c in comparisons]
+        }
+
+    @staticmethod
+    def exit_code(results: Dict[str, Any]) -> int:
+        statuses = {c['status'] for c in results['comparisons']}
+        if 'error' in statuses:
+            return EXIT_ERROR
+        if 'regression' in statuses:
+            return EXIT_REGRESSION
+        return EXIT_OK
+
+    @staticmethod
+    def format_report(results: Dict[str, Any]) -> str:
+        """逐阶段对比报告"""
+        status_labels = {
+            'regression': '回归', 'improvement': '改进', 'unchanged': '无显著变化',
+            'no_baseline': '无基线', 'error': '失败'
+        }
+        commit = results['commit'][:10] + (' (未提交修改)' if results['dirty'] else '')
+        lines = [
+            "基准回归测试报告",
+            "=" * 100,
+            f"提交: {commit}  重复: {results['repeats']} 次  容差: {results['tolerance']:.0%}  显著性: {results['alpha']}",
+            f"{'工作负载':<26}{'基线中位数':>12}{'当前中位数':>12}{'比值':>8}{'95% 区间':>18}{'p(变慢)':>10}  结论",
+            "-" * 100
+        ]
+        for c in results['comparisons']:
+            if c['status'] == 'error':
+                lines.append(f"{c['workload']:<26}{'-':>12}{'-':>12}{'-':>8}{'-':>18}{'-':>10}  失败: {c['error']}")
+                continue
+            baseline = f"{c['baseline_median']:.4f}s" if c['baseline_median'] is not None else '-'
+            ratio = f"{c['ratio']:.3f}" if c['ratio'] is not None else '-'
+            interval = f"[{c['ci_low']:.3f}, {c['ci_high']:.3f}]" if c['ci_low'] is not None else '-'
+            p_value = f"{c['p_slower']:.4f}" if c['p_slower'] is not None else '-'
+            lines.append(f"{c['workload']:<26}{baseline:>12}{c['current_median']:>11.4f}s{ratio:>8}"
+                         f"{interval:>18}{p_value:>10}  {status_labels[c['status']]}")
+        lines.append("=" * 100)
+
+        regressions = [c for c in results['comparisons'] if c['status'] == 'regression']
+        if regressions:
+            lines.append("检测到性能回归:")
+            for c in regressions:
+                lines.append(f"  - {c['workload']}: 中位数 {c['baseline_median']:.4f}s → {c['current_median']:.4f}s "
+                             f"(+{c['ratio'] - 1:.1%}，基线提交 {c['baseline_commit'][:10]})")
+        return "\n".join(lines)
+
+    def export(self, results: Dict[str, Any], output_dir: str = '.') -> Dict[str, str]:
+        """导出 JSON 结果与文本报告"""
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        json_file = os.path.join(output_dir, f"benchmark_comparison_{timestamp}.json")
+        text_file = os.path.join(output_dir, f"benchmark_comparison_{timestamp}.txt")
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        with open(text_file, 'w', encoding='utf-8') as f:
+            f.write(self.format_report(results))
+        self.logger.info(f"基准对比报告已导出: {json_file}, {text_file}")
+        return {'json': json_file, 'text': text_file}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='基准回归测试')
+    parser.add_argument('--workloads', default=None, help=f"逗号分隔的工作负载，可选: {','.join(WORKLOADS)}")
+    parser.add_argument('--repeats', type=int, default=7, help='每个工作负载的计时次数')
+    parser.add_argument('--warmup', type=int, default=1, help='预热次数（不计时）')
+    parser.add_argument('--rows', type=int, default=5000, help='合成销售数据行数')
+    parser.add_argument('--products', type=int, default=40, help='产品数量')
+    parser.add_argument('--days', type=int, default=30, help='天数')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='允许的中位数变慢比例')
+    parser.add_argument('--alpha', type=float, default=0.05, help='Mann-Whitney 检验显著性水平')
+    parser.add_argument('--baseline', default=None,
+                        help='基线提交（默认：有未提交修改时取 HEAD 的干净记录，否则取最近一次其他提交的记录）')
+    parser.add_argument('--db', default='benchmark_baselines.db',
+                        help='基线数据库路径（只给文件名时放在状态目录 QUALITY_STATE_DIR 下）')
+    parser.add_argument('--output-dir', default='benchmark_results', help='报告输出目录')
+    parser.add_argument('--no-save', action='store_true', help='不把本次结果保存为基线')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    runner = BenchmarkRunner(
+        workloads=args.workloads.split(',') if args.workloads else None,
+        repeats=args.repeats,
+        warmup=args.warmup,
+        sales_rows=args.rows,
+        n_products=args.products,
+        n_days=args.days,
+        tolerance=args.tolerance,
+        alpha=args.alpha,
+        db_path=args.db
+    )
+    results = runner.run(baseline_ref=args.baseline, save=not args.no_save)
+    print(runner.format_report(results))
+    runner.export(results, args.output_dir)
+
+    code = runner.exit_code(results)
+    if code == EXIT_REGRESSION:
+        print(f"\n❌ 性能回归超出容差 {args.tolerance:.0%}，退出码 {code}")
+    elif code == EXIT_ERROR:
+        print(f"\n❌ 有工作负载运行失败，退出码 {code}")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,8 +22,13 @@ from dataclasses import dataclass, asdict
 import json
 import os
 import warnings
+import argparse
 warnings.filterwarnings('ignore')
 
+from row_fingerprint_index import FingerprintIndex, compute_row_fingerprints, find_duplicate_mask, fingerprint_digest, date_range
+from quantile_sketch import KLLSketch, QuantileSketchStore
+from stage_tracer import traced, add_profile_argument, enable_profiling, print_profile_summary
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -73,8 +78,11 @@ class QualityReport:
 class DataQualityMonitor:
     """数据质量监控器"""
     
-    def __init__(self, excel_folder: str = './Excel文件夹/'):
+    def __init__(self, excel_folder: str = './Excel文件夹/', registry=None,
+                 fingerprint_dir: Optional[str] = 'fingerprint_index',
+                 sketch_db_path: Optional[str] = None):
         self.excel_folder = excel_folder
+        self.registry = registry  # 可选的共享数据集注册中心（DatasetRegistry）
         self.logger = logging.getLogger(f"{__name__}.DataQualityMonitor")
         
         # 质量阈值配置
@@ -101,7 +109,27 @@ class DataQualityMonitor:
             'inventory': '收发存汇总表查询.xlsx',
             'production': '产成品入库列表.xlsx'
         }
+        
+        # 重复检测的关键列（None 表示全部列；不存在的列自动忽略）
+        self.duplicate_keys = {
+            'sales': ['发票号', '发票日期', '客户名称', '物料名称', '主数量', '本币无税金额'],
+            'inventory': None,
+            'production': ['入库单号', '入库日期', '物料名称', '主数量']
+        }
+        
+        # 跨文件/跨运行重复检测的数据源及其业务日期列（库存为时点快照，每次导出都会重复，不做跨运行检测）
+        # ERP 导出是累计的：落在上一个导入文件日期范围内的行是预期的重复导出，只检查范围之外的行
+        self.cross_run_duplicate_sources = ['sales', 'production']
+        self.cross_run_date_columns = {
+            'sales': '发票日期',
+            'production': '入库日期'
+        }
+        self.fingerprint_index = FingerprintIndex(fingerprint_dir) if fingerprint_dir else None
+        
+        # 数值列的历史分位数草图（跨文件、跨天合并）；需显式指定 sketch_db_path 才会持久化
+        self.sketch_store = QuantileSketchStore(sketch_db_path) if sketch_db_path else None
     
+    @traced('quality_check')
     def run_quality_check(self) -> QualityReport:
         """运行完整的数据质量检查"""
         start_time = datetime.now()
@@ -146,11 +174,15 @@ class DataQualityMonitor:
             self.logger.error(f"数据质量检查失败: {e}")
             raise
     
+    @traced('load')
     def _load_all_datasets(self) -> Dict[str, pd.DataFrame]:
         """加载所有数据集"""
         datasets = {}
         
         for source_name, filename in self.data_sources.items():
+            if self.registry is not None and self.registry.has(source_name):
+                datasets[source_name] = self.registry.get(source_name)
+                continue
             try:
                 filepath = os.path.join(self.excel_folder, filename)
                 if os.path.exists(filepath):
@@ -166,6 +198,7 @@ class DataQualityMonitor:
         
         return datasets
     
+    @traced('dataset_quality')
     def _check_dataset_quality(self, df: pd.DataFrame, source_name: str) -> Tuple[List[QualityIssue], QualityMetrics]:
         """检查单个数据集的质量"""
         self.logger.info(f"检查 {source_name} 数据质量...")
@@ -204,6 +237,7 @@ class DataQualityMonitor:
         
         return issues, metrics
     
+    @traced('completeness')
     def _check_completeness(self, df: pd.DataFrame, source_name: str) -> Tuple[List[QualityIssue], float]:
         """检查数据完整性"""
         issues = []
@@ -232,6 +266,7 @@ class DataQualityMonitor:
         
         return issues, completeness_score
     
+    @traced('accuracy')
     def _check_accuracy(self, df: pd.DataFrame, source_name: str) -> Tuple[List[QualityIssue], float]:
         """检查数据准确性"""
         issues = []
@@ -240,6 +275,7 @@ class DataQualityMonitor:
         
         # 检查数值列的合理性
         numeric_columns = df.select_dtypes(include=[np.number]).columns
+        history_sketches = self._update_quantile_sketches(df, source_name, list(numeric_columns))
         
         for column in numeric_columns:
             total_checks += len(df)
@@ -260,9 +296,10 @@ class DataQualityMonitor:
                         suggested_action=f"检查 {column} 列的数据录入，负值可能不合理"
                     ))
             
-            # 检查异常大的值
+            # 检查异常大的值（99分位数取自全部历史数据；未启用草图时按当前数据计算）
             if len(df[column].dropna()) > 0:
-                q99 = df[column].quantile(0.99)
+                sketch = history_sketches.get(column)
+                q99 = sketch.quantile(0.99) if sketch is not None else df[column].quantile(0.99)
                 extreme_values = (df[column] > q99 * 10).sum()
                 if extreme_values > 0:
                     accuracy_violations += extreme_values
@@ -282,15 +319,37 @@ class DataQualityMonitor:
         
         return issues, accuracy_score
     
+    def _update_quantile_sketches(self, df: pd.DataFrame, source_name: str,
+                                  numeric_columns: List[str]) -> Dict[str, KLLSketch]:
+        """将当前数据并入历史分位数草图（累计导出中上一个文件已包含的日期范围不重复并入）"""
+        if self.sketch_store is None or not numeric_columns:
+            return {}
+        try:
+            return self.sketch_store.merge_frame(df, source_name, numeric_columns,
+                                                 self._business_dates(df, source_name))
+        except Exception as e:
+            self.logger.warning(f"{source_name} 分位数草图更新失败: {e}")
+            return {}
+    
+    def _business_dates(self, df: pd.DataFrame, source_name: str) -> Optional[pd.Series]:
+        """数据源的业务日期列（解析为日期）；没有日期列的数据源返回 None"""
+        date_column = self.cross_run_date_columns.get(source_name)
+        if date_column not in df.columns:
+            return None
+        return pd.to_datetime(df[date_column], errors='coerce')
+    
+    @traced('consistency')
     def _check_consistency(self, df: pd.DataFrame, source_name: str) -> Tuple[List[QualityIssue], float]:
         """检查数据一致性"""
         issues = []
         consistency_violations = 0
         total_checks = 0
         
-        # 检查重复记录
+        # 检查重复记录（按关键列的行指纹）
         if len(df) > 0:
-            duplicate_count = df.duplicated().sum()
+            key_columns = [col for col in (self.duplicate_keys.get(source_name) or []) if col in df.columns]
+            fingerprints = compute_row_fingerprints(df, key_columns)
+            duplicate_count = int(find_duplicate_mask(fingerprints).sum())
             total_checks += len(df)
             
             if duplicate_count > 0:
@@ -301,10 +360,29 @@ class DataQualityMonitor:
                     description=f"发现 {duplicate_count} 条重复记录",
                     affected_records=duplicate_count,
                     table_name=source_name,
-                    column_name="all",
+                    column_name=",".join(key_columns) if key_columns else "all",
                     detection_time=datetime.now().isoformat(),
                     suggested_action="删除重复记录或检查数据录入流程"
                 ))
+            
+            # 与此前导入的文件比较
+            if self.fingerprint_index is not None and source_name in self.cross_run_duplicate_sources:
+                dates = self._business_dates(df, source_name)
+                cross_count, checked = self._check_cross_run_duplicates(fingerprints, source_name, dates)
+                total_checks += checked
+                
+                if cross_count > 0:
+                    consistency_violations += cross_count
+                    issues.append(QualityIssue(
+                        issue_type="cross_file_duplicate",
+                        severity=self._determine_severity(cross_count / checked),
+                        description=f"上一个导入文件的日期范围之外，有 {cross_count} 条记录已在此前导入的文件中出现",
+                        affected_records=cross_count,
+                        table_name=source_name,
+                        column_name=",".join(key_columns) if key_columns else "all",
+                        detection_time=datetime.now().isoformat(),
+                        suggested_action="检查ERP导出的时间范围是否重叠，避免重复计入"
+                    ))
         
         # 检查数据格式一致性
         text_columns = df.select_dtypes(include=['object']).columns
@@ -332,6 +410,36 @@ class DataQualityMonitor:
         
         return issues, consistency_score
     
+    def _check_cross_run_duplicates(self, fingerprints: np.ndarray, source_name: str,
+                                    dates: Optional[pd.Series] = None) -> Tuple[int, int]:
+        """
+        统计已在此前导入文件中出现的行数，并把当前文件并入指纹索引
+        
+        日期落在上一个导入文件日期范围内的行（累计导出中的旧数据）不参与比较。
+        
+        返回: (重复行数, 参与比较的行数)
+        """
+        file_id = fingerprint_digest(fingerprints)
+        
+        # 同一文件重复检查时不与自身比较
+        if self.fingerprint_index.is_ingested(source_name, file_id):
+            return 0, 0
+        
+        try:
+            checked = np.ones(len(fingerprints), dtype=bool)
+            previous_range = self.fingerprint_index.last_date_range(source_name)
+            if dates is not None and previous_range is not None:
+                checked = ~dates.between(*previous_range).to_numpy()
+            cross_count = int(self.fingerprint_index.contains(source_name, fingerprints[checked]).sum())
+            self.fingerprint_index.merge(source_name, fingerprints, file_id,
+                                         date_range(dates) if dates is not None else None)
+        except Exception as e:
+            self.logger.warning(f"{source_name} 跨文件重复检测失败: {e}")
+            return 0, 0
+        
+        return cross_count, int(checked.sum())
+    
+    @traced('validity')
     def _check_validity(self, df: pd.DataFrame, source_name: str) -> Tuple[List[QualityIssue], float]:
         """检查数据有效性"""
         issues = []
@@ -623,13 +731,21 @@ class DataQualityMonitor:
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='数据质量监控系统')
+    parser.add_argument('--sketch-db', default=None,
+                        help='启用历史分位数草图并保存到该 SQLite 文件（如 quality_stats.db，只给文件名时放在状态目录下）')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, top_n=args.profile_top)
+    
     print("=" * 80)
     print("数据质量监控系统 v1.0")
     print("=" * 80)
     
     try:
         # 创建监控器
-        monitor = DataQualityMonitor()
+        monitor = DataQualityMonitor(sketch_db_path=args.sketch_db)
         
         # 运行质量检查
         report = monitor.run_quality_check()
@@ -649,6 +765,9 @@ def main():
         logger.error(f"数据质量监控失败: {e}")
         print(f"\n❌ 监控失败: {e}")
     
+    # 指定 --profile 时输出该阶段的性能分析文件
+    print_profile_summary()
+    
     print("\n" + "=" * 80)
 
 
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享数据集注册中心
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-06
+
+功能:
+1. 每个数据源在一次运行中只读取一次Excel文件
+2. 保存只读数据帧（不改列名、不删行，值与直接读取Excel相同，数据类型按第5项优化），
+   并记录数据血缘（文件路径、哈希、行数、处理步骤）。类型变化会改变 hash_pandas_object 的结果，
+   需要与直接读取的数据比较指纹时使用 row_fingerprint_index.compute_row_fingerprints（按规范形式计算）
+3. 向导入器、产销率分析器和质量监控器分发同一份数据
+4. 支持外部注入数据帧（基准测试、合成数据）
+5. 加载后立即做内存优化（重复字符串转 category、整数降位、日期一次解析），保留逐列前后字节数
+"""
+
+import pandas as pd
+import logging
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+from dataclasses import dataclass, field, asdict
+
+from memory_optimizer import MemoryOptimizer, MemoryOptimizationReport
+
+logger = logging.getLogger(__name__)
+
+# 默认数据源配置（与各组件保持一致）
+DEFAULT_DATA_SOURCES = {
+    'sales': '销售发票执行查询.xlsx',
+    'inventory': '收发存汇总表查询.xlsx',
+    'production': '产成品入库列表.xlsx'
+}
+
+
+@dataclass
+class DatasetLineage:
+    """数据血缘信息"""
+    source_name: str
+    file_path: Optional[str]
+    file_size: int
+    file_mtime: Optional[str]
+    content_hash: Optional[str]
+    raw_records: int
+    records: int
+    columns: List[str]
+    loaded_at: str
+    load_time: float
+    steps: List[str] = field(default_factory=list)
+
+
+def _copy_on_write_enabled() -> bool:
+    """判断pandas是否启用写时复制（启用时浅拷贝即可保证隔离）"""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except Exception:
+        return False
+
+
+def file_content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件内容的SHA256哈希"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DatasetRegistry:
+    """数据集注册中心：一次加载，多组件共享"""
+
+    def __init__(self, excel_folder: str = './Excel文件夹/',
+                 data_sources: Optional[Dict[str, str]] = None,
+                 optimize_memory: bool = True,
+                 memory_optimizer: Optional[MemoryOptimizer] = None):
+        self.excel_folder = excel_folder
+        self.data_sources = dict(data_sources or DEFAULT_DATA_SOURCES)
+        self.memory_optimizer = (memory_optimizer or MemoryOptimizer()) if optimize_memory else None
+        self.logger = logging.getLogger(f"{__name__}.DatasetRegistry")
+
+        self._frames: Dict[str, Optional[pd.DataFrame]] = {}
+        self._lineage: Dict[str, DatasetLineage] = {}
+        self._memory_reports: Dict[str, MemoryOptimizationReport] = {}
+        self._lock = threading.RLock()
+        self._shallow_copy = _copy_on_write_enabled()
+
+    def path_for(self, source_name: str) -> Optional[str]:
+        """返回数据源对应的文件路径"""
+        filename = self.data_sources.get(source_name)
+        if filename is None:
+            return None
+        return os.path.join(self.excel_folder, filename)
+
+    def has(self, source_name: str) -> bool:
+        """数据源是否已登记（加载成功或外部注入）"""
+        return self._frames.get(source_name) is not None
+
+    def load(self, source_name: str) -> Optional[DatasetLineage]:
+        """加载数据源（已加载时直接返回血缘信息）"""
+        with self._lock:
+            if source_name in self._frames:
+                return self._lineage.get(source_name)
+
+            file_path = self.path_for(source_name)
+            if file_path is None or not os.path.exists(file_path):
+                self.logger.warning(f"数据文件不存在: {file_path}")
+                self._frames[source_name] = None
+                return None
+
+            start_time = time.time()
+            try:
+                raw_df = pd.read_excel(file_path)
+            except Exception as e:
+                self.logger.error(f"加载 {source_name} 数据失败: {e}")
+                self._frames[source_name] = None
+                return None
+
+            df, memory_step = self._optimize(source_name, raw_df)
+            stat = os.stat(file_path)
+            lineage = DatasetLineage(
+                source_name=source_name,
+                file_path=file_path,
+                file_size=stat.st_size,
+                file_mtime=datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                content_hash=file_content_hash(file_path),
+                raw_records=len(raw_df),
+                records=len(df),
+                columns=[str(col) for col in df.columns],
+                loaded_at=datetime.now().isoformat(),
+                load_time=time.time() - start_time,
+                steps=['read_excel'] + memory_step
+            )
+            self._store(source_name, df, lineage)
+            self.logger.info(f"加载 {source_name} 数据: {len(df)} 条记录，耗时 {lineage.load_time:.2f}s")
+            return lineage
+
+    def register(self, source_name: str, df: pd.DataFrame, file_path: Optional[str] = None,
+                 step: str = 'register') -> DatasetLineage:
+        """注册外部提供的数据帧（如合成数据、已读取的数据）"""
+        with self._lock:
+            df = df.copy()
+            content_hash = None
+            if file_path and os.path.exists(file_path):
+                content_hash = file_content_hash(file_path)
+            else:
+                content_hash = hashlib.sha256(
+                    pd.util.hash_pandas_object(df, index=False).values.tobytes()
+                ).hexdigest()
+            # 哈希在优化前计算，保证与未优化时的数据指纹一致
+            df, memory_step = self._optimize(source_name, df)
+
+            lineage = DatasetLineage(
+                source_name=source_name,
+                file_path=file_path,
+                file_size=os.path.getsize(file_path) if file_path and os.path.exists(file_path) else 0,
+                file_mtime=None,
+                content_hash=content_hash,
+                raw_records=len(df),
+                records=len(df),
+                columns=[str(col) for col in df.columns],
+                loaded_at=datetime.now().isoformat(),
+                load_time=0.0,
+                steps=[step] + memory_step
+            )
+            self._store(source_name, df, lineage)
+            return lineage
+
+    def preload(self, source_names: Optional[List[str]] = None) -> Dict[str, Optional[DatasetLineage]]:
+        """预加载全部（或指定）数据源"""
+        names = source_names or list(self.data_sources.keys())
+        return {name: self.load(name) for name in names}
+
+    def get(self, source_name: str) -> Optional[pd.DataFrame]:
+        """获取数据帧副本，调用方的修改不会影响注册中心中的数据"""
+        if source_name not in self._frames:
+            self.load(source_name)
+        df = self._frames.get(source_name)
+        if df is None:
+            return None
+        return self._detach(df)
+
+    def get_all(self, source_names: Optional[List[str]] = None) -> Dict[str, Optional[pd.DataFrame]]:
+        """获取多个数据源"""
+        names = source_names or list(self.data_sources.keys())
+        return {name: self.get(name) for name in names}
+
+    def lineage(self, name: str) -> Optional[DatasetLineage]:
+        """获取数据血缘信息"""
+        return self._lineage.get(name)
+
+    def describe(self) -> Dict[str, Dict[str, Any]]:
+        """导出所有数据集的血缘信息"""
+        return {name: asdict(lineage) for name, lineage in self._lineage.items()}
+
+    def memory_reports(self) -> Dict[str, MemoryOptimizationReport]:
+        """各数据集的内存优化报告（逐列前后字节数）"""
+        return dict(self._memory_reports)
+
+    def _optimize(self, name: str, df: pd.DataFrame) -> tuple:
+        """执行内存优化，返回 (数据帧, 追加的处理步骤)"""
+        if self.memory_optimizer is None:
+            return df, []
+        df, report = self.memory_optimizer.optimize(df, name)
+        self._memory_reports[name] = report
+        return df, ['optimize_memory']
+
+    def _store(self, name: str, df: pd.DataFrame, lineage: DatasetLineage):
+        """保存数据帧（只通过 _detach 对外提供）"""
+        self._frames[name] = df
+        self._lineage[name] = lineage
+
+    def _detach(self, df: pd.DataFrame) -> pd.DataFrame:
+        """返回与注册中心隔离的数据帧"""
+        if self._shallow_copy:
+            return df.copy(deep=False)
+        return df.copy()
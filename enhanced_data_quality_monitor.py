@@ -23,7 +23,17 @@ from dataclasses import dataclass, asdict, field
 import json
 import os
 import warnings
+import argparse
 from scipy import stats
+from quality_stats_store import QualityStatsStore, RunningStats, frame_content_hash
+from product_anomaly_detector import ProductEWMADetector
+from anomaly_model_cache import AnomalyModelCache
+from quality_history_store import QualityHistoryStore
+from row_fingerprint_index import compute_row_fingerprints, find_duplicate_mask
+from quality_rules import RuleSet, RuleResult
+from stage_tracer import (trace_span, traced, submit_in_context, get_tracer, add_profile_argument,
+                          enable_profiling, print_profile_summary)
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
 try:
     from sklearn.ensemble import IsolationForest
     from sklearn.preprocessing import StandardScaler
@@ -45,6 +55,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+EXECUTION_MODES = ('sequential', 'process')
+# 7 天前、30 天前的历史对比只取目标时间前后此范围内的记录
+HISTORY_COMPARISON_WINDOW = timedelta(days=1)
+
 @dataclass
 class QualityDimension:
     """数据质量维度评分"""
@@ -124,9 +138,15 @@ class EnhancedQualityReport:
 class EnhancedDataQualityMonitor:
     """增强型数据质量监控器"""
     
-    def __init__(self, excel_folder: str = './Excel文件夹/', db_path: str = None):
+    def __init__(self, excel_folder: str = './Excel文件夹/', db_path: str = None, registry=None,
+                 stats_db_path: Optional[str] = 'quality_stats.db',
+                 model_cache_dir: Optional[str] = 'model_cache',
+                 history_db_path: Optional[str] = 'quality_history.db',
+                 rules_path: Optional[str] = None,
+                 execution_mode: str = 'sequential', max_workers: Optional[int] = None):
         self.excel_folder = excel_folder
         self.db_path = db_path
+        self.registry = registry  # 可选的共享数据集注册中心（DatasetRegistry）
         self.logger = logging.getLogger(f"{__name__}.EnhancedDataQualityMonitor")
         
         # 增强型质量阈值配置
@@ -154,9 +174,50 @@ class EnhancedDataQualityMonitor:
             'z_score_threshold': 3.0,
             'iqr_multiplier': 1.5,
             'isolation_forest_contamination': 0.1,
-            'confidence_threshold': 0.8
+            'confidence_threshold': 0.8,
+            'min_baseline_count': 30,  # 基线样本数不足时退回到本批次内的z分数
+            'ewma_alpha': 0.1,
+            'ewma_min_periods': 7,
+            'ml_n_jobs': 1,  # 各数据源已在线程池/进程池中并行，单个模型不再多线程，避免超额占用CPU
+            'model_drift_threshold': 0.25,  # 特征均值偏移（标准差单位）或标准差对数比超过该值时重新训练
+            'model_max_age_days': 30
+        }
+        
+        # 按产品时间序列检测的指标配置
+        self.product_metrics = {
+            'daily_sales': {'source': 'sales', 'date': '发票日期', 'value': '主数量'},
+            'daily_production': {'source': 'production', 'date': '入库日期', 'value': '主数量'},
+            'price': {'source': 'sales', 'date': '发票日期', 'amount': '本币无税金额', 'quantity': '主数量'}
+        }
+        
+        # 执行模式：sequential（机器学习阶段线程并行）或 process（按数据源/列组多进程并行）
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"未知的执行模式: {execution_mode}（可选: {', '.join(EXECUTION_MODES)}）")
+        self.execution_params = {
+            'mode': execution_mode,
+            'max_workers': max_workers,     # None 表示使用CPU核心数
+            'column_group_min_rows': 500000,  # 超过该行数的数据集按列组拆分统计检测
+            'column_group_size': 4
         }
         
+        # 增量检查配置：按日期水位切分新数据，没有日期列的快照数据按内容变化判断
+        self.incremental_watermarks = {
+            'sales': '发票日期',
+            'production': '入库日期'
+        }
+        self.stats_store = QualityStatsStore(stats_db_path) if stats_db_path else None
+        self.product_detector = ProductEWMADetector(
+            stats_db_path,
+            alpha=self.anomaly_params['ewma_alpha'],
+            z_threshold=self.anomaly_params['z_score_threshold'],
+            min_periods=self.anomaly_params['ewma_min_periods']
+        ) if stats_db_path else None
+        self.model_cache = AnomalyModelCache(
+            model_cache_dir,
+            drift_threshold=self.anomaly_params['model_drift_threshold'],
+            max_age_days=self.anomaly_params['model_max_age_days']
+        ) if model_cache_dir else None
+        
         # 数据源配置
         self.data_sources = {
             'sales': '销售发票执行查询.xlsx',
@@ -180,11 +241,22 @@ class EnhancedDataQualityMonitor:
                 '单价': (0, 10000),
                 '入库': (0, 1000000),
                 '出库': (0, 1000000)
+            },
+            'temporal_fields': {
+                'sales': ['发票日期'],
+                'production': ['入库日期']
             }
         }
         
-        # 历史数据存储
+        # 编译后的规则集：指定规则文件（JSON/YAML）时以文件为准，否则由 business_rules 生成
+        self.rule_set = RuleSet.from_file(rules_path) if rules_path else RuleSet.from_business_rules(self.business_rules)
+        
+        # 历史数据存储（SQLite；未配置时仅保留在内存中）
         self.quality_history = []
+        self.history_store = QualityHistoryStore(history_db_path) if history_db_path else None
+        if self.history_store is not None:
+            # 只在数据库首次使用时导入一次；之后的 quality_history.json 由本类写出
+            self.history_store.import_legacy_json('quality_history.json')
     
     def run_enhanced_quality_check(self) -> EnhancedQualityReport:
         """运行增强型数据质量检查"""
@@ -192,25 +264,34 @@ class EnhancedDataQualityMonitor:
         self.logger.info("开始增强型数据质量检查...")
         
         try:
-            # 1. 加载所有数据源
-            datasets = self._load_all_datasets()
-            
-            # 2. 执行多层次质量检查
-            all_issues = []
-            all_anomalies = []
-            dimension_scores = {}
-            
-            for source_name, df in datasets.items():
-                if df is not None and not df.empty:
-                    # 基础质量检查
-                    issues, dimensions = self._check_enhanced_dataset_quality(df, source_name)
-                    all_issues.extend(issues)
-                    dimension_scores[source_name] = dimensions
-                    
-                    # 异常检测
-                    anomalies = self._detect_anomalies(df, source_name)
-                    all_anomalies.extend(anomalies)
+            with trace_span('enhanced_quality_check'):
+                return self._run_enhanced_quality_stages(start_time)
             
+        except Exception as e:
+            self.logger.error(f"增强型数据质量检查失败: {e}")
+            raise
+    
+    def _run_enhanced_quality_stages(self, start_time: datetime) -> EnhancedQualityReport:
+        """增强型质量检查各阶段（每个阶段记录为一个追踪 span）"""
+        # 1. 加载所有数据源
+        with trace_span('load') as span:
+            datasets = self._load_all_datasets()
+            span.set_rows(sum(len(df) for df in datasets.values() if df is not None))
+        
+        # 2. 执行多层次质量检查
+        all_issues = []
+        all_anomalies = []
+        
+        with trace_span('source_checks', mode=self.execution_params['mode']):
+            source_issues, source_anomalies, dimension_scores, rule_results = self._run_source_checks(datasets)
+        all_issues.extend(source_issues)
+        all_anomalies.extend(source_anomalies)
+        
+        # 按产品的时间序列异常检测
+        with trace_span('product_anomalies'):
+            all_anomalies.extend(self._detect_product_anomalies(datasets))
+        
+        with trace_span('summarize'):
             # 3. 计算整体质量指标
             overall_metrics = self._calculate_enhanced_metrics(dimension_scores, all_issues)
             
@@ -222,36 +303,139 @@ class EnhancedDataQualityMonitor:
             # 5. 确定告警级别
             alert_level = self._determine_alert_level(overall_metrics, all_issues)
             
-            # 6. 创建增强型报告
-            processing_time = (datetime.now() - start_time).total_seconds()
-            report = EnhancedQualityReport(
-                report_id=f"EQR_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                timestamp=datetime.now().isoformat(),
-                metrics=overall_metrics,
-                issues=all_issues,
-                anomalies=all_anomalies,
-                recommendations=recommendations,
-                data_sources=list(datasets.keys()),
-                processing_time=processing_time,
-                quality_summary=self._generate_quality_summary(overall_metrics, all_issues),
-                alert_level=alert_level
-            )
-            
-            # 7. 存储历史数据
+        # 6. 创建增强型报告
+        processing_time = (datetime.now() - start_time).total_seconds()
+        report = EnhancedQualityReport(
+            report_id=f"EQR_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            timestamp=datetime.now().isoformat(),
+            metrics=overall_metrics,
+            issues=all_issues,
+            anomalies=all_anomalies,
+            recommendations=recommendations,
+            data_sources=list(datasets.keys()),
+            processing_time=processing_time,
+            quality_summary=self._generate_quality_summary(overall_metrics, all_issues, rule_results),
+            alert_level=alert_level
+        )
+        
+        # 7. 存储历史数据
+        with trace_span('store_history'):
             self._store_quality_history(report)
+        
+        self.logger.info(f"增强型数据质量检查完成，耗时 {processing_time:.2f} 秒")
+        return report
+    
+    def _worker_state(self) -> Dict[str, Any]:
+        """
+        工作进程需要的监控器状态（每个工作进程启动时传递一次）
+        
+        不携带注册中心（其中包含全部数据和锁）和质量历史，工作进程只做检查和打分。
+        """
+        state = self.__dict__.copy()
+        state['registry'] = None
+        state['quality_history'] = []
+        state['history_store'] = None
+        return state
+    
+    def _run_source_checks(self, datasets: Dict[str, pd.DataFrame]) -> Tuple[List[EnhancedQualityIssue], List[AnomalyDetection], Dict[str, Dict[str, QualityDimension]], Dict[str, List[RuleResult]]]:
+        """
+        对每个数据源执行维度检查、统计异常检测和机器学习异常检测
+        
+        process 模式下各数据源（大数据集再按列组拆分）提交到进程池并行执行，
+        监控器状态只在工作进程启动时传递一次，任务只携带数据；
+        结果合并顺序与执行先后无关：维度检查和统计异常按数据源顺序在前，机器学习异常按数据源顺序在后。
+        """
+        sources = [(name, df) for name, df in datasets.items() if df is not None and not df.empty]
+        use_processes = self.execution_params['mode'] == 'process'
+        
+        if use_processes:
+            executor = ProcessPoolExecutor(max_workers=self.execution_params['max_workers'],
+                                           initializer=_init_worker_monitor, initargs=(self._worker_state(),))
             
-            self.logger.info(f"增强型数据质量检查完成，耗时 {processing_time:.2f} 秒")
-            return report
+            def submit(method, *args):
+                # 只按方法名提交，不序列化监控器本身
+                return executor.submit(_call_worker_monitor, method.__name__, *args)
+        else:
+            executor = ThreadPoolExecutor(max_workers=max(1, len(sources)))
             
-        except Exception as e:
-            self.logger.error(f"增强型数据质量检查失败: {e}")
-            raise
+            def submit(method, *args):
+                # 线程中的阶段挂在 source_checks 之下
+                return submit_in_context(executor, method, *args)
+        
+        results = {}
+        batches = {}
+        with executor:
+            for order, (source_name, df) in enumerate(sources):
+                # 机器学习阶段在两种模式下都并行
+                if SKLEARN_AVAILABLE:
+                    results[(order, 2, 0)] = submit(self._detect_ml_anomalies, df, source_name,
+                                                    self._source_content_hash(source_name))
+                
+                if use_processes:
+                    results[(order, 0, 0)] = submit(self._check_enhanced_dataset_quality, df, source_name)
+                else:
+                    results[(order, 0, 0)] = self._check_enhanced_dataset_quality(df, source_name)
+                
+                # 统计异常检测：主进程切分增量批次，列组在工作进程中打分
+                batch = self._prepare_statistical_batch(df, source_name)
+                batches[order] = (source_name, batch)
+                for group_index, columns in enumerate(self._split_column_groups(df) if use_processes else [None]):
+                    group_df = df if columns is None else df[columns]
+                    group_batch = self._slice_statistical_batch(batch, columns)
+                    if use_processes:
+                        results[(order, 1, group_index)] = submit(
+                            self._score_statistical_columns, group_df, source_name, group_batch
+                        )
+                    else:
+                        results[(order, 1, group_index)] = self._score_statistical_columns(group_df, source_name, group_batch)
+            
+            resolved = {key: (value.result() if isinstance(value, Future) else value) for key, value in results.items()}
+        
+        all_issues = []
+        all_anomalies = []
+        dimension_scores = {}
+        rule_results = {}
+        merged_stats = {order: {} for order in batches}
+        
+        # 与串行版本一致：机器学习结果排在所有数据源的统计异常之后
+        for key in sorted(resolved, key=lambda k: (k[1] == 2, k)):
+            order, stage, _ = key
+            source_name = sources[order][0]
+            if stage == 0:
+                issues, dimensions, source_rule_results = resolved[key]
+                all_issues.extend(issues)
+                dimension_scores[source_name] = dimensions
+                rule_results[source_name] = source_rule_results
+            elif stage == 1:
+                anomalies, column_stats = resolved[key]
+                all_anomalies.extend(anomalies)
+                merged_stats[order].update(column_stats)
+            else:
+                all_anomalies.extend(resolved[key])
+        
+        for order, (source_name, batch) in batches.items():
+            self._commit_statistical_batch(source_name, batch, merged_stats[order])
+        
+        return all_issues, all_anomalies, dimension_scores, rule_results
+    
+    def _split_column_groups(self, df: pd.DataFrame) -> List[Optional[List[str]]]:
+        """大数据集按数值列分组，小数据集不拆分"""
+        if len(df) < self.execution_params['column_group_min_rows']:
+            return [None]
+        
+        numeric_columns = list(df.select_dtypes(include=[np.number]).columns)
+        size = max(1, self.execution_params['column_group_size'])
+        groups = [numeric_columns[i:i + size] for i in range(0, len(numeric_columns), size)]
+        return groups or [None]
     
     def _load_all_datasets(self) -> Dict[str, pd.DataFrame]:
         """加载所有数据集"""
         datasets = {}
         
         for source_name, filename in self.data_sources.items():
+            if self.registry is not None and self.registry.has(source_name):
+                datasets[source_name] = self.registry.get(source_name)
+                continue
             try:
                 filepath = os.path.join(self.excel_folder, filename)
                 if os.path.exists(filepath):
@@ -267,26 +451,35 @@ class EnhancedDataQualityMonitor:
         
         return datasets
     
-    def _check_enhanced_dataset_quality(self, df: pd.DataFrame, source_name: str) -> Tuple[List[EnhancedQualityIssue], Dict[str, QualityDimension]]:
+    def _check_enhanced_dataset_quality(self, df: pd.DataFrame, source_name: str) -> Tuple[List[EnhancedQualityIssue], Dict[str, QualityDimension], List[RuleResult]]:
         """检查单个数据集的增强型质量"""
         self.logger.info(f"检查 {source_name} 增强型数据质量...")
         
         issues = []
         
+        # 业务规则一次执行，结果按维度分发
+        with trace_span('rules', source=source_name) as span:
+            rule_results = self.rule_set.evaluate(df, source_name)
+            span.set_rows(len(df))
+        
         # 1. 完整性检查（25%权重）
-        completeness_issues, completeness_dim = self._check_enhanced_completeness(df, source_name)
+        with trace_span('completeness', source=source_name):
+            completeness_issues, completeness_dim = self._check_enhanced_completeness(df, source_name, rule_results)
         issues.extend(completeness_issues)
         
         # 2. 准确性检查（40%权重）
-        accuracy_issues, accuracy_dim = self._check_enhanced_accuracy(df, source_name)
+        with trace_span('accuracy', source=source_name):
+            accuracy_issues, accuracy_dim = self._check_enhanced_accuracy(df, source_name, rule_results)
         issues.extend(accuracy_issues)
         
         # 3. 一致性检查（25%权重）
-        consistency_issues, consistency_dim = self._check_enhanced_consistency(df, source_name)
+        with trace_span('consistency', source=source_name):
+            consistency_issues, consistency_dim = self._check_enhanced_consistency(df, source_name)
         issues.extend(consistency_issues)
         
         # 4. 有效性检查（10%权重）
-        validity_issues, validity_dim = self._check_enhanced_validity(df, source_name)
+        with trace_span('validity', source=source_name):
+            validity_issues, validity_dim = self._check_enhanced_validity(df, source_name, rule_results)
         issues.extend(validity_issues)
         
         dimensions = {
@@ -296,9 +489,39 @@ class EnhancedDataQualityMonitor:
             'validity': validity_dim
         }
         
-        return issues, dimensions
+        return issues, dimensions, rule_results
+    
+    def _rule_issues(self, rule_results: List[RuleResult], rule_type: str, source_name: str,
+                     dimension: str) -> List[EnhancedQualityIssue]:
+        """将某类规则的违规结果转换为质量问题"""
+        issues = []
+        for result in rule_results:
+            if result.rule_type != rule_type or result.violations == 0:
+                continue
+            issues.append(EnhancedQualityIssue(
+                issue_id=f"{result.id_prefix}_{source_name}_{result.key}_{datetime.now().strftime('%H%M%S')}",
+                issue_type=result.issue_type,
+                severity=self._determine_enhanced_severity(result.ratio, dimension),
+                confidence=result.confidence,
+                description=result.description,
+                affected_records=result.violations,
+                table_name=source_name,
+                column_name=result.column,
+                detection_time=datetime.now().isoformat(),
+                detection_method=result.detection_method,
+                suggested_action=result.suggested_action,
+                business_impact=result.business_impact,
+                auto_fixable=result.auto_fixable
+            ))
+        return issues
+    
+    @staticmethod
+    def _rule_score(rule_results: List[RuleResult], rule_type: str) -> float:
+        """某类规则的通过率（无适用规则时为1.0；同一列只计一次检查数）"""
+        return RuleSet.pass_rate(rule_results, rule_type)
     
-    def _check_enhanced_completeness(self, df: pd.DataFrame, source_name: str) -> Tuple[List[EnhancedQualityIssue], QualityDimension]:
+    def _check_enhanced_completeness(self, df: pd.DataFrame, source_name: str,
+                                     rule_results: List[RuleResult]) -> Tuple[List[EnhancedQualityIssue], QualityDimension]:
         """增强型完整性检查"""
         issues = []
         sub_scores = {}
@@ -311,33 +534,9 @@ class EnhancedDataQualityMonitor:
         null_ratio = null_cells / total_cells if total_cells > 0 else 0
         sub_scores['null_ratio'] = max(0, 1 - null_ratio)
         
-        # 2. 必填字段检查
-        required_fields = self.business_rules.get('required_fields', {}).get(source_name, [])
-        required_completeness = 1.0
-        
-        for field in required_fields:
-            if field in df.columns:
-                field_null_ratio = df[field].isnull().sum() / len(df)
-                if field_null_ratio > 0:
-                    severity = self._determine_enhanced_severity(field_null_ratio, 'completeness')
-                    confidence = 1.0 - field_null_ratio
-                    
-                    issues.append(EnhancedQualityIssue(
-                        issue_id=f"COMP_{source_name}_{field}_{datetime.now().strftime('%H%M%S')}",
-                        issue_type="missing_required_data",
-                        severity=severity,
-                        confidence=confidence,
-                        description=f"必填字段 '{field}' 有 {df[field].isnull().sum()} 个空值 ({field_null_ratio:.1%})",
-                        affected_records=df[field].isnull().sum(),
-                        table_name=source_name,
-                        column_name=field,
-                        detection_time=datetime.now().isoformat(),
-                        detection_method="required_field_validation",
-                        suggested_action=f"检查 {field} 字段的数据录入流程，确保必填字段完整性",
-                        business_impact="high" if field_null_ratio > 0.1 else "medium",
-                        auto_fixable=False
-                    ))
-                    required_completeness *= (1 - field_null_ratio)
+        # 2. 必填字段检查（required 规则）
+        issues.extend(self._rule_issues(rule_results, 'required', source_name, 'completeness'))
+        required_completeness = float(np.prod([1 - r.ratio for r in rule_results if r.rule_type == 'required']))
         
         sub_scores['required_fields'] = required_completeness
         
@@ -369,51 +568,22 @@ class EnhancedDataQualityMonitor:
         
         return issues, dimension
     
-    def _check_enhanced_accuracy(self, df: pd.DataFrame, source_name: str) -> Tuple[List[EnhancedQualityIssue], QualityDimension]:
+    def _check_enhanced_accuracy(self, df: pd.DataFrame, source_name: str,
+                                 rule_results: List[RuleResult]) -> Tuple[List[EnhancedQualityIssue], QualityDimension]:
         """增强型准确性检查"""
         issues = []
         sub_scores = {}
         
-        # 1. 数值范围验证
-        range_violations = 0
-        total_numeric_checks = 0
-        
-        numeric_columns = df.select_dtypes(include=[np.number]).columns
-        for column in numeric_columns:
-            if column in self.business_rules['value_ranges']:
-                min_val, max_val = self.business_rules['value_ranges'][column]
-                out_of_range = ((df[column] < min_val) | (df[column] > max_val)).sum()
-                total_numeric_checks += len(df)
-                range_violations += out_of_range
-                
-                if out_of_range > 0:
-                    violation_ratio = out_of_range / len(df)
-                    severity = self._determine_enhanced_severity(violation_ratio, 'accuracy')
-                    
-                    issues.append(EnhancedQualityIssue(
-                        issue_id=f"ACC_RANGE_{source_name}_{column}_{datetime.now().strftime('%H%M%S')}",
-                        issue_type="value_out_of_range",
-                        severity=severity,
-                        confidence=0.95,
-                        description=f"列 '{column}' 有 {out_of_range} 个值超出合理范围 [{min_val}, {max_val}]",
-                        affected_records=out_of_range,
-                        table_name=source_name,
-                        column_name=column,
-                        detection_time=datetime.now().isoformat(),
-                        detection_method="business_rule_validation",
-                        suggested_action=f"检查 {column} 列的数据录入，确保值在合理范围内",
-                        business_impact="high" if violation_ratio > 0.05 else "medium",
-                        auto_fixable=True
-                    ))
-        
-        sub_scores['range_validation'] = max(0, (total_numeric_checks - range_violations) / total_numeric_checks) if total_numeric_checks > 0 else 1.0
+        # 1. 数值范围验证（range 规则）
+        issues.extend(self._rule_issues(rule_results, 'range', source_name, 'accuracy'))
+        sub_scores['range_validation'] = self._rule_score(rule_results, 'range')
         
         # 2. 统计异常检测
         statistical_score = self._check_statistical_accuracy(df, source_name, issues)
         sub_scores['statistical_accuracy'] = statistical_score
         
         # 3. 业务逻辑验证
-        business_logic_score = self._check_business_logic_accuracy(df, source_name, issues)
+        business_logic_score = self._check_business_logic_accuracy(rule_results, source_name, issues)
         sub_scores['business_logic'] = business_logic_score
         
         # 计算准确性总分
@@ -485,56 +655,19 @@ class EnhancedDataQualityMonitor:
         
         return max(0, (total_values - outlier_ratio) / total_values) if total_values > 0 else 1.0
     
-    def _check_business_logic_accuracy(self, df: pd.DataFrame, source_name: str, issues: List[EnhancedQualityIssue]) -> float:
-        """业务逻辑准确性检查"""
-        violations = 0
-        total_checks = 0
-        
-        # 检查产品过滤规则
-        if '物料名称' in df.columns:
-            exclude_patterns = self.business_rules['product_filters']['exclude_patterns']
-            include_patterns = self.business_rules['product_filters']['include_patterns']
-            
-            for pattern in exclude_patterns:
-                excluded_products = df[df['物料名称'].str.contains(pattern, na=False)]
-                if len(excluded_products) > 0:
-                    # 检查是否有例外情况
-                    exceptions = excluded_products[
-                        excluded_products['物料名称'].str.contains('|'.join(include_patterns), na=False)
-                    ]
-                    actual_violations = len(excluded_products) - len(exceptions)
-                    
-                    if actual_violations > 0:
-                        violations += actual_violations
-                        violation_ratio = actual_violations / len(df)
-                        
-                        issues.append(EnhancedQualityIssue(
-                            issue_id=f"ACC_BIZ_{source_name}_{pattern}_{datetime.now().strftime('%H%M%S')}",
-                            issue_type="business_rule_violation",
-                            severity=self._determine_enhanced_severity(violation_ratio, 'accuracy'),
-                            confidence=0.9,
-                            description=f"发现 {actual_violations} 个应被过滤的 '{pattern}' 类产品",
-                            affected_records=actual_violations,
-                            table_name=source_name,
-                            column_name="物料名称",
-                            detection_time=datetime.now().isoformat(),
-                            detection_method="business_rule_validation",
-                            suggested_action=f"检查产品过滤规则，确保 '{pattern}' 类产品被正确处理",
-                            business_impact="medium",
-                            auto_fixable=True
-                        ))
-            
-            total_checks += len(df)
-        
-        return max(0, (total_checks - violations) / total_checks) if total_checks > 0 else 1.0
+    def _check_business_logic_accuracy(self, rule_results: List[RuleResult], source_name: str,
+                                       issues: List[EnhancedQualityIssue]) -> float:
+        """业务逻辑准确性检查（产品过滤规则）"""
+        issues.extend(self._rule_issues(rule_results, 'pattern_exclude', source_name, 'accuracy'))
+        return self._rule_score(rule_results, 'pattern_exclude')
     
     def _check_enhanced_consistency(self, df: pd.DataFrame, source_name: str) -> Tuple[List[EnhancedQualityIssue], QualityDimension]:
         """增强型一致性检查"""
         issues = []
         sub_scores = {}
         
-        # 1. 重复记录检测
-        duplicate_count = df.duplicated().sum()
+        # 1. 重复记录检测（行指纹排序比较）
+        duplicate_count = int(find_duplicate_mask(compute_row_fingerprints(df)).sum())
         duplicate_ratio = duplicate_count / len(df) if len(df) > 0 else 0
         sub_scores['duplicate_records'] = max(0, 1 - duplicate_ratio)
         
@@ -583,18 +716,19 @@ class EnhancedDataQualityMonitor:
         
         return issues, dimension
     
-    def _check_enhanced_validity(self, df: pd.DataFrame, source_name: str) -> Tuple[List[EnhancedQualityIssue], QualityDimension]:
+    def _check_enhanced_validity(self, df: pd.DataFrame, source_name: str,
+                                 rule_results: List[RuleResult]) -> Tuple[List[EnhancedQualityIssue], QualityDimension]:
         """增强型有效性检查"""
         issues = []
         sub_scores = {}
         
-        # 1. 业务规则有效性
-        business_validity_score = 1.0
-        sub_scores['business_validity'] = business_validity_score
+        # 1. 业务规则有效性（allowed_values 规则）
+        issues.extend(self._rule_issues(rule_results, 'allowed_values', source_name, 'validity'))
+        sub_scores['business_validity'] = self._rule_score(rule_results, 'allowed_values')
         
-        # 2. 时间序列有效性
-        temporal_validity_score = 1.0
-        sub_scores['temporal_validity'] = temporal_validity_score
+        # 2. 时间序列有效性（not_future 规则）
+        issues.extend(self._rule_issues(rule_results, 'not_future', source_name, 'validity'))
+        sub_scores['temporal_validity'] = self._rule_score(rule_results, 'not_future')
         
         # 3. 数据类型有效性
         type_validity_score = 1.0
@@ -618,7 +752,7 @@ class EnhancedDataQualityMonitor:
         
         return issues, dimension
     
-    def _detect_anomalies(self, df: pd.DataFrame, source_name: str) -> List[AnomalyDetection]:
+    def _detect_anomalies(self, df: pd.DataFrame, source_name: str, include_ml: bool = True) -> List[AnomalyDetection]:
         """智能异常检测"""
         anomalies = []
         
@@ -627,14 +761,102 @@ class EnhancedDataQualityMonitor:
         anomalies.extend(statistical_anomalies)
         
         # 2. 机器学习异常检测
-        if SKLEARN_AVAILABLE:
+        if SKLEARN_AVAILABLE and include_ml:
             ml_anomalies = self._detect_ml_anomalies(df, source_name)
             anomalies.extend(ml_anomalies)
         
         return anomalies
     
     def _detect_statistical_anomalies(self, df: pd.DataFrame, source_name: str) -> List[AnomalyDetection]:
-        """统计异常检测"""
+        """统计异常检测（已有基线时只检查新到达的数据并更新基线）"""
+        batch = self._prepare_statistical_batch(df, source_name)
+        anomalies, column_stats = self._score_statistical_columns(df, source_name, batch)
+        self._commit_statistical_batch(source_name, batch, column_stats)
+        return anomalies
+    
+    def _prepare_statistical_batch(self, df: pd.DataFrame, source_name: str) -> Optional[Dict[str, Any]]:
+        """切分新到达的数据并读取基线；未启用增量存储时返回 None"""
+        if self.stats_store is None:
+            return None
+        
+        delta, watermark, has_baseline = self.stats_store.split_new_rows(
+            df, source_name, self.incremental_watermarks.get(source_name)
+        )
+        return {
+            'delta': delta,
+            'watermark': watermark,
+            'has_baseline': has_baseline,
+            'column_stats': self.stats_store.load_column_stats(source_name) if has_baseline else {},
+            'total_records': len(df)
+        }
+    
+    @staticmethod
+    def _slice_statistical_batch(batch: Optional[Dict[str, Any]], columns: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+        """截取某个列组所需的批次数据"""
+        if batch is None or columns is None:
+            return batch
+        sliced = dict(batch)
+        sliced['delta'] = batch['delta'][columns]
+        sliced['column_stats'] = {col: s for col, s in batch['column_stats'].items() if col in columns}
+        return sliced
+    
+    def _score_statistical_columns(self, df: pd.DataFrame, source_name: str,
+                                   batch: Optional[Dict[str, Any]]) -> Tuple[List[AnomalyDetection], Dict[str, RunningStats]]:
+        """对批次中的数值列打分并返回更新后的基线（不写存储）"""
+        if batch is None:
+            return self._detect_full_statistical_anomalies(df, source_name), {}
+        
+        delta = batch['delta']
+        has_baseline = batch['has_baseline']
+        column_stats = {col: RunningStats(**vars(s)) for col, s in batch['column_stats'].items()}
+        
+        # 首次运行：全量检测并建立基线
+        anomalies = [] if has_baseline else self._detect_full_statistical_anomalies(df, source_name)
+        
+        numeric_columns = df.select_dtypes(include=[np.number]).columns
+        for column in numeric_columns:
+            series = delta[column]
+            values = series.dropna().astype(float)
+            baseline = column_stats.get(column, RunningStats())
+            
+            if has_baseline and len(values) > 0:
+                if baseline.count >= self.anomaly_params['min_baseline_count']:
+                    z_scores = baseline.zscores(values.values)
+                    mean, std = baseline.mean, baseline.std
+                elif len(values) > 10:
+                    z_scores = np.abs(stats.zscore(values))
+                    mean, std = float(values.mean()), float(values.std())
+                else:
+                    z_scores = None
+                
+                if z_scores is not None:
+                    anomaly = self._build_zscore_anomaly(values, z_scores, column, mean, std, {
+                        'mode': 'incremental',
+                        'baseline_count': baseline.count,
+                        'baseline_null_ratio': baseline.null_ratio,
+                        'checked_records': len(values)
+                    })
+                    if anomaly:
+                        anomalies.append(anomaly)
+            
+            if batch['watermark'].is_snapshot and len(delta) > 0:
+                # 快照型数据源（如库存）每次都是完整数据：用新快照替换基线，避免同一批行重复计入
+                baseline = RunningStats()
+            baseline.update(values.values, series.isna().sum())
+            column_stats[column] = baseline
+        
+        return anomalies, column_stats
+    
+    def _commit_statistical_batch(self, source_name: str, batch: Optional[Dict[str, Any]],
+                                  column_stats: Dict[str, RunningStats]):
+        """保存更新后的基线和水位"""
+        if batch is None:
+            return
+        self.stats_store.save(source_name, column_stats, batch['watermark'])
+        self.logger.info(f"{source_name} 增量统计检测: 新数据 {len(batch['delta'])} / {batch['total_records']} 条")
+    
+    def _detect_full_statistical_anomalies(self, df: pd.DataFrame, source_name: str) -> List[AnomalyDetection]:
+        """全量统计异常检测"""
         anomalies = []
         numeric_columns = df.select_dtypes(include=[np.number]).columns
         
@@ -644,31 +866,112 @@ class EnhancedDataQualityMonitor:
                 
                 # Z-Score异常检测
                 z_scores = np.abs(stats.zscore(values))
-                z_outliers_mask = z_scores > self.anomaly_params['z_score_threshold']
-                z_outliers_indices = values[z_outliers_mask].index.tolist()
-                
-                if len(z_outliers_indices) > 0:
-                    confidence = min(0.95, (z_scores[z_outliers_mask].mean() - self.anomaly_params['z_score_threshold']) / 3.0)
-                    
-                    anomalies.append(AnomalyDetection(
-                        detection_method="z_score",
-                        anomaly_type="statistical_outlier",
-                        confidence=confidence,
-                        affected_records=z_outliers_indices,
-                        statistical_info={
-                            'column': column,
-                            'mean': float(values.mean()),
-                            'std': float(values.std()),
-                            'z_threshold': self.anomaly_params['z_score_threshold'],
-                            'outlier_count': len(z_outliers_indices)
-                        },
-                        business_impact=self._assess_business_impact(column, len(z_outliers_indices), len(values))
-                    ))
+                anomaly = self._build_zscore_anomaly(values, z_scores, column, float(values.mean()), float(values.std()))
+                if anomaly:
+                    anomalies.append(anomaly)
         
         return anomalies
     
-    def _detect_ml_anomalies(self, df: pd.DataFrame, source_name: str) -> List[AnomalyDetection]:
-        """机器学习异常检测"""
+    def _build_zscore_anomaly(self, values: pd.Series, z_scores: np.ndarray, column: str,
+                              mean: float, std: float, extra_info: Dict[str, Any] = None) -> Optional[AnomalyDetection]:
+        """根据z分数构建异常检测结果"""
+        z_scores = np.asarray(z_scores)
+        z_outliers_mask = z_scores > self.anomaly_params['z_score_threshold']
+        z_outliers_indices = values[z_outliers_mask].index.tolist()
+        
+        if len(z_outliers_indices) == 0:
+            return None
+        
+        confidence = min(0.95, (z_scores[z_outliers_mask].mean() - self.anomaly_params['z_score_threshold']) / 3.0)
+        statistical_info = {
+            'column': column,
+            'mean': mean,
+            'std': std,
+            'z_threshold': self.anomaly_params['z_score_threshold'],
+            'outlier_count': len(z_outliers_indices)
+        }
+        statistical_info.update(extra_info or {})
+        
+        return AnomalyDetection(
+            detection_method="z_score",
+            anomaly_type="statistical_outlier",
+            confidence=confidence,
+            affected_records=z_outliers_indices,
+            statistical_info=statistical_info,
+            business_impact=self._assess_business_impact(column, len(z_outliers_indices), len(values))
+        )
+    
+    def _detect_product_anomalies(self, datasets: Dict[str, pd.DataFrame]) -> List[AnomalyDetection]:
+        """按产品、按指标的EWMA时间序列异常检测"""
+        anomalies = []
+        if self.product_detector is None:
+            return anomalies
+        
+        for metric, spec in self.product_metrics.items():
+            df = datasets.get(spec['source'])
+            columns = [spec['date'], '物料名称'] + [spec[k] for k in ('value', 'amount', 'quantity') if k in spec]
+            if df is None or df.empty or any(col not in df.columns for col in columns):
+                continue
+            
+            try:
+                if 'value' in spec:
+                    daily = self.product_detector.build_daily_matrix(df, spec['date'], '物料名称', spec['value'])
+                else:
+                    daily = self.product_detector.build_daily_price_matrix(
+                        df, spec['date'], '物料名称', spec['amount'], spec['quantity']
+                    )
+                flagged = self.product_detector.update(metric, daily)
+            except Exception as e:
+                self.logger.warning(f"{metric} 产品时间序列异常检测失败: {e}")
+                continue
+            
+            if flagged.empty:
+                continue
+            
+            # 定位到源数据行
+            row_keys = pd.MultiIndex.from_arrays([
+                pd.to_datetime(df[spec['date']], errors='coerce').dt.normalize(),
+                df['物料名称'].astype(str)
+            ])
+            flagged_keys = pd.MultiIndex.from_arrays([flagged['date'], flagged['product']])
+            affected = df.index[row_keys.isin(flagged_keys)].tolist()
+            
+            top = flagged.reindex(flagged['z_score'].abs().sort_values(ascending=False).index).head(20)
+            anomalies.append(AnomalyDetection(
+                detection_method="ewma_product",
+                anomaly_type="product_time_series_outlier",
+                confidence=min(0.95, float((flagged['z_score'].abs().mean() - self.anomaly_params['z_score_threshold']) / 3.0)),
+                affected_records=affected,
+                statistical_info={
+                    'metric': metric,
+                    'source': spec['source'],
+                    'flagged_points': len(flagged),
+                    'products': int(flagged['product'].nunique()),
+                    'alpha': self.anomaly_params['ewma_alpha'],
+                    'top_deviations': [
+                        {
+                            'date': row.date.strftime('%Y-%m-%d'),
+                            'product': row.product,
+                            'value': float(row.value),
+                            'expected': float(row.expected),
+                            'z_score': float(row.z_score)
+                        } for row in top.itertuples()
+                    ]
+                },
+                business_impact=self._assess_business_impact(metric, len(affected), len(df))
+            ))
+        
+        return anomalies
+    
+    def _source_content_hash(self, source_name: str) -> Optional[str]:
+        """注册中心已计算的数据源文件哈希（没有注册中心时返回 None）"""
+        lineage = self.registry.lineage(source_name) if self.registry is not None else None
+        return lineage.content_hash if lineage is not None else None
+    
+    @traced('ml_anomalies')
+    def _detect_ml_anomalies(self, df: pd.DataFrame, source_name: str,
+                             content_hash: Optional[str] = None) -> List[AnomalyDetection]:
+        """机器学习异常检测（content_hash 为数据源内容哈希，用于判断缓存模型能否直接复用）"""
         anomalies = []
         numeric_columns = df.select_dtypes(include=[np.number]).columns
         
@@ -677,15 +980,11 @@ class EnhancedDataQualityMonitor:
                 # 准备数据
                 data = df[numeric_columns].dropna()
                 if len(data) > 20:
-                    scaler = StandardScaler()
-                    scaled_data = scaler.fit_transform(data)
+                    scaler, iso_forest, model_info = self._get_ml_model(data, source_name, content_hash)
+                    scaled_data = scaler.transform(data)
                     
                     # Isolation Forest异常检测
-                    iso_forest = IsolationForest(
-                        contamination=self.anomaly_params['isolation_forest_contamination'],
-                        random_state=42
-                    )
-                    outliers = iso_forest.fit_predict(scaled_data)
+                    outliers = iso_forest.predict(scaled_data)
                     outlier_indices = data.index[outliers == -1].tolist()
                     
                     if len(outlier_indices) > 0:
@@ -702,7 +1001,8 @@ class EnhancedDataQualityMonitor:
                                 'features': list(numeric_columns),
                                 'contamination': self.anomaly_params['isolation_forest_contamination'],
                                 'outlier_count': len(outlier_indices),
-                                'total_records': len(data)
+                                'total_records': len(data),
+                                **model_info
                             },
                             business_impact=self._assess_business_impact('multivariate', len(outlier_indices), len(data))
                         ))
@@ -711,6 +1011,50 @@ class EnhancedDataQualityMonitor:
         
         return anomalies
     
+    def _get_ml_model(self, data: pd.DataFrame, source_name: str,
+                      content_hash: Optional[str] = None) -> Tuple[Any, Any, Dict[str, Any]]:
+        """
+        获取可用的 scaler/forest：数据内容未变或漂移未超阈值时复用缓存模型，否则重新训练并缓存
+        
+        没有传入数据源内容哈希时使用训练数据（数值列）的向量化哈希。
+        """
+        params = {'contamination': self.anomaly_params['isolation_forest_contamination'], 'random_state': 42}
+        if self.model_cache is not None and content_hash is None:
+            content_hash = frame_content_hash(data)
+        
+        fingerprint = None
+        if self.model_cache is not None:
+            cached = self.model_cache.load(source_name)
+            if cached is not None:
+                scaler, iso_forest, cached_fingerprint = cached
+                if self.model_cache.is_unchanged(cached_fingerprint, content_hash, list(data.columns), params):
+                    self.logger.info(f"{source_name} 数据未变化，复用缓存的异常检测模型")
+                    return scaler, iso_forest, {'model_reused': True, 'drift_score': 0.0,
+                                                'model_trained_at': cached_fingerprint.created_at}
+                fingerprint = AnomalyModelCache.fingerprint(data, params, content_hash)
+                reusable, drift = self.model_cache.is_reusable(cached_fingerprint, fingerprint)
+                if reusable:
+                    self.logger.info(f"{source_name} 复用缓存的异常检测模型 (漂移 {drift:.3f})")
+                    return scaler, iso_forest, {'model_reused': True, 'drift_score': drift,
+                                                'model_trained_at': cached_fingerprint.created_at}
+                self.logger.info(f"{source_name} 数据漂移 {drift:.3f} 超过阈值或模型过期，重新训练")
+        
+        scaler = StandardScaler()
+        scaled_data = scaler.fit_transform(data)
+        iso_forest = IsolationForest(
+            contamination=params['contamination'],
+            random_state=params['random_state'],
+            n_jobs=self.anomaly_params['ml_n_jobs']
+        )
+        iso_forest.fit(scaled_data)
+        
+        if self.model_cache is not None:
+            self.model_cache.save(source_name, scaler, iso_forest,
+                                  fingerprint or AnomalyModelCache.fingerprint(data, params, content_hash))
+        
+        return scaler, iso_forest, {'model_reused': False, 'drift_score': None,
+                                    'model_trained_at': datetime.now().isoformat()}
+    
     def _assess_business_impact(self, column: str, outlier_count: int, total_count: int) -> str:
         """评估业务影响"""
         impact_ratio = outlier_count / total_count if total_count > 0 else 0
@@ -828,10 +1172,14 @@ class EnhancedDataQualityMonitor:
     
     def _calculate_score_trend(self, current_score: float) -> str:
         """计算分数趋势"""
-        if len(self.quality_history) < 2:
+        if self.history_store is not None:
+            recent_scores = self.history_store.recent_scores(3)
+        else:
+            recent_scores = [h.metrics.weighted_score for h in self.quality_history[-3:]]
+        
+        if len(recent_scores) < 2:
             return "stable"
         
-        recent_scores = [h.metrics.weighted_score for h in self.quality_history[-3:]]
         recent_scores.append(current_score)
         
         if len(recent_scores) >= 3:
@@ -847,6 +1195,18 @@ class EnhancedDataQualityMonitor:
         """获取历史对比数据"""
         comparison = {}
         
+        if self.history_store is not None:
+            # 按时间查询：上一次记录，以及 7 天前、30 天前前后 1 天内最接近的记录（没有则不比较）
+            now = datetime.now()
+            record = self.history_store.latest_before(now)
+            if record is not None:
+                comparison['last_period'] = current_score - record['weighted_score']
+            for key, days in [('week_ago', 7), ('month_ago', 30)]:
+                record = self.history_store.nearest(now - timedelta(days=days), HISTORY_COMPARISON_WINDOW)
+                if record is not None:
+                    comparison[key] = current_score - record['weighted_score']
+            return comparison
+        
         if self.quality_history:
             last_score = self.quality_history[-1].metrics.weighted_score
             comparison['last_period'] = current_score - last_score
@@ -861,6 +1221,13 @@ class EnhancedDataQualityMonitor:
         
         return comparison
     
+    def get_quality_trend(self, days: int = 90) -> pd.DataFrame:
+        """按天聚合的质量趋势（用于趋势图）"""
+        if self.history_store is None:
+            return pd.DataFrame()
+        end = datetime.now()
+        return self.history_store.daily_trend(end - timedelta(days=days), end)
+    
     def _generate_intelligent_recommendations(self, issues: List[EnhancedQualityIssue],
                                             anomalies: List[AnomalyDetection],
                                             metrics: EnhancedQualityMetrics) -> List[str]:
@@ -914,6 +1281,10 @@ class EnhancedDataQualityMonitor:
             stat_anomalies = [a for a in anomalies if a.detection_method == 'z_score']
             if stat_anomalies:
                 recommendations.append("📈 统计异常检测发现离群值，建议检查数据录入的准确性")
+            
+            product_anomalies = [a for a in anomalies if a.detection_method == 'ewma_product']
+            if product_anomalies:
+                recommendations.append("🏷️ 部分产品的日销量/产量/价格明显偏离自身历史水平，建议逐一核实")
         
         # 5. 基于趋势的建议
         if metrics.score_trend == "declining":
@@ -940,7 +1311,8 @@ class EnhancedDataQualityMonitor:
         else:
             return "normal"
     
-    def _generate_quality_summary(self, metrics: EnhancedQualityMetrics, issues: List[EnhancedQualityIssue]) -> Dict[str, Any]:
+    def _generate_quality_summary(self, metrics: EnhancedQualityMetrics, issues: List[EnhancedQualityIssue],
+                                  rule_results: Optional[Dict[str, List[RuleResult]]] = None) -> Dict[str, Any]:
         """生成质量摘要"""
         return {
             'overall_grade': metrics.quality_grade,
@@ -959,32 +1331,44 @@ class EnhancedDataQualityMonitor:
                 'low': len([i for i in issues if i.severity == 'low'])
             },
             'trend': metrics.score_trend,
-            'auto_fixable': len([i for i in issues if i.auto_fixable])
+            'auto_fixable': len([i for i in issues if i.auto_fixable]),
+            'rule_timings': RuleSet.summarize_timings(rule_results or {})
         }
     
     def _store_quality_history(self, report: EnhancedQualityReport):
-        """存储质量历史数据"""
-        self.quality_history.append(report)
-        
-        # 保持历史记录在合理范围内（最多保留100条）
-        if len(self.quality_history) > 100:
-            self.quality_history = self.quality_history[-100:]
+        """存储质量历史数据（SQLite 或内存），并把最近10条写入 quality_history.json"""
+        if self.history_store is not None:
+            try:
+                self.history_store.record(report)
+            except Exception as e:
+                self.logger.warning(f"保存质量历史失败: {e}")
+        else:
+            self.quality_history.append(report)
+            
+            # 保持历史记录在合理范围内（最多保留100条）
+            if len(self.quality_history) > 100:
+                self.quality_history = self.quality_history[-100:]
         
-        # 可选：持久化到文件
+        # 持久化到文件（格式与旧版相同，供仍读取该文件的脚本使用）
         try:
-            history_file = 'quality_history.json'
-            history_data = []
-            
-            for report in self.quality_history[-10:]:  # 只保存最近10条到文件
-                history_data.append({
-                    'timestamp': report.timestamp,
-                    'overall_score': report.metrics.weighted_score,
-                    'quality_grade': report.metrics.quality_grade,
-                    'issue_count': report.metrics.issue_count,
-                    'critical_issues': report.metrics.critical_issue_count
-                })
+            if self.history_store is not None:
+                history_data = [{
+                    'timestamp': run['timestamp'],
+                    'overall_score': run['weighted_score'],
+                    'quality_grade': run['quality_grade'],
+                    'issue_count': run['issue_count'],
+                    'critical_issues': run['critical_issues']
+                } for run in self.history_store.recent_runs(10)]
+            else:
+                history_data = [{
+                    'timestamp': h.timestamp,
+                    'overall_score': h.metrics.weighted_score,
+                    'quality_grade': h.metrics.quality_grade,
+                    'issue_count': h.metrics.issue_count,
+                    'critical_issues': h.metrics.critical_issue_count
+                } for h in self.quality_history[-10:]]
             
-            with open(history_file, 'w', encoding='utf-8') as f:
+            with open('quality_history.json', 'w', encoding='utf-8') as f:
                 json.dump(history_data, f, ensure_ascii=False, indent=2)
                 
         except Exception as e:
@@ -1192,13 +1576,37 @@ class EnhancedDataQualityMonitor:
         print("="*80)
 
 
+_worker_monitor: Optional[EnhancedDataQualityMonitor] = None
+
+
+def _init_worker_monitor(state: Dict[str, Any]):
+    """进程池初始化：在工作进程中重建一次监控器"""
+    global _worker_monitor
+    _worker_monitor = EnhancedDataQualityMonitor.__new__(EnhancedDataQualityMonitor)
+    _worker_monitor.__dict__.update(state)
+
+
+def _call_worker_monitor(method_name: str, *args):
+    """在工作进程的监控器上执行一个检查阶段"""
+    return getattr(_worker_monitor, method_name)(*args)
+
+
 def main():
     """主程序入口"""
+    parser = argparse.ArgumentParser(description='增强型数据质量监控系统')
+    parser.add_argument('--mode', choices=EXECUTION_MODES, default='sequential',
+                        help='执行模式：sequential（机器学习阶段线程并行）或 process（按数据源/列组多进程并行）')
+    parser.add_argument('--workers', type=int, default=None, help='process 模式的进程数（默认CPU核心数）')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, top_n=args.profile_top)
+    
     print("🚀 启动增强型数据质量监控系统...")
     
     try:
         # 初始化监控器
-        monitor = EnhancedDataQualityMonitor()
+        monitor = EnhancedDataQualityMonitor(execution_mode=args.mode, max_workers=args.workers)
         
         # 运行质量检查
         report = monitor.run_enhanced_quality_check()
@@ -1214,6 +1622,15 @@ def main():
         print(f"   JSON: {json_file}")
         print(f"   HTML: {html_file}")
         
+        # 启用阶段追踪（STAGE_TRACE=1）时输出各阶段耗时
+        tracer = get_tracer()
+        if tracer.enabled:
+            print("\n" + tracer.format_summary())
+            print(f"   阶段追踪: {tracer.export('.', prefix='quality_trace')['trace']}")
+        
+        # 指定 --profile 时输出该阶段的性能分析文件
+        print_profile_summary()
+        
         # 根据告警级别给出建议
         if report.alert_level == 'critical':
             print(f"\n🚨 严重告警: 数据质量问题严重，建议立即处理！")
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据帧内存优化
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-15
+
+功能:
+1. 重复度高的字符串列（物料名称、客户名称、责任部门、物料分类等）转为 category
+2. 整数列无损降位（默认不低于 32 位，避免逐元素运算溢出）
+3. 浮点列可选无损降为 float32（默认关闭：pandas 对 float32 求和的累加精度不足）
+4. 日期列（列名含“日期”）加载时一次性解析为 datetime64，只在不产生新空值时转换
+5. 记录每列优化前后的字节数，供性能报告使用
+"""
+
+import pandas as pd
+import numpy as np
+import logging
+import time
+from typing import Dict, List, Optional, Tuple, Any
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+DATE_COLUMN_MARKERS = ('日期',)
+
+
+@dataclass
+class ColumnMemoryChange:
+    """单列优化前后对比"""
+    column: str
+    dtype_before: str
+    dtype_after: str
+    bytes_before: int
+    bytes_after: int
+    action: str  # 'category', 'downcast', 'parse_dates', 'unchanged'
+
+
+@dataclass
+class MemoryOptimizationReport:
+    """一个数据帧的内存优化结果"""
+    source_name: str
+    rows: int
+    bytes_before: int
+    bytes_after: int
+    elapsed: float
+    columns: List[ColumnMemoryChange] = field(default_factory=list)
+
+    @property
+    def saved_ratio(self) -> float:
+        return 1 - self.bytes_after / self.bytes_before if self.bytes_before else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'source_name': self.source_name,
+            'rows': self.rows,
+            'bytes_before': self.bytes_before,
+            'bytes_after': self.bytes_after,
+            'saved_ratio': self.saved_ratio,
+            'elapsed': self.elapsed,
+            'columns': [vars(change) for change in self.columns]
+        }
+
+
+def is_date_column(column: str, markers: Tuple[str, ...] = DATE_COLUMN_MARKERS) -> bool:
+    """列名是否标记为日期列"""
+    return any(marker in column for marker in markers)
+
+
+def _column_bytes(series: pd.Series) -> int:
+    return int(series.memory_usage(index=False, deep=True))
+
+
+class MemoryOptimizer:
+    """加载后立即执行的数据帧内存优化"""
+
+    def __init__(self, category_max_unique_ratio: float = 0.5, category_min_rows: int = 50,
+                 min_integer_bits: int = 32, downcast_floats: bool = False,
+                 date_markers: Tuple[str, ...] = DATE_COLUMN_MARKERS):
+        self.category_max_unique_ratio = category_max_unique_ratio
+        self.category_min_rows = category_min_rows
+        self.min_integer_bits = min_integer_bits
+        self.downcast_floats = downcast_floats
+        self.date_markers = date_markers
+        self.logger = logging.getLogger(f"{__name__}.MemoryOptimizer")
+
+    def optimize(self, df: pd.DataFrame, source_name: str = '') -> Tuple[pd.DataFrame, MemoryOptimizationReport]:
+        """返回优化后的数据帧（不修改输入）和逐列报告"""
+        start = time.perf_counter()
+        columns = {}
+        changes = []
+
+        for column in df.columns:
+            series = df[column]
+            optimized, action = self._optimize_column(str(column), series)
+            columns[column] = optimized
+            bytes_before = _column_bytes(series)
+            changes.append(ColumnMemoryChange(
+                column=str(column),
+                dtype_before=str(series.dtype),
+                dtype_after=str(optimized.dtype),
+                bytes_before=bytes_before,
+                bytes_after=bytes_before if optimized is series else _column_bytes(optimized),
+                action=action
+            ))
+
+        result = pd.DataFrame(columns, index=df.index)
+        result.columns = df.columns
+        report = MemoryOptimizationReport(
+            source_name=source_name,
+            rows=len(df),
+            bytes_before=sum(c.bytes_before for c in changes),
+            bytes_after=sum(c.bytes_after for c in changes),
+            elapsed=time.perf_counter() - start,
+            columns=changes
+        )
+        self.logger.info(
+            f"{source_name or '数据帧'} 内存优化: {report.bytes_before / 1024 / 1024:.1f}MB → "
+            f"{report.bytes_after / 1024 / 1024:.1f}MB（节省 {report.saved_ratio:.0%}）"
+        )
+        return result, report
+
+    def _optimize_column(self, column: str, series: pd.Series) -> Tuple[pd.Series, str]:
+        if is_date_column(column, self.date_markers):
+            parsed = self._parse_dates(series)
+            if parsed is not None:
+                return parsed, 'parse_dates'
+
+        if pd.api.types.is_integer_dtype(series.dtype) and not isinstance(series.dtype, pd.CategoricalDtype):
+            return self._downcast_integers(series)
+
+        if pd.api.types.is_float_dtype(series.dtype) and self.downcast_floats:
+            return self._downcast_floats(series)
+
+        if pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype):
+            return self._to_category(series)
+
+        return series, 'unchanged'
+
+    def _parse_dates(self, series: pd.Series) -> Optional[pd.Series]:
+        """字符串日期一次性解析；已是日期类型或解析会丢值时返回 None"""
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return None
+        if not (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)):
+            return None
+        parsed = pd.to_datetime(series, errors='coerce')
+        if (parsed.isna() & series.notna()).any():
+            return None
+        return parsed
+
+    def _downcast_integers(self, series: pd.Series) -> Tuple[pd.Series, str]:
+        downcast = pd.to_numeric(series, downcast='integer' if series.min() < 0 else 'unsigned')
+        if downcast.dtype.itemsize * 8 < self.min_integer_bits:
+            target = np.dtype(f"{'i' if downcast.dtype.kind == 'i' else 'u'}{self.min_integer_bits // 8}")
+            downcast = series.astype(target)
+        if downcast.dtype == series.dtype:
+            return series, 'unchanged'
+        return downcast, 'downcast'
+
+    def _downcast_floats(self, series: pd.Series) -> Tuple[pd.Series, str]:
+        values = series.to_numpy()
+        narrowed = values.astype(np.float32)
+        # 只有往返转换完全一致（NaN 位置相同）才视为无损
+        if not np.array_equal(narrowed.astype(values.dtype), values, equal_nan=True):
+            return series, 'unchanged'
+        return pd.Series(narrowed, index=series.index, name=series.name), 'downcast'
+
+    def _to_category(self, series: pd.Series) -> Tuple[pd.Series, str]:
+        if len(series) < self.category_min_rows:
+            return series, 'unchanged'
+        non_null = series.dropna()
+        if non_null.empty:
+            return series, 'unchanged'
+        # 混合类型（如数字与字符串混杂）的列保持原样
+        if pd.api.types.is_object_dtype(series.dtype) and not non_null.map(type).eq(str).all():
+            return series, 'unchanged'
+        if non_null.nunique() / len(series) > self.category_max_unique_ratio:
+            return series, 'unchanged'
+        return series.astype('category'), 'category'
+
+
+def format_memory_report(reports: List[MemoryOptimizationReport], top_n: int = 10) -> str:
+    """逐列内存优化文本表"""
+    lines = []
+    for report in reports:
+        lines.append(f"{report.source_name}: {report.rows:,} 行，{report.bytes_before / 1024 / 1024:.2f}MB → "
+                     f"{report.bytes_after / 1024 / 1024:.2f}MB（节省 {report.saved_ratio:.0%}）")
+        changed = sorted((c for c in report.columns if c.action != 'unchanged'),
+                         key=lambda c: c.bytes_before - c.bytes_after, reverse=True)
+        for change in changed[:top_n]:
+            lines.append(f"    {change.column}: {change.dtype_before} → {change.dtype_after}  "
+                         f"{change.bytes_before / 1024:.0f}KB → {change.bytes_after / 1024:.0f}KB")
+    return "\n".join(lines)
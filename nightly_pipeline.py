@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+夜间数据处理流水线
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-06
+
+功能:
+1. 通过共享数据集注册中心一次性加载全部Excel数据源
+2. 依次运行数据导入、产销率分析、数据质量监控、增强型质量监控和性能测试
+3. 汇总各阶段结果与数据血缘，输出运行记录
+"""
+
+import argparse
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from dataset_registry import DatasetRegistry
+from optimized_data_importer import OptimizedDataImporter, ETLConfig
+from optimized_production_sales_ratio import ProductionSalesRatioAnalyzer
+from data_quality_monitor import DataQualityMonitor
+from enhanced_data_quality_monitor import EnhancedDataQualityMonitor
+from performance_optimizer import PerformanceOptimizer
+from stage_tracer import trace_span, add_profile_argument, enable_profiling, finish_profiling, print_profile_summary
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('nightly_pipeline.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+class NightlyPipeline:
+    """夜间流水线：所有组件共享同一次数据加载"""
+
+    def __init__(self, excel_folder: str = './Excel文件夹/', run_performance: bool = True):
+        self.excel_folder = excel_folder
+        self.run_performance = run_performance
+        self.registry = DatasetRegistry(excel_folder)
+        self.logger = logging.getLogger(f"{__name__}.NightlyPipeline")
+
+    def run(self) -> Dict[str, Any]:
+        """运行完整的夜间流水线"""
+        start_time = time.time()
+        self.logger.info("开始执行夜间流水线...")
+
+        self.registry.preload()
+        stages: List[Dict[str, Any]] = []
+
+        stages.append(self._run_stage('data_import', self._run_import))
+        stages.append(self._run_stage('production_sales_ratio', self._run_ratio_analysis))
+        stages.append(self._run_stage('data_quality', self._run_quality_check))
+        stages.append(self._run_stage('enhanced_data_quality', self._run_enhanced_quality_check))
+        if self.run_performance:
+            stages.append(self._run_stage('performance', self._run_performance_test))
+
+        summary = {
+            'run_id': f"NIGHTLY_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            'timestamp': datetime.now().isoformat(),
+            'success': all(stage['success'] for stage in stages),
+            'datasets': self.registry.describe(),
+            'stages': stages,
+            'processing_time': time.time() - start_time
+        }
+
+        self.logger.info(f"夜间流水线执行完成，耗时: {summary['processing_time']:.2f}秒")
+        return summary
+
+    def _run_stage(self, stage_name: str, func) -> Dict[str, Any]:
+        """运行单个阶段并记录结果，单阶段失败不影响后续阶段"""
+        self.logger.info(f"开始阶段: {stage_name}")
+        stage_start = time.time()
+        try:
+            with trace_span(stage_name):
+                outputs = func()
+            success = True
+            error = None
+        except Exception as e:
+            self.logger.error(f"阶段 {stage_name} 执行失败: {e}")
+            outputs = {}
+            success = False
+            error = str(e)
+
+        return {
+            'stage': stage_name,
+            'success': success,
+            'error': error,
+            'outputs': outputs,
+            'elapsed': time.time() - stage_start
+        }
+
+    def _run_import(self) -> Dict[str, Any]:
+        importer = OptimizedDataImporter(ETLConfig(excel_folder=self.excel_folder), registry=self.registry)
+        result = importer.run_etl_process()
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        return {
+            'products_count': result['products_count'],
+            'metrics_count': result['metrics_count'],
+            'sql_file': result['sql_file']
+        }
+
+    def _run_ratio_analysis(self) -> Dict[str, Any]:
+        analyzer = ProductionSalesRatioAnalyzer(self.excel_folder, registry=self.registry)
+        sales_data, inventory_data = analyzer.load_and_validate_data()
+        report = analyzer.calculate_production_sales_ratio(sales_data, inventory_data)
+        return {
+            'total_products': report.total_products,
+            'abnormal_ratios_count': report.abnormal_ratios_count,
+            'report_file': analyzer.export_report_to_json(report)
+        }
+
+    def _run_quality_check(self) -> Dict[str, Any]:
+        monitor = DataQualityMonitor(self.excel_folder, registry=self.registry)
+        report = monitor.run_quality_check()
+        return {
+            'overall_score': report.metrics.overall_score,
+            'issue_count': report.metrics.issue_count,
+            'report_file': monitor.export_report(report, 'json')
+        }
+
+    def _run_enhanced_quality_check(self) -> Dict[str, Any]:
+        monitor = EnhancedDataQualityMonitor(self.excel_folder, registry=self.registry)
+        report = monitor.run_enhanced_quality_check()
+        return {
+            'weighted_score': report.metrics.weighted_score,
+            'quality_grade': report.metrics.quality_grade,
+            'alert_level': report.alert_level,
+            'report_file': monitor.export_report(report, 'json')
+        }
+
+    def _run_performance_test(self) -> Dict[str, Any]:
+        optimizer = PerformanceOptimizer(self.excel_folder, registry=self.registry)
+        report = optimizer.run_performance_test()
+        return {
+            'overall_score': report.overall_score,
+            'bottlenecks': report.bottlenecks,
+            'report_file': optimizer.export_report(report)
+        }
+
+    def export_summary(self, summary: Dict[str, Any], filename: Optional[str] = None) -> str:
+        """导出运行记录"""
+        if filename is None:
+            filename = f"nightly_run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+
+        self.logger.info(f"夜间流水线运行记录已导出: {filename}")
+        return filename
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='夜间数据处理流水线')
+    parser.add_argument('--excel-folder', default='./Excel文件夹/', help='Excel数据目录')
+    parser.add_argument('--skip-performance', action='store_true', help='跳过性能测试阶段')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, top_n=args.profile_top)
+
+    print("=" * 80)
+    print("夜间数据处理流水线 v1.0")
+    print("=" * 80)
+
+    pipeline = NightlyPipeline(args.excel_folder, run_performance=not args.skip_performance)
+    summary = pipeline.run()
+
+    print(f"\n📦 数据源加载:")
+    for source_name, lineage in summary['datasets'].items():
+        print(f"   {source_name}: {lineage['records']:,} 条记录 ({lineage['load_time']:.2f}s)")
+
+    print(f"\n🔄 阶段执行:")
+    for stage in summary['stages']:
+        status = "✅" if stage['success'] else "❌"
+        print(f"   {status} {stage['stage']}: {stage['elapsed']:.2f}s")
+        if stage['error']:
+            print(f"      错误: {stage['error']}")
+
+    summary['profile_files'] = finish_profiling()
+    summary_file = pipeline.export_summary(summary)
+    print(f"\n⏱️  总耗时: {summary['processing_time']:.2f}秒")
+    print(f"📄 运行记录: {summary_file}")
+    print_profile_summary(summary['profile_files'])
+    print("\n" + "=" * 80)
+
+    return 0 if summary['success'] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -26,6 +26,9 @@ from dataclasses import dataclass
 from pathlib import Path
 import hashlib
 import time
+import argparse
+
+from stage_tracer import trace_span, get_tracer, add_profile_argument, enable_profiling, print_profile_summary
 
 # 配置日志记录
 logging.basicConfig(
@@ -176,7 +179,7 @@ class DataCleaner:
         
         # 过滤客户名称
         if '客户名称' in df.columns:
-            df['客户名称'] = df['客户名称'].fillna('').astype(str).str.strip()
+            df['客户名称'] = df['客户名称'].astype(object).fillna('').astype(str).str.strip()
             excluded_customers = ['', '副产品', '鲜品']
             df = df[~df['客户名称'].str.lower().isin([x.lower() for x in excluded_customers])]
         
@@ -241,8 +244,9 @@ class ProductionSalesRatioCalculator:
 class OptimizedDataImporter:
     """优化的数据导入器主类"""
     
-    def __init__(self, config: ETLConfig = None):
+    def __init__(self, config: ETLConfig = None, registry=None):
         self.config = config or ETLConfig()
+        self.registry = registry  # 可选的共享数据集注册中心（DatasetRegistry）
         self.logger = logging.getLogger(f"{__name__}.OptimizedDataImporter")
         self.data_cleaner = DataCleaner(self.config)
         self.ratio_calculator = ProductionSalesRatioCalculator()
@@ -271,7 +275,15 @@ class OptimizedDataImporter:
         structure_info = {}
         
         for file_type, file_path in excel_files.items():
-            if os.path.exists(file_path):
+            lineage = self.registry.lineage(file_type) if self.registry is not None else None
+            if lineage is not None:
+                structure_info[file_type] = {
+                    'path': lineage.file_path,
+                    'columns': lineage.columns,
+                    'shape': (lineage.records, len(lineage.columns)),
+                    'exists': True
+                }
+            elif os.path.exists(file_path):
                 try:
                     df = pd.read_excel(file_path, nrows=5)  # 只读取前5行用于结构检查
                     structure_info[file_type] = {
@@ -302,19 +314,30 @@ class OptimizedDataImporter:
         self.logger.info(f"开始加载 {file_type} 数据: {file_path}")
         
         try:
-            # 读取Excel文件
-            df = pd.read_excel(file_path)
+            # 读取Excel文件（有注册中心时复用已加载的数据）
+            with trace_span('read', source=file_type) as span:
+                if self.registry is not None and self.registry.has(file_type):
+                    df = self.registry.get(file_type)
+                else:
+                    df = pd.read_excel(file_path)
+                span.set_rows(len(df))
             self.logger.info(f"原始数据形状: {df.shape}")
             
             # 应用业务过滤规则
-            df = self.data_cleaner.apply_business_filters(df, file_type)
+            with trace_span('filter', source=file_type) as span:
+                df = self.data_cleaner.apply_business_filters(df, file_type)
+                span.set_rows(len(df))
             
             # 根据文件类型进行列映射和数据转换
-            df = self._map_columns_and_convert(df, file_type)
+            with trace_span('map', source=file_type) as span:
+                df = self._map_columns_and_convert(df, file_type)
+                span.set_rows(len(df))
             
             # 数据验证
             if self.config.data_validation_enabled:
-                df = self._validate_data(df, file_type)
+                with trace_span('validate', source=file_type) as span:
+                    df = self._validate_data(df, file_type)
+                    span.set_rows(len(df))
             
             self.logger.info(f"{file_type} 数据加载完成，最终形状: {df.shape}")
             return df
@@ -545,23 +568,46 @@ class OptimizedDataImporter:
         self.logger.info("开始执行优化的ETL流程...")
         
         try:
-            # 1. 检查文件结构
-            structure_info = self.inspect_excel_structure()
-            
-            # 2. 加载和清洗数据
-            production_df = self.load_and_clean_excel(
-                os.path.join(self.config.excel_folder, '产成品入库列表.xlsx'), 'production'
-            )
+            with trace_span('etl'):
+                return self._run_etl_stages(start_time)
             
-            inventory_df = self.load_and_clean_excel(
-                os.path.join(self.config.excel_folder, '收发存汇总表查询.xlsx'), 'inventory'
-            )
-            
-            sales_df = self.load_and_clean_excel(
-                os.path.join(self.config.excel_folder, '销售发票执行查询.xlsx'), 'sales'
-            )
-            
-            # 3. 创建产品主表
+        except Exception as e:
+            self.logger.error(f"ETL流程执行失败: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'processing_time': time.time() - start_time
+            }
+    
+    def _run_etl_stages(self, start_time: float) -> Dict[str, Any]:
+        """ETL 各阶段（每个阶段记录为一个追踪 span）"""
+        # 1. 检查文件结构
+        with trace_span('inspect'):
+            structure_info = self.inspect_excel_structure()
+        
+        # 2. 加载和清洗数据
+        with trace_span('load') as load_span:
+            with trace_span('production') as span:
+                production_df = self.load_and_clean_excel(
+                    os.path.join(self.config.excel_folder, '产成品入库列表.xlsx'), 'production'
+                )
+                span.set_rows(len(production_df))
+            
+            with trace_span('inventory') as span:
+                inventory_df = self.load_and_clean_excel(
+                    os.path.join(self.config.excel_folder, '收发存汇总表查询.xlsx'), 'inventory'
+                )
+                span.set_rows(len(inventory_df))
+            
+            with trace_span('sales') as span:
+                sales_df = self.load_and_clean_excel(
+                    os.path.join(self.config.excel_folder, '销售发票执行查询.xlsx'), 'sales'
+                )
+                span.set_rows(len(sales_df))
+            load_span.set_rows(len(production_df) + len(inventory_df) + len(sales_df))
+        
+        # 3. 创建产品主表
+        with trace_span('products') as span:
             all_products = set()
             for df in [production_df, inventory_df, sales_df]:
                 if not df.empty and 'product_name' in df.columns:
@@ -570,18 +616,20 @@ class OptimizedDataImporter:
             products_df = pd.DataFrame(list(all_products), columns=['product_name'])
             products_df['product_id'] = range(1, len(products_df) + 1)
             product_mapping = products_df.set_index('product_name')['product_id'].to_dict()
-            
-            # 4. 处理每日指标数据
+            span.set_rows(len(products_df))
+        
+        # 4. 处理每日指标数据
+        with trace_span('aggregate') as span:
             # 聚合生产数据
             if not production_df.empty:
-                production_daily = production_df.groupby(['record_date', 'product_name'])['production_volume'].sum().reset_index()
+                production_daily = production_df.groupby(['record_date', 'product_name'], observed=True)['production_volume'].sum().reset_index()
             else:
                 production_daily = pd.DataFrame(columns=['record_date', 'product_name', 'production_volume'])
             
             # 聚合销售数据
             if not sales_df.empty:
                 sales_df['total_amount'] = sales_df['sales_volume'] * sales_df['average_price']
-                sales_daily = sales_df.groupby(['record_date', 'product_name']).agg({
+                sales_daily = sales_df.groupby(['record_date', 'product_name'], observed=True).agg({
                     'sales_volume': 'sum',
                     'total_amount': 'sum'
                 }).reset_index()
@@ -596,8 +644,10 @@ class OptimizedDataImporter:
             
             # 添加产品ID
             metrics_df['product_id'] = metrics_df['product_name'].map(product_mapping)
-            
-            # 5. 计算动态库存
+            span.set_rows(len(metrics_df))
+        
+        # 5. 计算动态库存
+        with trace_span('inventory') as span:
             if not inventory_df.empty:
                 initial_inventory = inventory_df.set_index('product_name')['inventory_level'].to_dict()
             else:
@@ -609,8 +659,10 @@ class OptimizedDataImporter:
             if not inventory_calc_df.empty:
                 inventory_merge = inventory_calc_df[['record_date', 'product_name', 'inventory_level']]
                 metrics_df = pd.merge(metrics_df, inventory_merge, on=['record_date', 'product_name'], how='left')
-            
-            # 6. 计算产销率和库存周转天数
+            span.set_rows(len(inventory_calc_df))
+        
+        # 6. 计算产销率和库存周转天数
+        with trace_span('ratio') as span:
             metrics_df['production_sales_ratio'] = metrics_df.apply(
                 lambda row: self.ratio_calculator.calculate_ratio(row['production_volume'], row['sales_volume']),
                 axis=1
@@ -622,40 +674,42 @@ class OptimizedDataImporter:
                     row.get('inventory_level', 0), row.get('sales_volume', 0)
                 ), axis=1
             )
-            
-            # 7. 导出SQL文件
+            span.set_rows(len(metrics_df))
+        
+        # 7. 导出SQL文件
+        with trace_span('export') as span:
             sql_file = self.export_to_sql(products_df, metrics_df)
-            
-            # 8. 生成数据质量报告
+            span.set_rows(len(products_df) + len(metrics_df))
+        
+        # 8. 生成数据质量报告
+        with trace_span('quality_report'):
             processing_time = time.time() - start_time
             quality_report = self.generate_data_quality_report()
             quality_report.processing_time = processing_time
-            
-            # 9. 返回处理结果
-            result = {
-                'success': True,
-                'structure_info': structure_info,
-                'products_count': len(products_df),
-                'metrics_count': len(metrics_df),
-                'sql_file': sql_file,
-                'quality_report': quality_report,
-                'processing_time': processing_time
-            }
-            
-            self.logger.info(f"ETL流程执行完成，耗时: {processing_time:.2f}秒")
-            return result
-            
-        except Exception as e:
-            self.logger.error(f"ETL流程执行失败: {e}")
-            return {
-                'success': False,
-                'error': str(e),
-                'processing_time': time.time() - start_time
-            }
+        
+        # 9. 返回处理结果
+        result = {
+            'success': True,
+            'structure_info': structure_info,
+            'products_count': len(products_df),
+            'metrics_count': len(metrics_df),
+            'sql_file': sql_file,
+            'quality_report': quality_report,
+            'processing_time': processing_time
+        }
+        
+        self.logger.info(f"ETL流程执行完成，耗时: {processing_time:.2f}秒")
+        return result
 
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='优化的数据导入器')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, top_n=args.profile_top)
+    
     print("=" * 80)
     print("优化的生产销售数据分析系统 - 数据导入器 v2.0")
     print("=" * 80)
@@ -690,6 +744,16 @@ def main():
         print(f"\n❌ ETL流程执行失败: {result['error']}")
         print(f"⏱️  处理时间: {result['processing_time']:.2f}秒")
     
+    # 启用阶段追踪（STAGE_TRACE=1）时输出各阶段耗时
+    tracer = get_tracer()
+    if tracer.enabled:
+        print("\n" + tracer.format_summary())
+        trace_files = tracer.export('.', prefix='etl_trace')
+        print(f"📄 阶段追踪: {trace_files['trace']}")
+    
+    # 指定 --profile 时输出该阶段的性能分析文件
+    print_profile_summary()
+    
     print("\n" + "=" * 80)
 
 
@@ -22,8 +22,11 @@ from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 import json
 import warnings
+import argparse
 warnings.filterwarnings('ignore')
 
+from stage_tracer import traced, add_profile_argument, enable_profiling, print_profile_summary
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -65,8 +68,9 @@ class RatioAnalysisReport:
 class ProductionSalesRatioAnalyzer:
     """产销率分析器类"""
     
-    def __init__(self, excel_folder: str = './Excel文件夹/'):
+    def __init__(self, excel_folder: str = './Excel文件夹/', registry=None):
         self.excel_folder = excel_folder
+        self.registry = registry  # 可选的共享数据集注册中心（DatasetRegistry）
         self.logger = logging.getLogger(f"{__name__}.ProductionSalesRatioAnalyzer")
         
         # 异常阈值配置
@@ -83,6 +87,7 @@ class ProductionSalesRatioAnalyzer:
             'consistency': 0.3      # 数据一致性
         }
     
+    @traced('ratio_load')
     def load_and_validate_data(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """加载并验证销售和库存数据"""
         self.logger.info("开始加载销售和库存数据...")
@@ -90,12 +95,12 @@ class ProductionSalesRatioAnalyzer:
         try:
             # 加载销售数据
             sales_path = f"{self.excel_folder}/销售发票执行查询.xlsx"
-            sales_data = pd.read_excel(sales_path)
+            sales_data = self._read_source('sales', sales_path)
             self.logger.info(f"销售数据加载完成，原始记录数: {len(sales_data)}")
             
             # 加载库存数据（包含生产信息）
             inventory_path = f"{self.excel_folder}/收发存汇总表查询.xlsx"
-            inventory_data = pd.read_excel(inventory_path)
+            inventory_data = self._read_source('inventory', inventory_path)
             self.logger.info(f"库存数据加载完成，原始记录数: {len(inventory_data)}")
             
             # 数据验证
@@ -108,6 +113,12 @@ class ProductionSalesRatioAnalyzer:
             self.logger.error(f"数据加载失败: {e}")
             raise
     
+    def _read_source(self, source_name: str, file_path: str) -> pd.DataFrame:
+        """读取数据源，优先使用注册中心中已加载的数据"""
+        if self.registry is not None and self.registry.has(source_name):
+            return self.registry.get(source_name)
+        return pd.read_excel(file_path)
+    
     def _validate_sales_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """验证销售数据"""
         self.logger.info("开始验证销售数据...")
@@ -176,6 +187,7 @@ class ProductionSalesRatioAnalyzer:
         
         return df
     
+    @traced('ratio_calculate')
     def calculate_production_sales_ratio(self, sales_data: pd.DataFrame, 
                                        inventory_data: pd.DataFrame,
                                        by_department: bool = True,
@@ -202,6 +214,7 @@ class ProductionSalesRatioAnalyzer:
         self.logger.info(f"产销率计算完成，共计算 {len(results)} 个产销率")
         return report
     
+    @traced('by_department')
     def _calculate_by_department(self, sales_data: pd.DataFrame, 
                                inventory_data: pd.DataFrame) -> List[RatioCalculationResult]:
         """按部门计算产销率"""
@@ -255,6 +268,7 @@ class ProductionSalesRatioAnalyzer:
         
         return results
     
+    @traced('by_product')
     def _calculate_by_product(self, sales_data: pd.DataFrame, 
                             inventory_data: pd.DataFrame) -> List[RatioCalculationResult]:
         """按产品计算产销率"""
@@ -528,6 +542,12 @@ class ProductionSalesRatioAnalyzer:
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='优化的产销率计算系统')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, top_n=args.profile_top)
+    
     print("=" * 80)
     print("优化的产销率计算系统 v2.0")
     print("=" * 80)
@@ -557,6 +577,9 @@ def main():
         logger.error(f"程序执行失败: {e}")
         print(f"\n❌ 程序执行失败: {e}")
     
+    # 指定 --profile 时输出该阶段的性能分析文件
+    print_profile_summary()
+    
     print("\n" + "=" * 80)
 
 
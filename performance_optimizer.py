@@ -20,19 +20,25 @@ import psutil
 import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any, Callable
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import json
 import os
 import gc
+import argparse
 from functools import wraps
 import warnings
 warnings.filterwarnings('ignore')
 
+from resource_profiler import StageProfiler, StageProfile
+from memory_optimizer import MemoryOptimizer, MemoryOptimizationReport, format_memory_report
+from stage_tracer import add_profile_argument, enable_profiling, finish_profiling, print_profile_summary
+
 # 导入优化的模块
 try:
-    from optimized_data_importer import OptimizedDataImporter
+    from optimized_data_importer import OptimizedDataImporter, ETLConfig
     from optimized_production_sales_ratio import ProductionSalesRatioAnalyzer
     from data_quality_monitor import DataQualityMonitor
+    from synthetic_data_generator import SyntheticDataGenerator, SyntheticDataConfig
 except ImportError as e:
     print(f"警告: 无法导入优化模块 - {e}")
 
@@ -59,6 +65,27 @@ class PerformanceMetrics:
     records_processed: int
     throughput: float  # 记录/秒
     timestamp: str
+    cpu_max: float = 0.0
+    sample_count: int = 0
+    top_allocations: List[Dict[str, Any]] = field(default_factory=list)
+    
+    @classmethod
+    def from_profile(cls, profile: StageProfile) -> 'PerformanceMetrics':
+        """由阶段采样结果构造性能指标"""
+        return cls(
+            operation_name=profile.name,
+            execution_time=profile.seconds,
+            memory_before=profile.memory_before,
+            memory_after=profile.memory_after,
+            memory_peak=profile.memory_peak,
+            cpu_usage=profile.cpu_mean,
+            records_processed=profile.records_processed,
+            throughput=profile.throughput,
+            timestamp=profile.timestamp,
+            cpu_max=profile.cpu_max,
+            sample_count=profile.sample_count,
+            top_allocations=profile.top_allocations
+        )
 
 @dataclass
 class OptimizationReport:
@@ -70,56 +97,34 @@ class OptimizationReport:
     bottlenecks: List[str]
     recommendations: List[str]
     overall_score: float
+    profile_files: Dict[str, str] = field(default_factory=dict)  # --profile 指定阶段的性能分析文件
+    memory_optimization: List[MemoryOptimizationReport] = field(default_factory=list)  # 逐列内存优化前后对比
 
 def performance_monitor(func: Callable) -> Callable:
-    """性能监控装饰器"""
+    """
+    性能监控装饰器
+
+    后台线程采样 RSS/CPU 捕获峰值；函数内可调用 resource_profiler.record_rows(n) 上报处理行数，
+    未上报且返回 DataFrame 时按其行数计算吞吐量。
+    """
+    profiled = StageProfiler(func.__name__)(func)
+    
     @wraps(func)
     def wrapper(*args, **kwargs):
-        # 记录开始状态
-        start_time = time.time()
-        process = psutil.Process()
-        memory_before = process.memory_info().rss / 1024 / 1024  # MB
-        cpu_before = process.cpu_percent()
-        
-        # 执行函数
-        result = func(*args, **kwargs)
-        
-        # 记录结束状态
-        end_time = time.time()
-        memory_after = process.memory_info().rss / 1024 / 1024  # MB
-        cpu_after = process.cpu_percent()
-        
-        # 计算指标
-        execution_time = end_time - start_time
-        memory_peak = max(memory_before, memory_after)
-        cpu_usage = (cpu_before + cpu_after) / 2
-        
-        # 记录性能数据
-        metrics = PerformanceMetrics(
-            operation_name=func.__name__,
-            execution_time=execution_time,
-            memory_before=memory_before,
-            memory_after=memory_after,
-            memory_peak=memory_peak,
-            cpu_usage=cpu_usage,
-            records_processed=0,  # 需要在函数中设置
-            throughput=0,
-            timestamp=datetime.now().isoformat()
-        )
-        
-        logger.info(f"{func.__name__} 执行完成 - 耗时: {execution_time:.2f}s, 内存: {memory_peak:.1f}MB")
-        
-        return result, metrics
+        result = profiled(*args, **kwargs)
+        return result, PerformanceMetrics.from_profile(profiled.last_profile)
     
     return wrapper
 
 class PerformanceOptimizer:
     """性能优化器"""
     
-    def __init__(self, excel_folder: str = './Excel文件夹/'):
+    def __init__(self, excel_folder: str = './Excel文件夹/', registry=None, trace_allocations: bool = False):
         self.excel_folder = excel_folder
+        self.registry = registry  # 可选的共享数据集注册中心（DatasetRegistry）
         self.logger = logging.getLogger(f"{__name__}.PerformanceOptimizer")
         self.metrics_history = []
+        self.trace_allocations = trace_allocations  # 记录 tracemalloc 分配热点（会拖慢执行）
         
         # 性能阈值配置
         self.performance_thresholds = {
@@ -155,6 +160,10 @@ class PerformanceOptimizer:
             # 运行各项性能测试
             all_metrics = []
             
+            # 0. 共享注册中心的一次性加载耗时
+            if self.registry is not None:
+                all_metrics.extend(self._collect_registry_load_metrics())
+            
             # 1. 数据导入性能测试
             import_metrics = self._test_data_import_performance()
             all_metrics.extend(import_metrics)
@@ -168,7 +177,7 @@ class PerformanceOptimizer:
             all_metrics.extend(quality_metrics)
             
             # 4. 内存优化测试
-            memory_metrics = self._test_memory_optimization()
+            memory_metrics, memory_reports = self._test_memory_optimization()
             all_metrics.extend(memory_metrics)
             
             # 分析瓶颈
@@ -188,7 +197,8 @@ class PerformanceOptimizer:
                 performance_metrics=all_metrics,
                 bottlenecks=bottlenecks,
                 recommendations=recommendations,
-                overall_score=overall_score
+                overall_score=overall_score,
+                memory_optimization=memory_reports
             )
             
             self.logger.info("性能测试完成")
@@ -211,6 +221,26 @@ class PerformanceOptimizer:
             'numpy_version': np.__version__
         }
     
+    def _collect_registry_load_metrics(self) -> List[PerformanceMetrics]:
+        """将注册中心的加载耗时记录为性能指标（数据只读取一次）"""
+        metrics = []
+        
+        for source_name, lineage in self.registry.describe().items():
+            load_time = lineage['load_time']
+            metrics.append(PerformanceMetrics(
+                operation_name=f"registry_load_{source_name}",
+                execution_time=load_time,
+                memory_before=0.0,
+                memory_after=0.0,
+                memory_peak=0.0,
+                cpu_usage=0.0,
+                records_processed=lineage['raw_records'],
+                throughput=lineage['raw_records'] / load_time if load_time > 0 else 0,
+                timestamp=lineage['loaded_at']
+            ))
+        
+        return metrics
+    
     def _test_data_import_performance(self) -> List[PerformanceMetrics]:
         """测试数据导入性能"""
         self.logger.info("测试数据导入性能...")
@@ -232,38 +262,25 @@ class PerformanceOptimizer:
         
         return metrics
     
+    def _profile(self, name: str) -> StageProfiler:
+        """创建测试阶段的资源采样器"""
+        return StageProfiler(name, trace_allocations=self.trace_allocations)
+    
     def _benchmark_original_import(self) -> Optional[PerformanceMetrics]:
         """基准测试原始导入方法"""
         try:
-            start_time = time.time()
-            process = psutil.Process()
-            memory_before = process.memory_info().rss / 1024 / 1024
-            
-            # 模拟原始导入逻辑
-            total_records = 0
-            for filename in ['销售发票执行查询.xlsx', '收发存汇总表查询.xlsx']:
-                filepath = os.path.join(self.excel_folder, filename)
-                if os.path.exists(filepath):
-                    df = pd.read_excel(filepath)
-                    total_records += len(df)
-                    # 简单的数据处理
-                    df = df.dropna()
-                    df = df[df.select_dtypes(include=[np.number]).columns[0] > 0] if len(df.select_dtypes(include=[np.number]).columns) > 0 else df
-            
-            end_time = time.time()
-            memory_after = process.memory_info().rss / 1024 / 1024
-            
-            return PerformanceMetrics(
-                operation_name="original_data_import",
-                execution_time=end_time - start_time,
-                memory_before=memory_before,
-                memory_after=memory_after,
-                memory_peak=max(memory_before, memory_after),
-                cpu_usage=process.cpu_percent(),
-                records_processed=total_records,
-                throughput=total_records / (end_time - start_time) if (end_time - start_time) > 0 else 0,
-                timestamp=datetime.now().isoformat()
-            )
+            with self._profile("original_data_import") as profiler:
+                # 模拟原始导入逻辑（基准测试衡量的就是 Excel 读取，始终直接读取文件，不使用注册中心）
+                for filename in ['销售发票执行查询.xlsx', '收发存汇总表查询.xlsx']:
+                    filepath = os.path.join(self.excel_folder, filename)
+                    if os.path.exists(filepath):
+                        df = pd.read_excel(filepath)
+                        profiler.add_records(len(df))
+                        # 简单的数据处理
+                        df = df.dropna()
+                        df = df[df.select_dtypes(include=[np.number]).columns[0] > 0] if len(df.select_dtypes(include=[np.number]).columns) > 0 else df
+            
+            return PerformanceMetrics.from_profile(profiler.result)
             
         except Exception as e:
             self.logger.error(f"原始导入基准测试失败: {e}")
@@ -272,30 +289,16 @@ class PerformanceOptimizer:
     def _benchmark_optimized_import(self) -> Optional[PerformanceMetrics]:
         """基准测试优化导入方法"""
         try:
-            start_time = time.time()
-            process = psutil.Process()
-            memory_before = process.memory_info().rss / 1024 / 1024
-            
-            # 使用优化的导入器
-            importer = OptimizedDataImporter(self.excel_folder)
-            result = importer.process_all_data()
-            
-            end_time = time.time()
-            memory_after = process.memory_info().rss / 1024 / 1024
-            
-            total_records = sum(len(df) for df in result.processed_data.values() if df is not None)
-            
-            return PerformanceMetrics(
-                operation_name="optimized_data_import",
-                execution_time=end_time - start_time,
-                memory_before=memory_before,
-                memory_after=memory_after,
-                memory_peak=max(memory_before, memory_after),
-                cpu_usage=process.cpu_percent(),
-                records_processed=total_records,
-                throughput=total_records / (end_time - start_time) if (end_time - start_time) > 0 else 0,
-                timestamp=datetime.now().isoformat()
-            )
+            with self._profile("optimized_data_import") as profiler:
+                # 使用优化的导入器
+                importer = OptimizedDataImporter(ETLConfig(excel_folder=self.excel_folder), registry=self.registry)
+                for file_type, filename in [('production', '产成品入库列表.xlsx'),
+                                            ('inventory', '收发存汇总表查询.xlsx'),
+                                            ('sales', '销售发票执行查询.xlsx')]:
+                    df = importer.load_and_clean_excel(os.path.join(self.excel_folder, filename), file_type)
+                    profiler.add_records(len(df))
+            
+            return PerformanceMetrics.from_profile(profiler.result)
             
         except Exception as e:
             self.logger.error(f"优化导入基准测试失败: {e}")
@@ -307,31 +310,14 @@ class PerformanceOptimizer:
         metrics = []
         
         try:
-            start_time = time.time()
-            process = psutil.Process()
-            memory_before = process.memory_info().rss / 1024 / 1024
-            
-            # 使用优化的产销率分析器
-            analyzer = ProductionSalesRatioAnalyzer(self.excel_folder)
-            sales_data, inventory_data = analyzer.load_and_validate_data()
-            report = analyzer.calculate_production_sales_ratio(sales_data, inventory_data)
-            
-            end_time = time.time()
-            memory_after = process.memory_info().rss / 1024 / 1024
+            with self._profile("ratio_calculation") as profiler:
+                # 使用优化的产销率分析器
+                analyzer = ProductionSalesRatioAnalyzer(self.excel_folder, registry=self.registry)
+                sales_data, inventory_data = analyzer.load_and_validate_data()
+                report = analyzer.calculate_production_sales_ratio(sales_data, inventory_data)
+                profiler.add_records(len(sales_data) + len(inventory_data))
             
-            total_records = len(sales_data) + len(inventory_data)
-            
-            metrics.append(PerformanceMetrics(
-                operation_name="ratio_calculation",
-                execution_time=end_time - start_time,
-                memory_before=memory_before,
-                memory_after=memory_after,
-                memory_peak=max(memory_before, memory_after),
-                cpu_usage=process.cpu_percent(),
-                records_processed=total_records,
-                throughput=total_records / (end_time - start_time) if (end_time - start_time) > 0 else 0,
-                timestamp=datetime.now().isoformat()
-            ))
+            metrics.append(PerformanceMetrics.from_profile(profiler.result))
             
         except Exception as e:
             self.logger.error(f"产销率计算性能测试失败: {e}")
@@ -344,82 +330,60 @@ class PerformanceOptimizer:
         metrics = []
         
         try:
-            start_time = time.time()
-            process = psutil.Process()
-            memory_before = process.memory_info().rss / 1024 / 1024
-            
-            # 使用数据质量监控器
-            monitor = DataQualityMonitor(self.excel_folder)
-            report = monitor.run_quality_check()
-            
-            end_time = time.time()
-            memory_after = process.memory_info().rss / 1024 / 1024
+            with self._profile("quality_check") as profiler:
+                # 使用数据质量监控器（基准测试不写入跨运行的指纹索引和分位数草图）
+                monitor = DataQualityMonitor(self.excel_folder, registry=self.registry,
+                                             fingerprint_dir=None, sketch_db_path=None)
+                report = monitor.run_quality_check()
+                profiler.add_records(report.metrics.total_records)
             
-            metrics.append(PerformanceMetrics(
-                operation_name="quality_check",
-                execution_time=end_time - start_time,
-                memory_before=memory_before,
-                memory_after=memory_after,
-                memory_peak=max(memory_before, memory_after),
-                cpu_usage=process.cpu_percent(),
-                records_processed=report.metrics.total_records,
-                throughput=report.metrics.total_records / (end_time - start_time) if (end_time - start_time) > 0 else 0,
-                timestamp=datetime.now().isoformat()
-            ))
+            metrics.append(PerformanceMetrics.from_profile(profiler.result))
             
         except Exception as e:
             self.logger.error(f"数据质量检查性能测试失败: {e}")
         
         return metrics
     
-    def _test_memory_optimization(self) -> List[PerformanceMetrics]:
-        """测试内存优化"""
+    def _test_memory_optimization(self) -> Tuple[List[PerformanceMetrics], List[MemoryOptimizationReport]]:
+        """
+        测试内存优化
+
+        有注册中心时直接取加载阶段的逐列优化结果；否则对合成销售数据执行同一优化器。
+        """
         self.logger.info("测试内存优化...")
         metrics = []
+        reports = []
         
         try:
-            # 测试大数据集处理
-            start_time = time.time()
-            process = psutil.Process()
-            memory_before = process.memory_info().rss / 1024 / 1024
-            
-            # 创建大数据集进行测试
-            large_df = pd.DataFrame({
-                'col1': np.random.randn(100000),
-                'col2': np.random.randn(100000),
-                'col3': np.random.choice(['A', 'B', 'C'], 100000),
-                'col4': pd.date_range('2023-01-01', periods=100000, freq='H')
-            })
-            
-            # 执行一些内存密集型操作
-            result = large_df.groupby('col3').agg({
-                'col1': ['mean', 'std', 'min', 'max'],
-                'col2': ['sum', 'count']
-            })
-            
-            # 强制垃圾回收
-            del large_df
-            gc.collect()
-            
-            end_time = time.time()
-            memory_after = process.memory_info().rss / 1024 / 1024
+            if self.registry is not None:
+                reports = list(self.registry.memory_reports().values())
             
-            metrics.append(PerformanceMetrics(
-                operation_name="memory_optimization_test",
-                execution_time=end_time - start_time,
-                memory_before=memory_before,
-                memory_after=memory_after,
-                memory_peak=max(memory_before, memory_after),
-                cpu_usage=process.cpu_percent(),
-                records_processed=100000,
-                throughput=100000 / (end_time - start_time) if (end_time - start_time) > 0 else 0,
-                timestamp=datetime.now().isoformat()
-            ))
+            # 测试大数据集处理
+            with self._profile("memory_optimization_test") as profiler:
+                # 使用与真实销售数据结构一致的合成数据
+                large_df = SyntheticDataGenerator(SyntheticDataConfig(sales_rows=100000)).generate_sales()
+                profiler.add_records(len(large_df))
+                
+                large_df, synthetic_report = MemoryOptimizer().optimize(large_df, 'synthetic_sales')
+                if not reports:
+                    reports.append(synthetic_report)
+                
+                # 在优化后的数据上执行内存密集型操作
+                result = large_df.groupby('物料名称', observed=True).agg({
+                    '主数量': ['mean', 'std', 'min', 'max'],
+                    '本币无税金额': ['sum', 'count']
+                })
+                
+                # 强制垃圾回收
+                del large_df
+                gc.collect()
+            
+            metrics.append(PerformanceMetrics.from_profile(profiler.result))
             
         except Exception as e:
             self.logger.error(f"内存优化测试失败: {e}")
         
-        return metrics
+        return metrics, reports
     
     def _identify_bottlenecks(self, metrics: List[PerformanceMetrics]) -> List[str]:
         """识别性能瓶颈"""
@@ -524,12 +488,17 @@ class PerformanceOptimizer:
                         'cpu_usage': m.cpu_usage,
                         'records_processed': m.records_processed,
                         'throughput': m.throughput,
-                        'timestamp': m.timestamp
+                        'timestamp': m.timestamp,
+                        'cpu_max': m.cpu_max,
+                        'sample_count': m.sample_count,
+                        'top_allocations': m.top_allocations
                     } for m in report.performance_metrics
                 ],
                 'bottlenecks': report.bottlenecks,
                 'recommendations': report.recommendations,
-                'overall_score': report.overall_score
+                'overall_score': report.overall_score,
+                'profile_files': report.profile_files,
+                'memory_optimization': [r.to_dict() for r in report.memory_optimization]
             }
             
             with open(filename, 'w', encoding='utf-8') as f:
@@ -560,6 +529,15 @@ class PerformanceOptimizer:
             print(f"    内存峰值: {metric.memory_peak:.1f}MB")
             print(f"    处理记录: {metric.records_processed:,}")
             print(f"    吞吐量: {metric.throughput:.1f} 记录/秒")
+            if metric.sample_count:
+                print(f"    CPU 平均/最大: {metric.cpu_usage:.0f}%/{metric.cpu_max:.0f}%（{metric.sample_count} 次采样）")
+            for allocation in metric.top_allocations[:3]:
+                print(f"    分配热点: {allocation['location']} ({allocation['size_mb']:.1f}MB)")
+        
+        if report.memory_optimization:
+            print(f"\n内存优化（逐列）:")
+            for line in format_memory_report(report.memory_optimization).splitlines():
+                print(f"  {line}")
         
         if report.bottlenecks:
             print(f"\n性能瓶颈:")
@@ -575,6 +553,12 @@ class PerformanceOptimizer:
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='性能优化和测试工具')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, top_n=args.profile_top)
+    
     print("=" * 80)
     print("性能优化和测试工具 v1.0")
     print("=" * 80)
@@ -586,12 +570,16 @@ def main():
         # 运行性能测试
         report = optimizer.run_performance_test()
         
+        # 指定阶段的性能分析文件与 JSON 报告写在同一目录
+        report.profile_files = finish_profiling()
+        
         # 打印摘要
         optimizer.print_summary(report)
         
         # 导出报告
         json_file = optimizer.export_report(report)
         print(f"\n📄 详细报告已保存到: {json_file}")
+        print_profile_summary(report.profile_files)
         
     except Exception as e:
         logger.error(f"性能测试失败: {e}")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按产品的时间序列异常检测
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-07
+
+功能:
+1. 按 (指标, 产品) 维护指数加权均值/方差基线（日销量、日产量、价格）
+2. 每次只处理上次之后的新日期，每天对全部产品做一次向量化更新，复杂度 O(产品数)
+3. 基线持久化到 SQLite，跨进程、跨运行累积
+"""
+
+import pandas as pd
+import numpy as np
+import logging
+import sqlite3
+from datetime import datetime
+from typing import List, Optional, Tuple
+from state_paths import resolve_state_path
+
+logger = logging.getLogger(__name__)
+
+
+class ProductEWMADetector:
+    """按产品的EWMA异常检测器"""
+
+    def __init__(self, db_path: str = 'quality_stats.db', alpha: float = 0.1,
+                 z_threshold: float = 3.0, min_periods: int = 7, min_relative_std: float = 0.01):
+        self.db_path = resolve_state_path(db_path)
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_periods = min_periods
+        # 标准差下限（相对均值），避免价格长期不变时微小波动被放大成异常
+        self.min_relative_std = min_relative_std
+        self.logger = logging.getLogger(f"{__name__}.ProductEWMADetector")
+        self._ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _ensure_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ewma_baselines (
+                    metric TEXT NOT NULL,
+                    product TEXT NOT NULL,
+                    mean REAL NOT NULL,
+                    var REAL NOT NULL,
+                    n INTEGER NOT NULL,
+                    PRIMARY KEY (metric, product)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ewma_progress (
+                    metric TEXT PRIMARY KEY,
+                    last_date TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def build_daily_matrix(df: pd.DataFrame, date_column: str, product_column: str,
+                           value_column: str) -> pd.DataFrame:
+        """构建 日期 × 产品 的日汇总矩阵（无记录为NaN）"""
+        dates = pd.to_datetime(df[date_column], errors='coerce').dt.normalize()
+        values = pd.to_numeric(df[value_column], errors='coerce')
+        frame = pd.DataFrame({'date': dates, 'product': df[product_column].astype(str), 'value': values})
+        frame = frame.dropna(subset=['date', 'value'])
+        return frame.pivot_table(index='date', columns='product', values='value', aggfunc='sum').sort_index()
+
+    @staticmethod
+    def build_daily_price_matrix(df: pd.DataFrame, date_column: str, product_column: str,
+                                 amount_column: str, quantity_column: str) -> pd.DataFrame:
+        """构建 日期 × 产品 的加权平均价格矩阵（金额合计 / 数量合计）"""
+        dates = pd.to_datetime(df[date_column], errors='coerce').dt.normalize()
+        frame = pd.DataFrame({
+            'date': dates,
+            'product': df[product_column].astype(str),
+            'amount': pd.to_numeric(df[amount_column], errors='coerce'),
+            'quantity': pd.to_numeric(df[quantity_column], errors='coerce')
+        }).dropna()
+        frame = frame[frame['quantity'] > 0]
+        totals = frame.groupby(['date', 'product'])[['amount', 'quantity']].sum()
+        price = (totals['amount'] / totals['quantity']).unstack('product')
+        return price.sort_index()
+
+    def _load_state(self, metric: str) -> Tuple[pd.DataFrame, Optional[pd.Timestamp]]:
+        with self._connect() as conn:
+            state = pd.read_sql_query(
+                "SELECT product, mean, var, n FROM ewma_baselines WHERE metric = ?",
+                conn, params=(metric,)
+            ).set_index('product')
+            row = conn.execute("SELECT last_date FROM ewma_progress WHERE metric = ?", (metric,)).fetchone()
+        return state, (pd.Timestamp(row[0]) if row else None)
+
+    def _save_state(self, metric: str, products: pd.Index, mean: np.ndarray, var: np.ndarray,
+                    n: np.ndarray, last_date: pd.Timestamp):
+        observed = n > 0
+        rows = [
+            (metric, product, float(m), float(v), int(c))
+            for product, m, v, c in zip(products[observed], mean[observed], var[observed], n[observed])
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO ewma_baselines (metric, product, mean, var, n) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO ewma_progress (metric, last_date, updated_at) VALUES (?, ?, ?)",
+                (metric, last_date.isoformat(), datetime.now().isoformat())
+            )
+
+    def update(self, metric: str, daily: pd.DataFrame) -> pd.DataFrame:
+        """
+        用新日期的数据更新基线并返回偏离记录
+
+        参数 daily 为 日期 × 产品 矩阵；只处理晚于上次进度的日期。
+        返回列: date, product, value, expected, std, z_score
+        """
+        empty = pd.DataFrame(columns=['date', 'product', 'value', 'expected', 'std', 'z_score'])
+        if daily is None or daily.empty:
+            return empty
+
+        state, last_date = self._load_state(metric)
+        new_days = daily if last_date is None else daily[daily.index > last_date]
+        if new_days.empty:
+            return empty
+
+        products = daily.columns.union(state.index)
+        state = state.reindex(products)
+        # 下面会原地更新，需要可写的副本（写时复制下 to_numpy 可能返回只读视图）
+        mean = state['mean'].fillna(0.0).to_numpy(dtype=float, copy=True)
+        var = state['var'].fillna(0.0).to_numpy(dtype=float, copy=True)
+        n = state['n'].fillna(0).to_numpy(dtype=np.int64, copy=True)
+        matrix = new_days.reindex(columns=products).to_numpy(dtype=float)
+
+        flagged: List[pd.DataFrame] = []
+        alpha = self.alpha
+        for day, x in zip(new_days.index, matrix):
+            observed = ~np.isnan(x)
+            std = np.maximum(np.sqrt(var), self.min_relative_std * np.abs(mean))
+
+            # 先用当前基线评估当天数据
+            ready = observed & (n >= self.min_periods) & (std > 0)
+            z = np.zeros_like(x)
+            z[ready] = (x[ready] - mean[ready]) / std[ready]
+            hits = np.abs(z) > self.z_threshold
+            if hits.any():
+                flagged.append(pd.DataFrame({
+                    'date': day,
+                    'product': products[hits],
+                    'value': x[hits],
+                    'expected': mean[hits],
+                    'std': std[hits],
+                    'z_score': z[hits]
+                }))
+
+            # 再把当天数据并入基线（首个观测直接作为初始均值）
+            first = observed & (n == 0)
+            mean[first] = x[first]
+            rest = observed & ~first
+            diff = x[rest] - mean[rest]
+            incr = alpha * diff
+            mean[rest] += incr
+            var[rest] = (1 - alpha) * (var[rest] + diff * incr)
+            n[observed] += 1
+
+        self._save_state(metric, products, mean, var, n, new_days.index.max())
+        self.logger.info(f"{metric} EWMA基线更新: {len(new_days)} 天, {len(products)} 个产品")
+
+        return pd.concat(flagged, ignore_index=True) if flagged else empty
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据质量历史存储
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-08
+
+功能:
+1. 将每次质量检查的维度分数、问题数量和异常数量写入本地 SQLite
+2. 按时间戳建立索引，支持上期/一周前/一个月前对比和时间范围查询
+3. 按天聚合的趋势查询，用于趋势图
+4. 兼容导入旧版 quality_history.json（只在首次使用数据库时导入一次，以标记行记录）
+5. 查询最近若干次记录，供继续写出的 quality_history.json 使用
+"""
+
+import pandas as pd
+import logging
+import sqlite3
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+from state_paths import resolve_state_path
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COLUMNS = [
+    'report_id', 'timestamp', 'ts', 'weighted_score', 'quality_grade',
+    'completeness', 'accuracy', 'consistency', 'validity',
+    'issue_count', 'critical_issues', 'high_issues', 'anomaly_count',
+    'alert_level', 'processing_time', 'data_sources'
+]
+
+LEGACY_IMPORT_MARKER = 'legacy_json_imported'
+
+
+class QualityHistoryStore:
+    """基于 SQLite 的质量历史存储"""
+
+    def __init__(self, db_path: str = 'quality_history.db'):
+        self.db_path = resolve_state_path(db_path)
+        self.logger = logging.getLogger(f"{__name__}.QualityHistoryStore")
+        self._ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS quality_runs (
+                    report_id TEXT PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    weighted_score REAL NOT NULL,
+                    quality_grade TEXT,
+                    completeness REAL,
+                    accuracy REAL,
+                    consistency REAL,
+                    validity REAL,
+                    issue_count INTEGER,
+                    critical_issues INTEGER,
+                    high_issues INTEGER,
+                    anomaly_count INTEGER,
+                    alert_level TEXT,
+                    processing_time REAL,
+                    data_sources TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_quality_runs_ts ON quality_runs (ts)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS store_markers (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+
+    def record(self, report) -> None:
+        """写入一次 EnhancedQualityReport"""
+        metrics = report.metrics
+        row = (
+            report.report_id,
+            report.timestamp,
+            datetime.fromisoformat(report.timestamp).timestamp(),
+            metrics.weighted_score,
+            metrics.quality_grade,
+            metrics.completeness.score,
+            metrics.accuracy.score,
+            metrics.consistency.score,
+            metrics.validity.score,
+            metrics.issue_count,
+            metrics.critical_issue_count,
+            len([i for i in report.issues if i.severity == 'high']),
+            len(report.anomalies),
+            report.alert_level,
+            report.processing_time,
+            json.dumps(report.data_sources, ensure_ascii=False)
+        )
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO quality_runs ({', '.join(HISTORY_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})",
+                row
+            )
+
+    def recent_scores(self, limit: int) -> List[float]:
+        """最近 limit 次的加权分数（按时间正序）"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT weighted_score FROM quality_runs ORDER BY ts DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [row['weighted_score'] for row in reversed(rows)]
+
+    def latest_before(self, moment: datetime) -> Optional[Dict[str, Any]]:
+        """不晚于指定时间的最近一次记录"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM quality_runs WHERE ts <= ? ORDER BY ts DESC LIMIT 1",
+                (moment.timestamp(),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def nearest(self, moment: datetime, window: timedelta) -> Optional[Dict[str, Any]]:
+        """指定时间前后 window 内最接近的一次记录（窗口内没有记录时返回 None）"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM quality_runs WHERE ts BETWEEN ? AND ? ORDER BY ABS(ts - ?) LIMIT 1",
+                ((moment - window).timestamp(), (moment + window).timestamp(), moment.timestamp())
+            ).fetchone()
+        return dict(row) if row else None
+
+    def query_range(self, start: datetime, end: datetime) -> pd.DataFrame:
+        """时间范围内的全部记录"""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT * FROM quality_runs WHERE ts BETWEEN ? AND ? ORDER BY ts",
+                conn, params=(start.timestamp(), end.timestamp())
+            )
+
+    def daily_trend(self, start: datetime, end: datetime) -> pd.DataFrame:
+        """按天聚合的分数与问题趋势"""
+        with self._connect() as conn:
+            return pd.read_sql_query("""
+                SELECT date(ts, 'unixepoch', 'localtime') AS day,
+                       COUNT(*) AS runs,
+                       AVG(weighted_score) AS weighted_score,
+                       AVG(completeness) AS completeness,
+                       AVG(accuracy) AS accuracy,
+                       AVG(consistency) AS consistency,
+                       AVG(validity) AS validity,
+                       MAX(issue_count) AS issue_count,
+                       MAX(critical_issues) AS critical_issues,
+                       MAX(anomaly_count) AS anomaly_count
+                FROM quality_runs
+                WHERE ts BETWEEN ? AND ?
+                GROUP BY day
+                ORDER BY day
+            """, conn, params=(start.timestamp(), end.timestamp()))
+
+    def recent_runs(self, limit: int) -> List[Dict[str, Any]]:
+        """最近 limit 次记录（按时间正序）"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM quality_runs ORDER BY ts DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM quality_runs").fetchone()[0]
+
+    def legacy_imported(self) -> bool:
+        """是否已执行过旧版 JSON 导入"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM store_markers WHERE name = ?", (LEGACY_IMPORT_MARKER,)
+            ).fetchone()
+        return row is not None
+
+    def import_legacy_json(self, json_path: str = 'quality_history.json') -> int:
+        """
+        导入旧版 quality_history.json
+
+        只在数据库首次使用时执行一次（文件不存在也算执行过）：之后继续写出的
+        quality_history.json 不会被当作旧版历史重复导入。
+        """
+        if self.legacy_imported():
+            return 0
+
+        entries = []
+        if os.path.exists(json_path):
+            try:
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            except Exception as e:
+                self.logger.warning(f"读取旧版质量历史失败: {e}")
+                return 0
+
+        rows = []
+        for entry in entries:
+            moment = datetime.fromisoformat(entry['timestamp'])
+            rows.append((
+                f"LEGACY_{moment.strftime('%Y%m%d_%H%M%S')}",
+                entry['timestamp'],
+                moment.timestamp(),
+                entry['overall_score'],
+                entry.get('quality_grade'),
+                entry.get('issue_count'),
+                entry.get('critical_issues')
+            ))
+
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO quality_runs "
+                "(report_id, timestamp, ts, weighted_score, quality_grade, issue_count, critical_issues) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            imported = conn.total_changes - before
+            conn.execute(
+                "INSERT OR REPLACE INTO store_markers (name, value, created_at) VALUES (?, ?, ?)",
+                (LEGACY_IMPORT_MARKER, json_path, datetime.now().isoformat())
+            )
+
+        if imported:
+            self.logger.info(f"已导入 {imported} 条旧版质量历史记录")
+        return imported
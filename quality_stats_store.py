@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+质量检查增量统计存储
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-07
+
+功能:
+1. 按 (数据源, 列) 持久化运行统计量（count、mean、M2、空值数）
+2. 使用 Welford/Chan 合并公式按批次增量更新，无需重读历史数据
+3. 记录每个数据源的增量水位（日期列最大值或内容哈希），用于切分新到达的数据
+4. 水位日期当天和日期无法解析的行按行指纹去重，迟到的同日数据不会漏检、已检查的行不会重复计入基线
+5. 没有日期列的快照型数据（如库存）内容变化时用新快照替换基线，而不是累加
+"""
+
+import pandas as pd
+import numpy as np
+import logging
+import sqlite3
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from state_paths import resolve_state_path
+from row_fingerprint_index import canonical_frame
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RunningStats:
+    """单列运行统计量"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    null_count: int = 0
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    @property
+    def null_ratio(self) -> float:
+        total = self.count + self.null_count
+        return self.null_count / total if total > 0 else 0.0
+
+    def update(self, values: np.ndarray, null_count: int = 0):
+        """合并一个批次的数据（Chan 等人的并行 Welford 公式）"""
+        self.null_count += int(null_count)
+        n_b = len(values)
+        if n_b == 0:
+            return
+
+        mean_b = float(np.mean(values))
+        m2_b = float(np.sum((values - mean_b) ** 2))
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta ** 2 * n_a * n_b / n
+        self.count = n
+
+    def zscores(self, values: np.ndarray) -> np.ndarray:
+        """相对于基线的绝对 z 分数"""
+        std = self.std
+        if std == 0:
+            return np.zeros(len(values))
+        return np.abs(values - self.mean) / std
+
+
+@dataclass
+class SourceWatermark:
+    """数据源增量水位"""
+    source_name: str
+    watermark_column: Optional[str]
+    watermark_value: Optional[str]
+    content_hash: str
+    rows_seen: int
+    updated_at: str
+    # 水位日期当天及日期无法解析的行的 (行指纹, 同指纹序号)，下次运行据此排除已检查的行；不在水位表中保存
+    boundary_rows: List[Tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def is_snapshot(self) -> bool:
+        """没有日期列的快照型数据源（基线随快照整体替换）"""
+        return self.watermark_column is None
+
+
+def row_keys(df: pd.DataFrame) -> pd.MultiIndex:
+    """逐行的 (行指纹, 同指纹序号)：完全相同的行按出现顺序区分，真实的重复行不会被合并"""
+    fingerprints = pd.Series(pd.util.hash_pandas_object(canonical_frame(df), index=False).values.view(np.int64),
+                             index=df.index)
+    occurrence = fingerprints.groupby(fingerprints).cumcount()
+    return pd.MultiIndex.from_arrays([fingerprints.values, occurrence.values], names=['fingerprint', 'occurrence'])
+
+
+def frame_content_hash(df: pd.DataFrame) -> str:
+    """计算数据帧内容哈希（向量化逐行哈希后汇总，按规范形式计算，不受内存优化影响）"""
+    row_hashes = pd.util.hash_pandas_object(canonical_frame(df), index=False).values
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+class QualityStatsStore:
+    """基于 SQLite 的运行统计量存储"""
+
+    def __init__(self, db_path: str = 'quality_stats.db'):
+        self.db_path = resolve_state_path(db_path)
+        self.logger = logging.getLogger(f"{__name__}.QualityStatsStore")
+        self._ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _ensure_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS column_stats (
+                    source_name TEXT NOT NULL,
+                    column_name TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    mean REAL NOT NULL,
+                    m2 REAL NOT NULL,
+                    null_count INTEGER NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (source_name, column_name)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS source_watermarks (
+                    source_name TEXT PRIMARY KEY,
+                    watermark_column TEXT,
+                    watermark_value TEXT,
+                    content_hash TEXT NOT NULL,
+                    rows_seen INTEGER NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS watermark_rows (
+                    source_name TEXT NOT NULL,
+                    fingerprint INTEGER NOT NULL,
+                    occurrence INTEGER NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_watermark_rows_source ON watermark_rows (source_name)")
+
+    def load_column_stats(self, source_name: str) -> Dict[str, RunningStats]:
+        """读取数据源所有列的运行统计量"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT column_name, count, mean, m2, null_count FROM column_stats WHERE source_name = ?",
+                (source_name,)
+            ).fetchall()
+        return {row[0]: RunningStats(count=row[1], mean=row[2], m2=row[3], null_count=row[4]) for row in rows}
+
+    def load_watermark(self, source_name: str) -> Optional[SourceWatermark]:
+        """读取数据源的增量水位"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT source_name, watermark_column, watermark_value, content_hash, rows_seen, updated_at "
+                "FROM source_watermarks WHERE source_name = ?",
+                (source_name,)
+            ).fetchone()
+        if not row:
+            return None
+        with self._connect() as conn:
+            boundary_rows = conn.execute(
+                "SELECT fingerprint, occurrence FROM watermark_rows WHERE source_name = ?", (source_name,)
+            ).fetchall()
+        return SourceWatermark(*row, boundary_rows=[tuple(r) for r in boundary_rows])
+
+    def save(self, source_name: str, column_stats: Dict[str, RunningStats], watermark: SourceWatermark):
+        """
+        在同一事务中保存统计量与水位
+
+        快照型数据源（watermark.is_snapshot）的统计量整体替换，不保留已不存在的列。
+        """
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            if watermark.is_snapshot:
+                conn.execute("DELETE FROM column_stats WHERE source_name = ?", (source_name,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO column_stats "
+                "(source_name, column_name, count, mean, m2, null_count, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(source_name, column, s.count, s.mean, s.m2, s.null_count, now) for column, s in column_stats.items()]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO source_watermarks "
+                "(source_name, watermark_column, watermark_value, content_hash, rows_seen, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (source_name, watermark.watermark_column, watermark.watermark_value,
+                 watermark.content_hash, watermark.rows_seen, now)
+            )
+            conn.execute("DELETE FROM watermark_rows WHERE source_name = ?", (source_name,))
+            conn.executemany(
+                "INSERT INTO watermark_rows (source_name, fingerprint, occurrence) VALUES (?, ?, ?)",
+                [(source_name, int(fp), int(occ)) for fp, occ in watermark.boundary_rows]
+            )
+
+    def reset(self, source_name: str):
+        """清除数据源的基线（例如业务口径变化后重建）"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM column_stats WHERE source_name = ?", (source_name,))
+            conn.execute("DELETE FROM source_watermarks WHERE source_name = ?", (source_name,))
+            conn.execute("DELETE FROM watermark_rows WHERE source_name = ?", (source_name,))
+
+    def split_new_rows(self, df: pd.DataFrame, source_name: str,
+                       watermark_column: Optional[str] = None) -> Tuple[pd.DataFrame, SourceWatermark, bool]:
+        """
+        切分新到达的数据
+
+        有日期列时，日期不早于上次水位的行以及日期无法解析的行为候选，
+        再按行指纹排除上次已检查过的行（水位当天的行和日期无法解析的行会被记住）；
+        没有日期列的快照型数据，内容变化时整个快照为新数据（保存时替换基线），内容未变时没有新数据。
+
+        返回: (新数据, 新水位, 是否已有基线)
+        """
+        previous = self.load_watermark(source_name)
+        content_hash = frame_content_hash(df)
+
+        if watermark_column and watermark_column not in df.columns:
+            watermark_column = None
+
+        boundary_rows = []
+        if watermark_column:
+            dates = pd.to_datetime(df[watermark_column], errors='coerce')
+            latest = dates.max()
+            new_value = latest.isoformat() if pd.notna(latest) else None
+            keys = row_keys(df)
+            if previous is None or previous.watermark_value is None:
+                candidates = np.ones(len(df), dtype=bool)
+            else:
+                previous_value = pd.Timestamp(previous.watermark_value)
+                candidates = ((dates >= previous_value) | dates.isna()).to_numpy()
+                if new_value is None or new_value < previous.watermark_value:
+                    new_value = previous.watermark_value
+            if previous is not None and previous.boundary_rows:
+                seen = pd.MultiIndex.from_tuples(previous.boundary_rows, names=keys.names)
+                candidates = candidates & ~keys.isin(seen)
+            delta = df[candidates]
+            rows_seen = (previous.rows_seen if previous else 0) + len(delta)
+
+            # 记住水位当天和日期无法解析的全部行（含本次之前已检查的），下次只检查其中新增的行
+            boundary = dates.isna().to_numpy()
+            if new_value is not None:
+                boundary = boundary | (dates == pd.Timestamp(new_value)).to_numpy()
+            boundary_rows = list(keys[boundary])
+        else:
+            new_value = None
+            if previous is not None and previous.content_hash == content_hash:
+                delta = df.iloc[0:0]
+                rows_seen = previous.rows_seen
+            else:
+                delta = df
+                rows_seen = len(df)
+
+        watermark = SourceWatermark(
+            source_name=source_name,
+            watermark_column=watermark_column,
+            watermark_value=new_value,
+            content_hash=content_hash,
+            rows_seen=rows_seen,
+            updated_at=datetime.now().isoformat(),
+            boundary_rows=boundary_rows
+        )
+        return delta, watermark, previous is not None
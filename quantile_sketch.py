@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可合并分位数草图
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-09
+
+功能:
+1. KLL 分位数草图：一次扫描构建，内存 O(k·log(n/k))，秩误差约 1/k 量级；
+   数据按固定大小的块并入并逐块压缩，每次只排序一个块，不对整列排序
+2. 草图可合并，跨文件、跨天累积后仍能给出全量历史的分位数
+3. 按 (数据源, 列) 持久化到 SQLite，并记录已并入的文件及其日期范围，避免重复计入：
+   同一文件只并入一次；ERP 导出是累计的，新文件中落在上一个文件日期范围内的行已经并入过，
+   只并入范围之外的行（与行指纹跨文件重复检测的口径一致）
+"""
+
+import pandas as pd
+import numpy as np
+import logging
+import sqlite3
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from quality_stats_store import frame_content_hash
+from row_fingerprint_index import date_range
+from state_paths import resolve_state_path
+
+logger = logging.getLogger(__name__)
+
+
+class KLLSketch:
+    """KLL 分位数草图"""
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.k = k
+        self.chunk_size = chunk_size or 2 * k  # update() 每次并入的最大元素数
+        self.n = 0
+        self.min_value = np.inf
+        self.max_value = -np.inf
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        """第 level 层容量：顶层为 k，每向下一层乘以 2/3"""
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values: Union[np.ndarray, pd.Series]):
+        """并入一批数值（忽略空值）：按 chunk_size 分块并入，每块之后压缩，排序只作用于有界的块"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+
+        self.n += len(values)
+        self.min_value = min(self.min_value, float(values.min()))
+        self.max_value = max(self.max_value, float(values.max()))
+        for start in range(0, len(values), self.chunk_size):
+            self.levels[0] = np.concatenate([self.levels[0], values[start:start + self.chunk_size]])
+            self._compress()
+
+    def merge(self, other: 'KLLSketch'):
+        """合并另一个草图"""
+        if other.n == 0:
+            return
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+
+        self.n += other.n
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        self._compress()
+
+    def _compress(self):
+        """逐层压缩：超出容量的层排序后随机保留奇数或偶数位，权重翻倍进入上一层"""
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+
+                items = np.sort(items)
+                leftover = items[len(items) - len(items) % 2:]
+                items = items[:len(items) - len(items) % 2]
+                promoted = items[self._rng.integers(2)::2]
+
+                self.levels[level] = leftover
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q: Union[float, List[float]]) -> Union[float, np.ndarray]:
+        """估计分位数（q 可为标量或列表）"""
+        scalar = np.isscalar(q)
+        qs = np.atleast_1d(np.asarray(q, dtype=float))
+        if self.n == 0:
+            result = np.full(len(qs), np.nan)
+            return float(result[0]) if scalar else result
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(arr), 2.0 ** level) for level, arr in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+
+        positions = np.searchsorted(cumulative, qs * cumulative[-1], side='left')
+        result = items[np.minimum(positions, len(items) - 1)]
+        result = np.where(qs <= 0, self.min_value, np.where(qs >= 1, self.max_value, result))
+        return float(result[0]) if scalar else result
+
+    def to_dict(self) -> Dict:
+        return {
+            'k': self.k,
+            'n': self.n,
+            'min': self.min_value,
+            'max': self.max_value,
+            'levels': [base64.b64encode(arr.astype(np.float64).tobytes()).decode('ascii') for arr in self.levels]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'KLLSketch':
+        sketch = cls(k=data['k'])
+        sketch.n = data['n']
+        sketch.min_value = data['min']
+        sketch.max_value = data['max']
+        sketch.levels = [np.frombuffer(base64.b64decode(item), dtype=np.float64).copy() for item in data['levels']]
+        return sketch
+
+
+class QuantileSketchStore:
+    """按 (数据源, 列) 持久化的分位数草图"""
+
+    def __init__(self, db_path: str = 'quality_stats.db', k: int = 200):
+        self.db_path = resolve_state_path(db_path)
+        self.k = k
+        self.logger = logging.getLogger(f"{__name__}.QuantileSketchStore")
+        self._ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _ensure_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS quantile_sketches (
+                    source TEXT NOT NULL,
+                    column_name TEXT NOT NULL,
+                    sketch TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (source, column_name)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS quantile_sketch_files (
+                    source TEXT NOT NULL,
+                    file_id TEXT NOT NULL,
+                    ingested_at TEXT NOT NULL,
+                    date_min TEXT,
+                    date_max TEXT,
+                    PRIMARY KEY (source, file_id)
+                )
+            """)
+            # 早期版本的文件表没有日期范围列
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(quantile_sketch_files)")}
+            for column in ('date_min', 'date_max'):
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE quantile_sketch_files ADD COLUMN {column} TEXT")
+
+    def load(self, source_name: str) -> Dict[str, KLLSketch]:
+        """读取某数据源全部列的草图"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT column_name, sketch FROM quantile_sketches WHERE source = ?", (source_name,)
+            ).fetchall()
+        return {column: KLLSketch.from_dict(json.loads(sketch)) for column, sketch in rows}
+
+    def is_ingested(self, source_name: str, file_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM quantile_sketch_files WHERE source = ? AND file_id = ?", (source_name, file_id)
+            ).fetchone()
+        return row is not None
+
+    def last_date_range(self, source_name: str) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """最近并入的文件的日期范围（未记录时返回 None）"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT date_min, date_max FROM quantile_sketch_files WHERE source = ? ORDER BY rowid DESC LIMIT 1",
+                (source_name,)
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return pd.Timestamp(row[0]), pd.Timestamp(row[1])
+
+    def merge_frame(self, df: pd.DataFrame, source_name: str,
+                    columns: Optional[List[str]] = None,
+                    dates: Optional[pd.Series] = None) -> Dict[str, KLLSketch]:
+        """
+        将数据帧的数值列并入历史草图并返回合并后的草图
+
+        同一份数据（按内容哈希识别）只并入一次，重复检查直接返回已有草图。
+        给出业务日期 dates 时，日期落在上一个并入文件日期范围内的行视为已并入，不再计入。
+        """
+        columns = list(columns) if columns is not None else list(df.select_dtypes(include=[np.number]).columns)
+        sketches = self.load(source_name)
+        if not columns:
+            return sketches
+
+        file_id = frame_content_hash(df[columns])
+        if self.is_ingested(source_name, file_id):
+            return sketches
+
+        rows = df
+        previous_range = self.last_date_range(source_name) if dates is not None else None
+        if previous_range is not None:
+            rows = df[~pd.to_datetime(dates, errors='coerce').between(*previous_range).to_numpy()]
+
+        for column in columns:
+            batch = KLLSketch(k=self.k)
+            batch.update(rows[column].to_numpy(dtype=float, na_value=np.nan))
+            if column in sketches:
+                sketches[column].merge(batch)
+            else:
+                sketches[column] = batch
+
+        now = datetime.now().isoformat()
+        file_range = date_range(dates) if dates is not None else None
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO quantile_sketches (source, column_name, sketch, updated_at) VALUES (?, ?, ?, ?)",
+                [(source_name, column, json.dumps(sketches[column].to_dict()), now) for column in columns]
+            )
+            conn.execute(
+                "INSERT INTO quantile_sketch_files (source, file_id, ingested_at, date_min, date_max) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (source_name, file_id, now,
+                 file_range[0].isoformat() if file_range else None,
+                 file_range[1].isoformat() if file_range else None)
+            )
+
+        self.logger.info(f"{source_name} 分位数草图更新: {len(columns)} 列，并入 {len(rows)}/{len(df)} 行")
+        return sketches
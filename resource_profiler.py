@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段资源采样分析
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-11
+
+功能:
+1. 后台线程按固定间隔采样 RSS 和 CPU（含子进程），捕获瞬时峰值
+2. 可选 tracemalloc 统计：阶段内 Python 堆峰值，以及阶段结束时占用最多的分配位置
+3. 被包装的函数通过 record_rows() 上报处理行数，吞吐量按真实行数计算
+4. 既可作为上下文管理器，也可作为装饰器包装任意 ETL 阶段
+"""
+
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import contextvars
+import psutil
+import pandas as pd
+from datetime import datetime
+from functools import wraps
+from typing import Dict, List, Optional, Any, Callable
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# 当前活动的阶段分析器（嵌套时为最内层）
+_active_profiler: contextvars.ContextVar = contextvars.ContextVar('active_stage_profiler', default=None)
+
+
+@dataclass
+class ResourceSample:
+    """单次资源采样"""
+    elapsed: float
+    rss_mb: float
+    cpu_percent: float
+
+
+@dataclass
+class StageProfile:
+    """一个阶段的资源分析结果"""
+    name: str
+    seconds: float
+    memory_before: float
+    memory_after: float
+    memory_peak: float
+    cpu_mean: float
+    cpu_max: float
+    records_processed: int
+    throughput: float  # 记录/秒
+    sample_count: int
+    traced_peak_mb: Optional[float] = None
+    top_allocations: List[Dict[str, Any]] = field(default_factory=list)
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+
+
+class ResourceSampler:
+    """后台线程采样进程 RSS 与 CPU"""
+
+    def __init__(self, interval: float = 0.05, include_children: bool = True,
+                 process: Optional[psutil.Process] = None):
+        self.interval = interval
+        self.include_children = include_children
+        self.process = process or psutil.Process()
+        self.samples: List[ResourceSample] = []
+        self._children: Dict[int, psutil.Process] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_time = 0.0
+
+    def _processes(self) -> List[psutil.Process]:
+        """当前进程及其子进程（子进程对象缓存以便 cpu_percent 连续计算）"""
+        processes = [self.process]
+        if not self.include_children:
+            return processes
+        try:
+            alive = {child.pid: child for child in self.process.children(recursive=True)}
+        except psutil.Error:
+            return processes
+        for pid, child in alive.items():
+            if pid not in self._children:
+                self._children[pid] = child
+                try:
+                    child.cpu_percent()  # 首次调用只建立基准
+                except psutil.Error:
+                    pass
+        for pid in list(self._children):
+            if pid not in alive:
+                del self._children[pid]
+        return processes + list(self._children.values())
+
+    def sample(self) -> ResourceSample:
+        """采集一次"""
+        rss = 0.0
+        cpu = 0.0
+        for proc in self._processes():
+            try:
+                rss += proc.memory_info().rss
+                cpu += proc.cpu_percent()
+            except psutil.Error:
+                continue
+        record = ResourceSample(
+            elapsed=time.perf_counter() - self._start_time,
+            rss_mb=rss / 1024 / 1024,
+            cpu_percent=cpu
+        )
+        self.samples.append(record)
+        return record
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def start(self) -> ResourceSample:
+        """开始采样，返回起始样本"""
+        self.samples = []
+        self._stop_event.clear()
+        self._start_time = time.perf_counter()
+        self.process.cpu_percent()
+        first = self.sample()
+        first.cpu_percent = 0.0
+        self._thread = threading.Thread(target=self._run, name='resource-sampler', daemon=True)
+        self._thread.start()
+        return first
+
+    def stop(self) -> ResourceSample:
+        """停止采样，返回结束样本"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.sample()
+
+    @property
+    def peak_rss(self) -> float:
+        return max((s.rss_mb for s in self.samples), default=0.0)
+
+    def cpu_stats(self) -> tuple:
+        """返回 (平均 CPU%, 最大 CPU%)，不含起始基准样本"""
+        values = [s.cpu_percent for s in self.samples[1:]]
+        if not values:
+            return 0.0, 0.0
+        return sum(values) / len(values), max(values)
+
+
+class StageProfiler:
+    """
+    阶段资源分析器
+
+    作为上下文管理器:
+        with StageProfiler('load_sales') as profiler:
+            df = load()
+            profiler.add_records(len(df))
+        profiler.result
+
+    作为装饰器:
+        @StageProfiler('load_sales', trace_allocations=True)
+        def load(): ...
+
+    被包装代码内部可调用 record_rows(n) 上报行数；未上报且返回值是 DataFrame 时按其行数计。
+    装饰器模式下最近一次结果保存在 wrapper.last_profile，全部结果追加到 history。
+    """
+
+    def __init__(self, name: Optional[str] = None, interval: float = 0.05,
+                 trace_allocations: bool = False, top_n: int = 10,
+                 include_children: bool = True, history: Optional[List[StageProfile]] = None):
+        self.name = name
+        self.interval = interval
+        self.trace_allocations = trace_allocations
+        self.top_n = top_n
+        self.include_children = include_children
+        self.history = history if history is not None else []
+        self.result: Optional[StageProfile] = None
+        self.logger = logging.getLogger(f"{__name__}.StageProfiler")
+
+        self._records = 0
+        self._records_reported = False
+        self._sampler: Optional[ResourceSampler] = None
+        self._started_tracemalloc = False
+        self._token = None
+        self._start = 0.0
+        self._memory_before = 0.0
+
+    def add_records(self, count: int):
+        """上报处理的行数（可多次调用累加）"""
+        self._records += int(count)
+        self._records_reported = True
+
+    def __enter__(self) -> 'StageProfiler':
+        self._records = 0
+        self._records_reported = False
+        self.result = None
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+        self._sampler = ResourceSampler(self.interval, self.include_children)
+        self._memory_before = self._sampler.start().rss_mb
+        self._token = _active_profiler.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        seconds = time.perf_counter() - self._start
+        _active_profiler.reset(self._token)
+        memory_after = self._sampler.stop().rss_mb
+        cpu_mean, cpu_max = self._sampler.cpu_stats()
+
+        traced_peak = None
+        top_allocations = []
+        if self.trace_allocations:
+            traced_peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            top_allocations = self._top_allocations(tracemalloc.take_snapshot())
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+        self.result = StageProfile(
+            name=self.name or 'stage',
+            seconds=seconds,
+            memory_before=self._memory_before,
+            memory_after=memory_after,
+            memory_peak=max(self._sampler.peak_rss, self._memory_before, memory_after),
+            cpu_mean=cpu_mean,
+            cpu_max=cpu_max,
+            records_processed=self._records,
+            throughput=self._records / seconds if seconds > 0 else 0.0,
+            sample_count=len(self._sampler.samples),
+            traced_peak_mb=traced_peak,
+            top_allocations=top_allocations
+        )
+        self.history.append(self.result)
+        self.logger.info(
+            f"{self.result.name} - 耗时: {seconds:.2f}s, 内存峰值: {self.result.memory_peak:.1f}MB, "
+            f"CPU 平均/最大: {cpu_mean:.0f}%/{cpu_max:.0f}%, 记录: {self._records:,}"
+        )
+        return False
+
+    def _top_allocations(self, snapshot: tracemalloc.Snapshot) -> List[Dict[str, Any]]:
+        """按代码行汇总的分配统计（排除 tracemalloc 与采样线程自身）"""
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, threading.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, os.path.join(os.path.dirname(psutil.__file__), '*'))
+        ])
+        allocations = []
+        for stat in snapshot.statistics('lineno')[:self.top_n]:
+            frame = stat.traceback[0]
+            allocations.append({
+                'location': f"{frame.filename}:{frame.lineno}",
+                'size_mb': stat.size / 1024 / 1024,
+                'count': stat.count
+            })
+        return allocations
+
+    def __call__(self, func: Callable) -> Callable:
+        """装饰器用法：每次调用使用独立的分析器实例，结果共享 history"""
+        name = self.name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = StageProfiler(name, self.interval, self.trace_allocations, self.top_n,
+                                     self.include_children, self.history)
+            with profiler:
+                result = func(*args, **kwargs)
+                if not profiler._records_reported and isinstance(result, pd.DataFrame):
+                    profiler.add_records(len(result))
+            wrapper.last_profile = profiler.result
+            return result
+
+        wrapper.last_profile = None
+        wrapper.profile_history = self.history
+        return wrapper
+
+
+def record_rows(count: int):
+    """向当前活动的阶段分析器上报处理行数；没有活动分析器时忽略"""
+    profiler = _active_profiler.get()
+    if profiler is not None:
+        profiler.add_records(count)
+
+
+def profile_stage(name: Optional[str] = None, **kwargs) -> StageProfiler:
+    """创建阶段分析器，可用作 with 语句或装饰器"""
+    return StageProfiler(name, **kwargs)
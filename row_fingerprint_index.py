@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行指纹重复检测
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-09
+
+功能:
+1. 按可配置的关键列向量化计算 64 位行指纹
+2. 基于排序的文件内重复检测，复杂度 O(N log N)
+3. 按数据源在磁盘上维护已导入行指纹的有序 uint64 索引，检测跨文件、跨运行的重复行
+4. 记录每个已导入文件的日期范围：ERP 导出是累计的，新文件中落在上一个文件日期范围内的行
+   是预期的重复导出，不计为跨文件重复
+5. 指纹按规范形式计算（整数、浮点统一为 64 位，日期列逐值统一为时间戳），
+   注册中心内存优化后的数据帧与直接读取Excel的数据帧得到相同的行指纹
+"""
+
+import pandas as pd
+import numpy as np
+import logging
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from state_paths import resolve_state_path
+from memory_optimizer import is_date_column
+
+logger = logging.getLogger(__name__)
+
+
+def _canonical_dates(series: pd.Series) -> pd.Series:
+    """
+    日期列的规范形式：能解析的值统一为纳秒时间戳文本，不能解析的值保留原文，空值为 None
+
+    逐值转换，一个值的指纹不受同一列其他值能否解析的影响。
+    """
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        parsed = series
+    else:
+        parsed = pd.to_datetime(series, errors='coerce')
+    values = series.to_numpy(dtype=object, copy=True)
+    values[pd.isna(values)] = None
+    valid = parsed.notna().to_numpy()
+    values[valid] = parsed[valid].to_numpy(dtype='datetime64[ns]').view(np.int64).astype(str)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def _canonical_column(column: str, series: pd.Series) -> pd.Series:
+    """单列的规范形式（category 列的哈希本身与原值一致，无需还原）"""
+    dtype = series.dtype
+    if is_date_column(column) and not pd.api.types.is_numeric_dtype(dtype):
+        return _canonical_dates(series)
+    if isinstance(dtype, np.dtype):
+        if dtype.kind == 'M' and dtype != np.dtype('datetime64[ns]'):
+            return series.astype('datetime64[ns]')
+        if dtype.kind in 'iu' and dtype.itemsize < 8:
+            return series.astype(np.int64)
+        if dtype.kind == 'f' and dtype.itemsize < 8:
+            return series.astype(np.float64)
+    return series
+
+
+def canonical_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    用于计算指纹的规范形式，抵消 MemoryOptimizer 的类型变化
+
+    哈希值依赖数据类型：int32 与 int64 的负数、float32 与 float64、字符串日期与 datetime64
+    得到的哈希都不同。只替换需要转换的列，其余列不复制。日期列（列名含“日期”）
+    不论是文本还是已解析的日期，都按 _canonical_dates 逐值转换。
+    """
+    columns = {column: _canonical_column(str(column), df[column]) for column in df.columns}
+    if all(columns[column] is df[column] for column in df.columns):
+        return df
+    result = pd.DataFrame(columns, index=df.index)
+    result.columns = df.columns
+    return result
+
+
+def compute_row_fingerprints(df: pd.DataFrame, key_columns: Optional[List[str]] = None) -> np.ndarray:
+    """计算行指纹（key_columns 为空或均不存在时使用全部列）"""
+    columns = [col for col in (key_columns or []) if col in df.columns] or list(df.columns)
+    return pd.util.hash_pandas_object(canonical_frame(df[columns]), index=False).to_numpy(dtype=np.uint64)
+
+
+def find_duplicate_mask(fingerprints: np.ndarray) -> np.ndarray:
+    """文件内重复标记：与 DataFrame.duplicated(keep='first') 语义一致"""
+    mask = np.zeros(len(fingerprints), dtype=bool)
+    if len(fingerprints) < 2:
+        return mask
+
+    order = np.argsort(fingerprints, kind='stable')
+    sorted_fingerprints = fingerprints[order]
+    mask[order[1:]] = sorted_fingerprints[1:] == sorted_fingerprints[:-1]
+    return mask
+
+
+def date_range(dates: pd.Series) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """日期列的 (最小值, 最大值)；没有可解析的日期时返回 None"""
+    dates = pd.to_datetime(dates, errors='coerce')
+    if dates.notna().any():
+        return dates.min(), dates.max()
+    return None
+
+
+def fingerprint_digest(fingerprints: np.ndarray) -> str:
+    """一批行指纹的摘要，用作文件标识（同一文件重复检查时不会与自身比较）"""
+    return hashlib.sha256(np.ascontiguousarray(fingerprints).tobytes()).hexdigest()
+
+
+class FingerprintIndex:
+    """按数据源保存的有序行指纹索引"""
+
+    def __init__(self, index_dir: str = 'fingerprint_index'):
+        self.index_dir = resolve_state_path(index_dir)
+        self.logger = logging.getLogger(f"{__name__}.FingerprintIndex")
+
+    def _index_path(self, source_name: str) -> str:
+        return os.path.join(self.index_dir, f"{source_name}.npy")
+
+    def _ledger_path(self, source_name: str) -> str:
+        return os.path.join(self.index_dir, f"{source_name}.files.json")
+
+    def load(self, source_name: str) -> np.ndarray:
+        """读取有序索引（内存映射，不整体载入内存）"""
+        path = self._index_path(source_name)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=np.uint64)
+        return np.load(path, mmap_mode='r')
+
+    def _load_ledger(self, source_name: str) -> List[Dict[str, Any]]:
+        """已导入文件列表 [{file_id, date_min, date_max}, ...]（旧版只记录文件标识）"""
+        path = self._ledger_path(source_name)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        return [entry if isinstance(entry, dict) else {'file_id': entry, 'date_min': None, 'date_max': None}
+                for entry in entries]
+
+    def is_ingested(self, source_name: str, file_id: str) -> bool:
+        """该文件是否已并入索引"""
+        return any(entry['file_id'] == file_id for entry in self._load_ledger(source_name))
+
+    def last_date_range(self, source_name: str) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """最近导入的文件的日期范围（未记录时返回 None）"""
+        ledger = self._load_ledger(source_name)
+        if not ledger or ledger[-1]['date_min'] is None:
+            return None
+        return pd.Timestamp(ledger[-1]['date_min']), pd.Timestamp(ledger[-1]['date_max'])
+
+    def contains(self, source_name: str, fingerprints: np.ndarray) -> np.ndarray:
+        """逐行判断指纹是否已出现在此前导入的数据中（二分查找）"""
+        index = self.load(source_name)
+        if len(index) == 0 or len(fingerprints) == 0:
+            return np.zeros(len(fingerprints), dtype=bool)
+
+        positions = np.searchsorted(index, fingerprints)
+        positions = np.minimum(positions, len(index) - 1)
+        return np.asarray(index[positions]) == fingerprints
+
+    def merge(self, source_name: str, fingerprints: np.ndarray, file_id: str,
+              date_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None):
+        """将一批指纹并入索引并记录文件标识和日期范围"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        merged = np.union1d(self.load(source_name), fingerprints).astype(np.uint64)
+
+        # 先写临时文件再替换，避免中断时损坏索引
+        path = self._index_path(source_name)
+        tmp_path = f"{path}.tmp.npy"
+        np.save(tmp_path, merged)
+        os.replace(tmp_path, path)
+
+        ledger = self._load_ledger(source_name)
+        ledger.append({
+            'file_id': file_id,
+            'date_min': date_range[0].isoformat() if date_range else None,
+            'date_max': date_range[1].isoformat() if date_range else None
+        })
+        with open(self._ledger_path(source_name), 'w', encoding='utf-8') as f:
+            json.dump(ledger, f)
+
+        self.logger.info(f"{source_name} 指纹索引更新: {len(merged)} 个唯一行指纹")
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规模基准测试
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-10
+
+功能:
+1. 用合成数据在 1万/10万/100万/1000万 行等规模下运行各处理阶段
+2. 阶段: 数据导入(ETL)、产销率分析、数据质量监控、增强型质量监控、报表生成
+3. 记录各阶段耗时、内存变化和吞吐量，按对数坐标拟合扩展指数（1.0 为线性）
+4. 输出 JSON 结果与文本摘要
+
+说明: 数据通过 DatasetRegistry 注册给各组件，不经过 Excel；
+报表生成阶段读取 Excel 文件，只在不超过 report_max_rows 的规模下运行。
+某阶段按已测耗时线性外推超过 stage_time_budget 时，更大规模下跳过该阶段并记录原因。
+"""
+
+import numpy as np
+import logging
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import gc
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Callable
+from dataclasses import dataclass, asdict
+
+from dataset_registry import DatasetRegistry
+from synthetic_data_generator import SyntheticDataGenerator, SyntheticDataConfig, EXCEL_MAX_ROWS
+from optimized_data_importer import OptimizedDataImporter, ETLConfig
+from optimized_production_sales_ratio import ProductionSalesRatioAnalyzer
+from data_quality_monitor import DataQualityMonitor
+from enhanced_data_quality_monitor import EnhancedDataQualityMonitor
+from resource_profiler import StageProfiler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [10000, 100000, 1000000, 10000000]
+STAGES = ['import', 'ratio', 'quality', 'enhanced_quality', 'report']
+
+# 旧版报表脚本目录
+REPORT_SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '原先：python脚本')
+
+
+@dataclass
+class StageMeasurement:
+    """单个阶段在某一规模下的测量结果"""
+    size: int
+    stage: str
+    status: str  # 'ok', 'error', 'skipped'
+    seconds: float
+    rows: int
+    memory_before: float
+    memory_after: float
+    throughput: float
+    error: Optional[str] = None
+    memory_peak: float = 0.0
+    cpu_mean: float = 0.0
+
+
+class ScaleBenchmark:
+    """规模基准测试"""
+
+    def __init__(self, sizes: Optional[List[int]] = None, stages: Optional[List[str]] = None,
+                 output_dir: str = 'scale_benchmark', report_max_rows: int = 100000,
+                 production_ratio: float = 0.3, n_products: int = 300, n_days: int = 90,
+                 stage_time_budget: float = 900.0, seed: int = 42):
+        self.sizes = sorted(sizes or DEFAULT_SIZES)
+        self.stages = stages or STAGES
+        unknown = set(self.stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"未知的基准测试阶段: {sorted(unknown)}")
+
+        self.output_dir = output_dir
+        self.report_max_rows = min(report_max_rows, EXCEL_MAX_ROWS)
+        self.production_ratio = production_ratio
+        self.n_products = n_products
+        self.n_days = n_days
+        self.stage_time_budget = stage_time_budget
+        self.seed = seed
+        self.logger = logging.getLogger(f"{__name__}.ScaleBenchmark")
+
+    def run(self) -> Dict[str, Any]:
+        """按规模从小到大运行全部阶段"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        measurements: List[StageMeasurement] = []
+
+        for size in self.sizes:
+            self.logger.info(f"生成 {size} 行销售数据...")
+            generator = SyntheticDataGenerator(SyntheticDataConfig(
+                n_products=self.n_products,
+                n_days=self.n_days,
+                sales_rows=size,
+                production_rows=max(1, int(size * self.production_ratio)),
+                seed=self.seed
+            ))
+            datasets = generator.generate_all()
+            registry = DatasetRegistry(self.output_dir)
+            for source_name in ('sales', 'inventory', 'production'):
+                registry.register(source_name, datasets[source_name], step='synthetic')
+
+            work_dir = os.path.join(self.output_dir, f"rows_{size}")
+            os.makedirs(work_dir, exist_ok=True)
+            stage_functions = {
+                'import': lambda: self._stage_import(registry, work_dir),
+                'ratio': lambda: self._stage_ratio(registry),
+                'quality': lambda: self._stage_quality(registry),
+                'enhanced_quality': lambda: self._stage_enhanced_quality(registry),
+                'report': lambda: self._stage_report(report_inputs, datasets, work_dir)
+            }
+
+            for stage in self.stages:
+                skip_reason = self._skip_reason(stage, size, measurements)
+                if skip_reason:
+                    measurements.append(StageMeasurement(size, stage, 'skipped', 0.0, 0, 0.0, 0.0, 0.0, skip_reason))
+                    self.logger.info(f"{stage} @ {size} 行: 跳过（{skip_reason}）")
+                    continue
+                if stage == 'report':
+                    # Excel 文件在计时前写出
+                    report_inputs = generator.write(datasets, os.path.join(work_dir, 'excel'), 'excel')
+                measurements.append(self._measure(size, stage, stage_functions[stage]))
+
+            del datasets, registry
+            gc.collect()
+
+        results = {
+            'timestamp': datetime.now().isoformat(),
+            'sizes': self.sizes,
+            'stages': self.stages,
+            'measurements': [asdict(m) for m in measurements],
+            'scaling': self.fit_scaling(measurements)
+        }
+        return results
+
+    def _skip_reason(self, stage: str, size: int, measurements: List[StageMeasurement]) -> Optional[str]:
+        """判断该阶段在此规模下是否跳过"""
+        if stage == 'report' and size > self.report_max_rows:
+            return f"超过报表阶段行数上限 {self.report_max_rows}"
+
+        previous = [m for m in measurements if m.stage == stage and m.status == 'ok']
+        if previous:
+            last = previous[-1]
+            projected = last.seconds * size / last.size
+            if projected > self.stage_time_budget:
+                return f"按 {last.size} 行耗时线性外推约 {projected:.0f}s，超过时间预算 {self.stage_time_budget:.0f}s"
+        return None
+    
+    def _measure(self, size: int, stage: str, func: Callable[[], int]) -> StageMeasurement:
+        """运行一个阶段并记录耗时、内存峰值与 CPU"""
+        gc.collect()
+        status, error = 'ok', None
+        with StageProfiler(f"{stage}@{size}") as profiler:
+            try:
+                profiler.add_records(func())
+            except Exception as e:
+                status, error = 'error', str(e)
+                self.logger.error(f"{stage} 在 {size} 行规模下失败: {e}")
+        profile = profiler.result
+
+        self.logger.info(f"{stage} @ {size} 行: {profile.seconds:.2f}s ({status})")
+        return StageMeasurement(
+            size=size,
+            stage=stage,
+            status=status,
+            seconds=profile.seconds,
+            rows=profile.records_processed,
+            memory_before=profile.memory_before,
+            memory_after=profile.memory_after,
+            throughput=profile.throughput,
+            error=error,
+            memory_peak=profile.memory_peak,
+            cpu_mean=profile.cpu_mean
+        )
+
+    def _stage_import(self, registry: DatasetRegistry, work_dir: str) -> int:
+        importer = OptimizedDataImporter(
+            ETLConfig(excel_folder=work_dir, sql_output_file=os.path.join(work_dir, 'import_data.sql')),
+            registry=registry
+        )
+        result = importer.run_etl_process()
+        if not result['success']:
+            raise RuntimeError(result.get('error'))
+        return sum(lineage['records'] for lineage in registry.describe().values())
+
+    def _stage_ratio(self, registry: DatasetRegistry) -> int:
+        analyzer = ProductionSalesRatioAnalyzer(registry=registry)
+        sales_data, inventory_data = analyzer.load_and_validate_data()
+        analyzer.calculate_production_sales_ratio(sales_data, inventory_data)
+        return len(sales_data) + len(inventory_data)
+
+    def _stage_quality(self, registry: DatasetRegistry) -> int:
+        # 关闭跨运行持久化，保证各规模之间互不影响
+        monitor = DataQualityMonitor(registry=registry, fingerprint_dir=None, sketch_db_path=None)
+        report = monitor.run_quality_check()
+        return report.metrics.total_records
+
+    def _stage_enhanced_quality(self, registry: DatasetRegistry) -> int:
+        monitor = EnhancedDataQualityMonitor(registry=registry, stats_db_path=None,
+                                             model_cache_dir=None, history_db_path=None)
+        report = monitor.run_enhanced_quality_check()
+        return report.metrics.total_records
+
+    def _stage_report(self, paths: Dict[str, str], datasets: Dict[str, Any], work_dir: str) -> int:
+        """报表生成：读取 Excel 数据源，完成调价分析和产销率明细，生成库存/产销率/销售/明细页面"""
+        html_dir = os.path.join(work_dir, 'html')
+
+        if REPORT_SCRIPT_DIR not in sys.path:
+            sys.path.insert(0, REPORT_SCRIPT_DIR)
+        from data_loader import DataLoader
+        from analyzer import PriceAnalyzer
+        from inventory_report import generate_inventory_page
+        from ratio_report import generate_ratio_page
+        from sales_report import generate_sales_page
+        from details_report import generate_details_page
+
+        # 旧版脚本大量 print，基准测试时丢弃
+        with contextlib.redirect_stdout(io.StringIO()):
+            loader = DataLoader()
+            price_data = loader.load_and_process_price_data(paths['price'])
+            inventory_data = loader.load_inventory_data(paths['inventory'])
+            sales_data = loader.load_sales_data(paths['sales'])
+            production_data = loader.load_daily_production_data(paths['production'])
+
+            analyzer = PriceAnalyzer(all_data=price_data, sales_data=sales_data,
+                                     daily_production_data=production_data)
+            analyzer.analyze_price_changes()
+            daily_sales = analyzer.process_sales_data() or {}
+            product_ratio_details = analyzer.calculate_product_sales_ratio_detail(
+                daily_sales_data=loader.load_daily_sales_data(paths['sales']),
+                daily_production_data=production_data
+            ) or []
+
+            production_totals = production_data.get('total', {})
+            sales_totals = {date: data['volume'] for date, data in daily_sales.items()}
+            ratio_summary = {}
+            for date in sorted(set(sales_totals) | set(production_totals)):
+                sales_volume = sales_totals.get(date, 0)
+                production_volume = production_totals.get(date, 0)
+                ratio = (sales_volume / production_volume * 100) if production_volume > 0 else 0
+                ratio_summary[date] = {'sales': sales_volume, 'production': production_volume, 'ratio': min(ratio, 500)}
+
+            os.makedirs(html_dir, exist_ok=True)
+            generate_inventory_page(inventory_data, html_dir)
+            generate_ratio_page(ratio_summary, product_ratio_details, html_dir)
+            generate_sales_page(daily_sales, None, html_dir)
+            generate_details_page(product_sales_ratio_data=product_ratio_details,
+                                  daily_sales=daily_sales, output_dir=html_dir)
+
+        return len(datasets['sales']) + len(datasets['production']) + len(datasets['inventory'])
+
+    @staticmethod
+    def fit_scaling(measurements: List[StageMeasurement]) -> Dict[str, Dict[str, Any]]:
+        """
+        按阶段拟合 log(耗时) = a·log(行数) + b
+
+        a≈1 为线性，a>1 表示随规模超线性增长；至少需要两个成功的规模点。
+        """
+        scaling = {}
+        for stage in dict.fromkeys(m.stage for m in measurements):
+            points = [(m.size, m.seconds) for m in measurements if m.stage == stage and m.status == 'ok' and m.seconds > 0]
+            entry: Dict[str, Any] = {'points': points, 'exponent': None}
+            if len(points) >= 2:
+                sizes = np.log([p[0] for p in points])
+                seconds = np.log([p[1] for p in points])
+                exponent, _ = np.polyfit(sizes, seconds, 1)
+                entry['exponent'] = round(float(exponent), 3)
+            scaling[stage] = entry
+        return scaling
+
+    def export(self, results: Dict[str, Any]) -> str:
+        """导出 JSON 结果与文本摘要，返回 JSON 路径"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        json_path = os.path.join(self.output_dir, f"scale_benchmark_{timestamp}.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+        with open(json_path.replace('.json', '.txt'), 'w', encoding='utf-8') as f:
+            f.write(self.format_summary(results))
+
+        self.logger.info(f"基准测试结果已导出: {json_path}")
+        return json_path
+
+    @staticmethod
+    def format_summary(results: Dict[str, Any]) -> str:
+        """文本摘要：各阶段在各规模下的耗时与扩展指数"""
+        sizes = results['sizes']
+        table: Dict[str, Dict[int, str]] = {}
+        for m in results['measurements']:
+            if m['status'] == 'ok':
+                cell = f"{m['seconds']:.2f}s"
+            else:
+                cell = '跳过' if m['status'] == 'skipped' else '失败'
+            table.setdefault(m['stage'], {})[m['size']] = cell
+
+        lines = ["规模基准测试结果", "=" * 80]
+        lines.append(f"{'阶段':<18}" + ''.join(f"{size:>12,}" for size in sizes) + f"{'扩展指数':>10}")
+        for stage, cells in table.items():
+            exponent = results['scaling'].get(stage, {}).get('exponent')
+            lines.append(
+                f"{stage:<18}" + ''.join(f"{cells.get(size, '-'):>12}" for size in sizes)
+                + f"{(f'{exponent:.2f}' if exponent is not None else '-'):>10}"
+            )
+        lines.append("=" * 80)
+        lines.append("扩展指数: 1.0 为线性增长，明显大于 1 的阶段在大数据量下会成为瓶颈")
+        return '\n'.join(lines) + '\n'
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='合成数据规模基准测试')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='销售明细行数列表，逗号分隔')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"阶段列表，可选: {','.join(STAGES)}")
+    parser.add_argument('--output-dir', default='scale_benchmark', help='输出目录')
+    parser.add_argument('--report-max-rows', type=int, default=100000, help='报表阶段的最大行数')
+    parser.add_argument('--products', type=int, default=300, help='产品数')
+    parser.add_argument('--days', type=int, default=90, help='天数')
+    parser.add_argument('--stage-time-budget', type=float, default=900.0, help='单个阶段的时间预算（秒）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    benchmark = ScaleBenchmark(
+        sizes=[int(s) for s in args.sizes.split(',') if s],
+        stages=[s for s in args.stages.split(',') if s],
+        output_dir=args.output_dir,
+        report_max_rows=args.report_max_rows,
+        n_products=args.products,
+        n_days=args.days,
+        stage_time_budget=args.stage_time_budget
+    )
+    results = benchmark.run()
+    benchmark.export(results)
+    print(benchmark.format_summary(results))
+
+
+if __name__ == "__main__":
+    main()
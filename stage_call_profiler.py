@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按阶段的函数级性能分析
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-14
+
+功能:
+1. 只在指定阶段（stage_tracer 的阶段名或路径）内运行 cProfile，其余代码不受影响
+2. 同名阶段多次出现时累积到同一份分析结果；嵌套的同名阶段只计一次
+3. 输出 pstats 文件、折叠调用栈（flamegraph.pl / speedscope 输入）和热点函数表
+
+说明: 折叠调用栈由 cProfile 的调用关系按调用方耗时比例推算，递归和多路径调用处为近似值；
+只分析开启阶段的线程，线程池/进程池中的工作代码不计入。
+"""
+
+import os
+import io
+import cProfile
+import pstats
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+FunctionKey = Tuple[str, int, str]
+
+
+def _frame_label(func: FunctionKey) -> str:
+    """折叠栈中的帧名（去掉分号，避免破坏格式）"""
+    filename, line, name = func
+    if filename == '~':
+        label = name
+    else:
+        label = f"{name} ({os.path.basename(filename)}:{line})"
+    return label.replace(';', ',')
+
+
+def collapse_stats(stats: pstats.Stats, min_fraction: float = 1e-4, max_depth: int = 64) -> Dict[str, float]:
+    """
+    由 cProfile 调用图推算折叠调用栈，值为该栈上的自身耗时（秒）
+
+    被调函数在某条路径上的耗时 = 调用边上的累计耗时 × 调用方在该路径上的占比。
+    """
+    raw = stats.stats
+    callees: Dict[FunctionKey, Dict[FunctionKey, float]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+
+    roots = [func for func, entry in raw.items() if not any(caller in raw for caller in entry[4])]
+    total = sum(raw[func][3] for func in roots) or 1.0
+    threshold = total * min_fraction
+    collapsed: Dict[str, float] = {}
+
+    def walk(func: FunctionKey, path_time: float, stack: List[FunctionKey], labels: List[str]):
+        _, _, self_time, cumulative, _ = raw[func]
+        scale = path_time / cumulative if cumulative > 0 else 0.0
+        labels = labels + [_frame_label(func)]
+        key = ';'.join(labels)
+        collapsed[key] = collapsed.get(key, 0.0) + self_time * scale
+        if len(stack) >= max_depth:
+            return
+        for callee, edge_time in callees.get(func, {}).items():
+            callee_time = edge_time * scale
+            if callee in stack or callee_time < threshold:
+                continue
+            walk(callee, callee_time, stack + [callee], labels)
+
+    for root in roots:
+        if raw[root][3] >= threshold:
+            walk(root, raw[root][3], [root], [])
+    return {stack: seconds for stack, seconds in collapsed.items() if seconds > 0}
+
+
+def top_functions(stats: pstats.Stats, limit: int = 30) -> List[Dict[str, Any]]:
+    """按自身耗时排序的热点函数"""
+    rows = []
+    for func, (primitive_calls, calls, self_time, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': _frame_label(func),
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'self_seconds': self_time,
+            'cumulative_seconds': cumulative,
+            'per_call_ms': cumulative / calls * 1000 if calls else 0.0
+        })
+    rows.sort(key=lambda row: row['self_seconds'], reverse=True)
+    return rows[:limit]
+
+
+def format_top_functions(rows: List[Dict[str, Any]], title: str, total_seconds: float) -> str:
+    """热点函数文本表"""
+    lines = [
+        title,
+        "=" * 120,
+        f"{'自身(s)':>10}{'自身%':>8}{'累计(s)':>10}{'调用次数':>12}{'每次(ms)':>10}  函数",
+        "-" * 120
+    ]
+    for row in rows:
+        share = row['self_seconds'] / total_seconds if total_seconds > 0 else 0.0
+        calls = f"{row['calls']}" if row['calls'] == row['primitive_calls'] else f"{row['calls']}/{row['primitive_calls']}"
+        lines.append(f"{row['self_seconds']:>10.3f}{share:>8.1%}{row['cumulative_seconds']:>10.3f}"
+                     f"{calls:>12}{row['per_call_ms']:>10.3f}  {row['function']}")
+    lines.append("=" * 120)
+    return "\n".join(lines)
+
+
+class StageCallProfiler:
+    """只在匹配阶段内启用的 cProfile"""
+
+    def __init__(self, stage: str, output_dir: str = '.', top_n: int = 30):
+        self.stage = stage.strip('/')
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.profile = cProfile.Profile()
+        self.matched_spans = 0
+        self.profiled_seconds = 0.0
+        self._active = False
+        self.logger = logging.getLogger(f"{__name__}.StageCallProfiler")
+
+    def matches(self, path: str) -> bool:
+        """阶段名或路径后缀匹配，如 'inventory' 或 'etl/inventory'"""
+        return path == self.stage or path.endswith('/' + self.stage)
+
+    def start(self) -> bool:
+        """开始分析；已在分析中（嵌套匹配）时返回 False"""
+        if self._active:
+            return False
+        self._active = True
+        self.matched_spans += 1
+        self.profile.enable()
+        return True
+
+    def stop(self, elapsed: float = 0.0):
+        self.profile.disable()
+        self._active = False
+        self.profiled_seconds += elapsed
+
+    def write(self, output_dir: Optional[str] = None) -> Dict[str, str]:
+        """写出 pstats、折叠调用栈和热点函数表，返回文件路径"""
+        if self.matched_spans == 0:
+            self.logger.warning(f"没有运行名为 {self.stage} 的阶段，未生成性能分析文件")
+            return {}
+
+        output_dir = output_dir or self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        base = os.path.join(output_dir, f"profile_{self.stage.replace('/', '_')}_{timestamp}")
+
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        pstats_file = f"{base}.pstats"
+        stats.dump_stats(pstats_file)
+
+        collapsed_file = f"{base}.collapsed.txt"
+        with open(collapsed_file, 'w', encoding='utf-8') as f:
+            for stack, seconds in sorted(collapse_stats(stats).items()):
+                # flamegraph.pl 需要整数样本值，这里以微秒为单位
+                microseconds = int(round(seconds * 1e6))
+                if microseconds > 0:
+                    f.write(f"{stack} {microseconds}\n")
+
+        top_file = f"{base}.top.txt"
+        title = (f"阶段 {self.stage} 热点函数（匹配 {self.matched_spans} 次，"
+                 f"阶段耗时 {self.profiled_seconds:.2f}s，cProfile 计时 {stats.total_tt:.2f}s）")
+        with open(top_file, 'w', encoding='utf-8') as f:
+            f.write(format_top_functions(top_functions(stats, self.top_n), title, stats.total_tt))
+
+        self.logger.info(f"阶段 {self.stage} 性能分析已导出: {pstats_file}")
+        return {'pstats': pstats_file, 'collapsed': collapsed_file, 'top': top_file}
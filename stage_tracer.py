@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级阶段追踪
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-12
+
+功能:
+1. trace_span() 为阶段和子阶段计时，记录行数与内存变化，支持嵌套
+2. traced 装饰器包装整个函数为一个阶段
+3. 导出 Chrome trace-event JSON（chrome://tracing、Perfetto 可直接打开）和文本摘要
+4. 未启用时 trace_span() 返回共享的空操作对象，开销接近零
+5. enable_profiling(stage) 只在指定阶段内运行 cProfile（见 stage_call_profiler）
+
+启用方式: 设置环境变量 STAGE_TRACE=1，或调用 enable_tracing()。
+说明: 进程池工作进程中的阶段不会自动回传到主进程；由调度方用 add_span() 补记工作进程测得的时间。
+线程池的工作线程不继承当前阶段，提交任务时使用 submit_in_context()，线程中的阶段才会挂在提交方的阶段之下。
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from datetime import datetime
+from functools import wraps
+from typing import Dict, List, Optional, Any, Callable
+from dataclasses import dataclass, field
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 当前所在阶段（用于建立父子关系）
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_trace_span', default=None)
+
+
+@dataclass
+class SpanRecord:
+    """一个已结束的阶段"""
+    span_id: int
+    parent_id: Optional[int]
+    name: str
+    path: str
+    depth: int
+    start_us: float
+    duration_us: float
+    pid: int
+    tid: int
+    rows: Optional[int] = None
+    memory_before: Optional[float] = None
+    memory_after: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def memory_delta(self) -> Optional[float]:
+        if self.memory_before is None or self.memory_after is None:
+            return None
+        return self.memory_after - self.memory_before
+
+
+class _NoopSpan:
+    """追踪关闭时使用的空操作阶段"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set_rows(self, rows):
+        pass
+
+    def add_rows(self, rows):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """进行中的阶段"""
+
+    def __init__(self, tracer: 'StageTracer', name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.rows: Optional[int] = None
+        self.span_id = 0
+        self.parent: Optional['Span'] = None
+        self.path = name
+        self.depth = 0
+        self._token = None
+        self._start = 0.0
+        self._memory_before: Optional[float] = None
+        self._profiling = False
+
+    def set_rows(self, rows):
+        """记录该阶段处理的行数"""
+        self.rows = int(rows)
+
+    def add_rows(self, rows):
+        """累加行数（分批处理时使用）"""
+        self.rows = (self.rows or 0) + int(rows)
+
+    def set(self, **attributes):
+        """附加任意属性，导出到 trace 的 args 中"""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> 'Span':
+        self.parent = _current_span.get()
+        if self.parent is not None:
+            self.path = f"{self.parent.path}/{self.name}"
+            self.depth = self.parent.depth + 1
+        self.span_id = self.tracer._next_id()
+        self._token = _current_span.set(self)
+        self._memory_before = self.tracer._memory_mb()
+        call_profiler = self.tracer.call_profiler
+        self._profiling = call_profiler is not None and call_profiler.matches(self.path) and call_profiler.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = time.perf_counter()
+        if self._profiling:
+            self.tracer.call_profiler.stop(end - self._start)
+        _current_span.reset(self._token)
+        self.tracer._record(SpanRecord(
+            span_id=self.span_id,
+            parent_id=self.parent.span_id if self.parent is not None else None,
+            name=self.name,
+            path=self.path,
+            depth=self.depth,
+            start_us=(self._start - self.tracer.origin) * 1e6,
+            duration_us=(end - self._start) * 1e6,
+            pid=os.getpid(),
+            tid=threading.get_ident(),
+            rows=self.rows,
+            memory_before=self._memory_before,
+            memory_after=self.tracer._memory_mb(),
+            attributes=self.attributes,
+            error=f"{exc_type.__name__}: {exc_val}" if exc_type is not None else None
+        ))
+        return False
+
+
+class StageTracer:
+    """阶段追踪器，收集已结束的阶段并负责导出"""
+
+    def __init__(self, enabled: bool = False, track_memory: bool = True):
+        self.enabled = enabled
+        self.track_memory = track_memory and PSUTIL_AVAILABLE
+        self.origin = time.perf_counter()
+        self.started_at = datetime.now()
+        self.records: List[SpanRecord] = []
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._process = psutil.Process() if PSUTIL_AVAILABLE else None
+        self.call_profiler = None  # 可选的 StageCallProfiler
+        self.logger = logging.getLogger(f"{__name__}.StageTracer")
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def _memory_mb(self) -> Optional[float]:
+        if not self.track_memory:
+            return None
+        return self._process.memory_info().rss / 1024 / 1024
+
+    def _record(self, record: SpanRecord):
+        with self._lock:
+            self.records.append(record)
+
+    def span(self, name: str, **attributes):
+        """创建阶段；未启用时返回空操作对象"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def add_span(self, name: str, start: float, end: float, pid: Optional[int] = None,
+                 tid: Optional[int] = None, rows: Optional[int] = None, error: Optional[str] = None,
+                 **attributes):
+        """
+        补记在其他进程中执行的阶段（start/end 为 time.time() 墙钟时间），挂在当前阶段之下
+
+        pid 不同的阶段在 Chrome trace 中显示为独立的行，便于查看并行度。
+        """
+        if not self.enabled:
+            return
+        parent = _current_span.get()
+        self._record(SpanRecord(
+            span_id=self._next_id(),
+            parent_id=parent.span_id if parent is not None else None,
+            name=name,
+            path=f"{parent.path}/{name}" if parent is not None else name,
+            depth=parent.depth + 1 if parent is not None else 0,
+            start_us=(start - self.started_at.timestamp()) * 1e6,
+            duration_us=(end - start) * 1e6,
+            pid=pid if pid is not None else os.getpid(),
+            tid=tid if tid is not None else threading.get_ident(),
+            rows=rows,
+            attributes=attributes,
+            error=error
+        ))
+
+    def reset(self):
+        """清空已记录的阶段并重置时间原点"""
+        with self._lock:
+            self.records = []
+            self._counter = 0
+        self.origin = time.perf_counter()
+        self.started_at = datetime.now()
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """转换为 Chrome trace-event 格式（完整事件 ph='X'）"""
+        events = []
+        for record in sorted(self.records, key=lambda r: r.start_us):
+            args = dict(record.attributes)
+            if record.rows is not None:
+                args['rows'] = record.rows
+            if record.memory_delta is not None:
+                args['memory_before_mb'] = round(record.memory_before, 2)
+                args['memory_delta_mb'] = round(record.memory_delta, 2)
+            if record.error:
+                args['error'] = record.error
+            events.append({
+                'name': record.name,
+                'cat': record.path.split('/')[0],
+                'ph': 'X',
+                'ts': round(record.start_us, 3),
+                'dur': round(record.duration_us, 3),
+                'pid': record.pid,
+                'tid': record.tid,
+                'args': {key: (value if isinstance(value, (int, float, str, bool)) or value is None else str(value))
+                         for key, value in args.items()}
+            })
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'started_at': self.started_at.isoformat()}
+        }
+
+    def export_chrome_trace(self, file_path: str) -> str:
+        """写出 Chrome trace JSON 文件"""
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+        self.logger.info(f"阶段追踪已导出: {file_path}（{len(self.records)} 个阶段）")
+        return file_path
+
+    def summarize(self) -> List[Dict[str, Any]]:
+        """按阶段路径汇总：调用次数、总耗时、自身耗时、行数、内存变化"""
+        child_time: Dict[int, float] = {}
+        for record in self.records:
+            if record.parent_id is not None:
+                child_time[record.parent_id] = child_time.get(record.parent_id, 0.0) + record.duration_us
+
+        summary: Dict[str, Dict[str, Any]] = {}
+        first_seen: Dict[str, float] = {}
+        for record in self.records:
+            entry = summary.setdefault(record.path, {
+                'path': record.path, 'depth': record.depth, 'calls': 0,
+                'total_seconds': 0.0, 'self_seconds': 0.0, 'rows': None, 'memory_delta_mb': None
+            })
+            entry['calls'] += 1
+            entry['total_seconds'] += record.duration_us / 1e6
+            entry['self_seconds'] += max(0.0, record.duration_us - child_time.get(record.span_id, 0.0)) / 1e6
+            if record.rows is not None:
+                entry['rows'] = (entry['rows'] or 0) + record.rows
+            if record.memory_delta is not None:
+                entry['memory_delta_mb'] = (entry['memory_delta_mb'] or 0.0) + record.memory_delta
+            first_seen[record.path] = min(first_seen.get(record.path, record.start_us), record.start_us)
+
+        # 按首次出现的路径前缀排序，使子阶段紧跟父阶段
+        def sort_key(path: str):
+            parts = path.split('/')
+            return [first_seen.get('/'.join(parts[:i + 1]), 0.0) for i in range(len(parts))]
+
+        return [summary[path] for path in sorted(summary, key=sort_key)]
+
+    def format_summary(self) -> str:
+        """文本摘要"""
+        lines = [
+            "阶段追踪摘要",
+            "=" * 96,
+            f"{'阶段':<44}{'次数':>6}{'总耗时(s)':>12}{'自身(s)':>10}{'行数':>12}{'内存Δ(MB)':>12}",
+            "-" * 96
+        ]
+        for entry in self.summarize():
+            label = '  ' * entry['depth'] + entry['path'].split('/')[-1]
+            rows = f"{entry['rows']:,}" if entry['rows'] is not None else '-'
+            memory = f"{entry['memory_delta_mb']:+.1f}" if entry['memory_delta_mb'] is not None else '-'
+            lines.append(f"{label:<44}{entry['calls']:>6}{entry['total_seconds']:>12.3f}"
+                         f"{entry['self_seconds']:>10.3f}{rows:>12}{memory:>12}")
+        lines.append("=" * 96)
+        return "\n".join(lines)
+
+    def export(self, output_dir: str, prefix: str = 'stage_trace') -> Dict[str, str]:
+        """同时导出 trace JSON 与文本摘要"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        trace_file = self.export_chrome_trace(os.path.join(output_dir, f"{prefix}_{timestamp}.json"))
+        summary_file = os.path.join(output_dir, f"{prefix}_{timestamp}.txt")
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            f.write(self.format_summary())
+        return {'trace': trace_file, 'summary': summary_file}
+
+
+_tracer = StageTracer(enabled=os.environ.get('STAGE_TRACE', '').lower() in ('1', 'true', 'yes', 'on'))
+
+
+def get_tracer() -> StageTracer:
+    """进程级默认追踪器"""
+    return _tracer
+
+
+def enable_tracing(track_memory: bool = True) -> StageTracer:
+    """启用默认追踪器并清空旧记录"""
+    _tracer.reset()
+    _tracer.track_memory = track_memory and PSUTIL_AVAILABLE
+    _tracer.enabled = True
+    return _tracer
+
+
+def disable_tracing():
+    _tracer.enabled = False
+
+
+def tracing_enabled() -> bool:
+    return _tracer.enabled
+
+
+def enable_profiling(stage: str, output_dir: str = '.', top_n: int = 30):
+    """
+    只对指定阶段运行 cProfile（同时启用阶段追踪以便识别阶段）
+
+    stage 可以是阶段名（如 'inventory'）或路径后缀（如 'etl/inventory'）。
+    """
+    from stage_call_profiler import StageCallProfiler
+
+    if not _tracer.enabled:
+        enable_tracing()
+    _tracer.call_profiler = StageCallProfiler(stage, output_dir, top_n)
+    return _tracer.call_profiler
+
+
+def add_profile_argument(parser):
+    """为命令行入口添加 --profile 选项"""
+    parser.add_argument('--profile', metavar='STAGE', default=None,
+                        help="只对指定阶段运行 cProfile，阶段名或路径后缀（如 inventory、etl/inventory）")
+    parser.add_argument('--profile-top', type=int, default=30, help='热点函数表的行数')
+    return parser
+
+
+def finish_profiling(output_dir: Optional[str] = None) -> Dict[str, str]:
+    """写出阶段性能分析文件并停止分析；未启用时返回空字典"""
+    call_profiler = _tracer.call_profiler
+    if call_profiler is None:
+        return {}
+    _tracer.call_profiler = None
+    return call_profiler.write(output_dir)
+
+
+def print_profile_summary(profile_files: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    打印阶段性能分析文件的路径（各命令行入口共用）
+
+    未传入 profile_files 时先调用 finish_profiling()；未指定 --profile 时不输出，返回空字典。
+    """
+    if profile_files is None:
+        profile_files = finish_profiling()
+    if profile_files:
+        print(f"\n📄 阶段性能分析: {profile_files['top']}")
+        print(f"   pstats: {profile_files['pstats']}")
+        print(f"   折叠调用栈: {profile_files['collapsed']}")
+    return profile_files
+
+
+def trace_span(name: str, **attributes):
+    """
+    在默认追踪器上创建阶段
+
+        with trace_span('load', source='sales') as span:
+            df = read()
+            span.set_rows(len(df))
+    """
+    if not _tracer.enabled:
+        return _NOOP_SPAN
+    return Span(_tracer, name, attributes)
+
+
+def submit_in_context(executor, func: Callable, *args, **kwargs):
+    """
+    在当前上下文中向线程池提交任务
+
+    工作线程不继承提交方的 contextvars，直接 executor.submit() 时线程中打开的阶段没有父阶段，
+    在 Chrome trace 中显示为独立的根阶段。每次提交复制一份当前上下文（copy_context().run）。
+    """
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """把整个函数作为一个阶段记录"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            with Span(_tracer, span_name, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorator
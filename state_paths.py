@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化状态目录
+版本: 1.0
+作者: Kilo Code
+日期: 2025-07-16
+
+功能:
+1. 各组件跨运行保存的状态（统计基线、分位数草图、模型缓存、质量历史、行指纹索引、基准基线）统一放在一个目录下
+2. 目录默认为当前目录下的 .quality_state/，可用环境变量 QUALITY_STATE_DIR 或 set_state_dir() 修改
+3. 只给出文件名的路径放入状态目录；带目录的路径（如 ./x.db、/data/x.db）按原样使用
+"""
+
+import os
+from typing import Optional
+
+STATE_DIR_ENV = 'QUALITY_STATE_DIR'
+DEFAULT_STATE_DIR = '.quality_state'
+
+_state_dir: Optional[str] = None
+
+
+def set_state_dir(path: Optional[str]):
+    """设置状态目录（None 表示恢复为环境变量或默认值）"""
+    global _state_dir
+    _state_dir = path
+
+
+def get_state_dir() -> str:
+    """当前状态目录：set_state_dir() > 环境变量 QUALITY_STATE_DIR > .quality_state"""
+    return _state_dir or os.environ.get(STATE_DIR_ENV) or DEFAULT_STATE_DIR
+
+
+def resolve_state_path(path: Optional[str]) -> Optional[str]:
+    """
+    解析状态文件/目录路径
+
+    Args:
+        path: 文件名（放入状态目录）、带目录的路径（原样使用）或 None（未启用）
+
+    Returns:
+        实际路径；只给出文件名时会创建状态目录
+    """
+    if not path:
+        return path
+    if os.path.dirname(path):
+        return path
+    state_dir = get_state_dir()
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, path)
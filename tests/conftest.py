@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共配置
+
+仓库根目录和 原先：python脚本/ 下的模块都可直接导入（根目录优先）。
+仓库根目录下的模块在导入时会在当前目录创建日志文件，默认状态目录也相对当前目录，
+因此在收集测试之前切换到临时目录，并把状态目录指向临时目录，测试不会改动工作区。
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 报表生成脚本（原先：python脚本/）的模块按目录内的顶层模块导入
+LEGACY_DIR = os.path.join(ROOT, '原先：python脚本')
+for path in (LEGACY_DIR, ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+_WORK_DIR = tempfile.mkdtemp(prefix='quality_tests_')
+os.chdir(_WORK_DIR)
+os.environ['QUALITY_STATE_DIR'] = os.path.join(_WORK_DIR, 'state')
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""AnomalyModelCache：按内容哈希复用、漂移重训、旧版指纹兼容"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomaly_model_cache import AnomalyModelCache, DriftFingerprint
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    from enhanced_data_quality_monitor import EnhancedDataQualityMonitor
+
+    return EnhancedDataQualityMonitor(stats_db_path=None, model_cache_dir=str(tmp_path / 'models'),
+                                      history_db_path=None)
+
+
+def _data(seed=0, shift=0.0, rows=200):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'数量': rng.normal(100 + shift, 10, rows), '金额': rng.normal(500 + shift, 50, rows)})
+
+
+def test_same_content_hash_reuses_model_without_fingerprint(monitor, monkeypatch):
+    data = _data()
+    _, _, first = monitor._get_ml_model(data, 'sales', content_hash='abc')
+    assert first['model_reused'] is False
+
+    def fail(*args, **kwargs):
+        raise AssertionError("内容未变时不应重新计算指纹")
+
+    monkeypatch.setattr(AnomalyModelCache, 'fingerprint', staticmethod(fail))
+    _, _, second = monitor._get_ml_model(data, 'sales', content_hash='abc')
+    assert second['model_reused'] is True
+    assert second['drift_score'] == 0.0
+
+
+def test_changed_content_within_drift_threshold_reuses_model(monitor):
+    monitor._get_ml_model(_data(seed=0), 'sales')
+    _, _, info = monitor._get_ml_model(_data(seed=1), 'sales')
+    assert info['model_reused'] is True
+    assert 0.0 < info['drift_score'] <= monitor.model_cache.drift_threshold
+
+
+def test_drift_or_param_change_retrains(monitor):
+    monitor._get_ml_model(_data(), 'sales', content_hash='abc')
+    _, _, drifted = monitor._get_ml_model(_data(shift=50.0), 'sales', content_hash='def')
+    assert drifted['model_reused'] is False
+
+    monitor.anomaly_params['isolation_forest_contamination'] = 0.05
+    _, _, changed = monitor._get_ml_model(_data(shift=50.0), 'sales', content_hash='def')
+    assert changed['model_reused'] is False
+
+
+def test_models_are_single_threaded_inside_pool(monitor):
+    _, forest, _ = monitor._get_ml_model(_data(), 'sales')
+    assert forest.n_jobs == 1
+
+
+def test_legacy_fingerprint_with_quantiles_loads(tmp_path):
+    cache = AnomalyModelCache(str(tmp_path / 'models'))
+    fingerprint = AnomalyModelCache.fingerprint(_data(), {'contamination': 0.1, 'random_state': 42})
+    cache.save('sales', object(), object(), fingerprint)
+
+    _, fingerprint_path = cache._paths('sales')
+    with open(fingerprint_path, 'r', encoding='utf-8') as f:
+        legacy = json.load(f)
+    legacy.pop('content_hash')
+    legacy['quantiles'] = {'p10': [0.0, 0.0], 'p50': [0.0, 0.0], 'p90': [0.0, 0.0]}
+    with open(fingerprint_path, 'w', encoding='utf-8') as f:
+        json.dump(legacy, f)
+
+    _, _, loaded = cache.load('sales')
+    assert isinstance(loaded, DriftFingerprint)
+    assert loaded.content_hash is None
+    assert loaded.means == fingerprint.means
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""BenchmarkRunner 基线选择：干净工作区与其他提交比较，未提交修改与 HEAD 的干净运行比较"""
+
+import pytest
+
+from benchmark_runner import BenchmarkRunner, compare_samples
+
+HEAD = 'b' * 40
+PARENT = 'a' * 40
+
+
+@pytest.fixture
+def runner(tmp_path):
+    return BenchmarkRunner(workloads=['load_clean_sales'], db_path=str(tmp_path / 'baselines.db'))
+
+
+def _save(runner, commit, dirty, samples):
+    runner.store.save('load_clean_sales', samples, {'commit': commit, 'dirty': dirty, 'branch': 'main'}, runner.config)
+
+
+def test_clean_tree_compares_against_previous_commit(runner):
+    _save(runner, PARENT, False, [1.0, 1.1])
+    _save(runner, HEAD, False, [2.0, 2.1])
+
+    commit, samples = runner.baseline_for('load_clean_sales', {'commit': HEAD, 'dirty': False})
+    assert commit == PARENT
+    assert samples == [1.0, 1.1]
+
+
+def test_dirty_tree_compares_against_clean_head_runs(runner):
+    _save(runner, PARENT, False, [1.0, 1.1])
+    _save(runner, HEAD, False, [2.0, 2.1])
+    _save(runner, HEAD, True, [3.0, 3.1])
+
+    commit, samples = runner.baseline_for('load_clean_sales', {'commit': HEAD, 'dirty': True})
+    assert commit == HEAD
+    assert samples == [2.0, 2.1]
+
+
+def test_second_dirty_run_still_has_a_baseline(runner):
+    _save(runner, PARENT, False, [1.0, 1.1])
+    _save(runner, HEAD, True, [3.0, 3.1])
+
+    # HEAD 没有干净运行时退回到上一个提交，而不是报告“无基线”
+    commit, samples = runner.baseline_for('load_clean_sales', {'commit': HEAD, 'dirty': True})
+    assert commit == PARENT
+    assert samples == [1.0, 1.1]
+
+
+def test_explicit_baseline_commit_wins(runner):
+    _save(runner, PARENT, True, [1.0, 1.1])
+    _save(runner, HEAD, False, [2.0, 2.1])
+
+    commit, _ = runner.baseline_for('load_clean_sales', {'commit': HEAD, 'dirty': True}, baseline_commit=PARENT)
+    assert commit == PARENT
+
+
+def test_clear_slowdown_is_a_regression():
+    baseline = [1.00, 1.01, 0.99, 1.02, 0.98, 1.00, 1.01]
+    current = [1.50, 1.52, 1.49, 1.51, 1.48, 1.50, 1.53]
+    assert compare_samples('w', current, baseline, PARENT, tolerance=0.1, alpha=0.05).status == 'regression'
+    assert compare_samples('w', baseline, baseline, PARENT, tolerance=0.1, alpha=0.05).status == 'unchanged'
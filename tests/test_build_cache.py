@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""BuildCache：按输入指纹确定需要重建的任务，没有数据的图表同样缓存"""
+
+import os
+
+import pytest
+
+from build_cache import BuildCache
+from task_graph import TaskGraph, TaskRunner
+
+
+def load_source(source_path):
+    with open(source_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def render_chart(data, output_dir):
+    """没有数据时不生成图表（返回 None）"""
+    if not data.strip():
+        return None
+    path = os.path.join(output_dir, 'chart.png')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(data)
+    return path
+
+
+def build_page(data, output_dir):
+    path = os.path.join(output_dir, 'page.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"<p>{data}</p>")
+    return path
+
+
+@pytest.fixture
+def build(tmp_path):
+    source = tmp_path / 'source.txt'
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+
+    def graph():
+        graph = TaskGraph()
+        out = {'output_dir': str(output_dir)}
+        graph.add('load', load_source, kwargs={'source_path': str(source)}, kind='load', sources=(str(source),))
+        graph.add('chart', render_chart, {'data': 'load'}, out, kind='chart', cache=True)
+        graph.add('page', build_page, {'data': 'load'}, out, after=('chart',), kind='page', cache=True)
+        return graph
+
+    def run():
+        return TaskRunner(graph(), jobs=1, cache=BuildCache(str(output_dir))).run()
+
+    def stale():
+        g = graph()
+        return BuildCache(str(output_dir)).plan(g, g.topological_order())
+
+    return source, output_dir, run, stale
+
+
+def test_unchanged_inputs_need_no_tasks(build):
+    source, _, run, stale = build
+    source.write_text('data', encoding='utf-8')
+    run()
+    assert stale() == set()
+
+
+def test_changed_source_rebuilds_outputs_and_their_inputs(build):
+    source, _, run, stale = build
+    source.write_text('data', encoding='utf-8')
+    run()
+    source.write_text('new data', encoding='utf-8')
+    assert stale() == {'load', 'chart', 'page'}
+
+
+def test_deleted_output_rebuilds_task_and_its_pages(build):
+    source, output_dir, run, stale = build
+    source.write_text('data', encoding='utf-8')
+    run()
+    (output_dir / 'chart.png').unlink()
+    assert stale() == {'load', 'chart', 'page'}
+
+
+def test_empty_chart_stays_cached(build):
+    source, _, run, stale = build
+    source.write_text('  ', encoding='utf-8')
+    results = run()
+    assert results['chart'].status == 'done' and results['chart'].value is None
+
+    assert stale() == set()
+    results = run()
+    assert results['chart'].status == 'cached' and results['chart'].value is None
+    assert results['page'].status == 'cached'
+
+    # 有数据后重新生成
+    source.write_text('data', encoding='utf-8')
+    assert stale() == {'load', 'chart', 'page'}
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""图表缓存：缓存键随数据、样式和 rcParams 变化"""
+
+import matplotlib
+import pandas as pd
+
+from chart_cache import ChartCache
+
+
+def _data():
+    return {'鸡苗': pd.DataFrame({'日期': pd.date_range('2025-07-01', periods=3), '价格': [3.1, 3.2, 3.0]})}
+
+
+def test_key_is_stable_for_same_inputs():
+    cache = ChartCache()
+    assert cache.key(_data(), style={'dpi': 300}) == cache.key(_data(), style={'dpi': 300})
+
+
+def test_key_changes_with_data_and_style():
+    cache = ChartCache()
+    key = cache.key(_data(), style={'dpi': 300})
+    changed = _data()
+    changed['鸡苗'].loc[2, '价格'] = 3.3
+
+    assert cache.key(changed, style={'dpi': 300}) != key
+    assert cache.key(_data(), style={'dpi': 150}) != key
+
+
+def test_key_changes_with_rc_params():
+    cache = ChartCache()
+    with matplotlib.rc_context({'lines.linewidth': 1.0}):
+        key = cache.key(_data())
+    with matplotlib.rc_context({'lines.linewidth': 2.5}):
+        assert cache.key(_data()) != key
+    # 与渲染无关的设置不影响缓存键
+    with matplotlib.rc_context({'lines.linewidth': 1.0, 'interactive': True}):
+        assert cache.key(_data()) == key
+
+
+def test_fresh_only_with_matching_key_and_image(tmp_path):
+    cache = ChartCache()
+    chart_path = str(tmp_path / 'chart.png')
+    key = cache.key(_data())
+    assert not cache.is_fresh(chart_path, key)
+
+    with open(chart_path, 'wb') as f:
+        f.write(b'png')
+    cache.store(chart_path, key)
+    assert cache.is_fresh(chart_path, key)
+    assert not cache.is_fresh(chart_path, cache.key(_data(), style={'dpi': 150}))
+    assert not ChartCache(enabled=False).is_fresh(chart_path, key)
+
+    (tmp_path / 'chart.png').unlink()
+    assert not cache.is_fresh(chart_path, key)
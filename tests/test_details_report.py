@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""details.html：返回页面路径，分片文件逐个作为构建输出"""
+
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from details_report import DETAIL_DATA_DIRNAME, detail_shard_files, generate_details_page
+from report_tasks import build_details_page
+
+
+def _inputs(days):
+    ratio = [{'date': datetime(2025, 7, day),
+              'data': pd.DataFrame({'品名': ['凤肠'], '销量': [10], '产量': [20], '产销率': [50.0]})}
+             for day in days]
+    sales = {datetime(2025, 7, day): {'volume': 100, 'avg_price': 12.0, 'product_count': 1,
+                                      'data': pd.DataFrame({'物料名称': ['凤肠'], '主数量': [100],
+                                                            '本币无税金额': [1200.0]}),
+                                      'quantity_column': '主数量'}
+             for day in days}
+    return ratio, sales
+
+
+def test_generate_details_page_returns_page_path(tmp_path):
+    ratio, sales = _inputs([1, 2])
+    assert generate_details_page(ratio, sales, str(tmp_path)) == os.path.join(str(tmp_path), 'details.html')
+
+
+def test_build_outputs_list_every_shard(tmp_path):
+    ratio, sales = _inputs([1, 2, 3])
+    outputs = build_details_page(ratio, sales, str(tmp_path))
+
+    assert outputs[0] == os.path.join(str(tmp_path), 'details.html')
+    shards = outputs[1:]
+    assert shards == detail_shard_files(str(tmp_path))
+    assert all(os.path.isfile(path) for path in outputs)
+    # 每天两类分片（产销率、销售）
+    assert len([path for path in shards if path.endswith('.js')]) == 6
+
+    # 不再引用的旧分片被删除，也不再出现在输出中
+    ratio, sales = _inputs([1])
+    shards = build_details_page(ratio, sales, str(tmp_path))[1:]
+    assert len([path for path in shards if path.endswith('.js')]) == 2
+    assert all(os.path.join(str(tmp_path), DETAIL_DATA_DIRNAME) in path for path in shards)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""折线图降采样：点数、首尾点和全局极值"""
+
+import numpy as np
+import pandas as pd
+
+from downsample import downsample_positions
+
+
+def _series(n=5000):
+    rng = np.random.default_rng(0)
+    x = pd.date_range('2015-01-01', periods=n, freq='D').to_numpy(copy=True)
+    y = np.cumsum(rng.normal(size=n)) + 100
+    return x, y
+
+
+def test_short_series_is_unchanged():
+    x, y = _series(50)
+    assert np.array_equal(downsample_positions(x, y, max_points=100), np.arange(50))
+
+
+def test_requested_point_count_and_endpoints():
+    x, y = _series()
+    positions = downsample_positions(x, y, max_points=200, keep_extremes=False)
+
+    assert len(positions) == 200
+    assert positions[0] == 0 and positions[-1] == len(y) - 1
+    assert np.all(np.diff(positions) > 0)
+
+
+def test_extremes_are_kept():
+    x, y = _series()
+    positions = downsample_positions(x, y, max_points=200)
+
+    assert 200 <= len(positions) <= 202
+    assert np.argmax(y) in positions
+    assert np.argmin(y) in positions
+    assert y[positions].max() == y.max() and y[positions].min() == y.min()
+
+
+def test_missing_values_are_skipped():
+    x, y = _series()
+    y[::7] = np.nan
+    x[3] = np.datetime64('NaT')
+    positions = downsample_positions(x, y, max_points=200)
+
+    assert not np.isnan(y[positions]).any()
+    assert 3 not in positions
+    assert np.nanargmax(y) in positions
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""industry.html：趋势图及其响应式变体与页面一起作为构建输出"""
+
+import os
+
+import pandas as pd
+import pytest
+from PIL import Image
+
+import industry_report
+from report_tasks import build_industry_page
+
+
+@pytest.fixture
+def fake_charts(monkeypatch):
+    """用纯色 PNG 代替趋势图（绘图依赖中文字体，这里只关心输出列表）"""
+    def generate_industry_charts(industry_data, output_dir, chart_cache=None):
+        chart_paths = []
+        for product_name in industry_data:
+            filename = f"{product_name}_price_trend.png"
+            Image.new('RGB', (1600, 800), 'white').save(os.path.join(output_dir, filename))
+            chart_paths.append(filename)
+        return chart_paths
+
+    monkeypatch.setattr(industry_report, 'generate_industry_charts', generate_industry_charts)
+
+
+def test_outputs_include_charts_and_variants(tmp_path, fake_charts):
+    output_dir = str(tmp_path)
+    industry_data = {name: pd.DataFrame({'日期': pd.date_range('2025-07-01', periods=3), '价格': [1.0, 2.0, 3.0]})
+                     for name in ['鸡苗', '琵琶腿']}
+
+    outputs = build_industry_page(industry_data, output_dir)
+
+    assert outputs[0] == os.path.join(output_dir, 'industry.html')
+    for name in industry_data:
+        assert os.path.join(output_dir, f"{name}_price_trend.png") in outputs
+    variants = [path for path in outputs if os.sep + 'responsive' + os.sep in path]
+    assert any(path.endswith('.webp') for path in variants)
+    assert any(path.endswith('.png') for path in variants)
+    assert all(os.path.isfile(path) for path in outputs)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""预编译页面模板：逐段渲染，生成内容出错时不留下半个页面"""
+
+import os
+
+import pytest
+
+from html_utils import PageTemplate, write_html_report
+
+TEMPLATE = PageTemplate("<h1>{{title}}</h1><table>{{rows}}</table>")
+
+
+def _rows(fail_at=None):
+    for i in range(3):
+        if i == fail_at:
+            raise ValueError('数据错误')
+        yield [f"<tr><td>{i}</td>", "</tr>"]
+
+
+def test_render_expands_nested_chunks():
+    assert TEMPLATE.slots == ['title', 'rows']
+    assert TEMPLATE.render_to_string(title='报表', rows=_rows()) == \
+        "<h1>报表</h1><table><tr><td>0</td></tr><tr><td>1</td></tr><tr><td>2</td></tr></table>"
+
+
+def test_missing_slot_raises():
+    with pytest.raises(KeyError):
+        TEMPLATE.render_to_string(title='报表')
+
+
+def test_failed_page_leaves_no_partial_output(tmp_path):
+    output_dir = str(tmp_path)
+    path = write_html_report(TEMPLATE.render(title='旧', rows=_rows()), 'page.html', output_dir)
+
+    with pytest.raises(ValueError):
+        write_html_report(TEMPLATE.render(title='新', rows=_rows(fail_at=2)), 'page.html', output_dir)
+
+    with open(path, encoding='utf-8') as f:
+        assert f.read().startswith('<h1>旧</h1>')
+    assert not [name for name in os.listdir(output_dir) if name.endswith('.tmp')]
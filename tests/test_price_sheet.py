@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""综合售价表：解析结果、按源文件修改时间失效的缓存、销售页面只输出本次写出的 JSON"""
+
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import price_sheet
+from price_sheet import PRICE_SHEET_JSON, load_price_sheet, parse_price_sheet
+from report_tasks import build_sales_page
+
+
+def _cells(price=16500):
+    return pd.DataFrame([
+        ['综合售价', None, None, None, None, None],
+        ['主类别', '单位', '核算办法', '7月1日', '7月2日', '均价'],
+        ['分割品', '加工一厂', '毛鸡', price, 16600, 16550],
+        [None, '加工二厂', None, 16400, 16450.6, None],
+        [None, '加工二厂', '按重量', 16000, None, None],
+        ['鲜品', '加工一厂', '毛鸡', 9000, 9100, 9050],
+        ['说明：以含税价计', None, None, None, None, None],
+    ])
+
+
+@pytest.fixture
+def price_file(tmp_path):
+    price_sheet._memory_cache.clear()
+    path = tmp_path / '综合售价7.2.xlsx'
+
+    def write(price=16500, mtime_ns=None):
+        _cells(price).to_excel(path, header=False, index=False)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        return str(path)
+
+    yield write
+    price_sheet._memory_cache.clear()
+
+
+def test_parse_price_sheet_groups_rows():
+    sheet = parse_price_sheet(_cells(), date_label='7.2')
+
+    assert sheet.headers == ['7月1日', '7月2日', '均价']
+    assert sheet.explanation == '说明：以含税价计'
+    assert [category.name for category in sheet.categories] == ['分割品', '鲜品']
+
+    cut = sheet.categories[0]
+    assert cut.average == '16,550'
+    # 空的核算办法沿用上一行
+    assert [(method.name, len(method.rows)) for method in cut.methods] == [('毛鸡', 2), ('按重量', 1)]
+    assert cut.methods[0].rows[1].values == ['16,400', '16,450']
+    assert cut.methods[1].rows[0].values == ['16,000', '']
+    assert sheet.categories[1].row_count == 1
+
+
+def test_cached_json_is_reused_until_source_changes(price_file, tmp_path, monkeypatch):
+    output_dir = str(tmp_path / 'out')
+    os.makedirs(output_dir)
+    path = price_file(mtime_ns=1_700_000_000_000_000_000)
+
+    sheet, json_path = load_price_sheet(path, date_label='7.2', cache_dir=output_dir)
+    assert json_path == os.path.join(output_dir, PRICE_SHEET_JSON)
+    with open(json_path, encoding='utf-8') as f:
+        assert json.load(f)['categories'][0]['average'] == '16,550'
+
+    # 源文件未变：新进程直接使用 JSON，不再读取工作簿
+    price_sheet._memory_cache.clear()
+    monkeypatch.setattr(price_sheet.pd, 'read_excel', lambda *args, **kwargs: pytest.fail('workbook re-read'))
+    cached, _ = load_price_sheet(path, date_label='7.2', cache_dir=output_dir)
+    assert cached.categories[0].methods[0].rows[0].values == sheet.categories[0].methods[0].rows[0].values
+    monkeypatch.undo()
+
+    # 修改时间变化后重新解析
+    price_sheet._memory_cache.clear()
+    price_file(price=17000, mtime_ns=1_700_000_100_000_000_000)
+    sheet, _ = load_price_sheet(path, date_label='7.2', cache_dir=output_dir)
+    assert sheet.categories[0].methods[0].rows[0].values[0] == '17,000'
+
+
+def test_sales_outputs_only_list_price_json_written_this_run(price_file, tmp_path):
+    output_dir = str(tmp_path / 'out')
+    os.makedirs(output_dir)
+    daily_sales = {datetime(2025, 7, 1): {'volume': 100, 'avg_price': 12.0, 'product_count': 1,
+                                          'data': pd.DataFrame({'物料名称': ['凤肠'], '主数量': [100]}),
+                                          'quantity_column': '主数量'}}
+    path = price_file()
+    json_path = os.path.join(output_dir, PRICE_SHEET_JSON)
+
+    outputs = build_sales_page(daily_sales, path, output_dir)
+    assert outputs == [os.path.join(output_dir, 'sales.html'), json_path]
+
+    # 综合售价文件被移除：旧的 JSON 被删除，不再作为输出
+    os.remove(path)
+    outputs = build_sales_page(daily_sales, path, output_dir)
+    assert outputs == [os.path.join(output_dir, 'sales.html')]
+    assert not os.path.exists(json_path)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""ProductEWMADetector：EWMA 递推、跨运行增量更新、尖峰检测"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from product_anomaly_detector import ProductEWMADetector
+
+
+def _detector(tmp_path, name='stats.db', **kwargs):
+    return ProductEWMADetector(str(tmp_path / name), **kwargs)
+
+
+def _daily(values, start='2025-07-01', product='A'):
+    index = pd.date_range(start, periods=len(values), freq='D')
+    return pd.DataFrame({product: values}, index=index)
+
+
+def _state(detector, metric):
+    return detector._load_state(metric)
+
+
+def test_mean_follows_pandas_ewm(tmp_path):
+    values = [10.0, 12.0, 11.0, 13.0, 9.0, 10.5]
+    detector = _detector(tmp_path, alpha=0.3)
+    detector.update('daily_sales', _daily(values))
+
+    state, last_date = _state(detector, 'daily_sales')
+    expected = pd.Series(values).ewm(alpha=0.3, adjust=False).mean().iloc[-1]
+    assert state.loc['A', 'mean'] == pytest.approx(expected)
+    assert state.loc['A', 'n'] == len(values)
+    assert last_date == pd.Timestamp('2025-07-06')
+
+
+def test_incremental_runs_match_single_run(tmp_path):
+    rng = np.random.default_rng(1)
+    daily = pd.DataFrame(rng.normal(100, 5, (20, 3)), columns=['A', 'B', 'C'],
+                         index=pd.date_range('2025-07-01', periods=20, freq='D'))
+
+    whole = _detector(tmp_path, 'whole.db')
+    whole.update('m', daily)
+    split = _detector(tmp_path, 'split.db')
+    split.update('m', daily.iloc[:8])
+    # 重复提交已处理的日期不会再次计入
+    split.update('m', daily.iloc[:12])
+    split.update('m', daily)
+
+    pd.testing.assert_frame_equal(_state(whole, 'm')[0].sort_index(), _state(split, 'm')[0].sort_index())
+
+
+def test_spike_flagged_only_after_min_periods(tmp_path):
+    detector = _detector(tmp_path, 'early.db', min_periods=5, z_threshold=3.0)
+    early = detector.update('m', _daily([10.0, 10.2, 50.0]))
+    assert early.empty
+
+    steady = [10.0, 10.2, 9.8, 10.1, 9.9, 10.0, 10.3]
+    detector = _detector(tmp_path, 'steady.db', min_periods=5)
+    detector.update('m', _daily(steady))
+    flagged = detector.update('m', _daily([30.0], start='2025-07-08'))
+    assert list(flagged['product']) == ['A']
+    assert flagged['z_score'].iloc[0] > 3.0
+    assert flagged['expected'].iloc[0] == pytest.approx(_daily(steady)['A'].ewm(alpha=0.1, adjust=False).mean().iloc[-1])
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""QualityHistoryStore：旧版 JSON 只导入一次、最近记录查询、历史对比的时间窗口"""
+
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from quality_history_store import QualityHistoryStore
+
+
+def _report(report_id, timestamp, score):
+    dimension = SimpleNamespace(score=score)
+    metrics = SimpleNamespace(weighted_score=score, quality_grade='B', completeness=dimension,
+                              accuracy=dimension, consistency=dimension, validity=dimension,
+                              issue_count=3, critical_issue_count=1)
+    return SimpleNamespace(report_id=report_id, timestamp=timestamp, metrics=metrics, issues=[],
+                           anomalies=[], alert_level='normal', processing_time=1.0, data_sources=['sales'])
+
+
+def _write_legacy(path, timestamps):
+    entries = [{'timestamp': ts, 'overall_score': 0.9, 'quality_grade': 'B+', 'issue_count': 2,
+                'critical_issues': 0} for ts in timestamps]
+    path.write_text(json.dumps(entries), encoding='utf-8')
+
+
+@pytest.fixture
+def store(tmp_path):
+    return QualityHistoryStore(str(tmp_path / 'history.db'))
+
+
+def test_legacy_json_is_imported_only_once(store, tmp_path):
+    legacy = tmp_path / 'quality_history.json'
+    _write_legacy(legacy, ['2025-07-01T10:00:00'])
+    assert store.import_legacy_json(str(legacy)) == 1
+    assert store.legacy_imported()
+
+    # 之后写出的文件包含新的记录，不应再被当作旧版历史导入
+    _write_legacy(legacy, ['2025-07-01T10:00:00', '2025-07-02T10:00:00'])
+    assert store.import_legacy_json(str(legacy)) == 0
+    assert store.count() == 1
+
+
+def test_missing_legacy_file_still_sets_marker(store, tmp_path):
+    legacy = tmp_path / 'quality_history.json'
+    assert store.import_legacy_json(str(legacy)) == 0
+    _write_legacy(legacy, ['2025-07-01T10:00:00'])
+    assert store.import_legacy_json(str(legacy)) == 0
+    assert store.count() == 0
+
+
+def test_recent_runs_are_in_time_order(store):
+    for day, score in [(3, 0.7), (1, 0.9), (2, 0.8)]:
+        store.record(_report(f"R{day}", f"2025-07-0{day}T10:00:00", score))
+
+    runs = store.recent_runs(2)
+    assert [run['report_id'] for run in runs] == ['R2', 'R3']
+    assert store.recent_scores(3) == [0.9, 0.8, 0.7]
+
+
+def test_monitor_keeps_writing_history_json(tmp_path, monkeypatch):
+    from enhanced_data_quality_monitor import EnhancedDataQualityMonitor
+
+    monkeypatch.chdir(tmp_path)
+    monitor = EnhancedDataQualityMonitor(stats_db_path=None, model_cache_dir=None,
+                                         history_db_path=str(tmp_path / 'history.db'))
+    monitor._store_quality_history(_report('R1', '2025-07-01T10:00:00', 0.85))
+    monitor._store_quality_history(_report('R2', '2025-07-02T10:00:00', 0.75))
+
+    entries = json.loads((tmp_path / 'quality_history.json').read_text(encoding='utf-8'))
+    assert [entry['overall_score'] for entry in entries] == [0.85, 0.75]
+    assert set(entries[0]) == {'timestamp', 'overall_score', 'quality_grade', 'issue_count', 'critical_issues'}
+
+    # 重新创建监控器时不会把刚写出的文件当作旧版历史导入
+    monitor = EnhancedDataQualityMonitor(stats_db_path=None, model_cache_dir=None,
+                                         history_db_path=str(tmp_path / 'history.db'))
+    assert monitor.history_store.count() == 2
+
+
+def test_nearest_only_returns_records_inside_window(store):
+    store.record(_report('R1', '2025-05-01T10:00:00', 0.6))
+    store.record(_report('R2', '2025-07-01T09:00:00', 0.8))
+    store.record(_report('R3', '2025-07-02T18:00:00', 0.9))
+
+    target = datetime(2025, 7, 1, 12, 0)
+    assert store.nearest(target, timedelta(days=1))['report_id'] == 'R2'
+    assert store.nearest(datetime(2025, 6, 1), timedelta(days=1)) is None
+
+
+def test_historical_comparison_omits_periods_without_nearby_runs(tmp_path, monkeypatch):
+    from enhanced_data_quality_monitor import EnhancedDataQualityMonitor
+
+    monkeypatch.chdir(tmp_path)
+    monitor = EnhancedDataQualityMonitor(stats_db_path=None, model_cache_dir=None,
+                                         history_db_path=str(tmp_path / 'history.db'))
+    now = datetime.now()
+    # 只有几个月前的记录：只能作为上一次记录，不能当作 7 天前或 30 天前
+    monitor.history_store.record(_report('OLD', (now - timedelta(days=120)).isoformat(), 0.5))
+    assert monitor._get_historical_comparison(0.9) == pytest.approx({'last_period': 0.4})
+
+    monitor.history_store.record(_report('WEEK', (now - timedelta(days=7, hours=3)).isoformat(), 0.7))
+    comparison = monitor._get_historical_comparison(0.9)
+    assert comparison == pytest.approx({'last_period': 0.2, 'week_ago': 0.2})
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""RuleSet：产品过滤规则与旧版逐条循环的结果一致"""
+
+import pandas as pd
+import pytest
+
+from quality_rules import RuleSet
+
+
+def _legacy_product_filter(df, exclude_patterns, include_patterns):
+    """旧版 _check_business_logic_accuracy 的循环实现：(各模式违规数, 通过率)"""
+    violations = {}
+    total = 0
+    if '物料名称' in df.columns:
+        for pattern in exclude_patterns:
+            excluded = df[df['物料名称'].str.contains(pattern, na=False)]
+            exceptions = excluded[excluded['物料名称'].str.contains('|'.join(include_patterns), na=False)]
+            if len(excluded) - len(exceptions) > 0:
+                violations[pattern] = len(excluded) - len(exceptions)
+        total += len(df)
+    score = max(0, (total - sum(violations.values())) / total) if total > 0 else 1.0
+    return violations, score
+
+
+def _rule_product_filter(df, exclude_patterns, include_patterns):
+    rule_set = RuleSet.from_business_rules({'product_filters': {'exclude_patterns': exclude_patterns,
+                                                                'include_patterns': include_patterns}})
+    results = rule_set.evaluate(df, 'sales')
+    violations = {r.key: r.violations for r in results if r.violations > 0}
+    return violations, RuleSet.pass_rate(results, 'pattern_exclude')
+
+
+NAMES = pd.Series(['鲜肉', '鲜凤肠', '冻鸡', '鲜冻混合', '烤肠', None, 123, '冻品1', 1.5], dtype=object)
+
+
+@pytest.mark.parametrize('exclude_patterns, include_patterns', [
+    (['鲜'], ['凤肠', '烤肠', '火腿肠']),
+    (['鲜', '冻'], ['凤肠']),
+    (['鲜', '冻', '1'], ['混合']),
+    (['鲜'], []),
+])
+def test_product_filter_matches_legacy_loop(exclude_patterns, include_patterns):
+    df = pd.DataFrame({'物料名称': NAMES, '主数量': range(len(NAMES))})
+    assert _rule_product_filter(df, exclude_patterns, include_patterns) == \
+        pytest.approx(_legacy_product_filter(df, exclude_patterns, include_patterns))
+
+
+def test_non_string_values_do_not_match_patterns():
+    df = pd.DataFrame({'物料名称': pd.Series([1, 12, '1号'], dtype=object)})
+    rule_set = RuleSet.from_dict({'rules': [{'type': 'pattern_exclude', 'column': '物料名称', 'pattern': '1'}]})
+    assert rule_set.evaluate(df, 'sales')[0].violations == 1
+
+
+def test_multiple_patterns_count_column_once():
+    df = pd.DataFrame({'物料名称': ['鲜肉', '冻鸡', '烤肠', '火腿']})
+    rule_set = RuleSet.from_dict({'rules': [
+        {'type': 'pattern_exclude', 'column': '物料名称', 'pattern': '鲜'},
+        {'type': 'pattern_exclude', 'column': '物料名称', 'pattern': '冻'},
+    ]})
+    assert RuleSet.pass_rate(rule_set.evaluate(df, 'sales'), 'pattern_exclude') == pytest.approx(0.5)
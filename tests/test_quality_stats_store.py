@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""QualityStatsStore：Welford 合并、日期水位切分、快照基线替换"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from quality_stats_store import QualityStatsStore, RunningStats
+
+
+@pytest.fixture
+def store(tmp_path):
+    return QualityStatsStore(str(tmp_path / 'stats.db'))
+
+
+def _sales(rows):
+    return pd.DataFrame(rows, columns=['发票日期', '物料名称', '主数量'])
+
+
+def test_running_stats_merge_matches_full_data():
+    rng = np.random.default_rng(0)
+    batches = [rng.normal(10, 3, size) for size in (1, 7, 250, 40)]
+    stats = RunningStats()
+    for batch in batches:
+        stats.update(batch, null_count=2)
+
+    full = np.concatenate(batches)
+    assert stats.count == len(full)
+    assert stats.null_count == 8
+    assert stats.mean == pytest.approx(full.mean())
+    assert stats.variance == pytest.approx(full.var(ddof=1))
+
+
+def test_running_stats_empty_batch_only_counts_nulls():
+    stats = RunningStats()
+    stats.update(np.array([1.0, 3.0]))
+    stats.update(np.array([]), null_count=3)
+    assert (stats.count, stats.mean, stats.null_count) == (2, 2.0, 3)
+
+
+def test_late_rows_on_watermark_date_are_checked_once(store):
+    first = _sales([('2025-07-01', 'A', 1), ('2025-07-02', 'B', 2)])
+    delta, watermark, has_baseline = store.split_new_rows(first, 'sales', '发票日期')
+    assert len(delta) == 2 and not has_baseline
+    store.save('sales', {}, watermark)
+
+    # 第二次导出：水位当天迟到一行、日期无法解析一行、更晚日期一行，外加已检查过的两行
+    second = _sales([('2025-07-01', 'A', 1), ('2025-07-02', 'B', 2), ('2025-07-02', 'C', 3),
+                     ('not a date', 'D', 4), ('2025-07-03', 'E', 5)])
+    delta, watermark, has_baseline = store.split_new_rows(second, 'sales', '发票日期')
+    assert has_baseline
+    assert sorted(delta['物料名称']) == ['C', 'D', 'E']
+    assert watermark.rows_seen == 5
+    store.save('sales', {}, watermark)
+
+    # 内容不变时没有新数据（日期无法解析的行也不会重复检查）
+    delta, _, _ = store.split_new_rows(second, 'sales', '发票日期')
+    assert delta.empty
+
+
+def test_identical_rows_are_distinct_by_occurrence(store):
+    first = _sales([('2025-07-02', 'A', 1)])
+    _, watermark, _ = store.split_new_rows(first, 'sales', '发票日期')
+    store.save('sales', {}, watermark)
+
+    second = _sales([('2025-07-02', 'A', 1), ('2025-07-02', 'A', 1)])
+    delta, _, _ = store.split_new_rows(second, 'sales', '发票日期')
+    assert len(delta) == 1
+
+
+def test_snapshot_source_replaces_baseline(store):
+    snapshot = pd.DataFrame({'物料名称': ['A', 'B'], '入库': [1.0, 2.0]})
+    delta, watermark, _ = store.split_new_rows(snapshot, 'inventory')
+    assert watermark.is_snapshot and len(delta) == 2
+    store.save('inventory', {'入库': RunningStats(2, 1.5, 0.5, 0), '旧列': RunningStats(5, 1.0, 0.0, 0)}, watermark)
+
+    delta, watermark, _ = store.split_new_rows(snapshot, 'inventory')
+    assert delta.empty and watermark.rows_seen == 2
+
+    changed = pd.DataFrame({'物料名称': ['A', 'B', 'C'], '入库': [1.0, 2.0, 6.0]})
+    delta, watermark, _ = store.split_new_rows(changed, 'inventory')
+    assert len(delta) == 3 and watermark.rows_seen == 3
+    store.save('inventory', {'入库': RunningStats(3, 3.0, 14.0, 0)}, watermark)
+    assert set(store.load_column_stats('inventory')) == {'入库'}
+
+
+def test_monitor_does_not_double_count_snapshot_rows(tmp_path):
+    from enhanced_data_quality_monitor import EnhancedDataQualityMonitor
+
+    monitor = EnhancedDataQualityMonitor(stats_db_path=str(tmp_path / 'stats.db'),
+                                         model_cache_dir=None, history_db_path=None)
+    first = pd.DataFrame({'物料名称': list('ABCD'), '入库': [1.0, 2.0, 3.0, 4.0]})
+    second = first.assign(入库=[1.0, 2.0, 3.0, 5.0])
+    monitor._detect_statistical_anomalies(first, 'inventory')
+    monitor._detect_statistical_anomalies(second, 'inventory')
+
+    stats = monitor.stats_store.load_column_stats('inventory')['入库']
+    assert stats.count == 4
+    assert stats.mean == pytest.approx(second['入库'].mean())
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""KLLSketch：秩误差界、分块更新、合并；QuantileSketchStore：同一数据只并入一次，累计导出的旧行不重复并入"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantile_sketch import KLLSketch, QuantileSketchStore
+
+QS = np.linspace(0.01, 0.99, 99)
+MAX_RANK_ERROR = 0.03
+
+
+def _rank_error(sketch, values):
+    ordered = np.sort(values)
+    ranks = np.searchsorted(ordered, sketch.quantile(QS)) / len(ordered)
+    return float(np.abs(ranks - QS).max())
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_rank_error_within_bound(seed):
+    values = np.random.default_rng(seed).lognormal(0, 1, 200_000)
+    sketch = KLLSketch(k=200, seed=seed)
+    sketch.update(values)
+
+    assert sketch.n == len(values)
+    assert _rank_error(sketch, values) < MAX_RANK_ERROR
+    assert sum(len(level) for level in sketch.levels) < 10 * sketch.k
+    assert sketch.quantile(0.0) == values.min()
+    assert sketch.quantile(1.0) == values.max()
+
+
+def test_update_only_sorts_bounded_chunks(monkeypatch):
+    sketch = KLLSketch(k=100, seed=0)
+    sizes = []
+    original_sort = np.sort
+
+    def tracking_sort(a, *args, **kwargs):
+        sizes.append(len(a))
+        return original_sort(a, *args, **kwargs)
+
+    monkeypatch.setattr(np, 'sort', tracking_sort)
+    sketch.update(np.random.default_rng(0).normal(size=50_000))
+
+    assert sizes
+    assert max(sizes) <= sketch.chunk_size + sketch.k
+
+
+def test_merged_sketches_cover_both_batches():
+    rng = np.random.default_rng(4)
+    first, second = rng.normal(0, 1, 80_000), rng.normal(5, 2, 120_000)
+    sketch = KLLSketch(k=200, seed=0)
+    sketch.update(first)
+    other = KLLSketch(k=200, seed=1)
+    other.update(second)
+    sketch.merge(other)
+
+    assert sketch.n == len(first) + len(second)
+    assert _rank_error(sketch, np.concatenate([first, second])) < MAX_RANK_ERROR
+
+
+def test_nan_values_are_ignored():
+    sketch = KLLSketch(k=50)
+    sketch.update(np.array([np.nan, 1.0, 2.0, np.nan, 3.0]))
+    assert sketch.n == 3
+    assert sketch.quantile(0.5) == 2.0
+
+
+def test_store_ingests_same_frame_once(tmp_path):
+    store = QuantileSketchStore(str(tmp_path / 'stats.db'), k=50)
+    df = pd.DataFrame({'主数量': np.arange(1000, dtype=float)})
+    store.merge_frame(df, 'sales')
+    sketches = store.merge_frame(df, 'sales')
+    assert sketches['主数量'].n == 1000
+
+    round_trip = store.load('sales')['主数量']
+    assert round_trip.quantile(0.5) == pytest.approx(sketches['主数量'].quantile(0.5))
+
+
+def _daily_export(start, end, rows_per_day=500):
+    dates = pd.date_range(start, end, freq='D').repeat(rows_per_day)
+    # 同一天的数值固定，累计导出中的旧行与上一次导出完全相同
+    values = np.random.default_rng(0).lognormal(0, 1, len(pd.date_range('2025-07-01', end)) * rows_per_day)
+    offset = (pd.Timestamp(start) - pd.Timestamp('2025-07-01')).days * rows_per_day
+    return pd.DataFrame({'发票日期': dates, '主数量': values[offset:offset + len(dates)]})
+
+
+def test_cumulative_export_rows_are_merged_once(tmp_path):
+    first, cumulative = _daily_export('2025-07-01', '2025-07-10'), _daily_export('2025-07-01', '2025-07-20')
+    store = QuantileSketchStore(str(tmp_path / 'stats.db'), k=200)
+    store.merge_frame(first, 'sales', ['主数量'], first['发票日期'])
+    store.merge_frame(cumulative, 'sales', ['主数量'], cumulative['发票日期'])
+    sketches = store.merge_frame(cumulative, 'sales', ['主数量'], cumulative['发票日期'])
+
+    single = QuantileSketchStore(str(tmp_path / 'single.db'), k=200)
+    expected = single.merge_frame(cumulative, 'sales', ['主数量'], cumulative['发票日期'])
+
+    assert sketches['主数量'].n == expected['主数量'].n == len(cumulative)
+    # 分位数与一次性并入相同（均在秩误差界内）
+    values = cumulative['主数量'].to_numpy()
+    assert _rank_error(sketches['主数量'], values) < MAX_RANK_ERROR
+    assert _rank_error(expected['主数量'], values) < MAX_RANK_ERROR
+    assert store.last_date_range('sales') == (pd.Timestamp('2025-07-01'), pd.Timestamp('2025-07-20'))
+
+
+def test_monitor_does_not_persist_sketches_by_default(tmp_path, monkeypatch):
+    from data_quality_monitor import DataQualityMonitor
+
+    monkeypatch.setenv('QUALITY_STATE_DIR', str(tmp_path))
+    monitor = DataQualityMonitor(fingerprint_dir=None)
+    assert monitor.sketch_store is None
+    monitor._check_accuracy(pd.DataFrame({'主数量': [1.0, 2.0, 3.0]}), 'sales')
+    assert not (tmp_path / 'quality_stats.db').exists()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""报告文件写入：原子替换、预压缩副本、内容未变时不重写"""
+
+import gzip
+import os
+
+import pytest
+
+from report_writer import COMPRESS_MIN_BYTES, atomic_write, write_if_changed
+
+
+def _files(directory):
+    return sorted(os.listdir(directory))
+
+
+def _chunks(fail_after=None):
+    for i in range(5):
+        if fail_after is not None and i == fail_after:
+            raise RuntimeError('生成内容出错')
+        yield f"<p>{i}</p>" * 100
+
+
+def test_atomic_write_streams_chunks_and_compresses(tmp_path):
+    path = str(tmp_path / 'page.html')
+    atomic_write(path, _chunks(), compress=('gz',))
+
+    expected = "".join(_chunks()).encode('utf-8')
+    assert len(expected) >= COMPRESS_MIN_BYTES
+    with open(path, 'rb') as f:
+        assert f.read() == expected
+    with gzip.open(path + '.gz', 'rb') as f:
+        assert f.read() == expected
+    assert _files(tmp_path) == ['page.html', 'page.html.gz']
+
+
+def test_failed_body_keeps_previous_file_and_leaves_no_temp(tmp_path):
+    path = str(tmp_path / 'page.html')
+    atomic_write(path, 'old', compress=())
+
+    with pytest.raises(RuntimeError):
+        atomic_write(path, _chunks(fail_after=3), compress=('gz',))
+
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == 'old'
+    assert _files(tmp_path) == ['page.html']
+
+
+def test_small_files_drop_stale_compressed_copies(tmp_path):
+    path = str(tmp_path / 'page.html')
+    atomic_write(path, 'x' * COMPRESS_MIN_BYTES, compress=('gz',))
+    atomic_write(path, 'small', compress=('gz',))
+    assert _files(tmp_path) == ['page.html']
+
+
+def test_write_if_changed_skips_identical_content(tmp_path):
+    path = str(tmp_path / 'data.json')
+    assert write_if_changed(path, '{"a": 1}', compress=()) is True
+    mtime = os.stat(path).st_mtime_ns
+    os.utime(path, ns=(mtime - 10**9, mtime - 10**9))
+
+    assert write_if_changed(path, '{"a": 1}', compress=()) is False
+    assert os.stat(path).st_mtime_ns == mtime - 10**9
+
+    assert write_if_changed(path, '{"a": 2}', compress=()) is True
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == '{"a": 2}'
+
+
+def test_write_if_changed_restores_missing_compressed_copy(tmp_path):
+    path = str(tmp_path / 'data.json')
+    content = 'y' * COMPRESS_MIN_BYTES
+    write_if_changed(path, content, compress=('gz',))
+    os.remove(path + '.gz')
+
+    assert write_if_changed(path, content, compress=('gz',)) is True
+    assert os.path.exists(path + '.gz')
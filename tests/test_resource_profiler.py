@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""阶段资源分析：行数上报、嵌套阶段、分配统计"""
+
+import pandas as pd
+
+from resource_profiler import StageProfiler, profile_stage, record_rows
+
+
+def test_context_manager_counts_reported_rows():
+    with profile_stage('load', interval=0.01) as profiler:
+        record_rows(100)
+        record_rows(50)
+
+    result = profiler.result
+    assert result.name == 'load' and result.records_processed == 150
+    assert result.memory_peak >= max(result.memory_before, result.memory_after) > 0
+    assert result.sample_count >= 2
+    # 阶段之外上报的行数被忽略
+    record_rows(10)
+    assert profiler.result.records_processed == 150
+
+
+def test_decorator_uses_dataframe_rows_unless_reported():
+    history = []
+
+    @StageProfiler('frame', interval=0.01, history=history)
+    def load(n):
+        return pd.DataFrame({'a': range(n)})
+
+    @StageProfiler('reported', interval=0.01, history=history)
+    def parse():
+        record_rows(7)
+        return pd.DataFrame({'a': range(3)})
+
+    load(25)
+    parse()
+    assert load.last_profile.records_processed == 25
+    assert parse.last_profile.records_processed == 7
+    assert [profile.name for profile in history] == ['frame', 'reported']
+
+
+def test_nested_stages_report_to_innermost():
+    with profile_stage('outer', interval=0.01) as outer:
+        with profile_stage('inner', interval=0.01) as inner:
+            record_rows(5)
+        record_rows(2)
+
+    assert inner.result.records_processed == 5
+    assert outer.result.records_processed == 2
+
+
+def test_traced_allocations():
+    with profile_stage('alloc', interval=0.01, trace_allocations=True, top_n=3) as profiler:
+        data = [bytearray(1024) for _ in range(2000)]
+
+    assert len(data) == 2000
+    assert profiler.result.traced_peak_mb >= 1.5
+    assert 0 < len(profiler.result.top_allocations) <= 3
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""响应式图片：源图哈希未变时跳过生成，源图变化或变体缺失时重新生成"""
+
+import os
+
+import pytest
+from PIL import Image
+
+import responsive_images
+from responsive_images import load_responsive_image, process_images, variant_output_files
+
+
+def _chart(path, color='white'):
+    img = Image.new('RGB', (1200, 600), color)
+    for x in range(0, 1200, 7):
+        img.putpixel((x, 300), (x % 256, 0, 0))
+    img.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """记录实际缩放编码的宽度"""
+    widths = []
+    render_width = responsive_images._render_width
+
+    def record(img, variants):
+        widths.append(variants[0][0].width)
+        return render_width(img, variants)
+
+    monkeypatch.setattr(responsive_images, '_render_width', record)
+    return widths
+
+
+def test_unchanged_source_is_skipped(tmp_path, rendered):
+    output_dir = str(tmp_path)
+    chart = _chart(tmp_path / 'chart.png')
+
+    image = process_images([chart], output_dir, widths=(480, 960, 1600))[chart]
+    assert sorted(rendered) == [480, 960, 1200]
+    files = variant_output_files(output_dir, [image])
+    assert all(os.path.isfile(path) for path in files)
+    assert {variant.format for variant in image.variants} == {'png', 'webp'}
+    assert load_responsive_image(output_dir, 'chart.png') == image
+
+    rendered.clear()
+    assert process_images([chart], output_dir, widths=(480, 960, 1600))[chart] == image
+    assert rendered == []
+
+
+def test_changed_source_or_missing_variant_rerenders(tmp_path, rendered):
+    output_dir = str(tmp_path)
+    chart = _chart(tmp_path / 'chart.png')
+    image = process_images([chart], output_dir, widths=(480, 960))[chart]
+
+    rendered.clear()
+    os.remove(os.path.join(output_dir, image.variants[0].src))
+    process_images([chart], output_dir, widths=(480, 960))
+    assert rendered
+
+    rendered.clear()
+    _chart(tmp_path / 'chart.png', color='black')
+    changed = process_images([chart], output_dir, widths=(480, 960))[chart]
+    assert rendered and changed.source_hash != image.source_hash
+
+
+def test_dropped_widths_are_removed(tmp_path, rendered):
+    output_dir = str(tmp_path)
+    chart = _chart(tmp_path / 'chart.png')
+    old_files = variant_output_files(output_dir, process_images([chart], output_dir, widths=(480, 960)).values())
+
+    new_files = variant_output_files(output_dir, process_images([chart], output_dir, widths=(960,)).values())
+    dropped = set(old_files) - set(new_files)
+    assert dropped
+    for path in dropped:
+        assert not os.path.exists(path)
+    assert all(os.path.isfile(path) for path in new_files)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""行指纹：文件内重复标记、有序索引、累计导出的跨文件重复检测、不受内存优化影响"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset_registry import DatasetRegistry
+from row_fingerprint_index import FingerprintIndex, compute_row_fingerprints, find_duplicate_mask
+
+
+def _sales(start, end):
+    dates = pd.date_range(start, end, freq='D')
+    return pd.DataFrame({
+        '发票号': [f"INV{d:%Y%m%d}" for d in dates],
+        '发票日期': dates,
+        '客户名称': '客户A',
+        '物料名称': '凤肠',
+        '主数量': np.arange(len(dates), dtype=float) + 1,
+        '本币无税金额': np.arange(len(dates), dtype=float) * 10
+    })
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    from data_quality_monitor import DataQualityMonitor
+
+    return DataQualityMonitor(fingerprint_dir=str(tmp_path / 'index'), sketch_db_path=None)
+
+
+def _cross_file_issues(monitor, df):
+    issues, _ = monitor._check_consistency(df, 'sales')
+    return [issue for issue in issues if issue.issue_type == 'cross_file_duplicate']
+
+
+def test_duplicate_mask_matches_pandas_duplicated():
+    df = pd.DataFrame({'a': [1, 2, 1, 3, 2, 1], 'b': list('xyxzyx')})
+    mask = find_duplicate_mask(compute_row_fingerprints(df))
+    assert mask.tolist() == df.duplicated(keep='first').tolist()
+
+
+def test_index_contains_merged_fingerprints(tmp_path):
+    index = FingerprintIndex(str(tmp_path / 'index'))
+    fingerprints = compute_row_fingerprints(_sales('2025-07-01', '2025-07-10'))
+    index.merge('sales', fingerprints[:5], 'file-1')
+
+    assert index.contains('sales', fingerprints).tolist() == [True] * 5 + [False] * 5
+    assert index.is_ingested('sales', 'file-1')
+    assert index.last_date_range('sales') is None
+
+
+def test_legacy_ledger_of_file_ids_still_loads(tmp_path):
+    index = FingerprintIndex(str(tmp_path / 'index'))
+    index.merge('sales', np.array([1, 2], dtype=np.uint64), 'file-1')
+    with open(index._ledger_path('sales'), 'w', encoding='utf-8') as f:
+        json.dump(['file-1'], f)
+
+    assert index.is_ingested('sales', 'file-1')
+    assert index.last_date_range('sales') is None
+
+
+def test_cumulative_export_is_not_a_cross_file_duplicate(monitor):
+    assert _cross_file_issues(monitor, _sales('2025-07-01', '2025-07-10')) == []
+    # 下一次导出包含此前的全部行和新的日期
+    assert _cross_file_issues(monitor, _sales('2025-07-01', '2025-07-20')) == []
+    assert monitor.fingerprint_index.last_date_range('sales') == (pd.Timestamp('2025-07-01'),
+                                                                   pd.Timestamp('2025-07-20'))
+
+
+def test_rows_outside_previous_range_are_still_compared(monitor):
+    monitor._check_consistency(_sales('2025-07-01', '2025-07-10'), 'sales')
+    monitor._check_consistency(_sales('2025-07-11', '2025-07-20'), 'sales')
+
+    # 重新导出上上个文件的数据，落在上一个文件的日期范围之外
+    issues = _cross_file_issues(monitor, pd.concat([_sales('2025-07-01', '2025-07-05'),
+                                                    _sales('2025-07-21', '2025-07-25')]))
+    assert len(issues) == 1
+    assert issues[0].affected_records == 5
+
+
+def test_registry_frame_fingerprints_match_direct_read(tmp_path):
+    rows = 120
+    pd.DataFrame({
+        '发票号': [f"INV{i:04d}" for i in range(rows)],
+        '发票日期': [f"2025-07-{i % 28 + 1:02d}" for i in range(rows)],
+        '客户名称': ['客户A', '客户B', '客户C'] * (rows // 3),
+        '主数量': np.arange(rows) - 60,
+        '本币无税金额': np.linspace(-100, 100, rows)
+    }).to_excel(tmp_path / '销售发票执行查询.xlsx', index=False)
+
+    registry = DatasetRegistry(str(tmp_path), {'sales': '销售发票执行查询.xlsx'})
+    optimized = registry.get('sales')
+    direct = pd.read_excel(tmp_path / '销售发票执行查询.xlsx')
+    # 确认注册中心确实改变了类型
+    assert str(optimized['发票日期'].dtype) != str(direct['发票日期'].dtype)
+    assert isinstance(optimized['客户名称'].dtype, pd.CategoricalDtype)
+    assert optimized['主数量'].dtype != direct['主数量'].dtype
+
+    assert np.array_equal(compute_row_fingerprints(optimized), compute_row_fingerprints(direct))
+    assert np.array_equal(compute_row_fingerprints(optimized, ['发票号', '发票日期']),
+                          compute_row_fingerprints(direct, ['发票号', '发票日期']))
+
+
+def test_performance_benchmark_leaves_fingerprint_index_unchanged(tmp_path, monkeypatch):
+    from performance_optimizer import PerformanceOptimizer
+    from synthetic_data_generator import SyntheticDataConfig, SyntheticDataGenerator
+
+    monkeypatch.setenv('QUALITY_STATE_DIR', str(tmp_path))
+    index = FingerprintIndex('fingerprint_index')
+    index.merge('sales', compute_row_fingerprints(_sales('2025-07-01', '2025-07-10')), 'nightly-file')
+    before = {path.name: path.read_bytes() for path in (tmp_path / 'fingerprint_index').iterdir()}
+
+    generator = SyntheticDataGenerator(SyntheticDataConfig(sales_rows=2000, production_rows=500, n_products=40))
+    registry = DatasetRegistry(str(tmp_path / 'excel'))
+    for name, df in [('sales', generator.generate_sales()), ('production', generator.generate_production())]:
+        registry.register(name, df, step='synthetic')
+
+    metrics = PerformanceOptimizer(str(tmp_path / 'excel'), registry=registry)._test_quality_check_performance()
+    assert [m.operation_name for m in metrics] == ['quality_check']
+    assert {path.name: path.read_bytes() for path in (tmp_path / 'fingerprint_index').iterdir()} == before
+    assert not (tmp_path / 'quality_stats.db').exists()
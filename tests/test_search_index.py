@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""客户端搜索索引：n-gram 倒排表和生成阈值"""
+
+import json
+import re
+
+from html_utils import SEARCH_INDEX_MIN_ROWS, build_search_index, generate_search_index_tag
+
+
+def _decode(deltas):
+    rows, row_id = [], 0
+    for i, delta in enumerate(deltas):
+        row_id = delta if i == 0 else row_id + delta
+        rows.append(row_id)
+    return rows
+
+
+def test_postings_list_matching_rows():
+    rows = [['凤肠', '100'], ['鸡胸', '200'], ['凤肠', 'ab']] + [[f'x{i}', ''] for i in range(97)]
+    index = build_search_index(rows)
+
+    assert index['n'] == 2 and index['rows'] == 100
+    assert _decode(index['grams']['凤肠']) == [0, 2]
+    assert _decode(index['grams']['鸡胸']) == [1]
+    # 查询按大写匹配
+    assert _decode(index['grams']['AB']) == [2]
+    # 不跨单元格组合 n-gram
+    assert '肠1' not in index['grams']
+
+
+def test_common_grams_are_not_indexed():
+    rows = [[f'2025-07-{i % 28 + 1:02d}', f'item{i}'] for i in range(400)]
+    index = build_search_index(rows)
+
+    assert '20' in index['common'] and '20' not in index['grams']
+    for deltas in index['grams'].values():
+        assert len(deltas) <= int(400 * 0.05)
+
+
+def test_tag_only_for_large_tables():
+    small = [[f'row{i}'] for i in range(SEARCH_INDEX_MIN_ROWS - 1)]
+    assert generate_search_index_tag('t', small) == ''
+
+    large = small + [['</script>']]
+    tag = generate_search_index_tag('t', large)
+    assert tag.startswith('<script type="application/json" id="t-search-index">')
+    body = re.match(r'<script[^>]*>(.*)</script>$', tag).group(1)
+    assert '</script>' not in body
+    assert json.loads(body)['rows'] == SEARCH_INDEX_MIN_ROWS
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""EnhancedDataQualityMonitor._run_source_checks：结果顺序、执行模式、多进程任务不序列化监控器"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from enhanced_data_quality_monitor import EnhancedDataQualityMonitor
+
+
+class _PickleCounter:
+    """被序列化时计数（用于确认任务中不携带监控器）"""
+    count = 0
+
+    def __reduce__(self):
+        type(self).count += 1
+        return (_PickleCounter, ())
+
+
+def _monitor(**kwargs):
+    return EnhancedDataQualityMonitor(stats_db_path=None, model_cache_dir=None, history_db_path=None, **kwargs)
+
+
+def _datasets():
+    rng = np.random.default_rng(3)
+    datasets = {}
+    for name, rows in [('sales', 300), ('production', 200)]:
+        df = pd.DataFrame({'物料名称': ['凤肠'] * rows,
+                           '主数量': rng.normal(100, 5, rows),
+                           '单价': rng.normal(10, 1, rows)})
+        df.loc[5, '主数量'] = 1000.0
+        datasets[name] = df
+    return datasets
+
+
+def _summary(anomalies):
+    return [(a.detection_method, a.anomaly_type, a.affected_records,
+             a.statistical_info.get('total_records')) for a in anomalies]
+
+
+def test_ml_results_follow_all_statistical_results_in_source_order():
+    _, anomalies, dimension_scores, _ = _monitor()._run_source_checks(_datasets())
+
+    methods = [a.detection_method for a in anomalies]
+    assert 'isolation_forest' in methods
+    first_ml = methods.index('isolation_forest')
+    assert all(method == 'isolation_forest' for method in methods[first_ml:])
+    assert [a.statistical_info['total_records'] for a in anomalies[first_ml:]] == [300, 200]
+    assert list(dimension_scores) == ['sales', 'production']
+
+
+def test_process_mode_matches_sequential_without_pickling_monitor_per_task():
+    datasets = _datasets()
+    _, sequential, _, _ = _monitor()._run_source_checks(datasets)
+
+    monitor = _monitor(execution_mode='process', max_workers=2)
+    monitor.pickle_probe = _PickleCounter()
+    _PickleCounter.count = 0
+    _, parallel, _, _ = monitor._run_source_checks(datasets)
+
+    assert _summary(parallel) == _summary(sequential)
+    # 监控器状态只在工作进程启动时传递，任务只携带方法名和数据
+    assert _PickleCounter.count <= 2
+
+
+def test_unknown_execution_mode_is_rejected():
+    with pytest.raises(ValueError):
+        _monitor(execution_mode='threads')
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""阶段追踪：线程池中的阶段挂在提交方阶段之下、Chrome trace 导出、性能分析文件输出"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import stage_tracer
+from stage_tracer import enable_tracing, print_profile_summary, submit_in_context, trace_span
+
+
+@pytest.fixture
+def tracer():
+    tracer = enable_tracing(track_memory=False)
+    yield tracer
+    stage_tracer.disable_tracing()
+    tracer.reset()
+
+
+def _records(tracer):
+    return {record.name: record for record in tracer.records}
+
+
+def _child(name):
+    with trace_span(name):
+        pass
+
+
+def test_thread_pool_spans_have_submitting_parent(tracer):
+    with trace_span('parent'):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [submit_in_context(executor, _child, f"child{i}") for i in range(3)]
+            for future in futures:
+                future.result()
+
+    records = _records(tracer)
+    for i in range(3):
+        assert records[f"child{i}"].parent_id == records['parent'].span_id
+        assert records[f"child{i}"].path == f"parent/child{i}"
+
+
+def test_plain_submit_loses_parent(tracer):
+    with trace_span('parent'):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(_child, 'orphan').result()
+
+    assert _records(tracer)['orphan'].parent_id is None
+
+
+def test_chrome_trace_export(tracer, tmp_path):
+    with trace_span('load', source='sales') as span:
+        span.set_rows(120)
+        _child('parse')
+    with pytest.raises(ValueError):
+        with trace_span('broken'):
+            raise ValueError('bad data')
+    now = time.time()
+    tracer.add_span('worker_task', now - 0.5, now, pid=4242, rows=7, kind='page')
+
+    path = tracer.export_chrome_trace(str(tmp_path / 'trace' / 'stages.json'))
+    with open(path, encoding='utf-8') as f:
+        trace = json.load(f)
+
+    events = {event['name']: event for event in trace['traceEvents']}
+    assert set(events) == {'load', 'parse', 'broken', 'worker_task'}
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events.values())
+    assert [event['ts'] for event in trace['traceEvents']] == sorted(event['ts'] for event in trace['traceEvents'])
+    assert events['load']['args'] == {'source': 'sales', 'rows': 120}
+    # 子阶段归入根阶段的类别，并包含在父阶段的时间范围内
+    assert events['parse']['cat'] == 'load'
+    assert events['load']['ts'] <= events['parse']['ts']
+    assert events['parse']['ts'] + events['parse']['dur'] <= events['load']['ts'] + events['load']['dur'] + 1
+    assert 'bad data' in events['broken']['args']['error']
+    assert events['worker_task']['pid'] == 4242
+    assert events['worker_task']['args'] == {'kind': 'page', 'rows': 7}
+    assert events['worker_task']['dur'] == pytest.approx(0.5e6, rel=1e-3)
+
+
+def test_export_writes_trace_and_summary(tracer, tmp_path):
+    with trace_span('stage'):
+        _child('step')
+
+    files = tracer.export(str(tmp_path), prefix='run')
+    assert all(os.path.isfile(path) for path in files.values())
+    with open(files['summary'], encoding='utf-8') as f:
+        summary = f.read()
+    assert 'stage' in summary and '  step' in summary
+
+
+def test_print_profile_summary(capsys):
+    assert print_profile_summary() == {}
+    assert capsys.readouterr().out == ''
+
+    files = {'top': 'a_top.txt', 'pstats': 'a.pstats', 'collapsed': 'a.folded'}
+    assert print_profile_summary(files) == files
+    out = capsys.readouterr().out
+    assert all(path in out for path in files.values())
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""任务图执行：失败结果、依赖任务跳过、必需任务失败时终止构建"""
+
+import pytest
+
+from task_graph import TaskGraph, TaskGraphError, TaskRunner
+
+
+def load(value):
+    return value
+
+
+def broken():
+    raise ValueError('数据文件损坏')
+
+
+def combine(a, b):
+    return a + b
+
+
+@pytest.fixture(params=[1, 2], ids=['serial', 'parallel'])
+def jobs(request):
+    return request.param
+
+
+def test_failure_skips_input_dependents_only(jobs):
+    graph = TaskGraph()
+    graph.add('a', load, kwargs={'value': 1})
+    graph.add('bad', broken)
+    graph.add('uses_bad', combine, {'a': 'a', 'b': 'bad'})
+    graph.add('after_bad', load, kwargs={'value': 2}, after=('bad',))
+    graph.add('ok', combine, {'a': 'a', 'b': 'after_bad'})
+
+    results = TaskRunner(graph, jobs=jobs).run()
+
+    assert results['bad'].status == 'failed'
+    assert results['bad'].error == 'ValueError: 数据文件损坏'
+    assert 'broken' in results['bad'].traceback
+    assert results['uses_bad'].status == 'skipped' and 'bad' in results['uses_bad'].error
+    # 只要求先执行的任务失败不阻塞
+    assert results['after_bad'].status == 'done'
+    assert results['ok'].value == 3
+
+
+def test_required_failure_aborts_build(jobs):
+    graph = TaskGraph()
+    graph.add('bad', broken, required=True)
+    graph.add('later', load, kwargs={'value': 1}, after=('bad',))
+    graph.add('page', load, {'value': 'later'})
+
+    runner = TaskRunner(graph, jobs=jobs)
+    results = runner.run()
+
+    assert runner.aborted
+    assert results['bad'].status == 'failed'
+    assert results['later'].status == 'skipped' and results['later'].error == 'build aborted'
+    assert results['page'].status == 'skipped'
+    assert '1 failed, 2 skipped' in runner.format_summary()
+
+
+def test_invalid_graphs_are_rejected():
+    graph = TaskGraph()
+    graph.add('a', load, {'value': 'b'})
+    graph.add('b', load, {'value': 'a'})
+    with pytest.raises(TaskGraphError):
+        graph.topological_order()
+
+    graph = TaskGraph()
+    graph.add('a', load, {'value': 'missing'})
+    with pytest.raises(TaskGraphError):
+        graph.topological_order()
+    with pytest.raises(TaskGraphError):
+        graph.add('a', load)
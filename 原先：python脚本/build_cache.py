@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+增量构建缓存模块，按输入指纹决定哪些图表和页面需要重新生成
+
+任务指纹 = 任务名 + 函数 + 固定参数 + 代码版本 + 源数据文件哈希 + 上游任务指纹。
+指纹只由输入推出、不依赖任务结果，因此在执行任何任务之前就能确定需要重建的输出；
+加载和分析任务只在有过期输出需要它们时才执行。
+清单（manifest）保存在输出目录中，同时缓存源文件哈希（大小和修改时间不变时不重新计算）。
+没有数据、按设计不产生输出的任务（结果为 None，如没有数据的图表）只记录指纹，输入不变时同样视为最新。
+"""
+
+import os
+import glob
+import json
+import hashlib
+from datetime import datetime
+
+MANIFEST_VERSION = 1
+MANIFEST_FILENAME = '.build_manifest.json'
+
+
+def _sha256_file(path, chunk_size=1024 * 1024):
+    """计算文件内容的SHA256哈希"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_fingerprint(paths):
+    """
+    计算代码版本指纹
+
+    参数:
+        paths: 参与构建的源码文件列表（任一文件修改都会使全部输出失效）
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        digest.update(_sha256_file(path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def _output_paths(value):
+    """任务结果中的输出文件路径（str 或 str 列表），无法识别时返回空列表"""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, str) for item in value):
+        return list(value)
+    return []
+
+
+class BuildCache:
+    """基于输入指纹的构建缓存"""
+
+    def __init__(self, output_dir, code_version='', force=False):
+        """
+        参数:
+            output_dir: 输出目录（清单文件保存于此）
+            code_version: 代码版本指纹，见 code_fingerprint()
+            force: 忽略已有清单，全部重建
+        """
+        self.output_dir = output_dir
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.code_version = code_version
+        self.force = force
+        self.tasks = {}
+        self.files = {}
+        self.fingerprints = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable build manifest {self.manifest_path}: {e}")
+            return
+        if manifest.get('version') != MANIFEST_VERSION:
+            return
+        # 文件哈希缓存即使在 force 模式下也可复用
+        self.files = manifest.get('files', {})
+        if not self.force:
+            self.tasks = manifest.get('tasks', {})
+
+    def save(self):
+        """写出清单（先写临时文件再替换，避免中断时留下半个清单）"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'saved_at': datetime.now().isoformat(),
+            'code_version': self.code_version,
+            'tasks': self.tasks,
+            'files': self.files
+        }
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def file_hash(self, path):
+        """源文件哈希；大小和修改时间未变时复用清单中的结果，文件不存在时返回 'missing'"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 'missing'
+        cached = self.files.get(path)
+        if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+            return cached['sha256']
+        sha256 = _sha256_file(path)
+        self.files[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': sha256}
+        return sha256
+
+    def source_hashes(self, sources):
+        """源文件（可为 glob 模式）到哈希的映射"""
+        hashes = {}
+        for source in sources:
+            if glob.has_magic(source):
+                matched = sorted(glob.glob(source))
+                hashes[source] = {path: self.file_hash(path) for path in matched}
+            else:
+                hashes[source] = self.file_hash(source)
+        return hashes
+
+    def fingerprint(self, task, input_fingerprints):
+        """计算单个任务的指纹"""
+        payload = {
+            'task': task.name,
+            'func': f"{task.func.__module__}.{task.func.__qualname__}",
+            'kwargs': {key: repr(value) for key, value in sorted(task.kwargs.items())},
+            'inputs': {param: input_fingerprints[dep] for param, dep in sorted(task.inputs.items())},
+            'sources': self.source_hashes(task.sources),
+            'code': self.code_version
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def is_fresh(self, task):
+        """输出任务的指纹与清单一致且输出文件都还在（上次没有输出的任务只比较指纹）"""
+        entry = self.tasks.get(task.name)
+        if not task.cache or entry is None:
+            return False
+        if entry.get('fingerprint') != self.fingerprints.get(task.name):
+            return False
+        if entry.get('empty'):
+            return True
+        outputs = entry.get('outputs') or []
+        return bool(outputs) and all(os.path.exists(path) for path in outputs)
+
+    def plan(self, graph, order):
+        """
+        确定需要执行的任务
+
+        参数:
+            graph: TaskGraph
+            order: 拓扑顺序
+
+        返回:
+            set: 需要执行的任务名；其余可缓存任务沿用上次的输出
+        """
+        self.fingerprints = {}
+        for name in order:
+            task = graph.tasks[name]
+            self.fingerprints[name] = self.fingerprint(task, self.fingerprints)
+
+        # 过期的输出任务（顺序依赖的图表要重建时页面也重建，页面是否引用图表取决于图表文件是否存在），
+        # 以及不产生缓存输出的末端任务
+        consumed = {dep for task in graph.tasks.values() for dep in task.inputs.values()}
+        stale = set()
+        for name in order:
+            task = graph.tasks[name]
+            if task.cache:
+                if not self.is_fresh(task) or any(dep in stale for dep in task.after):
+                    stale.add(name)
+            elif name not in consumed:
+                stale.add(name)
+
+        # 加上它们（递归）需要结果的上游任务
+        needed = set(stale)
+        for name in reversed(order):
+            if name in needed:
+                needed.update(graph.tasks[name].inputs.values())
+        return needed
+
+    def cached_value(self, name):
+        """可缓存任务上次的结果（输出路径；上次没有输出时为 None）"""
+        entry = self.tasks.get(name, {})
+        if entry.get('empty'):
+            return None
+        outputs = entry.get('outputs') or []
+        return outputs[0] if len(outputs) == 1 else outputs
+
+    def record(self, task, result):
+        """
+        记录任务结果
+
+        结果为 None（没有数据，不产生输出）时只记录指纹；失败、输出无法识别或输出文件未实际写出的任务
+        从清单中移除，下次重建。
+        """
+        if not task.cache:
+            return
+        if result.status == 'done' and result.value is None:
+            self.tasks[task.name] = {
+                'fingerprint': self.fingerprints.get(task.name),
+                'outputs': [],
+                'empty': True,
+                'built_at': datetime.now().isoformat()
+            }
+            return
+        outputs = _output_paths(result.value) if result.status == 'done' else []
+        if outputs and all(os.path.exists(path) for path in outputs):
+            self.tasks[task.name] = {
+                'fingerprint': self.fingerprints.get(task.name),
+                'outputs': outputs,
+                'built_at': datetime.now().isoformat()
+            }
+        else:
+            self.tasks.pop(task.name, None)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+图表缓存模块，按绘图数据和样式参数的哈希跳过未变化图表的渲染
+
+缓存键 = 绘图数据 + 样式参数（调用方传入的 dpi、字体等，以及当前 matplotlib rcParams）+ 绘图代码版本。
+键保存在图表所在目录的 .chart_cache/<图片文件名>.key 中（每张图一个文件，并行进程互不干扰），
+键一致且图片仍在时直接沿用已有图片。
+"""
+
+import os
+import json
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import matplotlib
+
+CACHE_DIRNAME = '.chart_cache'
+# 与渲染结果无关、且在不同进程中取值可能不同的 rcParams
+_IGNORED_RC_KEYS = ('backend', 'backend_fallback', 'interactive', 'savefig.directory')
+
+
+def _update_digest(digest, value):
+    """把绘图数据逐层写入哈希（DataFrame/Series 按内容，dict 按键排序）"""
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr([str(col) for col in value.columns]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(repr(value.name).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        digest.update(str(value.dtype).encode('ascii'))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(b'{')
+        for key in sorted(value, key=repr):
+            digest.update(repr(key).encode('utf-8'))
+            _update_digest(digest, value[key])
+        digest.update(b'}')
+    elif isinstance(value, (list, tuple, np.ndarray)):
+        digest.update(b'[')
+        for item in value:
+            _update_digest(digest, item)
+        digest.update(b']')
+    else:
+        digest.update(repr(value).encode('utf-8'))
+    digest.update(b';')
+
+
+def data_fingerprint(value):
+    """绘图数据的内容哈希"""
+    digest = hashlib.sha256()
+    _update_digest(digest, value)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_version(path):
+    """绘图代码文件的哈希（每个进程只计算一次）"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def rc_fingerprint():
+    """当前 matplotlib 全局样式（含 seaborn 主题设置）的哈希"""
+    items = sorted((key, repr(value)) for key, value in dict.items(matplotlib.rcParams)
+                   if key not in _IGNORED_RC_KEYS)
+    return data_fingerprint([matplotlib.__version__, items])
+
+
+class ChartCache:
+    """按内容哈希缓存已渲染的图表"""
+
+    def __init__(self, enabled=True):
+        """
+        参数:
+            enabled: False 时总是重新渲染（仍会写入缓存键）
+        """
+        self.enabled = enabled
+        self.rendered = 0
+        self.skipped = 0
+
+    @staticmethod
+    def _key_path(chart_path):
+        directory, filename = os.path.split(chart_path)
+        return os.path.join(directory, CACHE_DIRNAME, filename + '.key')
+
+    def key(self, data, style=None, code_path=None):
+        """
+        计算缓存键
+
+        参数:
+            data: 实际绘制的数据
+            style: 影响输出的参数（dpi、尺寸、字体等）
+            code_path: 绘图代码所在文件，修改后缓存失效
+        """
+        return data_fingerprint({
+            'data': data_fingerprint(data),
+            'style': style or {},
+            'rc': rc_fingerprint(),
+            'code': code_version(code_path) if code_path else ''
+        })
+
+    def is_fresh(self, chart_path, key):
+        """图片存在且上次渲染时的键与本次一致"""
+        if not self.enabled or not os.path.exists(chart_path):
+            return False
+        try:
+            with open(self._key_path(chart_path), 'r', encoding='utf-8') as f:
+                fresh = json.load(f).get('key') == key
+        except (OSError, ValueError):
+            return False
+        if fresh:
+            self.skipped += 1
+            print(f"Chart unchanged, skipped rendering: {chart_path}")
+        return fresh
+
+    def store(self, chart_path, key):
+        """记录刚渲染完成的图表的键（先写临时文件再替换）"""
+        self.rendered += 1
+        key_path = self._key_path(chart_path)
+        os.makedirs(os.path.dirname(key_path), exist_ok=True)
+        temp_path = f"{key_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': key}, f)
+        os.replace(temp_path, key_path)
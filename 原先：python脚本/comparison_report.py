@@ -6,7 +6,8 @@
 
 import pandas as pd
 from datetime import datetime # Added for get_date helper
-from html_utils import generate_header, generate_navigation, generate_footer, write_html_report
+from html_utils import (generate_header, generate_navigation, generate_footer, write_html_report,
+                        generate_search_index_tag, PageTemplate)
 
 # --- CSS Styles (Copied from details_report.py for consistency) ---
 CSS_STYLES = """
@@ -200,6 +201,9 @@ CSS_STYLES = """
 </style>
 """
 
+# 页面模板：页面样式直接编入模板，各部分内容逐段写入文件
+PAGE_TEMPLATE = PageTemplate("{{header}}" + CSS_STYLES + "<div class='container'>{{navigation}}{{content}}</div>{{footer}}")
+
 # --- Helper function copied from details_report.py ---
 def get_date(record):
     date_val = record.get('日期')
@@ -212,9 +216,9 @@ def get_date(record):
 
 # --- Function to generate adjustment table (copied & adapted from details_report.py) ---
 def _generate_adjustment_table(conflict_records):
-    """生成调价记录表格 (冲突记录)"""
+    """生成调价记录表格 (冲突记录)，逐行产出 HTML 片段（生成器）"""
     print(f"_generate_adjustment_table - 收到的记录数: {len(conflict_records) if conflict_records else 0}")
-    adjustment_html = '''
+    yield '''
         <div class="data-card">
             <div class="data-card-header">
                 <h3 class="data-card-title">调价记录</h3>
@@ -230,7 +234,7 @@ def _generate_adjustment_table(conflict_records):
             print(f"调价记录排序错误: {e}")
             sorted_records = conflict_records # Fallback if date format is unexpected
 
-        adjustment_html += '''
+        yield '''
                 <p>以下为系统记录的价格调整信息（仅显示价格有变动的记录），按日期降序排列。</p>
                 <p style="text-align: right; font-size: 12px; color: #666; margin-top: 5px;">注：数据来源：调价表。价格差异 = 价格 - 前价格。</p>
                 <div class="detail-search">
@@ -250,6 +254,7 @@ def _generate_adjustment_table(conflict_records):
                         </thead>
                         <tbody>
         '''
+        search_rows = []  # 各行单元格文字，用于预建搜索索引
         for record in sorted_records:
             date_str = record.get('日期', 'N/A')
             name = record.get('品名', 'N/A')
@@ -293,7 +298,7 @@ def _generate_adjustment_table(conflict_records):
                 diff_display = str(diff)  # 显示原始值
             # --- 结束价格差异处理 --- END ---
             
-            adjustment_html += f'''
+            yield f'''
                             <tr>
                                 <td data-label="日期">{date_str}</td>
                                 <td data-label="品名">{name}</td>
@@ -303,17 +308,18 @@ def _generate_adjustment_table(conflict_records):
                                 <td data-label="价格差异" class="text-right {diff_class}">{diff_display}</td>
                             </tr>
             '''
-        adjustment_html += '''
+            search_rows.append([date_str, name, spec, prev_price_display, curr_price_display, diff_display])
+        yield '''
                         </tbody>
                     </table>
+        ''' + generate_search_index_tag('conflictTable', search_rows) + '''
                 </div> <!-- Close table-responsive -->
             </div>
         '''
     else:
-        adjustment_html += "<p>无价格调整记录可显示。</p></div>"
+        yield "<p>无价格调整记录可显示。</p></div>"
 
-    adjustment_html += "</div>" # Close data-card
-    return adjustment_html
+    yield "</div>" # Close data-card
 
 def _generate_comparison_content(price_comparison_data, conflict_records):
     """生成价格对比和调价记录部分的HTML内容"
@@ -322,12 +328,12 @@ def _generate_comparison_content(price_comparison_data, conflict_records):
         price_comparison_data (pd.DataFrame): 价格对比数据。
         conflict_records (list): 调价记录列表。
 
-    Returns:
-        str: 包含两个部分的HTML代码。
+    Yields:
+        str: 两个部分的HTML代码片段（表格逐行产出）。
         """
     print(f"_generate_comparison_content - 收到的冲突记录数: {len(conflict_records) if conflict_records else 0}")
 
-    comparison_section = '''
+    yield '''
     <div class="section">
         <div class="section-header">
              <h2>价格波动分析</h2> <!-- Changed Title -->
@@ -337,14 +343,14 @@ def _generate_comparison_content(price_comparison_data, conflict_records):
 
     # --- Price Comparison Table ---
     if price_comparison_data is None or price_comparison_data.empty:
-        comparison_section += """
+        yield """
              <div class="data-card">
                  <div class="data-card-header"><h3 class="data-card-title">春雪与小明农牧价格对比</h3></div>
                  <div class="data-card-body"><p>无价格对比数据可供显示。</p></div>
              </div>
         """
     else:
-        comparison_section += '''
+        yield '''
              <div class="data-card">
                  <div class="data-card-header">
                      <h3 class="data-card-title">春雪与小明农牧价格对比</h3>
@@ -369,8 +375,9 @@ def _generate_comparison_content(price_comparison_data, conflict_records):
                             <tbody>
     '''
     required_cols = ['品名', '规格', '春雪价格', '小明中间价', '中间价差']
+    search_rows = []  # 各行单元格文字，用于预建搜索索引
     if not all(col in price_comparison_data.columns for col in required_cols):
-        comparison_section += "<tr><td colspan='5'>价格对比数据列不完整。</td></tr>"
+        yield "<tr><td colspan='5'>价格对比数据列不完整。</td></tr>"
     else:
         sorted_data = price_comparison_data
         for _, row in sorted_data.iterrows():
@@ -397,7 +404,7 @@ def _generate_comparison_content(price_comparison_data, conflict_records):
                         price_diff_class = "warning" # Negative difference highlighted
                 except (ValueError, TypeError):
                     price_diff_display = str(price_diff_val)
-            comparison_section += f'''
+            yield f'''
                 <tr>
                     <td data-label="品名">{prod_name}</td>
                     <td data-label="规格">{spec}</td>
@@ -406,22 +413,23 @@ def _generate_comparison_content(price_comparison_data, conflict_records):
                     <td data-label="中间价差" class="text-right {price_diff_class}">{price_diff_display}</td>
                 </tr>
             '''
-    comparison_section += '''
+            search_rows.append([prod_name, spec, spring_price_display, xiaoming_price_display, price_diff_display])
+    yield '''
                             </tbody>
                         </table>
+    ''' + generate_search_index_tag('comparisonTable', search_rows) + '''
                     </div>
                 </div>
             </div>
         '''
 
     # --- Adjustment Table (Moved from details) ---
-    comparison_section += _generate_adjustment_table(conflict_records)
+    yield from _generate_adjustment_table(conflict_records)
 
-    comparison_section += '''
+    yield '''
         </div> <!-- Close section-body -->
     </div> <!-- Close section -->
     '''
-    return comparison_section
 
 def generate_comparison_page(price_comparison_data, conflict_records, output_dir):
     """生成 price_volatility.html 页面 (原 comparison.html)
@@ -430,6 +438,8 @@ def generate_comparison_page(price_comparison_data, conflict_records, output_dir
         price_comparison_data (pd.DataFrame): 价格对比数据。
         conflict_records (list): 调价记录列表。
         output_dir (str): HTML 文件输出目录。
+    Returns:
+        str: 页面路径，写入失败时返回 None。
     """
     print("开始生成 price_volatility.html 页面...")
     print(f"generate_comparison_page - 收到的冲突记录数: {len(conflict_records) if conflict_records else 0}")
@@ -437,17 +447,18 @@ def generate_comparison_page(price_comparison_data, conflict_records, output_dir
     header_html = generate_header(title=page_title, output_dir=output_dir)
     # Changed active_page identifier
     nav_html = generate_navigation(active_page="price_volatility")
-    comparison_content_html = _generate_comparison_content(price_comparison_data, conflict_records)
     footer_html = generate_footer()
 
-    # Add CSS Styles to the beginning of the body or within the head if possible
-    # Assuming header_html contains <head>...</head><body>, inject CSS after </head>
-    # Or better, modify generate_header if possible. For now, inject after header.
-    full_html = header_html + CSS_STYLES + "<div class='container'>" + nav_html + comparison_content_html + "</div>" + footer_html
+    # CSS Styles are compiled into PAGE_TEMPLATE right after the header; content is streamed to the file
+    page = PAGE_TEMPLATE.render(header=header_html, navigation=nav_html,
+                                content=_generate_comparison_content(price_comparison_data, conflict_records),
+                                footer=footer_html)
 
     # Changed output filename
-    write_html_report(full_html, "price_volatility.html", output_dir)
-    print(f"price_volatility.html generated in {output_dir}")
+    report_path = write_html_report(page, "price_volatility.html", output_dir)
+    if report_path:
+        print(f"price_volatility.html generated in {output_dir}")
+    return report_path
 
 # --- Example Usage (Updated for testing) ---
 if __name__ == '__main__':
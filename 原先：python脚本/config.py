@@ -11,6 +11,7 @@ INVENTORY_PATH = r'\\xskynas\userdata\quzhupeng\Desktop\my_python_project\价格
 SALES_PATH = r'\\xskynas\userdata\quzhupeng\Desktop\my_python_project\价格表\销售发票执行查询.xlsx'
 PRODUCTION_PATH = r'\\xskynas\userdata\quzhupeng\Desktop\my_python_project\价格表\产成品入库列表.xlsx'
 INDUSTRY_TREND_PATH = r'\\xskynas\userdata\quzhupeng\Desktop\my_python_project\价格表\小明农牧.xlsx'
+COMPARISON_PATH = r'\\xskynas\userdata\quzhupeng\Desktop\my_python_project\价格表\春雪与小明农牧价格对比.xlsx'
 OUTPUT_DIR = r'输出'  # 使用相对路径，指向当前目录下的输出文件夹
 
 # 添加综合售价数据目录和文件模式
@@ -25,6 +26,10 @@ RAW_CHICKEN_PRICE_PATH = r"\\xskynas\userdata\quzhupeng\Desktop\my_python_projec
 BREAST_PRICE_PATH = r"\\xskynas\userdata\quzhupeng\Desktop\my_python_project\价格表\板冻大胸历史价格.xlsx"
 LEG_PRICE_PATH = r"\\xskynas\userdata\quzhupeng\Desktop\my_python_project\价格表\琵琶腿历史价格.xlsx"
 
+# 报告输出设置
+# HTML/CSS/JS 输出额外生成的预压缩副本（'gz'、'br'，br 需要安装 brotli），供支持静态压缩的 Web 服务器直接发送；空元组表示不生成
+PRECOMPRESS_FORMATS = ()
+
 # 确保输出目录存在
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
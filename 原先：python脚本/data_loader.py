@@ -611,7 +611,7 @@ class DataLoader:
         print("开始加载价格对比数据...")
         
         if comparison_path is None:
-            comparison_path = r'\\xskynas\userdata\quzhupeng\Desktop\my_python_project\价格表\春雪与小明农牧价格对比.xlsx'
+            comparison_path = config.COMPARISON_PATH
         
         try:
             # 读取价格对比表
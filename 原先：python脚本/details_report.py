@@ -2,11 +2,18 @@
 """
 生成详细数据分析报告页面 (details.html)。
 包含每日产销率明细和每日销售明细。
+页面只包含每日汇总卡片，各日明细表格写入 details_data/ 下的分片，展开卡片时按需加载。
 """
 
+import os
+import re
+import json
+import hashlib
 import pandas as pd
 from datetime import datetime
-from html_utils import generate_header, generate_navigation, generate_footer, write_html_report
+from html_utils import (generate_header, generate_navigation, generate_footer, write_html_report,
+                        build_search_index, SEARCH_INDEX_MIN_ROWS, PageTemplate)
+from report_writer import write_if_changed, sibling_paths
 
 # --- CSS Styles (Combined and refined) ---
 CSS_STYLES = """
@@ -216,32 +223,163 @@ CSS_STYLES = """
 </style>
 """
 
+# --- Lazily loaded detail panels ---
+# 面板表格不再内联在页面中：每个日期的明细写成 details_data/<类型>/<日期>.js 分片，
+# 首次展开卡片时通过 <script> 加载（以 file:// 直接打开报告时浏览器禁止 fetch），再由脚本生成面板。
+# 单元格文字和样式类仍由 Python 计算，与原先内联生成的表格一致。
+DETAIL_DATA_DIRNAME = 'details_data'
+
+DETAIL_PANEL_SCRIPT = """
+<script>
+    // 面板配置：标题、搜索框和表格的 id 前缀与原先内联面板保持一致（searchTableInPanel 依赖表格 id）
+    const DETAIL_PANEL_KINDS = {
+        ratio: {title: '产销率明细', panelClass: 'ratio-panel'},
+        sales: {title: '销售明细', panelClass: 'sales-panel'}
+    };
+    const detailShardCallbacks = {};
+
+    // 分片脚本加载完成后调用
+    function detailShardLoaded(kind, dateStr, payload) {
+        const key = kind + '/' + dateStr;
+        const callbacks = detailShardCallbacks[key] || [];
+        detailShardCallbacks[key] = 'loaded';
+        callbacks.forEach(function(callback) { callback(payload); });
+    }
+
+    function loadDetailShard(kind, dateStr, callback) {
+        const key = kind + '/' + dateStr;
+        if (Array.isArray(detailShardCallbacks[key])) {
+            detailShardCallbacks[key].push(callback);
+            return;
+        }
+        detailShardCallbacks[key] = [callback];
+        const script = document.createElement('script');
+        script.src = DETAIL_SHARD_DIR + '/' + DETAIL_SHARD_INDEX[kind][dateStr];
+        script.onerror = function() {
+            delete detailShardCallbacks[key];
+            callback({message: '明细数据加载失败，请确认 ' + DETAIL_SHARD_DIR + ' 目录与本页面放在一起。'});
+        };
+        document.head.appendChild(script);
+    }
+
+    function buildDetailCell(tag, cell, columnIndex, isTotal) {
+        const td = document.createElement(tag);
+        const text = Array.isArray(cell) ? cell[0] : cell;
+        const className = Array.isArray(cell) ? cell[1] : (columnIndex > 0 ? 'text-right' : '');
+        if (className) td.className = className;
+        if (isTotal) {
+            const strong = document.createElement('strong');
+            strong.textContent = text;
+            td.appendChild(strong);
+        } else {
+            td.textContent = text;
+        }
+        return td;
+    }
+
+    function buildDetailPanel(kind, dateStr, payload) {
+        const config = DETAIL_PANEL_KINDS[kind];
+        const panelId = kind + 'Panel_' + dateStr;
+        const tableId = kind + 'Table_' + dateStr;
+        const searchId = kind + 'Search_' + dateStr;
+        const panel = document.createElement('div');
+        panel.id = panelId;
+        panel.className = config.panelClass;
+        panel.style.display = 'none';
+
+        const closeButton = '<button onclick="togglePanel(\\'' + panelId + '\\', event)" class="close-button"><i class="bi bi-x-lg"></i></button>';
+        if (payload.message) {
+            panel.innerHTML = '<div class="' + kind + '-panel-header"><h4></h4>' + closeButton + '</div>'
+                + '<div class="' + kind + '-panel-body"><p></p></div>';
+            panel.querySelector('h4').textContent = config.title + ' - ' + dateStr;
+            panel.querySelector('p').textContent = payload.message;
+            return panel;
+        }
+
+        panel.innerHTML = '<div class="' + kind + '-panel-header"><h4></h4>'
+            + '<div class="' + kind + '-panel-controls">'
+            + '<input type="text" id="' + searchId + '" onkeyup="searchTableInPanel(\\'' + tableId + '\\', \\'' + searchId + '\\')" placeholder="搜索产品..." class="search-input">'
+            + closeButton + '</div></div>'
+            + '<div class="' + kind + '-panel-body"><div class="sales-table-container table-responsive">'
+            + '<table id="' + tableId + '" class="mobile-friendly-table"><thead><tr></tr></thead><tbody></tbody></table>'
+            + '</div></div>';
+        panel.querySelector('h4').textContent = config.title + ' - ' + dateStr;
+        if (payload.search) registerTableSearchIndex(tableId, payload.search);
+        const headRow = panel.querySelector('thead tr');
+        payload.columns.forEach(function(column) {
+            const th = document.createElement('th');
+            th.textContent = column;
+            headRow.appendChild(th);
+        });
+
+        const tbody = panel.querySelector('tbody');
+        const fragment = document.createDocumentFragment();
+        payload.rows.forEach(function(row) {
+            const tr = document.createElement('tr');
+            row.forEach(function(cell, i) { tr.appendChild(buildDetailCell('td', cell, i, false)); });
+            fragment.appendChild(tr);
+        });
+        if (payload.total) {
+            const tr = document.createElement('tr');
+            tr.className = 'total-row';
+            payload.total.forEach(function(cell, i) { tr.appendChild(buildDetailCell('td', cell, i, true)); });
+            fragment.appendChild(tr);
+        }
+        if (payload.notice) {
+            const tr = document.createElement('tr');
+            const td = document.createElement('td');
+            td.colSpan = payload.columns.length;
+            td.textContent = payload.notice;
+            tr.appendChild(td);
+            fragment.appendChild(tr);
+        }
+        tbody.appendChild(fragment);
+        return panel;
+    }
+
+    // 卡片点击：首次展开时加载分片并生成面板，之后只切换显示
+    function openDetailPanel(kind, dateStr, event) {
+        if (event) event.stopPropagation();
+        const panelId = kind + 'Panel_' + dateStr;
+        if (document.getElementById(panelId)) {
+            togglePanel(panelId, null);
+            return;
+        }
+        loadDetailShard(kind, dateStr, function(payload) {
+            if (document.getElementById(panelId)) return;
+            document.getElementById(kind + 'DetailPanels').appendChild(buildDetailPanel(kind, dateStr, payload));
+            togglePanel(panelId, null);
+        });
+    }
+</script>
+"""
+
+# 页面模板：页面样式和明细面板脚本直接编入模板，各部分内容逐段写入文件
+PAGE_TEMPLATE = PageTemplate("{{header}}" + CSS_STYLES + "{{shard_script}}" + DETAIL_PANEL_SCRIPT
+                             + "<div class='container'>{{navigation}}{{content}}</div>{{footer}}")
+
+
+def _shard_filename(date_str):
+    """日期字符串转换为安全的分片文件名"""
+    return re.sub(r'[^0-9A-Za-z_-]', '_', date_str) + '.js'
+
+
+def _with_search_index(panel):
+    """行数较多的面板附带预建搜索索引（浏览器端 searchTableInPanel 使用）"""
+    if len(panel['rows']) >= SEARCH_INDEX_MIN_ROWS:
+        panel['search'] = build_search_index(
+            [[cell[0] if isinstance(cell, list) else cell for cell in row] for row in panel['rows']])
+    return panel
+
+
 # --- Copied and adapted from ratio_report.py --- START ---
-# Panel generation function (used by _generate_ratio_detail_section)
-def _generate_product_sales_ratio_detail_panel(date_str, data):
-    """生成每日产品产销率明细面板"""
+# Panel data function (used by _generate_ratio_detail_section)
+def _product_sales_ratio_panel_data(data):
+    """生成每日产品产销率明细面板的分片数据（单元格文字与样式类）"""
     if data is None or data.empty:
-        # Return an empty div with the panel ID so JS doesn't break
-        return f'''<div id="ratioPanel_{date_str}" class="ratio-panel" style="display: none;">
-                 <div class="ratio-panel-header"><h4>产销率明细 - {date_str}</h4><button onclick="togglePanel('ratioPanel_{date_str}', event)" class="close-button"><i class="bi bi-x-lg"></i></button></div>
-                 <div class="ratio-panel-body"><p>当日无详细产品产销数据。</p></div>
-               </div>'''
-
-    panel_html = f'''
-    <div id="ratioPanel_{date_str}" class="ratio-panel" style="display: none;">
-        <div class="ratio-panel-header">
-            <h4>产销率明细 - {date_str}</h4>
-            <div class="ratio-panel-controls">
-                <input type="text" id="ratioSearch_{date_str}" onkeyup="searchTableInPanel('ratioTable_{date_str}', 'ratioSearch_{date_str}')" placeholder="搜索产品..." class="search-input">
-                <button onclick="togglePanel('ratioPanel_{date_str}', event)" class="close-button"><i class="bi bi-x-lg"></i></button>
-            </div>
-        </div>
-        <div class="ratio-panel-body">
-            <div class="sales-table-container table-responsive">
-                <table id="ratioTable_{date_str}" class="mobile-friendly-table">
-                    <thead><tr><th>产品名称</th><th>销量</th><th>产量</th><th>产销率</th></tr></thead>
-                    <tbody>
-    '''
+        return {'message': '当日无详细产品产销数据。'}
+
+    panel = {'columns': ['产品名称', '销量', '产量', '产销率'], 'rows': [], 'total': None}
     try:
         if '产销率' in data.columns and pd.api.types.is_numeric_dtype(data['产销率']):
             data_sorted = data.sort_values(by='产销率', ascending=False, na_position='last')
@@ -250,7 +388,7 @@ def _generate_product_sales_ratio_detail_panel(date_str, data):
 
     required_cols = ['品名', '销量', '产量', '产销率']
     if not all(col in data_sorted.columns for col in required_cols):
-        panel_html += "<tr><td colspan='4'>数据列不完整。</td></tr>"
+        panel['notice'] = "数据列不完整。"
     else:
         for _, row in data_sorted.iterrows():
             prod_name = row.get('品名', 'N/A')
@@ -266,7 +404,7 @@ def _generate_product_sales_ratio_detail_panel(date_str, data):
                      if ratio_float > 100: ratio_class = "high-value"
                      elif ratio_float < 90: ratio_class = "low-value"
                  except: ratio_display = str(ratio_val)
-            panel_html += f'''<tr><td>{prod_name}</td><td class="text-right">{sales_display}</td><td class="text-right">{prod_display}</td><td class="{ratio_class} text-right">{ratio_display}</td></tr>'''
+            panel['rows'].append([str(prod_name), sales_display, prod_display, [ratio_display, f"{ratio_class} text-right"]])
         try:
             total_sales = data['销量'].sum() if '销量' in data.columns and pd.api.types.is_numeric_dtype(data['销量']) else 0
             total_production = data['产量'].sum() if '产量' in data.columns and pd.api.types.is_numeric_dtype(data['产量']) else 0
@@ -274,14 +412,14 @@ def _generate_product_sales_ratio_detail_panel(date_str, data):
             total_ratio_class = ""
             if total_ratio > 100: total_ratio_class = "high-value"
             elif total_ratio < 90: total_ratio_class = "low-value"
-            panel_html += f'''<tr class="total-row"><td><strong>合计</strong></td><td class="text-right"><strong>{total_sales:,.0f}</strong></td><td class="text-right"><strong>{total_production:,.0f}</strong></td><td class="{total_ratio_class} text-right"><strong>{total_ratio:.0f}%</strong></td></tr>'''
-        except Exception: panel_html += "<tr><td colspan='4'>计算合计时出错。</td></tr>"
-    panel_html += '''</tbody></table></div></div></div>'''
-    return panel_html
+            panel['total'] = ['合计', f"{total_sales:,.0f}", f"{total_production:,.0f}",
+                              [f"{total_ratio:.0f}%", f"{total_ratio_class} text-right"]]
+        except Exception: panel['notice'] = "计算合计时出错。"
+    return _with_search_index(panel)
 
 # Section generation function for Ratio details
-def _generate_ratio_detail_section(product_sales_ratio_data):
-    """生成每日产品产销率明细部分 (卡片 + 面板)"""
+def _generate_ratio_detail_section(product_sales_ratio_data, shards):
+    """生成每日产品产销率明细部分 (卡片 + 面板容器)，面板数据写入 shards"""
     if not product_sales_ratio_data or len(product_sales_ratio_data) == 0:
         return '''<div id="daily-ratio-details" class="section"><div class="section-header"><h2>每日产品产销率明细</h2><a href="ratio.html" class="btn btn-secondary btn-sm back-button">返回产销率总览</a></div><div class="section-body"><p>无产品产销率明细数据。</p></div></div>'''
 
@@ -296,7 +434,7 @@ def _generate_ratio_detail_section(product_sales_ratio_data):
             <p style="text-align: right; font-size: 12px; color: #666; margin-top: 5px;">数据来源：产成品入库列表 & 销售发票执行查询（排除客户名称为空、副产品、鲜品的记录）</p>
             <div class="sales-container"><div class="sales-flex">
     '''
-    processed_dates = set(); panel_html_parts = []
+    processed_dates = set()
     # Sort data by date before generating cards
     try:
         # Ensure dates are comparable (e.g., datetime objects)
@@ -323,46 +461,28 @@ def _generate_ratio_detail_section(product_sales_ratio_data):
             except Exception: pass
         detail_html += f'''
             <div class="sales-flex-item">
-                <div class="sales-card" onclick="toggleRatioPanel('{date_str}', event)">
+                <div class="sales-card" onclick="openDetailPanel('ratio', '{date_str}', event)">
                     <div class="sales-card-header"><h4><i class="bi bi-calendar3"></i> {date_str}</h4><i class="bi bi-chevron-down toggle-icon"></i></div>
                     <div class="sales-card-body"><p><i class="bi bi-speedometer2"></i> 平均: <strong>{avg_ratio:.1f}%</strong></p><p><i class="bi bi-collection"></i> 产品数: <strong>{product_count}</strong></p></div>
                     <div class="card-hint">点击查看详情</div>
                 </div>
                 </div>
         '''
-        panel_html_parts.append(_generate_product_sales_ratio_detail_panel(date_str, data_df))
+        shards['ratio'][date_str] = _product_sales_ratio_panel_data(data_df)
     detail_html += '''</div></div>''' # Close sales-flex, sales-container
-    detail_html += "\n".join(panel_html_parts) # Append panels
+    detail_html += '''<div id="ratioDetailPanels"></div>''' # Panels are appended here when opened
     detail_html += '''</div></div>''' # Close section-body, section
     return detail_html
 # --- Copied and adapted from ratio_report.py --- END ---
 
 # --- Copied and adapted from sales_report.py --- START ---
-# Panel generation function (used by _generate_sales_detail_section)
-def _generate_sales_detail_panel(date_str, sales_data, quantity_column):
-    """生成每日销售明细面板的HTML。"""
+# Panel data function (used by _generate_sales_detail_section)
+def _sales_detail_panel_data(sales_data, quantity_column):
+    """生成每日销售明细面板的分片数据（单元格文字与样式类）"""
     if sales_data is None or sales_data.empty:
-         # Return an empty div with the panel ID so JS doesn't break
-        return f'''<div id="salesPanel_{date_str}" class="sales-panel" style="display: none;">
-                 <div class="sales-panel-header"><h4>销售明细 - {date_str}</h4><button onclick="togglePanel('salesPanel_{date_str}', event)" class="close-button"><i class="bi bi-x-lg"></i></button></div>
-                 <div class="sales-panel-body"><p>当日无详细销售数据。</p></div>
-               </div>'''
-
-    panel_html = f'''
-    <div id="salesPanel_{date_str}" class="sales-panel" style="display: none;">
-        <div class="sales-panel-header">
-            <h4>销售明细 - {date_str}</h4>
-            <div class="sales-panel-controls">
-                <input type="text" id="salesSearch_{date_str}" onkeyup="searchTableInPanel('salesTable_{date_str}', 'salesSearch_{date_str}')" placeholder="搜索产品..." class="search-input">
-                <button onclick="togglePanel('salesPanel_{date_str}', event)" class="close-button"><i class="bi bi-x-lg"></i></button>
-            </div>
-        </div>
-        <div class="sales-panel-body">
-            <div class="sales-table-container table-responsive">
-                <table id="salesTable_{date_str}" class="mobile-friendly-table">
-                    <thead><tr><th>物料名称</th><th>销量</th><th>销售金额(无税)</th><th>含税单价(元/吨)</th></tr></thead>
-                    <tbody>
-    '''
+        return {'message': '当日无详细销售数据。'}
+
+    panel = {'columns': ['物料名称', '销量', '销售金额(无税)', '含税单价(元/吨)'], 'rows': [], 'total': None}
     sorted_sales = sales_data
     try:
         if quantity_column and quantity_column in sales_data.columns and pd.api.types.is_numeric_dtype(sales_data[quantity_column]): sorted_sales = sales_data.sort_values(by=quantity_column, ascending=False, na_position='last')
@@ -372,7 +492,7 @@ def _generate_sales_detail_panel(date_str, sales_data, quantity_column):
     required_cols = ['物料名称', '本币无税金额', '含税单价']
     if quantity_column: required_cols.append(quantity_column)
     if not all(col in sorted_sales.columns for col in required_cols):
-         panel_html += "<tr><td colspan='4'>销售明细数据列不完整。</td></tr>"
+         panel['notice'] = "销售明细数据列不完整。"
     else:
         for _, row in sorted_sales.iterrows():
             mat_name = row.get('物料名称', 'N/A'); amount_val = row.get('本币无税金额'); unit_price_val = row.get('含税单价'); quantity_val = row.get(quantity_column) if quantity_column else None
@@ -397,7 +517,7 @@ def _generate_sales_detail_panel(date_str, sales_data, quantity_column):
                 except (ValueError, TypeError):
                     unit_price_display = str(unit_price_val)
 
-            panel_html += f'''<tr><td>{mat_name}</td><td class="text-right">{quantity_display}</td><td class="text-right">{amount_display}</td><td class="text-right">{unit_price_display}</td></tr>'''
+            panel['rows'].append([str(mat_name), quantity_display, amount_display, unit_price_display])
         try:
              total_volume = sorted_sales[quantity_column].sum() if quantity_column and quantity_column in sorted_sales.columns and pd.api.types.is_numeric_dtype(sorted_sales[quantity_column]) else None
              total_amount = sorted_sales['本币无税金额'].sum() if '本币无税金额' in sorted_sales.columns and pd.api.types.is_numeric_dtype(sorted_sales['本币无税金额']) else 0
@@ -417,19 +537,14 @@ def _generate_sales_detail_panel(date_str, sales_data, quantity_column):
                  except Exception:
                      total_avg_price_display = "计算错误"
 
-             panel_html += f'''<tr class="total-row">
-                                <td><strong>合计</strong></td>
-                                <td class="text-center"><strong>{volume_total_display}</strong></td>
-                                <td class="text-center"><strong>{amount_total_display}</strong></td>
-                                <td class="text-center"><strong>{total_avg_price_display}</strong></td>
-                            </tr>'''
+             panel['total'] = ['合计', [volume_total_display, 'text-center'], [amount_total_display, 'text-center'],
+                               [total_avg_price_display, 'text-center']]
         except Exception: pass # Ignore error in total calculation
-    panel_html += '''</tbody></table></div></div></div>'''
-    return panel_html
+    return _with_search_index(panel)
 
 # Section generation function for Sales details
-def _generate_sales_detail_section(daily_sales):
-    """生成每日销售明细部分 (卡片 + 面板)"""
+def _generate_sales_detail_section(daily_sales, shards):
+    """生成每日销售明细部分 (卡片 + 面板容器)，面板数据写入 shards"""
     if not daily_sales or len(daily_sales) == 0:
         return '''<div id="daily-sales-details" class="section"><div class="section-header"><h2>每日销售明细</h2><a href="sales.html" class="btn btn-secondary btn-sm back-button">返回销售总览</a></div><div class="section-body"><p>无销售明细数据可供显示。</p></div></div>'''
 
@@ -453,7 +568,6 @@ def _generate_sales_detail_section(daily_sales):
     except Exception:
         sorted_dates = list(daily_sales.keys())
 
-    panel_html_parts = []
     for date in sorted_dates:
         sales_info = daily_sales.get(date)
         if not isinstance(sales_info, dict): continue
@@ -471,7 +585,7 @@ def _generate_sales_detail_section(daily_sales):
 
         detail_html += f'''
             <div class="sales-flex-item">
-                <div class="sales-card" onclick="toggleSalesPanel('{date_str}', event)">
+                <div class="sales-card" onclick="openDetailPanel('sales', '{date_str}', event)">
                     <div class="sales-card-header"><h4><i class="bi bi-calendar3"></i> {date_str}</h4><i class="bi bi-chevron-down toggle-icon"></i></div>
                     <div class="sales-card-body">
                         <p><i class="bi bi-box"></i> 销量: <strong>{volume_display}</strong></p>
@@ -482,38 +596,102 @@ def _generate_sales_detail_section(daily_sales):
                 </div>
                 </div>
         '''
-        panel_html_parts.append(_generate_sales_detail_panel(date_str, sales_data_df, quantity_column))
+        shards['sales'][date_str] = _sales_detail_panel_data(sales_data_df, quantity_column)
     detail_html += '''</div></div>''' # Close sales-flex, sales-container
-    detail_html += "\n".join(panel_html_parts)
+    detail_html += '''<div id="salesDetailPanels"></div>''' # Panels are appended here when opened
     detail_html += '''</div></div>''' # Close section-body, section
     return detail_html
 # --- Copied and adapted from sales_report.py --- END ---
 
+def _write_detail_shards(shards, output_dir):
+    """
+    写出每日明细分片并返回日期索引
+
+    参数:
+        shards: {类型: {日期字符串: 面板数据}}
+        output_dir: HTML 输出目录
+
+    返回:
+        dict: {类型: {日期字符串: 相对 details_data 的分片路径（带内容哈希，内容变化时浏览器不会使用旧缓存）}}
+    """
+    data_dir = os.path.join(output_dir, DETAIL_DATA_DIRNAME)
+    index = {}
+    written = set()
+    for kind, panels in shards.items():
+        kind_dir = os.path.join(data_dir, kind)
+        os.makedirs(kind_dir, exist_ok=True)
+        index[kind] = {}
+        for date_str, panel in panels.items():
+            filename = _shard_filename(date_str)
+            payload = json.dumps(panel, ensure_ascii=False, separators=(',', ':'))
+            content = f"detailShardLoaded({json.dumps(kind)},{json.dumps(date_str, ensure_ascii=False)},{payload});\n"
+            shard_path = os.path.join(kind_dir, filename)
+            written.update(os.path.normpath(path) for path in [shard_path] + sibling_paths(shard_path))
+            # 内容未变的分片不重写
+            write_if_changed(shard_path, content)
+            version = hashlib.sha256(content.encode('utf-8')).hexdigest()[:10]
+            index[kind][date_str] = f"{kind}/{filename}?v={version}"
+
+    # 删除已不在报告中的旧分片
+    for root, _, files in os.walk(data_dir):
+        for filename in files:
+            path = os.path.normpath(os.path.join(root, filename))
+            if path not in written:
+                os.remove(path)
+    return index
+
+
+def detail_shard_files(output_dir):
+    """
+    details.html 引用的分片文件（含预压缩副本）
+
+    每次生成页面时不再引用的旧分片已被删除，目录中的文件就是当前页面的全部分片。
+    """
+    data_dir = os.path.join(output_dir, DETAIL_DATA_DIRNAME)
+    files = []
+    for root, _, filenames in os.walk(data_dir):
+        files.extend(os.path.join(root, filename) for filename in filenames)
+    return sorted(files)
+
+
 def generate_details_page(product_sales_ratio_data, daily_sales, output_dir):
-    """生成 details.html 页面
+    """生成 details.html 页面（卡片内联，面板明细写入 details_data 分片，展开时加载）
     Args:
         product_sales_ratio_data (list): 每日产品产销率明细数据列表。
         daily_sales (dict): 每日销售数据。
         output_dir (str): HTML 文件输出目录。
+    Returns:
+        str: 页面路径，写入失败时返回 None。分片文件见 detail_shard_files()。
     """
     print("开始生成 details.html 页面...")
     page_title = "春雪食品生品产销分析报告 - 详细数据"
 
-    # Generate content for the two sections using placeholders for now
-    ratio_details_html = _generate_ratio_detail_section(product_sales_ratio_data)
-    sales_details_html = _generate_sales_detail_section(daily_sales)
+    # Generate content for the two sections; panel data is collected into shards
+    shards = {'ratio': {}, 'sales': {}}
+    ratio_details_html = _generate_ratio_detail_section(product_sales_ratio_data, shards)
+    sales_details_html = _generate_sales_detail_section(daily_sales, shards)
+
+    # 先写分片再写页面，页面引用的分片总是存在
+    shard_index = _write_detail_shards(shards, output_dir)
+    index_json = json.dumps(shard_index, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    shard_script = (f"<script>const DETAIL_SHARD_DIR = {json.dumps(DETAIL_DATA_DIRNAME)}; "
+                    f"const DETAIL_SHARD_INDEX = {index_json};</script>")
 
     # Assemble page
     header_html = generate_header(title=page_title, output_dir=output_dir)
     nav_html = generate_navigation(active_page="details")
     footer_html = generate_footer()
 
-    # Add CSS Styles and container
-    # Ensure necessary JS functions (togglePanel, searchTableInPanel) are loaded, assuming via generate_footer or generate_header
-    full_html = header_html + CSS_STYLES + "<div class='container'>" + nav_html + ratio_details_html + sales_details_html + "</div>" + footer_html
+    # CSS Styles and panel loader script are compiled into PAGE_TEMPLATE
+    # togglePanel/searchTableInPanel come from the shared assets referenced by generate_header/generate_footer
+    page = PAGE_TEMPLATE.render(header=header_html, shard_script=shard_script, navigation=nav_html,
+                                content=(ratio_details_html, sales_details_html), footer=footer_html)
 
-    write_html_report(full_html, "details.html", output_dir)
+    report_path = write_html_report(page, "details.html", output_dir)
+    if report_path is None:
+        return None
     print(f"details.html 页面已生成在 {output_dir}")
+    return report_path
 
 # --- Example Usage (Updated for testing, needs dummy data matching new args) ---
 if __name__ == '__main__':
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+折线图降采样模块（Largest-Triangle-Three-Buckets）
+
+在保持曲线形状的前提下把长时间序列压缩到固定点数，并始终保留首尾点和全局最高、最低点，
+使渲染耗时和图片大小不随历史长度增长。
+"""
+
+import numpy as np
+
+
+def _lttb(x, y, n_out):
+    """LTTB 算法，返回选中点的位置（升序）；x、y 为不含空值的 float 数组"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # 首尾点之间的 n_out - 2 个桶（n > n_out 时每个桶至少一个点）
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # 与上一个选中点、下一个桶均值构成的三角形面积最大的点
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_positions(x, y, max_points, keep_extremes=True):
+    """
+    选出用于绘图的数据点
+
+    参数:
+        x: 横轴数据（日期或数值）
+        y: 纵轴数值
+        max_points: 目标点数；数据点不超过该值时原样返回全部位置
+        keep_extremes: 保留全局最高点和最低点（可能比 max_points 多两个点）
+
+    返回:
+        np.ndarray: 选中点在原数据中的位置（升序），可用于 DataFrame.iloc
+    """
+    x_values = np.asarray(x)
+    y_values = np.asarray(y, dtype=float)
+    if len(y_values) <= max_points:
+        return np.arange(len(y_values))
+
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        valid_x = ~np.isnat(x_values)
+        x_values = x_values.astype('datetime64[ns]').astype(np.int64).astype(float)
+    else:
+        x_values = x_values.astype(float)
+        valid_x = ~np.isnan(x_values)
+    # 空值点不参与降采样（降采样后的折线不再显示空值造成的断点）
+    valid = np.flatnonzero(valid_x & ~np.isnan(y_values))
+    if len(valid) == 0:
+        return valid
+
+    selected = valid[_lttb(x_values[valid], y_values[valid], max_points)]
+    if keep_extremes:
+        extremes = valid[[np.argmax(y_values[valid]), np.argmin(y_values[valid])]]
+        selected = np.union1d(selected, extremes)
+    return selected
@@ -4,20 +4,19 @@ HTML 生成工具模块
 """
 from datetime import datetime
 import os
-import time
-import tempfile
-import shutil
-import random
+import re
+import json
+import hashlib
+import textwrap
 
-def generate_header(title="分析报告", output_dir="."):
-    """生成HTML头部，包含样式和导航"""
-    # Correctly reference image paths relative to the output directory
-    # Example: Use os.path.basename if images are in the same dir, or adjust path
-    # Assuming images are in the same output_dir as html files for simplicity now.
-
-    # Extract CSS and JS from the original _generate_html_header
-    # Note: Ensure all necessary JS functions are included.
-    css_styles = """
+from report_writer import atomic_write, write_if_changed
+from responsive_images import load_responsive_image, DEFAULT_SIZES
+
+# 各页面共用的样式和脚本作为外部静态资源写入输出目录的 assets/ 下，页面只引用一次，浏览器可缓存
+ASSET_DIRNAME = 'assets'
+
+# 共用样式（assets/report.css）
+REPORT_CSS = """
         :root {
             --primary-color: #1976D2;
             --secondary-color: #03A9F4;
@@ -318,7 +317,8 @@ def generate_header(title="分析报告", output_dir="."):
         }
     """
 
-    javascript = """
+# 共用脚本，在 <head> 中加载（assets/report.js）
+REPORT_JS = """
         // Global function: Toggle ratio/sales detail panel visibility and card active state
         function toggleDetailPanel(panelType, dateStr, event) {
             var panelId = panelType + "Panel_" + dateStr; // e.g., "ratioPanel_2023-10-26" or "salesPanel_2023-10-26"
@@ -356,6 +356,127 @@ def generate_header(title="分析报告", output_dir="."):
             if(event) event.stopPropagation();
         }
 
+        // --- Prebuilt search index (see html_utils.build_search_index) ---
+        const tableSearchIndexes = {};
+        const tableSearchTimers = {};
+
+        // 注册动态生成的表格（如明细面板）的索引；页面内嵌的索引在首次搜索时读取
+        function registerTableSearchIndex(tableId, index) {
+            tableSearchIndexes[tableId] = index;
+        }
+
+        function getTableSearchIndex(tableId) {
+            if (!(tableId in tableSearchIndexes)) {
+                const el = document.getElementById(tableId + '-search-index');
+                tableSearchIndexes[tableId] = el ? JSON.parse(el.textContent) : null;
+            }
+            return tableSearchIndexes[tableId];
+        }
+
+        // tbody 中的数据行（不含合计行），与索引中的行号一一对应
+        function tableDataRows(table) {
+            const rows = [];
+            const body = table.tBodies[0];
+            if (!body) return rows;
+            for (let i = 0; i < body.rows.length; i++) {
+                if (!body.rows[i].classList.contains('total-row')) rows.push(body.rows[i]);
+            }
+            return rows;
+        }
+
+        // 解码差分编码的倒排表（按需解码并缓存）
+        function indexPostings(index, gram) {
+            let rows = index.decoded[gram];
+            if (rows === undefined) {
+                const deltas = index.grams[gram];
+                rows = null;
+                if (deltas) {
+                    rows = new Array(deltas.length);
+                    let id = 0;
+                    for (let i = 0; i < deltas.length; i++) { id += deltas[i]; rows[i] = id; }
+                }
+                index.decoded[gram] = rows;
+            }
+            return rows;
+        }
+
+        function intersectSorted(a, b) {
+            const result = [];
+            let i = 0, j = 0;
+            while (i < a.length && j < b.length) {
+                if (a[i] === b[j]) { result.push(a[i]); i++; j++; }
+                else if (a[i] < b[j]) i++;
+                else j++;
+            }
+            return result;
+        }
+
+        // 各数据行的大写文字（单元格之间以换行分隔，与 Python 端建索引时一致），首次搜索时读取并缓存
+        function tableRowTexts(index, rows) {
+            if (!index.texts) {
+                index.texts = rows.map(function(tr) {
+                    return Array.from(tr.cells, function(td) { return td.textContent; }).join("\n").toUpperCase();
+                });
+            }
+            return index.texts;
+        }
+
+        // 返回包含 filter（已转大写）的行号集合：先用 n-gram 倒排表求候选行，再做子串校验
+        function lookupTableSearch(index, rows, filter) {
+            if (!index.decoded) {
+                index.decoded = {};
+                index.commonSet = new Set(index.common);
+            }
+            let candidates = null;
+            // 含代理对的字符与 Python 端的字符切分不一致，直接扫描行文字
+            if (filter.length >= index.n && !/[\\uD800-\\uDFFF]/.test(filter)) {
+                for (let i = 0; i + index.n <= filter.length; i++) {
+                    const gram = filter.substr(i, index.n);
+                    if (index.commonSet.has(gram)) continue;
+                    const postings = indexPostings(index, gram);
+                    if (!postings) return new Set();
+                    candidates = candidates ? intersectSorted(candidates, postings) : postings;
+                    if (candidates.length === 0) return new Set();
+                }
+            }
+            const matched = new Set();
+            const texts = tableRowTexts(index, rows);
+            if (candidates) {
+                for (let i = 0; i < candidates.length; i++) {
+                    if (texts[candidates[i]].indexOf(filter) > -1) matched.add(candidates[i]);
+                }
+            } else {
+                for (let i = 0; i < texts.length; i++) {
+                    if (texts[i].indexOf(filter) > -1) matched.add(i);
+                }
+            }
+            return matched;
+        }
+
+        // 按索引过滤大表格（输入防抖，只修改显示状态发生变化的行）
+        function debounceTableSearch(tableId, inputId) {
+            clearTimeout(tableSearchTimers[tableId]);
+            tableSearchTimers[tableId] = setTimeout(function() {
+                const input = document.getElementById(inputId);
+                const table = document.getElementById(tableId);
+                const index = getTableSearchIndex(tableId);
+                if (!input || !table || !index) return;
+                const rows = tableDataRows(table);
+                if (rows.length !== index.rows) {
+                    // 表格与索引不一致时退回逐行扫描
+                    tableSearchIndexes[tableId] = null;
+                    searchTable(tableId, inputId);
+                    return;
+                }
+                const filter = input.value.toUpperCase();
+                const matched = filter ? lookupTableSearch(index, rows, filter) : null;
+                for (let i = 0; i < rows.length; i++) {
+                    const display = (!matched || matched.has(i)) ? "" : "none";
+                    if (rows[i].style.display !== display) rows[i].style.display = display;
+                }
+            }, 120);
+        }
+
         // Global function: Search within a table inside a panel
         function searchTableInPanel(tableId, inputId) {
             const input = document.getElementById(inputId);
@@ -389,21 +510,32 @@ def generate_header(title="分析报告", output_dir="."):
             let amountTotal = 0;      // 销售表：无税金额合计
             let visibleRowCount = 0;
             
+            // 有预建索引时按索引判断匹配行，合计只读取可见行的单元格
+            const index = getTableSearchIndex(tableId);
+            const dataRows = index ? tableDataRows(table) : [];
+            const matched = (index && dataRows.length === index.rows) ? lookupTableSearch(index, dataRows, filter) : null;
+            let rowId = -1;
+            
             // 处理数据行 (过滤并累加)
             for (let i = 0; i < tr.length; i++) {
                 if (i === 0 || tr[i].classList.contains('total-row')) continue; // 跳过表头和合计行
+                rowId++;
                 
                 const td = tr[i].getElementsByTagName("td");
                 let txtValue = "";
                 let visible = false;
                 
-                // 检查所有单元格是否匹配筛选条件
-                for (let j = 0; j < td.length; j++) {
-                    if (td[j]) {
-                        txtValue = td[j].textContent || td[j].innerText;
-                        if (txtValue.toUpperCase().indexOf(filter) > -1) {
-                            visible = true;
-                            break;
+                if (matched) {
+                    visible = matched.has(rowId);
+                } else {
+                    // 检查所有单元格是否匹配筛选条件
+                    for (let j = 0; j < td.length; j++) {
+                        if (td[j]) {
+                            txtValue = td[j].textContent || td[j].innerText;
+                            if (txtValue.toUpperCase().indexOf(filter) > -1) {
+                                visible = true;
+                                break;
+                            }
                         }
                     }
                 }
@@ -564,31 +696,187 @@ def generate_header(title="分析报告", output_dir="."):
         // --- End Added Mobile Enhancement Script ---
     """
 
-    # Get current time for the header (if needed, or use footer)
-    current_time_header = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+# 页脚脚本，在页面末尾加载（assets/report-footer.js）
+FOOTER_JS = """
+             // Add specific JS calls needed on all pages after DOM load, if any were in the original footer
+             // e.g., initializing components
+              function searchAbnormal() { searchTable('abnormalTable', 'abnormalSearch'); }
+              function searchInconsistent() { searchTable('inconsistentTable', 'inconsistentSearch'); }
+              function searchConflict() { searchTable('conflictTable', 'conflictSearch'); }
+              function searchComparison() { searchTable('comparisonTable', 'comparisonSearch'); }
+              
+              // 表格搜索函数 - 用于一般表格搜索
+              function searchTable(tableId, inputId) {
+                  // 页面内嵌了预建索引的大表格：防抖后按索引过滤，不再逐行读取单元格
+                  if (getTableSearchIndex(tableId)) {
+                      debounceTableSearch(tableId, inputId);
+                      return;
+                  }
+                  const input = document.getElementById(inputId);
+                  const filter = input.value.toUpperCase();
+                  const table = document.getElementById(tableId);
+                  const tr = table.getElementsByTagName("tr");
+                  
+                  for (let i = 0; i < tr.length; i++) {
+                      if (i === 0) continue; // 跳过表头
+                      const td = tr[i].getElementsByTagName("td");
+                      let txtValue = "";
+                      let visible = false;
+                      
+                      for (let j = 0; j < td.length; j++) {
+                          if (td[j]) {
+                              txtValue = td[j].textContent || td[j].innerText;
+                              if (txtValue.toUpperCase().indexOf(filter) > -1) {
+                                  visible = true;
+                                  break;
+                              }
+                          }
+                      }
+                      
+                      tr[i].style.display = visible ? "" : "none";
+                  }
+              }
+              
+              // 切换面板显示/隐藏
+              function togglePanel(panelId, event) {
+                  if (event) event.stopPropagation();
+                  const panel = document.getElementById(panelId);
+                  if (panel) {
+                      if (panel.style.display === "none" || panel.style.display === "") {
+                          panel.style.display = "block";
+                      } else {
+                          panel.style.display = "none";
+                      }
+                  }
+              }
+              
+              // 切换产销率明细面板
+              function toggleRatioPanel(dateStr, event) {
+                  if (event) event.stopPropagation();
+                  const panelId = `ratioPanel_${dateStr}`;
+                  togglePanel(panelId, null);
+              }
+              
+              // 切换销售明细面板
+              function toggleSalesPanel(dateStr, event) {
+                  if (event) event.stopPropagation();
+                  const panelId = `salesPanel_${dateStr}`;
+                  togglePanel(panelId, null);
+              }
+"""
+
+
+class PageTemplate:
+    """
+    预编译的页面模板
+
+    模板文字中的 {{name}} 为占位符，创建时切分一次；render() 按顺序逐段产出文字，
+    占位符的值可以是字符串，也可以是（可嵌套的）字符串可迭代对象，如逐行产出表格的生成器。
+    """
+
+    _SLOT_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+
+    def __init__(self, text):
+        self.parts = []  # [(字面文字, 占位符名或 None)]
+        position = 0
+        for match in self._SLOT_PATTERN.finditer(text):
+            self.parts.append((text[position:match.start()], match.group(1)))
+            position = match.end()
+        self.parts.append((text[position:], None))
+        self.slots = [slot for _, slot in self.parts if slot]
+
+    def render(self, **values):
+        """逐段产出页面文字（生成器），缺少占位符的值时抛出 KeyError"""
+        missing = [slot for slot in self.slots if slot not in values]
+        if missing:
+            raise KeyError(f"模板缺少占位符的值: {', '.join(missing)}")
+        for literal, slot in self.parts:
+            if literal:
+                yield literal
+            if slot:
+                yield from iter_chunks(values[slot])
+
+    def render_to_string(self, **values):
+        """渲染为完整字符串"""
+        return "".join(self.render(**values))
+
+
+def iter_chunks(value):
+    """把字符串或嵌套的字符串可迭代对象展开为字符串序列"""
+    if value is None:
+        return
+    if isinstance(value, str):
+        if value:
+            yield value
+        return
+    for item in value:
+        yield from iter_chunks(item)
+
+
+def _asset_text(text):
+    return textwrap.dedent(text).strip() + "\n"
+
+
+SHARED_ASSETS = {
+    'report.css': _asset_text(REPORT_CSS),
+    'report.js': _asset_text(REPORT_JS),
+    'report-footer.js': _asset_text(FOOTER_JS),
+}
+# 资源内容哈希，作为引用地址的版本参数（内容变化时浏览器重新下载）
+_ASSET_VERSIONS = {name: hashlib.sha256(text.encode('utf-8')).hexdigest()[:10]
+                   for name, text in SHARED_ASSETS.items()}
+
+
+def asset_url(name):
+    """共用资源相对于页面的引用地址"""
+    return f"{ASSET_DIRNAME}/{name}?v={_ASSET_VERSIONS[name]}"
+
+
+def write_shared_assets(output_dir):
+    """
+    把共用样式和脚本写入 output_dir/assets/（内容未变的文件不重写）
+
+    参数:
+        output_dir: HTML 报告输出目录
 
-    return f"""<!DOCTYPE html>
+    返回:
+        list: 资源文件路径
+    """
+    asset_dir = os.path.join(output_dir, ASSET_DIRNAME)
+    os.makedirs(asset_dir, exist_ok=True)
+    paths = []
+    for name, text in SHARED_ASSETS.items():
+        path = os.path.join(asset_dir, name)
+        # 并行构建时多个页面任务可能同时写入，原子替换保证读到的总是完整文件
+        write_if_changed(path, text)
+        paths.append(path)
+    return paths
+
+
+HEADER_TEMPLATE = PageTemplate(f"""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title}</title>
+    <title>{{{{title}}}}</title>
     <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/bootstrap-icons.css">
-    <style>
-        {css_styles}
-    </style>
-    <script>
-        {javascript}
-    </script>
+    <link rel="stylesheet" href="{asset_url('report.css')}">
+    <script src="{asset_url('report.js')}"></script>
 </head>
 <body>
     <div class="container">
         <div class="report-header">
             <h1>春雪食品生品产销分析报告</h1>
-            <!-- <p>生成时间: {current_time_header}</p> -->
+            <!-- <p>生成时间: {{{{generated_at}}}}</p> -->
             <p>报告作者: quzhupeng@springsnow.cn</p>
         </div>
-"""
+""")
+
+
+def generate_header(title="分析报告", output_dir="."):
+    """生成HTML头部，包含样式和导航（样式和脚本引用 assets/ 下的共用资源）"""
+    return HEADER_TEMPLATE.render_to_string(
+        title=title, generated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
 def generate_navigation(active_page="index"):
     """生成导航栏HTML"""
@@ -608,10 +896,7 @@ def generate_navigation(active_page="index"):
     nav_html += '</ul></nav>'
     return nav_html
 
-def generate_footer():
-    """生成HTML页脚"""
-    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    return f"""
+FOOTER_TEMPLATE = PageTemplate(f"""
             <div class="section">
                 <div class="section-header">
                     <h2>报告说明</h2>
@@ -620,142 +905,126 @@ def generate_footer():
                     <p>本报告数据来源于企业内部系统。报告中的分析结果仅供参考，具体业务决策请结合实际情况。</p>
                     <p>如有任何问题或建议，请联系guanlibu@springsnow.cn</p>
                     <p style="text-align: right; margin-top: 20px;">
-                        报告生成时间：{current_time}
+                        报告生成时间：{{{{generated_at}}}}
                     </p>
                 </div>
             </div>
         </div> <!-- Close container -->
-        <script>
-             // Add specific JS calls needed on all pages after DOM load, if any were in the original footer
-             // e.g., initializing components
-              function searchAbnormal() {{ searchTable('abnormalTable', 'abnormalSearch'); }}
-              function searchInconsistent() {{ searchTable('inconsistentTable', 'inconsistentSearch'); }}
-              function searchConflict() {{ searchTable('conflictTable', 'conflictSearch'); }}
-              function searchComparison() {{ searchTable('comparisonTable', 'comparisonSearch'); }}
-              
-              // 表格搜索函数 - 用于一般表格搜索
-              function searchTable(tableId, inputId) {{
-                  const input = document.getElementById(inputId);
-                  const filter = input.value.toUpperCase();
-                  const table = document.getElementById(tableId);
-                  const tr = table.getElementsByTagName("tr");
-                  
-                  for (let i = 0; i < tr.length; i++) {{
-                      if (i === 0) continue; // 跳过表头
-                      const td = tr[i].getElementsByTagName("td");
-                      let txtValue = "";
-                      let visible = false;
-                      
-                      for (let j = 0; j < td.length; j++) {{
-                          if (td[j]) {{
-                              txtValue = td[j].textContent || td[j].innerText;
-                              if (txtValue.toUpperCase().indexOf(filter) > -1) {{
-                                  visible = true;
-                                  break;
-                              }}
-                          }}
-                      }}
-                      
-                      tr[i].style.display = visible ? "" : "none";
-                  }}
-              }}
-              
-              // 切换面板显示/隐藏
-              function togglePanel(panelId, event) {{
-                  if (event) event.stopPropagation();
-                  const panel = document.getElementById(panelId);
-                  if (panel) {{
-                      if (panel.style.display === "none" || panel.style.display === "") {{
-                          panel.style.display = "block";
-                      }} else {{
-                          panel.style.display = "none";
-                      }}
-                  }}
-              }}
-              
-              // 切换产销率明细面板
-              function toggleRatioPanel(dateStr, event) {{
-                  if (event) event.stopPropagation();
-                  const panelId = `ratioPanel_${{dateStr}}`;
-                  togglePanel(panelId, null);
-              }}
-              
-              // 切换销售明细面板
-              function toggleSalesPanel(dateStr, event) {{
-                  if (event) event.stopPropagation();
-                  const panelId = `salesPanel_${{dateStr}}`;
-                  togglePanel(panelId, null);
-              }}
-        </script>
+        <script src="{asset_url('report-footer.js')}"></script>
     </body>
 </html>
-"""
+""")
+
+
+def generate_footer():
+    """生成HTML页脚（页脚脚本引用 assets/ 下的共用资源）"""
+    return FOOTER_TEMPLATE.render_to_string(generated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
 def write_html_report(html_content, filename, output_dir):
-    """将HTML内容写入文件"""
+    """
+    将HTML内容写入文件，并确保页面引用的共用资源（assets/）存在
+
+    内容写入同目录下的临时文件后原子替换目标文件（见 report_writer.atomic_write），
+    按 config.PRECOMPRESS_FORMATS 同时生成预压缩副本。
+
+    参数:
+        html_content: 完整的HTML字符串，或逐段产出HTML的可迭代对象（如 PageTemplate.render()），
+                      后者边生成边写入临时文件，不在内存中拼出整个页面
+        filename: 输出文件名
+        output_dir: 输出目录
+
+    返回:
+        str: 报告路径，写入失败（I/O 错误）时返回 None
+
+    页面内容在写入过程中才逐段生成，生成内容时抛出的异常（数据错误等）不在这里处理，
+    原样向上抛出（临时文件已删除），由调用方的任务标记为失败。
+    """
     os.makedirs(output_dir, exist_ok=True)
     report_path = os.path.join(output_dir, filename)
-    
-    # 强制垃圾回收，尝试释放文件句柄
-    import gc
-    gc.collect()
-    
-    # 重试机制
-    max_retries = 3
-    retry_delay = 1  # 延迟1秒
-    
-    for attempt in range(max_retries):
-        try:
-            # 使用临时文件方式写入，避免直接写入时的文件锁定问题
-            temp_fd, temp_path = tempfile.mkstemp(suffix='.html', prefix=f"{filename.split('.')[0]}_temp_", dir=output_dir)
-            with os.fdopen(temp_fd, 'w', encoding='utf-8') as temp_file:
-                temp_file.write(html_content)
-            
-            # 如果目标文件存在，尝试删除它
-            if os.path.exists(report_path):
-                try:
-                    os.remove(report_path)
-                except PermissionError:
-                    # 如果不能删除，尝试重命名原文件
-                    backup_name = f"{filename.split('.')[0]}_{int(time.time())}_{random.randint(1000, 9999)}.bak.html"
-                    backup_path = os.path.join(output_dir, backup_name)
-                    os.rename(report_path, backup_path)
-                    print(f"无法删除原文件，已将其重命名为: {backup_name}")
-            
-            # 将临时文件复制到目标路径
-            shutil.copy2(temp_path, report_path)
-            os.remove(temp_path)  # 删除临时文件
-            
-            print(f"报告已生成: {report_path}")
-            # 如果成功写入，输出页面成功生成消息
-            if filename == "index.html":
-                print(f"index.html 页面已生成在 {output_dir}")
-            elif filename == "details.html":
-                print(f"details.html 页面已生成在 {output_dir}")
-            elif filename == "price_volatility.html":
-                print(f"price_volatility.html generated in {output_dir}")
-            elif filename == "industry.html":
-                print(f"industry.html 页面已生成在 {output_dir}")
-            
-            return report_path
-            
-        except Exception as e:
-            print(f"写入报告 {filename} 时发生错误 (尝试 {attempt+1}/{max_retries}): {str(e)}")
-            import traceback
-            traceback.print_exc()
-            
-            if attempt < max_retries - 1:
-                print(f"将在 {retry_delay} 秒后重试...")
-                time.sleep(retry_delay)
-                retry_delay *= 2  # 增加下一次等待时间
-            else:
-                print(f"无法写入报告 {filename}，达到最大重试次数。")
-    
-    return None
+    try:
+        write_shared_assets(output_dir)
+        atomic_write(report_path, iter_chunks(html_content))
+    except OSError as e:
+        print(f"写入报告 {filename} 时发生错误: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+    print(f"报告已生成: {report_path}")
+    # 如果成功写入，输出页面成功生成消息
+    if filename == "index.html":
+        print(f"index.html 页面已生成在 {output_dir}")
+    elif filename == "details.html":
+        print(f"details.html 页面已生成在 {output_dir}")
+    elif filename == "price_volatility.html":
+        print(f"price_volatility.html generated in {output_dir}")
+    elif filename == "industry.html":
+        print(f"industry.html 页面已生成在 {output_dir}")
+    return report_path
 
 # Helper function to generate image tags safely
-def generate_image_tag(image_filename, alt_text="", css_class="img-fluid"):
-    """Generates an <img> tag, assuming image is relative to HTML file."""
+def generate_image_tag(image_filename, alt_text="", css_class="img-fluid", output_dir=None, sizes=DEFAULT_SIZES):
+    """Generates an <img> tag, assuming image is relative to HTML file.
+
+    When output_dir is given and responsive variants exist for the image (see responsive_images),
+    the tag becomes a <picture> with a WebP <source> and PNG srcset, so narrow screens download
+    a small variant instead of the full-size chart.
+    """
     # In a multi-file setup, ensure the image path is correct relative to the HTML file.
     # If images and HTML are in the same output dir, just the filename is needed.
-    return f'<img src="{image_filename}" alt="{alt_text}" class="{css_class}">' 
\ No newline at end of file
+    image = load_responsive_image(output_dir, image_filename) if output_dir else None
+    if image is None:
+        return f'<img src="{image_filename}" alt="{alt_text}" class="{css_class}">'
+    webp_srcset = image.srcset('webp')
+    source = f'<source type="image/webp" srcset="{webp_srcset}" sizes="{sizes}">' if webp_srcset else ''
+    return (f'<picture>{source}<img src="{image_filename}" srcset="{image.srcset("png")}" sizes="{sizes}" '
+            f'width="{image.width}" height="{image.height}" alt="{alt_text}" class="{css_class}" '
+            f'loading="lazy" decoding="async"></picture>')
+
+
+# --- Prebuilt client-side search index ---
+# 行数少于该值的表格逐行扫描已足够快，不生成索引
+SEARCH_INDEX_MIN_ROWS = 300
+
+
+def build_search_index(row_texts, ngram=2, common_ratio=0.05):
+    """
+    为表格生成客户端搜索用的倒排索引（n-gram → 行号）
+
+    行文字本身不写入索引：浏览器端首次搜索时从表格单元格读取一次并缓存，用于校验候选行。
+
+    参数:
+        row_texts: 每个数据行的单元格文字列表（顺序与 tbody 中的数据行一致，不含合计行）
+        ngram: n-gram 长度，短于该长度的查询在浏览器端直接扫描行文字
+        common_ratio: 出现在超过该比例行中的 n-gram 不建倒排表（如日期、数字中的常见组合），
+                      只记录在 common 中，由浏览器端对候选行做子串校验
+
+    返回:
+        dict: {'n', 'rows'（数据行数）, 'grams'（差分编码的行号列表）, 'common'}
+    """
+    texts = ["\n".join(str(cell) for cell in cells).upper() for cells in row_texts]
+    postings = {}
+    for row_id, text in enumerate(texts):
+        for gram in {text[i:i + ngram] for i in range(len(text) - ngram + 1)}:
+            if "\n" not in gram:
+                postings.setdefault(gram, []).append(row_id)
+
+    max_rows = max(1, int(len(texts) * common_ratio))
+    grams = {}
+    common = []
+    for gram, row_ids in postings.items():
+        if len(row_ids) > max_rows:
+            common.append(gram)
+            continue
+        # 行号递增，差分后数字更短
+        grams[gram] = [row_ids[0]] + [b - a for a, b in zip(row_ids, row_ids[1:])]
+    return {'n': ngram, 'rows': len(texts), 'grams': grams, 'common': sorted(common)}
+
+
+def generate_search_index_tag(table_id, row_texts):
+    """生成嵌入页面的搜索索引（JSON 数据块，浏览器端 searchTable 按表格 id 查找）；小表格返回空字符串"""
+    if len(row_texts) < SEARCH_INDEX_MIN_ROWS:
+        return ''
+    index_json = json.dumps(build_search_index(row_texts), ensure_ascii=False, separators=(',', ':'))
+    index_json = index_json.replace('</', '<\\/')  # 防止数据中的 "</script>" 提前结束数据块
+    return f'<script type="application/json" id="{table_id}-search-index">{index_json}</script>'
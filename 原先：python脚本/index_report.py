@@ -3,7 +3,7 @@
 生成报告主页 (index.html)，包含摘要信息。
 """
 
-from html_utils import generate_header, generate_navigation, write_html_report
+from html_utils import generate_header, generate_navigation, write_html_report, PageTemplate
 # 导入generate_footer但不直接使用，我们将重写这个函数
 from html_utils import generate_footer as original_generate_footer
 
@@ -117,6 +117,9 @@ CSS_STYLES = """
 </style>
 """
 
+# 页面模板：页面样式直接编入模板，各部分内容逐段写入文件
+PAGE_TEMPLATE = PageTemplate("{{header}}" + CSS_STYLES + "<div class='container'>{{navigation}}{{content}}{{history}}</div>{{footer}}")
+
 def _generate_summary_content(summary_data):
     """生成摘要部分的HTML内容
 
@@ -325,11 +328,13 @@ def generate_index_page(summary_data, output_dir):
     Args:
         summary_data (dict): 传递给 _generate_summary_content 的数据字典。
         output_dir (str): HTML 文件输出目录。
+    Returns:
+        str: 页面路径，写入失败时返回 None。
     """
     print("开始生成 index.html 页面...")
     if not isinstance(summary_data, dict):
         print("错误: summary_data 不是有效的字典。无法生成 index.html。")
-        return
+        return None
 
     page_title = "春雪食品生品产销分析报告 - 摘要"
     header_html = generate_header(title=page_title)
@@ -351,11 +356,14 @@ def generate_index_page(summary_data, output_dir):
     </div>
     """
 
-    # Construct the full HTML, placing history section after summary, before footer
-    full_html = header_html + CSS_STYLES + "<div class='container'>" + nav_html + summary_content_html + history_section_html + "</div>" + footer_html
+    # Render the page, placing history section after summary, before footer
+    page = PAGE_TEMPLATE.render(header=header_html, navigation=nav_html, content=summary_content_html,
+                                history=history_section_html, footer=footer_html)
 
-    write_html_report(full_html, "index.html", output_dir)
-    print(f"index.html 页面已生成在 {output_dir}")
+    report_path = write_html_report(page, "index.html", output_dir)
+    if report_path:
+        print(f"index.html 页面已生成在 {output_dir}")
+    return report_path
 
 # --- Example Usage (for testing) ---
 if __name__ == '__main__':
@@ -14,13 +14,24 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import seaborn as sns
 from datetime import datetime
+from functools import lru_cache
 from matplotlib.ticker import FuncFormatter
 import matplotlib.font_manager as fm
-from html_utils import generate_header, generate_navigation, generate_footer, write_html_report, generate_image_tag
+from html_utils import generate_header, generate_navigation, generate_footer, write_html_report, generate_image_tag, PageTemplate
+from chart_cache import ChartCache
+from downsample import downsample_positions
+from responsive_images import process_images, variant_output_files
+
+# 页面模板，各部分内容逐段写入文件
+PAGE_TEMPLATE = PageTemplate("{{header}}<div class='container'>{{navigation}}{{content}}</div>{{footer}}")
+
+# 趋势线最多绘制的点数（18英寸宽、300 DPI 的图上更多的点已无法分辨）
+MAX_PLOT_POINTS = 1200
 
 # 检查并配置中文字体
+@lru_cache(maxsize=None)
 def setup_chinese_font():
-    """检查并配置中文字体，返回可用的字体名称"""
+    """检查并配置中文字体，返回可用的字体名称（每个进程只查找一次，调用方不应修改返回值）"""
     # 检查常见的中文字体路径
     font_paths = [
         "C:/Windows/Fonts/simhei.ttf",  # 黑体
@@ -48,13 +59,14 @@ def setup_chinese_font():
     return available_font
 
 # 配置文件和路径
-def generate_industry_charts(industry_data, output_dir):
+def generate_industry_charts(industry_data, output_dir, chart_cache=None):
     """
     生成行业价格趋势图
     
     参数:
         industry_data (dict): 包含各个产品价格数据的字典
         output_dir (str): 输出目录
+        chart_cache (ChartCache): 图表缓存，默认按内容哈希跳过未变化的图表
         
     返回:
         list: 生成的图表文件路径列表
@@ -64,6 +76,7 @@ def generate_industry_charts(industry_data, output_dir):
     productionTotal = 0  # 避免引用错误
     
     chart_paths = []
+    chart_cache = chart_cache or ChartCache()
     
     # 确保输出目录存在
     os.makedirs(output_dir, exist_ok=True)
@@ -91,10 +104,6 @@ def generate_industry_charts(industry_data, output_dir):
             data = industry_data[product_name]
             if data is not None and not data.empty:
                 try:
-                    # 创建更大的图表
-                    plt.figure(figsize=(18, 8))
-                    ax = plt.gca()
-                    
                     # 确保日期列格式正确
                     if 'date' in data.columns:
                         # 尝试将日期转换为datetime格式
@@ -103,6 +112,21 @@ def generate_industry_charts(industry_data, output_dir):
                         # 排序数据确保时间线一致性
                         data = data.sort_values('date')
                         
+                        chart_filename = f"{product_name}_price_trend.png"
+                        chart_path = os.path.join(output_dir, chart_filename)
+                        cache_key = chart_cache.key(
+                            data[['date', 'price']],
+                            {'product': product_name, 'figsize': (18, 8), 'dpi': 300,
+                             'max_points': MAX_PLOT_POINTS, 'font': chinese_font.get_file() or chinese_font.get_name()},
+                            __file__)
+                        if chart_cache.is_fresh(chart_path, cache_key):
+                            chart_paths.append(chart_filename)
+                            continue
+                        
+                        # 创建更大的图表
+                        plt.figure(figsize=(18, 8))
+                        ax = plt.gca()
+                        
                         # 计算价格变化率（用于后续分析）
                         data['price_pct_change'] = data['price'].pct_change() * 100
                         
@@ -112,18 +136,22 @@ def generate_industry_charts(industry_data, output_dir):
                         max_price_row = data.loc[max_price_idx]
                         min_price_row = data.loc[min_price_idx]
                         
+                        # 长历史降采样后再绘制（保留形状和最高、最低点），统计值仍基于完整数据
+                        plot_positions = downsample_positions(data['date'], data['price'], MAX_PLOT_POINTS)
+                        plot_data = data.iloc[plot_positions]
+                        
                         # 计算合适的数据点抽样间隔（避免拥挤）
-                        total_points = len(data)
+                        total_points = len(plot_data)
                         sample_interval = max(1, total_points // 30)  # 最多显示约30个点
                         
                         # 绘制价格趋势线，使用透明度和更细的线条
-                        ax.plot(data['date'], data['price'], 
+                        ax.plot(plot_data['date'], plot_data['price'], 
                                color=color_palette.get(product_name, '#1976D2'),
                                linewidth=2.5, alpha=0.85)
                         
                         # 添加稀疏的数据点标记
-                        ax.scatter(data['date'][::sample_interval], 
-                                  data['price'][::sample_interval],
+                        ax.scatter(plot_data['date'][::sample_interval], 
+                                  plot_data['price'][::sample_interval],
                                   color=color_palette.get(product_name, '#1976D2'),
                                   s=60, zorder=5, alpha=0.8)
                         
@@ -162,14 +190,17 @@ def generate_industry_charts(industry_data, output_dir):
                         # 格式化y轴为货币格式
                         ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f"¥{x:.2f}"))
                         
-                        # 优化x轴日期格式
-                        # 主刻度 - 年份
-                        ax.xaxis.set_major_locator(mdates.YearLocator())
+                        # 优化x轴日期格式（刻度数量不随历史长度增长）
+                        span_years = max((data['date'].max() - data['date'].min()).days / 365.25, 0)
+                        # 主刻度 - 年份（超过12年时每隔多年）
+                        ax.xaxis.set_major_locator(mdates.YearLocator(base=max(1, int(np.ceil(span_years / 12)))))
                         ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y年'))
                         
-                        # 次刻度 - 每3个月
-                        ax.xaxis.set_minor_locator(mdates.MonthLocator(interval=3))
-                        ax.xaxis.set_minor_formatter(mdates.DateFormatter('%m月'))
+                        # 次刻度 - 每3个月（超过4年每半年、超过8年每年，超过16年只保留年份刻度）
+                        minor_interval = 3 if span_years <= 4 else 6 if span_years <= 8 else 12 if span_years <= 16 else None
+                        if minor_interval:
+                            ax.xaxis.set_minor_locator(mdates.MonthLocator(interval=minor_interval))
+                            ax.xaxis.set_minor_formatter(mdates.DateFormatter('%m月'))
                         
                         # 强调主刻度网格线
                         ax.grid(which='major', linestyle='-', linewidth=0.7, alpha=0.3)
@@ -181,7 +212,7 @@ def generate_industry_charts(industry_data, output_dir):
                         # 如果数据点超过365个（大约一年），添加30日移动平均线
                         if len(data) > 365:
                             data['MA30'] = data['price'].rolling(window=30).mean()
-                            ax.plot(data['date'], data['MA30'], 
+                            ax.plot(plot_data['date'], data['MA30'].iloc[plot_positions], 
                                    color='#FF6F00', linewidth=2, 
                                    linestyle='--', alpha=0.7,
                                    label='30日移动平均')
@@ -202,10 +233,9 @@ def generate_industry_charts(industry_data, output_dir):
                         plt.tight_layout()
                         
                         # 保存图表，增加DPI提高清晰度
-                        chart_filename = f"{product_name}_price_trend.png"
-                        chart_path = os.path.join(output_dir, chart_filename)
                         plt.savefig(chart_path, dpi=300, bbox_inches='tight')
                         plt.close()
+                        chart_cache.store(chart_path, cache_key)
                         
                         print(f"已生成{product_name}价格趋势图: {chart_path}")
                         chart_paths.append(chart_filename)
@@ -282,7 +312,7 @@ def _generate_industry_content(industry_data, chart_paths, output_dir):
                 <div class="subsection">
                     <h4>{product_name}价格趋势</h4>
                     <div class="chart-container">
-                        {generate_image_tag(chart_filename, alt_text=f"{product_name}价格趋势图", css_class="chart")}
+                        {generate_image_tag(chart_filename, alt_text=f"{product_name}价格趋势图", css_class="chart", output_dir=output_dir)}
                     </div>
                 </div>
                 '''
@@ -306,6 +336,9 @@ def generate_industry_page(industry_data, output_dir):
     Args:
         industry_data (dict): 行业价格数据字典，格式为 {产品名: 数据DataFrame}
         output_dir (str): HTML 文件输出目录
+
+    Returns:
+        list: [页面路径, 趋势图路径..., 响应式变体和清单路径...]，页面写入失败时返回 None
     """
     print(f"{'='*20} 开始生成 industry.html 页面 {'='*20}")
     print(f"接收到的industry_data中的键: {list(industry_data.keys() if industry_data else [])}")
@@ -317,6 +350,9 @@ def generate_industry_page(industry_data, output_dir):
     # 生成各个产品的价格趋势图
     chart_paths = generate_industry_charts(industry_data, output_dir)
     print(f"生成的chart_paths: {chart_paths}")
+    # 各趋势图的多宽度/WebP 版本一起放入线程池生成，页面据此输出 srcset
+    chart_files = [os.path.join(output_dir, chart_filename) for chart_filename in chart_paths]
+    images = process_images(chart_files, output_dir)
     
     # 生成页面
     page_title = "春雪食品生品产销分析报告 - 行业价格"
@@ -325,9 +361,12 @@ def generate_industry_page(industry_data, output_dir):
     industry_content_html = _generate_industry_content(industry_data, chart_paths, output_dir)
     footer_html = generate_footer()
     
-    full_html = header_html + "<div class='container'>" + nav_html + industry_content_html + "</div>" + footer_html
+    page = PAGE_TEMPLATE.render(header=header_html, navigation=nav_html, content=industry_content_html,
+                                footer=footer_html)
     
-    write_html_report(full_html, "industry.html", output_dir)
+    report_path = write_html_report(page, "industry.html", output_dir)
+    if report_path is None:
+        return None
     print(f"industry.html 页面已生成在 {output_dir}")
     
     # 检查生成的文件
@@ -340,6 +379,7 @@ def generate_industry_page(industry_data, output_dir):
                 print(f"警告: {product_name}价格趋势未包含在HTML中")
     
     print(f"{'='*20} industry.html 页面生成完成 {'='*20}")
+    return [report_path] + chart_files + variant_output_files(output_dir, images.values())
 
 # 示例使用（用于测试）
 if __name__ == '__main__':
@@ -12,7 +12,9 @@ from html_utils import (
     generate_navigation,
     generate_footer,
     write_html_report,
-    generate_image_tag
+    generate_image_tag,
+    generate_search_index_tag,
+    PageTemplate
     # 移除了 format_dataframe, format_currency, format_number
 )
 # 从 utils.report_utils 导入格式化函数 (假设它们在这里)
@@ -32,6 +34,9 @@ except ModuleNotFoundError:
             return str(value)
 # ----------------
 
+# 页面模板，各部分内容逐段写入文件
+PAGE_TEMPLATE = PageTemplate("{{header}}<div class='container'>{{navigation}}{{content}}</div>{{footer}}")
+
 def _generate_inventory_content(inventory_data, output_dir):
     """生成库存情况部分的HTML内容 (移植自原 _generate_inventory_section)
 
@@ -39,17 +44,18 @@ def _generate_inventory_content(inventory_data, output_dir):
         inventory_data (pd.DataFrame): 库存数据。
         output_dir (str): 输出目录，用于检查图片文件。
 
-    Returns:
-        str: 库存部分的HTML代码。
+    Yields:
+        str: 库存部分的HTML代码片段（明细表逐行产出）。
     """
     # Handle cases where inventory_data might be None or empty
     if inventory_data is None or inventory_data.empty:
-        return """
+        yield """
         <div class="section">
             <div class="section-header"><h2>库存情况</h2></div>
             <div class="section-body"><p>无库存数据可供显示。</p></div>
         </div>
         """
+        return
 
     # Inventory summary cards
     total_inventory_kg = inventory_data['库存量'].sum() if '库存量' in inventory_data.columns else 0
@@ -61,7 +67,7 @@ def _generate_inventory_content(inventory_data, output_dir):
     total_production_tons = total_production_kg / 1000.0
     total_sales_tons = total_sales_kg / 1000.0
 
-    inventory_section = f"""
+    yield f"""
     <div class="section">
         <div class="section-header">
             <h2>库存情况</h2>
@@ -89,7 +95,7 @@ def _generate_inventory_content(inventory_data, output_dir):
     inventory_chart_path = os.path.join(output_dir, inventory_chart_filename)
     if os.path.exists(inventory_chart_path):
         print(f"DEBUG: Inventory chart found: {inventory_chart_path}") # 保留调试信息
-        inventory_section += f"""
+        yield f"""
             <div class="data-card">
                 <div class="data-card-header">
                     <h3 class="data-card-title">库存可视化</h3>
@@ -97,7 +103,7 @@ def _generate_inventory_content(inventory_data, output_dir):
                 <div class="data-card-body">
                     <div>
                         <h4>库存量TOP15产品</h4>
-                        {generate_image_tag(inventory_chart_filename, alt_text="库存量TOP15产品", css_class="img-fluid")}
+                        {generate_image_tag(inventory_chart_filename, alt_text="库存量TOP15产品", css_class="img-fluid", output_dir=output_dir)}
                     </div>
                 </div>
             </div>
@@ -105,7 +111,7 @@ def _generate_inventory_content(inventory_data, output_dir):
     else:
         print(f"WARNING: Inventory chart NOT found at: {inventory_chart_path}") # 保留警告信息
         # 可以选择性地添加占位符或提示
-        inventory_section += """
+        yield """
             <div class="data-card">
                 <div class="data-card-header"><h3 class="data-card-title">库存可视化</h3></div>
                 <div class="data-card-body"><p>库存量TOP15产品图表未生成或未找到。</p></div>
@@ -113,7 +119,7 @@ def _generate_inventory_content(inventory_data, output_dir):
         """
 
     # Inventory detail table
-    inventory_section += """
+    yield """
         <div class="data-card">
             <div class="data-card-header">
                 <h3 class="data-card-title">库存明细表</h3>
@@ -137,28 +143,33 @@ def _generate_inventory_content(inventory_data, output_dir):
 
     # Add data rows - sort by inventory quantity descending
     display_columns = ['品名', '产量', '销量', '库存量']
+    search_rows = []  # 各行单元格文字，用于预建搜索索引
     if all(col in inventory_data.columns for col in display_columns):
         # 确保在排序前处理 NaN 值，否则可能导致错误
         sorted_inventory = inventory_data[display_columns].fillna({'库存量': -float('inf')}).sort_values(by='库存量', ascending=False).replace({-float('inf'): pd.NA})
 
         for _, row in sorted_inventory.iterrows():
-            inventory_section += "<tr>"
+            row_html = "<tr>"
             # 品名列
-            inventory_section += f"<td>{row.get('品名', 'N/A')}</td>"
+            row_html += f"<td>{row.get('品名', 'N/A')}</td>"
+            row_cells = [row.get('品名', 'N/A')]
             # 数值列格式化
             for col in ['产量', '销量', '库存量']:
                 value = row.get(col)
                 # 使用 format_number 处理 NaN 和数字
                 value_display = format_number(value, precision=0) # 假设 format_number 能处理 NaN/None
-                inventory_section += f"<td class=\"text-right\">{value_display}</td>"
-            inventory_section += "</tr>"
+                row_html += f"<td class=\"text-right\">{value_display}</td>"
+                row_cells.append(value_display)
+            yield row_html + "</tr>"
+            search_rows.append(row_cells)
     else:
         missing_cols = [col for col in display_columns if col not in inventory_data.columns]
-        inventory_section += f"<tr><td colspan='4'>库存明细列不完整 (缺少: {', '.join(missing_cols)}) 或数据格式错误。</td></tr>"
+        yield f"<tr><td colspan='4'>库存明细列不完整 (缺少: {', '.join(missing_cols)}) 或数据格式错误。</td></tr>"
 
-    inventory_section += """
+    yield """
                         </tbody>
                     </table>
+    """ + generate_search_index_tag('inventoryTable', search_rows) + """
                 </div>
             </div>
         </div>
@@ -166,25 +177,26 @@ def _generate_inventory_content(inventory_data, output_dir):
 </div> <!-- Close section -->
     """
 
-    return inventory_section
-
 def generate_inventory_page(inventory_data, output_dir):
     """生成 inventory.html 页面
 
     Args:
         inventory_data (pd.DataFrame): 库存数据。
         output_dir (str): HTML 文件输出目录。
+    Returns:
+        str: 页面路径，写入失败时返回 None。
     """
     print("开始生成 inventory.html 页面...")
     page_title = "春雪食品生品产销分析报告 - 库存情况"
     header_html = generate_header(title=page_title, output_dir=output_dir)
     nav_html = generate_navigation(active_page="inventory")
-    inventory_content_html = _generate_inventory_content(inventory_data, output_dir)
     footer_html = generate_footer()
 
-    full_html = header_html + "<div class='container'>" + nav_html + inventory_content_html + "</div>" + footer_html
+    page = PAGE_TEMPLATE.render(header=header_html, navigation=nav_html,
+                                content=_generate_inventory_content(inventory_data, output_dir),
+                                footer=footer_html)
 
-    write_html_report(full_html, "inventory.html", output_dir)
+    return write_html_report(page, "inventory.html", output_dir)
 
 # # --- Example Usage (for testing) ---
 # if __name__ == '__main__':
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+综合售价表解析模块
+
+把综合售价工作簿（header=None 读入的整块单元格）解析为结构化的价格表：
+日期/均价标题、按主类别和核算办法分组的数据行、各主类别均价以及说明文字。
+说明文字通过对整块单元格的向量化字符串查找定位；分组所需的各列在整列上一次算好。
+HTML（sales_report）和 JSON 输出共用同一份解析结果，结果按源文件大小和修改时间缓存：
+进程内缓存一份，同时把 JSON 写到输出目录，源文件未变时下次直接读取 JSON，不再打开工作簿。
+"""
+
+import os
+import json
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from report_writer import write_if_changed
+
+PRICE_SHEET_JSON = 'comprehensive_price.json'
+PRICE_SHEET_VERSION = 1
+EXPLANATION_MARKER = "说明"
+DEFAULT_EXPLANATION = "说明：加工一二厂实际为：去毛、血、肠后调整加工产品价格的综合价格。与真实行业价格也相甚相符。"
+
+# 表格结构：第2行为日期/均价标题，第3行起为数据；前三列为主类别、单位（工厂）、核算办法，最后一列为均价
+HEADER_ROW = 1
+FIRST_DATA_ROW = 2
+FIRST_VALUE_COL = 3
+
+
+@dataclass
+class PriceRow:
+    """一行价格数据"""
+    factory: str
+    values: List[str]  # 各日期列的显示文字
+
+
+@dataclass
+class CalcMethodGroup:
+    """主类别下同一核算办法的数据行"""
+    name: str
+    rows: List[PriceRow] = field(default_factory=list)
+
+
+@dataclass
+class PriceCategory:
+    """主类别"""
+    name: str
+    average: Optional[str]  # 均价显示文字；表格没有均价列时为 None
+    methods: List[CalcMethodGroup] = field(default_factory=list)
+
+    @property
+    def row_count(self) -> int:
+        return sum(len(method.rows) for method in self.methods)
+
+
+@dataclass
+class PriceSheet:
+    """解析后的综合售价表"""
+    date_label: str
+    headers: List[str]  # 第4列起的标题（日期列和均价列）
+    categories: List[PriceCategory]
+    explanation: str
+    source: Dict[str, object] = field(default_factory=dict)  # 源文件名、大小、修改时间
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data['version'] = PRICE_SHEET_VERSION
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PriceSheet':
+        categories = [
+            PriceCategory(
+                name=category['name'],
+                average=category['average'],
+                methods=[CalcMethodGroup(method['name'], [PriceRow(**row) for row in method['rows']])
+                         for method in category['methods']]
+            )
+            for category in data['categories']
+        ]
+        return cls(data['date_label'], data['headers'], categories, data['explanation'], data.get('source', {}))
+
+
+def format_price(value) -> str:
+    """单元格显示文字：数字取整并加千分位，空值为空字符串"""
+    if pd.isna(value):
+        return ""
+    if isinstance(value, (int, float)):
+        return f"{int(value):,}"
+    return str(value)
+
+
+def _cell_text(column: pd.Series) -> pd.Series:
+    """整列转为去除首尾空白的文字，空值为空字符串"""
+    return column.astype(object).where(column.notna(), "").astype(str).str.strip()
+
+
+def find_marker(block: pd.DataFrame, marker: str = EXPLANATION_MARKER) -> Optional[Tuple[int, int]]:
+    """
+    按行优先顺序查找第一个包含 marker 的文字单元格
+
+    返回:
+        (行位置, 列位置)，找不到时返回 None
+    """
+    cells = pd.Series(block.to_numpy(dtype=object).ravel(), dtype=object)
+    if cells.empty:
+        return None
+    is_text = cells.map(type).eq(str)
+    if not is_text.any():
+        return None
+    matches = cells[is_text].str.contains(marker, regex=False)
+    if not matches.any():
+        return None
+    position = int(matches.index[np.argmax(matches.to_numpy())])
+    return divmod(position, block.shape[1])
+
+
+def parse_price_sheet(df: pd.DataFrame, date_label: str = "最新") -> PriceSheet:
+    """
+    解析 header=None 读入的综合售价表
+
+    参数:
+        df: 工作簿的整块单元格
+        date_label: 标题中显示的日期
+
+    返回:
+        PriceSheet
+    """
+    df = df.copy()
+    n_cols = len(df.columns)
+
+    explanation = ""
+    marker = find_marker(df)
+    if marker is not None:
+        text = df.iat[marker]
+        explanation = text if text.startswith("说明：") else "说明：" + text
+        df.iat[marker] = ""
+    if not explanation:
+        explanation = DEFAULT_EXPLANATION
+
+    headers = []
+    if n_cols > FIRST_VALUE_COL:
+        headers = [str(value) if pd.notna(value) else "" for value in df.iloc[HEADER_ROW, FIRST_VALUE_COL:]]
+
+    data = df.iloc[FIRST_DATA_ROW:]
+    main_category = _cell_text(data.iloc[:, 0])
+    factory = _cell_text(data.iloc[:, 1])
+    calc_method = _cell_text(data.iloc[:, 2])
+    # 单位、核算办法或任一数值列有内容的才是数据行
+    has_values = data.iloc[:, FIRST_VALUE_COL:].notna().any(axis=1)
+    genuine = (factory != "") | (calc_method != "") | has_values
+
+    main_category, calc_method = main_category[genuine], calc_method[genuine]
+    starts = main_category != ""
+    category = main_category.where(starts).ffill()
+    # 核算办法为空时沿用本主类别内上一行的核算办法（每个主类别起始行重新开始）
+    segment = starts.cumsum()
+    effective_method = calc_method.where(calc_method != "").groupby(segment).ffill().fillna("")
+
+    # 按主类别、核算办法首次出现的顺序分组（同名的分组合并）
+    groups: Dict[str, Dict[str, List[int]]] = {}
+    for position, name, method in zip(np.flatnonzero(genuine.to_numpy()), category, effective_method):
+        if pd.isna(name):
+            continue  # 第一个主类别之前的行
+        groups.setdefault(name, {}).setdefault(method, []).append(position)
+
+    # 日期列（第4列到倒数第2列）整块格式化一次
+    value_cols = list(range(FIRST_VALUE_COL, n_cols - 1))
+    if value_cols:
+        values = data.iloc[:, value_cols].apply(lambda column: column.map(format_price)).to_numpy(dtype=object)
+    else:
+        values = np.empty((len(data), 0), dtype=object)
+    avg_col = n_cols - 1 if n_cols - 1 >= FIRST_VALUE_COL else None
+    factories = data.iloc[:, 1].to_numpy(dtype=object)
+
+    categories = []
+    for name, methods in groups.items():
+        first_position = next(iter(methods.values()))[0]
+        average = format_price(data.iat[first_position, avg_col]) if avg_col is not None else None
+        category_entry = PriceCategory(name=name, average=average)
+        for method, positions in methods.items():
+            rows = [PriceRow(factory=str(factories[position]) if pd.notna(factories[position]) else "",
+                             values=values[position].tolist())
+                    for position in positions]
+            category_entry.methods.append(CalcMethodGroup(method, rows))
+        categories.append(category_entry)
+
+    return PriceSheet(date_label=date_label, headers=headers, categories=categories, explanation=explanation)
+
+
+def _source_info(path: str) -> Dict[str, object]:
+    stat = os.stat(path)
+    return {'file': os.path.basename(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+_memory_cache: Dict[Tuple[str, str], PriceSheet] = {}
+
+
+def load_price_sheet(path: str, date_label: str = "最新",
+                     cache_dir: Optional[str] = None) -> Tuple[PriceSheet, Optional[str]]:
+    """
+    读取并解析综合售价文件（带缓存）
+
+    参数:
+        path: 综合售价 Excel 文件
+        date_label: 标题中显示的日期
+        cache_dir: 输出目录；给出时读写其中的 comprehensive_price.json
+
+    返回:
+        (PriceSheet, 与本次解析结果一致的 JSON 路径)；未给出 cache_dir 或写入失败时路径为 None
+    """
+    source = _source_info(path)
+    key = (os.path.abspath(path), json.dumps(source, sort_keys=True))
+    sheet = _memory_cache.get(key)
+
+    json_path = os.path.join(cache_dir, PRICE_SHEET_JSON) if cache_dir else None
+    from_json = False
+    if sheet is None and json_path and os.path.exists(json_path):
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('version') == PRICE_SHEET_VERSION and cached.get('source') == source:
+                sheet = PriceSheet.from_dict(cached)
+                from_json = cached.get('date_label') == date_label
+                print(f"综合售价文件未变化，使用已解析的结果: {json_path}")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Warning: Ignoring unreadable price sheet cache {json_path}: {e}")
+
+    if sheet is None:
+        df = pd.read_excel(path, header=None)
+        sheet = parse_price_sheet(df, date_label)
+        sheet.source = source
+    sheet.date_label = date_label
+    _memory_cache[key] = sheet
+
+    if json_path and not from_json:
+        try:
+            write_if_changed(json_path, json.dumps(sheet.to_dict(), ensure_ascii=False, separators=(',', ':')))
+        except OSError as e:
+            print(f"Warning: Could not write price sheet JSON {json_path}: {e}")
+            json_path = None
+    return sheet, json_path
+
+
+def remove_price_sheet_json(cache_dir: str) -> None:
+    """删除输出目录中的 comprehensive_price.json（综合售价文件已不存在时，旧结果不再作为输出）"""
+    json_path = os.path.join(cache_dir, PRICE_SHEET_JSON)
+    try:
+        os.remove(json_path)
+        print(f"综合售价文件不存在，删除旧的解析结果: {json_path}")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Warning: Could not remove price sheet JSON {json_path}: {e}")
@@ -6,7 +6,10 @@
 import os
 import pandas as pd
 from datetime import datetime
-from html_utils import generate_header, generate_navigation, generate_footer, write_html_report, generate_image_tag
+from html_utils import generate_header, generate_navigation, generate_footer, write_html_report, generate_image_tag, PageTemplate
+
+# 页面模板，各部分内容逐段写入文件
+PAGE_TEMPLATE = PageTemplate("{{header}}{{navigation}}{{content}}{{footer}}")
 
 def _generate_product_sales_ratio_detail_panel(date_str, data):
     """生成每日产品产销率明细面板 (移植自原 _generate_product_sales_ratio_detail_panel)
@@ -282,7 +285,7 @@ def _generate_ratio_content(production_sales_ratio, product_sales_ratio_data, ou
             </div>
             <div class="data-card-body">
                 <p>下图展示了每日产销率的变化趋势，以及对应的销量和产量数据。产销率接近100%表示生产与销售较为平衡；低于100%表示产品积压；高于100%表示消耗了库存。</p>
-                {generate_image_tag(ratio_chart_filename, alt_text='产销率趋势图')}
+                {generate_image_tag(ratio_chart_filename, alt_text='产销率趋势图', output_dir=output_dir)}
             </div>
         </div>
         '''
@@ -305,6 +308,8 @@ def generate_ratio_page(production_sales_ratio, product_sales_ratio_data, output
         production_sales_ratio (dict): 每日总体产销率数据。
         product_sales_ratio_data (list): 每日产品明细数据列表。
         output_dir (str): HTML 文件输出目录。
+    Returns:
+        str: 页面路径，写入失败时返回 None。
     """
     print("开始生成 ratio.html 页面...")
     page_title = "春雪食品生品产销分析报告 - 产销率分析"
@@ -313,9 +318,10 @@ def generate_ratio_page(production_sales_ratio, product_sales_ratio_data, output
     ratio_content_html = _generate_ratio_content(production_sales_ratio, product_sales_ratio_data, output_dir)
     footer_html = generate_footer()
 
-    full_html = header_html + nav_html + ratio_content_html + footer_html
+    page = PAGE_TEMPLATE.render(header=header_html, navigation=nav_html, content=ratio_content_html,
+                                footer=footer_html)
 
-    write_html_report(full_html, "ratio.html", output_dir)
+    return write_html_report(page, "ratio.html", output_dir)
 
 # # --- Example Usage (for testing) ---
 # if __name__ == '__main__':
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+报表构建任务定义：数据加载 → 分析 → 图表 → 页面
+
+每个任务都是模块级函数（可在工作进程中按名称导入），输入输出均可序列化。
+加载任务登记所读的源文件，图表和页面任务返回输出文件路径，供增量构建缓存使用。
+"""
+
+import os
+from functools import wraps
+
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+
+import config
+from task_graph import TaskGraph, ReportBuildError
+from data_loader import DataLoader
+from analyzer import PriceAnalyzer
+from visualizer import DataVisualizer
+from html_utils import write_shared_assets
+from responsive_images import process_images, variant_output_files
+
+from index_report import generate_index_page
+from inventory_report import generate_inventory_page
+from ratio_report import generate_ratio_page
+from sales_report import generate_sales_page
+from details_report import generate_details_page, detail_shard_files
+from comparison_report import generate_comparison_page
+from industry_report import generate_industry_page
+
+
+def isolated_plot_style(func):
+    """
+    绘图任务的 matplotlib/seaborn 全局样式只在本任务内生效
+
+    工作进程会复用执行多个任务（如 industry 页面调用 sns.set_theme），不隔离时样式会串到后续图表。
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with matplotlib.rc_context():
+            try:
+                return func(*args, **kwargs)
+            finally:
+                plt.close('all')
+    return wrapper
+
+
+# --- Loaders ---
+def load_price_data():
+    """调价表（必需，失败时终止构建）"""
+    all_price_data = DataLoader().load_and_process_price_data()
+    if all_price_data is None or all_price_data.empty:
+        raise ReportBuildError("Failed to load price data (调价表)")
+    return all_price_data
+
+
+def load_inventory_data():
+    """收发存汇总表"""
+    inventory_data = DataLoader().load_inventory_data()
+    if inventory_data is None:
+        print("Warning: Failed to load inventory data. Inventory report might be empty.")
+        inventory_data = pd.DataFrame(columns=['品名', '产量', '销量', '库存量'])
+    return inventory_data
+
+
+def load_sales_data():
+    """销售发票执行查询（明细）"""
+    sales_data = DataLoader().load_sales_data()
+    if sales_data is None:
+        print("Warning: Failed to load sales data. Sales report and ratio analysis might be affected.")
+        sales_data = pd.DataFrame()
+    return sales_data
+
+
+def load_daily_sales_by_material():
+    """销售发票执行查询（按日期、物料汇总，用于产品产销率明细）"""
+    daily_sales = DataLoader().load_daily_sales_data(path=None)
+    if daily_sales is None:
+        print("Warning: Failed to load specific sales data for ratio details.")
+        daily_sales = {'by_material': {}}
+    return daily_sales
+
+
+def load_production_data():
+    """产成品入库列表：{'by_material': {date: {product: qty}}, 'total': {date: qty}}"""
+    daily_production_data = DataLoader().load_daily_production_data()
+    if not daily_production_data or not daily_production_data.get('by_material'):
+        print("Warning: Failed to load production data. Ratio analysis might be affected.")
+        daily_production_data = {'by_material': {}, 'total': {}}
+    return daily_production_data
+
+
+def load_comparison_data():
+    """春雪与小明农牧价格对比"""
+    comparison_data = DataLoader().load_price_comparison_data()
+    if comparison_data is None:
+        print("Warning: Failed to load comparison data. Comparison report might be empty.")
+        comparison_data = pd.DataFrame(columns=['品名', '规格', '春雪价格', '小明中间价', '中间价差'])
+    return comparison_data
+
+
+def find_comprehensive_price_file():
+    """综合售价文件路径"""
+    comprehensive_price_file = DataLoader().load_comprehensive_price_data()
+    if comprehensive_price_file is None:
+        print("Warning: Failed to find comprehensive price file. Sales page might be missing table.")
+    return comprehensive_price_file
+
+
+def load_industry_price_data():
+    """卓创资讯行业价格"""
+    industry_price_data = DataLoader().load_industry_price_data()
+    if not industry_price_data:
+        print("Warning: Failed to load industry price data. Industry report might be empty.")
+        industry_price_data = {'鸡苗': None, '毛鸡': None, '板冻大胸': None, '琵琶腿': None}
+    return industry_price_data
+
+
+# --- Analyses ---
+def analyze_price_changes(all_price_data):
+    """价格波动分析；返回排序并补充价差列后的调价数据及各类记录"""
+    analyzer = PriceAnalyzer(all_data=all_price_data)
+    analyzer.analyze_price_changes()
+    return {
+        'all_data': analyzer.all_data,
+        'abnormal_changes': analyzer.abnormal_changes,
+        'inconsistent_records': analyzer.inconsistent_records,
+        'conflict_records': analyzer.conflict_records
+    }
+
+
+def process_daily_sales(sales_data):
+    """每日销售汇总 {date: {data: DataFrame, volume: ...}}"""
+    processed_daily_sales = PriceAnalyzer(all_data=pd.DataFrame(), sales_data=sales_data).process_sales_data()
+    if processed_daily_sales is None:
+        print("Warning: Failed to process daily sales data. Sales report might be empty.")
+        processed_daily_sales = {}
+    return processed_daily_sales
+
+
+def calculate_ratio_summary(daily_sales, daily_production_data):
+    """每日总产销率 {date: {sales, production, ratio}}"""
+    prod_total_by_date = daily_production_data.get('total', {})
+    sales_total_by_date = {date: data['volume'] for date, data in daily_sales.items()}
+
+    ratio_summary_data = {}
+    all_ratio_dates = sorted(set(list(sales_total_by_date.keys()) + list(prod_total_by_date.keys())))
+    for date in all_ratio_dates:
+        sales_vol = sales_total_by_date.get(date, 0)
+        prod_vol = prod_total_by_date.get(date, 0)
+        ratio = (sales_vol / prod_vol * 100) if prod_vol > 0 else 0
+        ratio = min(ratio, 500)  # Clip ratio similar to analyzer's internal logic
+        ratio_summary_data[date] = {'sales': sales_vol, 'production': prod_vol, 'ratio': ratio}
+    print(f"Calculated ratio summary for {len(ratio_summary_data)} dates.")
+    return ratio_summary_data
+
+
+def calculate_product_ratio_details(daily_sales_by_material, daily_production_data):
+    """每日产品产销率明细 [{date, data: DataFrame}, ...]"""
+    product_ratio_details = PriceAnalyzer(all_data=pd.DataFrame()).calculate_product_sales_ratio_detail(
+        daily_sales_data=daily_sales_by_material,
+        daily_production_data=daily_production_data
+    )
+    if product_ratio_details is None:
+        print("Warning: Failed to calculate product ratio details.")
+        product_ratio_details = []
+    return product_ratio_details
+
+
+# --- Charts ---
+def _with_responsive_images(chart_path, output_dir):
+    """图表及其响应式变体（多宽度 PNG/WebP 和清单）一起作为任务输出；图表生成失败时原样返回"""
+    if not chart_path:
+        return chart_path
+    images = process_images([chart_path], output_dir)
+    return [chart_path] + variant_output_files(output_dir, images.values())
+
+
+@isolated_plot_style
+def render_inventory_chart(inventory_data, output_dir):
+    return _with_responsive_images(
+        DataVisualizer(output_dir=output_dir).generate_inventory_visualization(inventory_data), output_dir)
+
+
+@isolated_plot_style
+def render_sales_trend_chart(daily_sales, output_dir):
+    return _with_responsive_images(
+        DataVisualizer(output_dir=output_dir).generate_daily_sales_trend(daily_sales), output_dir)
+
+
+@isolated_plot_style
+def render_ratio_chart(ratio_summary, output_dir):
+    return _with_responsive_images(
+        DataVisualizer(output_dir=output_dir).generate_production_sales_ratio_chart(
+            ratio_summary, os.path.join(output_dir, "production_sales_ratio.png")), output_dir)
+
+
+# --- Pages ---
+def _written(report_path, filename):
+    """页面写入失败（write_html_report 返回 None）时任务失败，不记入构建缓存"""
+    if report_path is None:
+        raise ReportBuildError(f"Failed to write {filename}")
+    return report_path
+
+
+def build_shared_assets(output_dir):
+    # 页面写入时也会补写，这里单独成为任务，使资源文件被删除后增量构建能重新生成
+    return write_shared_assets(output_dir)
+
+
+def build_index_page(price_analysis, ratio_summary, daily_sales, output_dir):
+    summary_data_for_index = {
+        'all_data': price_analysis['all_data'],
+        'abnormal_changes': price_analysis['abnormal_changes'],
+        'inconsistent_records': price_analysis['inconsistent_records'],
+        'missing_dates': [],  # Placeholder
+        'production_sales_ratio': ratio_summary,
+        'daily_sales': daily_sales
+    }
+    return _written(generate_index_page(summary_data_for_index, output_dir), 'index.html')
+
+
+def build_inventory_page(inventory_data, output_dir):
+    return _written(generate_inventory_page(inventory_data, output_dir), 'inventory.html')
+
+
+def build_ratio_page(ratio_summary, product_ratio_details, output_dir):
+    return _written(generate_ratio_page(ratio_summary, product_ratio_details, output_dir), 'ratio.html')
+
+
+def build_sales_page(daily_sales, comprehensive_price_file, output_dir):
+    # 页面和本次写出的综合售价结构化结果（JSON）一起作为输出
+    return _written(generate_sales_page(daily_sales, comprehensive_price_file, output_dir), 'sales.html')
+
+
+def build_details_page(product_ratio_details, daily_sales, output_dir):
+    page_path = _written(generate_details_page(
+        product_sales_ratio_data=product_ratio_details,
+        daily_sales=daily_sales,
+        output_dir=output_dir
+    ), 'details.html')
+    # 每个分片文件都是输出：被删除时重新生成
+    return [page_path] + detail_shard_files(output_dir)
+
+
+def build_price_volatility_page(comparison_data, price_analysis, output_dir):
+    print(f"Number of conflict_records: {len(price_analysis['conflict_records'])}")
+    return _written(generate_comparison_page(
+        price_comparison_data=comparison_data,
+        conflict_records=price_analysis['conflict_records'],
+        output_dir=output_dir
+    ), 'price_volatility.html')
+
+
+@isolated_plot_style
+def build_industry_page(industry_data, output_dir):
+    # 趋势图及其响应式变体与页面一起作为输出
+    return _written(generate_industry_page(industry_data=industry_data, output_dir=output_dir), 'industry.html')
+
+
+def build_report_graph(output_dir):
+    """
+    构建完整报表的任务图
+
+    参数:
+        output_dir: 图表与 HTML 页面的输出目录
+
+    返回:
+        TaskGraph
+    """
+    graph = TaskGraph()
+    out = {'output_dir': output_dir}
+
+    graph.add('load_price', load_price_data, kind='load', required=True, sources=(config.DATA_PATH,))
+    graph.add('load_inventory', load_inventory_data, kind='load', sources=(config.INVENTORY_PATH,))
+    graph.add('load_sales', load_sales_data, kind='load', sources=(config.SALES_PATH,))
+    graph.add('load_sales_by_material', load_daily_sales_by_material, kind='load', sources=(config.SALES_PATH,))
+    graph.add('load_production', load_production_data, kind='load', sources=(config.PRODUCTION_PATH,))
+    graph.add('load_comparison', load_comparison_data, kind='load', sources=(config.COMPARISON_PATH,))
+    # 综合售价文件由销售页面直接读取，按目录中全部候选文件计算指纹
+    graph.add('find_comprehensive_price', find_comprehensive_price_file, kind='load',
+              sources=(os.path.join(config.COMPREHENSIVE_PRICE_DIR, "综合售价*.xlsx"),))
+    graph.add('load_industry', load_industry_price_data, kind='load',
+              sources=(config.CHICKEN_PRICE_PATH, config.RAW_CHICKEN_PRICE_PATH,
+                       config.BREAST_PRICE_PATH, config.LEG_PRICE_PATH))
+
+    graph.add('price_analysis', analyze_price_changes, {'all_price_data': 'load_price'}, kind='analyze')
+    graph.add('daily_sales', process_daily_sales, {'sales_data': 'load_sales'}, kind='analyze')
+    graph.add('ratio_summary', calculate_ratio_summary,
+              {'daily_sales': 'daily_sales', 'daily_production_data': 'load_production'}, kind='analyze')
+    graph.add('product_ratio_details', calculate_product_ratio_details,
+              {'daily_sales_by_material': 'load_sales_by_material', 'daily_production_data': 'load_production'},
+              kind='analyze')
+
+    graph.add('inventory_chart', render_inventory_chart, {'inventory_data': 'load_inventory'}, out,
+              kind='chart', cache=True)
+    graph.add('sales_trend_chart', render_sales_trend_chart, {'daily_sales': 'daily_sales'}, out,
+              kind='chart', cache=True)
+    graph.add('ratio_chart', render_ratio_chart, {'ratio_summary': 'ratio_summary'}, out,
+              kind='chart', cache=True)
+
+    graph.add('shared_assets', build_shared_assets, kwargs=out, kind='page', cache=True)
+    # 页面只在图表文件存在时引用它，因此图表是顺序依赖（after），图表失败不阻塞页面
+    graph.add('index.html', build_index_page,
+              {'price_analysis': 'price_analysis', 'ratio_summary': 'ratio_summary', 'daily_sales': 'daily_sales'},
+              out, kind='page', cache=True)
+    graph.add('inventory.html', build_inventory_page, {'inventory_data': 'load_inventory'}, out,
+              after=('inventory_chart',), kind='page', cache=True)
+    graph.add('ratio.html', build_ratio_page,
+              {'ratio_summary': 'ratio_summary', 'product_ratio_details': 'product_ratio_details'}, out,
+              after=('ratio_chart',), kind='page', cache=True)
+    graph.add('sales.html', build_sales_page,
+              {'daily_sales': 'daily_sales', 'comprehensive_price_file': 'find_comprehensive_price'}, out,
+              after=('sales_trend_chart',), kind='page', cache=True)
+    graph.add('details.html', build_details_page,
+              {'product_ratio_details': 'product_ratio_details', 'daily_sales': 'daily_sales'}, out,
+              kind='page', cache=True)
+    graph.add('price_volatility.html', build_price_volatility_page,
+              {'comparison_data': 'load_comparison', 'price_analysis': 'price_analysis'}, out,
+              kind='page', cache=True)
+    graph.add('industry.html', build_industry_page, {'industry_data': 'load_industry'}, out,
+              kind='page', cache=True)
+    return graph
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+报告文件写入模块
+
+每个文件只写一次：内容写入同目录下的临时文件后用 os.replace 原子替换，读者不会看到写了一半的文件。
+可选同时生成预压缩副本（<文件>.gz / <文件>.br），供支持静态压缩的 Web 服务器直接发送。
+写入时不逐个 fsync，由构建结束时对本次的全部输出统一调用 sync_outputs()。
+"""
+
+import os
+import gzip
+
+import config
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+COMPRESS_SUFFIXES = {'gz': '.gz', 'br': '.br'}
+# 小于该字节数的文件压缩收益很小，不生成副本
+COMPRESS_MIN_BYTES = 1024
+BROTLI_QUALITY = 9
+
+_warned_brotli = False
+
+
+def compress_formats(formats=None):
+    """
+    规范化预压缩格式
+
+    参数:
+        formats: 格式列表（'gz'、'br'），默认取 config.PRECOMPRESS_FORMATS
+
+    返回:
+        tuple: 可用的格式（未安装 brotli 时去掉 'br' 并提示一次）
+    """
+    global _warned_brotli
+    if formats is None:
+        formats = getattr(config, 'PRECOMPRESS_FORMATS', ())
+    result = []
+    for fmt in formats:
+        if fmt not in COMPRESS_SUFFIXES:
+            raise ValueError(f"不支持的预压缩格式: {fmt}")
+        if fmt == 'br' and not BROTLI_AVAILABLE:
+            if not _warned_brotli:
+                print("Warning: brotli is not installed, skipping .br precompressed files")
+                _warned_brotli = True
+            continue
+        if fmt not in result:
+            result.append(fmt)
+    return tuple(result)
+
+
+def sibling_paths(path):
+    """文件所有可能的预压缩副本路径"""
+    return [path + suffix for suffix in COMPRESS_SUFFIXES.values()]
+
+
+def _temp_path(path):
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, f".{filename}.{os.getpid()}.tmp")
+
+
+def _iter_bytes(content):
+    """str / bytes / 字符串片段的可迭代对象 → UTF-8 字节片段"""
+    if isinstance(content, bytes):
+        yield content
+    elif isinstance(content, str):
+        yield content.encode('utf-8')
+    else:
+        for chunk in content:
+            if chunk:
+                yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+
+class _Sink:
+    """一个目标文件（原文件或压缩副本）的临时文件及其压缩器"""
+
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.temp_path = _temp_path(path)
+        self.file = open(self.temp_path, 'wb')
+        self.size = 0
+        if fmt == 'gz':
+            # 固定 mtime、不写文件名，内容相同时副本逐字节一致
+            self.compressor = gzip.GzipFile(filename='', mode='wb', fileobj=self.file, compresslevel=9, mtime=0)
+        elif fmt == 'br':
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.compressor = None
+        self.fmt = fmt
+
+    def write(self, data):
+        self.size += len(data)
+        if self.fmt == 'gz':
+            self.compressor.write(data)
+        elif self.fmt == 'br':
+            self.file.write(self.compressor.process(data))
+        else:
+            self.file.write(data)
+
+    def close(self):
+        if self.fmt == 'gz':
+            self.compressor.close()
+        elif self.fmt == 'br':
+            self.file.write(self.compressor.finish())
+        self.file.close()
+
+    def discard(self):
+        try:
+            self.file.close()
+        except OSError:
+            pass
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+def atomic_write(path, content, compress=None):
+    """
+    原子写入文件，可同时生成预压缩副本
+
+    参数:
+        path: 目标路径
+        content: str、bytes，或逐段产出字符串的可迭代对象（边生成边写入，只迭代一次）
+        compress: 预压缩格式，默认取 config.PRECOMPRESS_FORMATS；() 表示不生成
+
+    返回:
+        str: 目标路径
+    """
+    formats = compress_formats(compress)
+    sinks = [_Sink(path)] + [_Sink(path + COMPRESS_SUFFIXES[fmt], fmt) for fmt in formats]
+    try:
+        for data in _iter_bytes(content):
+            for sink in sinks:
+                sink.write(data)
+        for sink in sinks:
+            sink.close()
+    except BaseException:
+        for sink in sinks:
+            sink.discard()
+        raise
+
+    keep = {sink.path for sink in sinks}
+    if sinks[0].size < COMPRESS_MIN_BYTES:
+        for sink in sinks[1:]:
+            os.remove(sink.temp_path)
+        keep = {path}
+    # 先替换压缩副本再替换原文件，原文件出现时副本已是新内容
+    for sink in sinks[1:] + sinks[:1]:
+        if sink.path in keep:
+            os.replace(sink.temp_path, sink.path)
+    # 去掉不再生成的旧副本，避免服务器发送过期内容
+    for sibling in sibling_paths(path):
+        if sibling not in keep and os.path.exists(sibling):
+            os.remove(sibling)
+    return path
+
+
+def _read_bytes(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def write_if_changed(path, content, compress=None):
+    """
+    内容与现有文件相同（且应有的压缩副本齐全）时不重写，否则原子写入
+
+    参数:
+        path: 目标路径
+        content: str 或 bytes
+        compress: 预压缩格式，见 atomic_write()
+
+    返回:
+        bool: 是否写入了文件
+    """
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    formats = compress_formats(compress) if len(data) >= COMPRESS_MIN_BYTES else ()
+    expected = {path + COMPRESS_SUFFIXES[fmt] for fmt in formats}
+    if (_read_bytes(path) == data
+            and all(os.path.exists(sibling) == (sibling in expected) for sibling in sibling_paths(path))):
+        return False
+    atomic_write(path, data, compress=formats)
+    return True
+
+
+def remove_output(path):
+    """删除输出文件及其压缩副本"""
+    for target in [path] + sibling_paths(path):
+        if os.path.exists(target):
+            os.remove(target)
+
+
+def _fsync_path(path, directory=False):
+    # Windows 上 fsync 需要可写句柄；目录只在 POSIX 上同步
+    flags = (os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)) if directory else os.O_RDWR
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_outputs(paths):
+    """
+    把一批输出文件（及其压缩副本）落盘，每个所在目录只同步一次
+
+    参数:
+        paths: 文件或目录路径（目录递归处理）
+
+    返回:
+        int: 同步的文件数
+    """
+    files = []
+    for path in paths:
+        if not isinstance(path, str):
+            continue
+        if os.path.isdir(path):
+            for root, _, filenames in os.walk(path):
+                files.extend(os.path.join(root, filename) for filename in filenames)
+        elif os.path.isfile(path):
+            files.append(path)
+            files.extend(sibling for sibling in sibling_paths(path) if os.path.isfile(sibling))
+
+    directories = set()
+    synced = 0
+    for path in dict.fromkeys(files):
+        try:
+            _fsync_path(path)
+            synced += 1
+        except OSError as e:
+            print(f"Warning: fsync failed for {path}: {e}")
+        directories.add(os.path.dirname(os.path.abspath(path)))
+    # 目录项（os.replace 产生的重命名）落盘；Windows 不支持打开目录，跳过
+    if os.name != 'nt':
+        for directory in sorted(directories):
+            try:
+                _fsync_path(directory, directory=True)
+            except OSError:
+                pass
+    return synced
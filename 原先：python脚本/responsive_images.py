@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+响应式图片模块
+
+把图表 PNG 批量缩放为多个宽度，并为每个宽度生成 WebP 版本，供页面的 <picture>/srcset 使用，
+移动端只下载与屏幕宽度相当的小图。变体写在输出目录的 responsive/ 下，
+每张源图有一个清单 responsive/<图片文件名>.json，记录源图哈希、生成参数和各变体的尺寸；
+源图哈希与参数都未变且变体文件仍在时跳过，不再打开图片。
+缩放和编码在线程池中进行（Pillow 在这两步释放 GIL），每个宽度记录一个追踪阶段，挂在提交方的阶段之下。
+"""
+
+import io
+import os
+import sys
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from report_writer import atomic_write, write_if_changed
+
+# 阶段追踪模块位于项目根目录
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stage_tracer import trace_span, submit_in_context
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    PIL_AVAILABLE = False
+
+RESPONSIVE_DIRNAME = 'responsive'
+RESPONSIVE_VERSION = 1
+# 目标宽度（像素），大于原图的宽度按原图宽度处理，不放大
+RESPONSIVE_WIDTHS = (480, 960, 1600, 2400)
+VARIANT_FORMATS = ('webp', 'png')
+WEBP_QUALITY = 80
+# optimize=True（zlib 9 级）比 6 级慢约 4 倍，文件只小约 1%
+PNG_COMPRESS_LEVEL = 6
+# 页面内容区最宽 1200px（左右各 20px 内边距），窄屏时占满视口
+DEFAULT_SIZES = "(max-width: 768px) 100vw, 1160px"
+
+_warned_pil = False
+
+
+@dataclass
+class ImageVariant:
+    """一个缩放后的图片文件"""
+    src: str  # 相对 HTML 文件的路径
+    width: int
+    height: int
+    format: str
+
+
+@dataclass
+class ResponsiveImage:
+    """一张源图及其全部变体"""
+    src: str
+    width: int
+    height: int
+    source_hash: str
+    variants: List[ImageVariant] = field(default_factory=list)
+
+    def srcset(self, fmt: str) -> str:
+        """指定格式的 srcset 属性值（按宽度升序）；PNG 以原图作为最大候选"""
+        entries = [(variant.width, variant.src) for variant in self.variants if variant.format == fmt]
+        if fmt == 'png' and all(width < self.width for width, _ in entries):
+            entries.append((self.width, self.src))
+        return ", ".join(f"{src} {width}w" for width, src in sorted(entries))
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ResponsiveImage':
+        variants = [ImageVariant(**variant) for variant in data.get('variants', [])]
+        return cls(data['src'], data['width'], data['height'], data['source_hash'], variants)
+
+
+def _settings(widths: Tuple[int, ...]) -> dict:
+    return {'version': RESPONSIVE_VERSION, 'widths': list(widths), 'formats': list(VARIANT_FORMATS),
+            'webp_quality': WEBP_QUALITY, 'png_compress_level': PNG_COMPRESS_LEVEL}
+
+
+def _manifest_path(output_dir: str, image_filename: str) -> str:
+    return os.path.join(output_dir, RESPONSIVE_DIRNAME, image_filename + '.json')
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_manifest(output_dir: str, image_filename: str) -> Optional[dict]:
+    try:
+        with open(_manifest_path(output_dir, image_filename), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _variant_files(output_dir: str, image: ResponsiveImage) -> List[str]:
+    return [os.path.join(output_dir, variant.src) for variant in image.variants]
+
+
+def _fresh_image(output_dir: str, image_filename: str, source_hash: str,
+                 settings: Optional[dict] = None) -> Optional[ResponsiveImage]:
+    """清单与源图哈希（及给出的生成参数）一致且变体文件都在时返回清单中的结果"""
+    manifest = _read_manifest(output_dir, image_filename)
+    if not manifest or (settings is not None and manifest.get('settings') != settings):
+        return None
+    try:
+        image = ResponsiveImage.from_dict(manifest['image'])
+    except (KeyError, TypeError):
+        return None
+    if image.source_hash != source_hash:
+        return None
+    if not all(os.path.exists(path) for path in _variant_files(output_dir, image)):
+        return None
+    return image
+
+
+def _target_widths(source_width: int, widths: Iterable[int]) -> List[int]:
+    """不超过原图宽度的目标宽度（去重、升序）"""
+    return sorted({min(int(width), source_width) for width in widths if width > 0})
+
+
+def _encode(img, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        img.save(buffer, format='WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        img.save(buffer, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+
+def _render_width(img, variants: List[Tuple[ImageVariant, str, Optional[int]]]) -> List[ImageVariant]:
+    """
+    缩放一次（原尺寸时不缩放），编码写入同一宽度的各格式变体
+
+    参数:
+        img: 已加载的源图
+        variants: [(变体, 输出路径, 大小上限), ...]；编码结果不小于上限时不写入（缩小后的 PNG 可能比原图还大）
+
+    返回:
+        list: 未写入的变体
+    """
+    size = (variants[0][0].width, variants[0][0].height)
+    with trace_span('render_width', width=size[0]):
+        if size != img.size:
+            img = img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        dropped = []
+        for variant, path, max_bytes in variants:
+            data = _encode(img, variant.format)
+            if max_bytes is not None and len(data) >= max_bytes:
+                dropped.append(variant)
+                continue
+            atomic_write(path, data, compress=())
+    return dropped
+
+
+def _variant_name(stem: str, width: int, source_width: int, fmt: str) -> str:
+    # 原尺寸的变体不带宽度后缀
+    suffix = '' if width == source_width else f'-{width}w'
+    return f"{RESPONSIVE_DIRNAME}/{stem}{suffix}.{fmt}"
+
+
+def _plan_image(output_dir: str, source_path: str, source_hash: str, widths: Tuple[int, ...]):
+    """
+    打开源图并列出需要生成的变体
+
+    返回:
+        (ResponsiveImage, 已加载的图片, 按宽度分组的 [[(变体, 输出路径, 大小上限), ...], ...])
+    """
+    image_filename = os.path.basename(source_path)
+    stem = os.path.splitext(image_filename)[0]
+    img = Image.open(source_path)
+    img.load()
+    # matplotlib 输出的 RGBA 通常完全不透明，去掉 alpha 通道后变体更小
+    if img.mode == 'RGBA' and img.getextrema()[3] == (255, 255):
+        img = img.convert('RGB')
+    source_width, source_height = img.size
+    source_size = os.path.getsize(source_path)
+    image = ResponsiveImage(image_filename, source_width, source_height, source_hash)
+    jobs = []
+    for width in _target_widths(source_width, widths):
+        height = max(1, round(source_height * width / source_width))
+        width_jobs = []
+        for fmt in VARIANT_FORMATS:
+            if fmt == 'png' and width == source_width:
+                continue  # 原图本身就是该宽度的 PNG
+            variant = ImageVariant(_variant_name(stem, width, source_width, fmt), width, height, fmt)
+            image.variants.append(variant)
+            # PNG 变体比原图还大时没有意义，页面直接用原图
+            width_jobs.append((variant, os.path.join(output_dir, variant.src), source_size if fmt == 'png' else None))
+        if width_jobs:
+            jobs.append(width_jobs)
+    return image, img, jobs
+
+
+def _remove_stale(output_dir: str, image_filename: str, image: ResponsiveImage) -> None:
+    """删除旧清单中有、本次不再生成的变体文件"""
+    manifest = _read_manifest(output_dir, image_filename)
+    if not manifest:
+        return
+    try:
+        previous = ResponsiveImage.from_dict(manifest['image'])
+    except (KeyError, TypeError):
+        return
+    current = set(_variant_files(output_dir, image))
+    for path in _variant_files(output_dir, previous):
+        if path not in current and os.path.exists(path):
+            os.remove(path)
+
+
+def process_images(image_paths: Iterable[str], output_dir: str, widths: Optional[Iterable[int]] = None,
+                   jobs: Optional[int] = None) -> Dict[str, ResponsiveImage]:
+    """
+    批量生成响应式图片变体
+
+    参数:
+        image_paths: 源图路径（应位于 output_dir 中，页面按文件名引用）
+        output_dir: 输出目录，变体和清单写在其 responsive/ 子目录下
+        widths: 目标宽度，默认 RESPONSIVE_WIDTHS
+        jobs: 线程数，默认由 ThreadPoolExecutor 决定
+
+    返回:
+        dict: {源图路径: ResponsiveImage}；未安装 Pillow 或处理失败的图片不在其中
+    """
+    global _warned_pil
+    widths = tuple(widths or RESPONSIVE_WIDTHS)
+    settings = _settings(widths)
+    results: Dict[str, ResponsiveImage] = {}
+    pending = []
+    for source_path in dict.fromkeys(image_paths):
+        if not source_path or not os.path.exists(source_path):
+            continue
+        source_hash = _file_hash(source_path)
+        fresh = _fresh_image(output_dir, os.path.basename(source_path), source_hash, settings)
+        if fresh is not None:
+            results[source_path] = fresh
+        else:
+            pending.append((source_path, source_hash))
+
+    if pending and not PIL_AVAILABLE:
+        if not _warned_pil:
+            print("Pillow library not found. Skipping responsive image generation. Install with: pip install Pillow")
+            _warned_pil = True
+        pending = []
+
+    if pending:
+        os.makedirs(os.path.join(output_dir, RESPONSIVE_DIRNAME), exist_ok=True)
+        planned = []
+        for source_path, source_hash in pending:
+            try:
+                planned.append((source_path, *_plan_image(output_dir, source_path, source_hash, widths)))
+            except Exception as e:
+                print(f"生成响应式图像失败: {source_path}: {e}")
+
+        # 所有图片的所有宽度放入同一个线程池
+        with trace_span('responsive_images', images=len(planned)), ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [(source_path, image, submit_in_context(executor, _render_width, img, width_jobs))
+                       for source_path, image, img, image_jobs in planned for width_jobs in image_jobs]
+            failed = set()
+            for source_path, image, future in futures:
+                try:
+                    for variant in future.result():
+                        image.variants.remove(variant)
+                except Exception as e:
+                    if source_path not in failed:
+                        print(f"生成响应式图像失败: {source_path}: {e}")
+                    failed.add(source_path)
+
+        for source_path, image, img, _ in planned:
+            img.close()
+            if source_path in failed:
+                continue
+            image_filename = os.path.basename(source_path)
+            _remove_stale(output_dir, image_filename, image)
+            write_if_changed(_manifest_path(output_dir, image_filename),
+                             json.dumps({'settings': settings, 'image': image.to_dict()}, ensure_ascii=False),
+                             compress=())
+            results[source_path] = image
+
+    generated = sum(1 for source_path, _ in pending if source_path in results)
+    print(f"Responsive images: {generated} generated, {len(results) - generated} unchanged")
+    return results
+
+
+def variant_output_files(output_dir: str, images: Iterable[ResponsiveImage]) -> List[str]:
+    """变体文件和清单的路径（用作任务输出）"""
+    paths = []
+    for image in images:
+        paths.extend(_variant_files(output_dir, image))
+        paths.append(_manifest_path(output_dir, image.src))
+    return paths
+
+
+def load_responsive_image(output_dir: str, image_filename: str) -> Optional[ResponsiveImage]:
+    """
+    读取已生成的变体信息（供页面生成 srcset）
+
+    参数:
+        output_dir: 输出目录
+        image_filename: 页面中引用的图片文件名
+
+    返回:
+        ResponsiveImage；源图不存在、尚未生成或已过期时返回 None
+    """
+    source_path = os.path.join(output_dir, image_filename)
+    if not os.path.exists(_manifest_path(output_dir, image_filename)) or not os.path.exists(source_path):
+        return None
+    return _fresh_image(output_dir, image_filename, _file_hash(source_path))
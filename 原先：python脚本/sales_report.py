@@ -5,8 +5,83 @@
 
 import os
 import pandas as pd
-from html_utils import generate_header, generate_navigation, generate_footer, write_html_report, generate_image_tag
-from collections import OrderedDict # 导入OrderedDict
+from html_utils import generate_header, generate_navigation, generate_footer, write_html_report, generate_image_tag, PageTemplate
+from price_sheet import load_price_sheet, remove_price_sheet_json
+
+# 页面模板，各部分内容逐段写入文件
+PAGE_TEMPLATE = PageTemplate("{{header}}{{navigation}}{{content}}{{footer}}")
+
+def _render_price_sheet(sheet):
+    """把解析后的综合售价表（price_sheet.PriceSheet）渲染为HTML表格
+
+    Args:
+        sheet (PriceSheet): 综合售价表。
+
+    Returns:
+        str: 综合售价部分的HTML代码。
+    """
+    parts = [f'''
+            <div class="subsection">
+                <h3>综合售价 ({sheet.date_label})</h3>
+                <div class="table-responsive" id="comp-price-table-container">
+                    <table class="table table-bordered table-striped price-table" style="text-align: center;">
+            ''', '''
+            <style>
+                .price-table th, .price-table td { text-align: center; vertical-align: middle; }
+                .price-table th { background-color: #f2f2f2; font-weight: bold; }
+                .price-table .price-category { background-color: #f0f4f8; font-weight: bold; }
+                .price-table .price-value { text-align: right; font-family: Arial, sans-serif; }
+                .empty-cell { background-color: #fafafa; }
+                .calculation-method { background-color: #f5f5f5; font-weight: 500; }
+                .swipe-hint { text-align: center; color: #666; font-size: 0.8em; padding: 5px; margin-bottom: 5px; }
+            </style>
+            ''']
+
+    parts.append("<thead>")
+    parts.append('<tr><th colspan="3" style="background-color: #e6f2ff;">类别</th>')
+    # 日期列和均价列标题
+    for header in sheet.headers:
+        parts.append(f'<th style="background-color: #e6f2ff;">{header}</th>')
+    parts.append("</tr></thead>")
+
+    parts.append("<tbody>")
+    for category in sheet.categories:
+        total_rows = category.row_count
+        if total_rows == 0: continue
+
+        avg_price_cell_html = ""
+        if category.average is not None: # 有均价列时，均价单元格跨该主分类的全部行
+            avg_price_cell_html = f'<td rowspan="{total_rows}" class="price-value { "empty-cell" if category.average == "" else ""}">{category.average}</td>'
+
+        is_first_html_row_for_main_cat = True
+        for method in category.methods:
+            for i, row in enumerate(method.rows):
+                parts.append("<tr>")
+                if is_first_html_row_for_main_cat:
+                    parts.append(f'<td rowspan="{total_rows}" class="price-category">{category.name}</td>')
+                parts.append(f'<td>{row.factory}</td>')
+                if i == 0: # First row for this specific calc method group
+                    parts.append(f'<td rowspan="{len(method.rows)}" class="calculation-method { "empty-cell" if method.name == "" else ""}">{method.name}</td>')
+                for cell_content in row.values:
+                    parts.append(f'<td class="price-value { "empty-cell" if cell_content == "" else ""}">{cell_content}</td>')
+                if is_first_html_row_for_main_cat:
+                    parts.append(avg_price_cell_html)
+                parts.append("</tr>")
+                is_first_html_row_for_main_cat = False
+
+    parts.append("</tbody>")
+    parts.append('''
+                    </table>
+                </div>
+                <div class="swipe-hint"><i class="bi bi-arrow-left-right"></i> 左右滑动查看更多</div>
+                <div class="description">
+                    <p style="text-align: left; font-size: 13px; color: #666; margin-top: 10px; border-left: 3px solid #1976D2; padding-left: 10px; background-color: #f9f9f9; padding: 8px;">
+                        <strong>说明：</strong>''' + sheet.explanation.replace("说明：", "") + '''
+                    </p>
+                </div>
+            </div>
+            ''')
+    return "".join(parts)
 
 def _generate_sales_content(daily_sales, comprehensive_price_file, output_dir):
     """生成销售情况部分的HTML内容
@@ -17,8 +92,9 @@ def _generate_sales_content(daily_sales, comprehensive_price_file, output_dir):
         output_dir (str): 输出目录
 
     Returns:
-        str: 销售情况部分的HTML代码。
+        tuple: (销售情况部分的HTML代码, 本次写出的综合售价 JSON 路径列表)。
     """
+    price_files = []
     if not daily_sales or len(daily_sales) == 0:
         print("警告: 每日销售数据为空，跳过销售情况部分生成")
         return """
@@ -26,7 +102,7 @@ def _generate_sales_content(daily_sales, comprehensive_price_file, output_dir):
             <div class="section-header"><h2>销售情况分析</h2></div>
             <div class="section-body"><p>无销售数据可供显示。</p></div>
         </div>
-        """
+        """, price_files
 
     html = '''
     <div class="section">
@@ -39,7 +115,6 @@ def _generate_sales_content(daily_sales, comprehensive_price_file, output_dir):
     # 添加综合售价表格
     if comprehensive_price_file and os.path.exists(comprehensive_price_file):
         try:
-            import pandas as pd
             import re
             
             file_name = os.path.basename(comprehensive_price_file)
@@ -47,165 +122,22 @@ def _generate_sales_content(daily_sales, comprehensive_price_file, output_dir):
             date_str = match.group(1) if match else "最新"
             
             print(f"处理综合售价文件: {comprehensive_price_file}")
-            df = pd.read_excel(comprehensive_price_file, header=None)
-            
-            explanation_text = ""
-            for r_idx in range(len(df)):
-                for c_idx in range(len(df.columns)):
-                    cell_val = df.iloc[r_idx, c_idx]
-                    if pd.notna(cell_val) and isinstance(cell_val, str) and "说明" in cell_val:
-                        explanation_text = cell_val if cell_val.startswith("说明：") else "说明：" + cell_val
-                        df.iloc[r_idx, c_idx] = "" 
-                        break 
-                if explanation_text: break
-            
-            if not explanation_text:
-                explanation_text = "说明：加工一二厂实际为：去毛、血、肠后调整加工产品价格的综合价格。与真实行业价格也相甚相符。"
-            
-            html += f'''
-            <div class="subsection">
-                <h3>综合售价 ({date_str})</h3>
-                <div class="table-responsive" id="comp-price-table-container">
-                    <table class="table table-bordered table-striped price-table" style="text-align: center;">
-            '''
-            html += '''
-            <style>
-                .price-table th, .price-table td { text-align: center; vertical-align: middle; }
-                .price-table th { background-color: #f2f2f2; font-weight: bold; }
-                .price-table .price-category { background-color: #f0f4f8; font-weight: bold; }
-                .price-table .price-value { text-align: right; font-family: Arial, sans-serif; }
-                .empty-cell { background-color: #fafafa; }
-                .calculation-method { background-color: #f5f5f5; font-weight: 500; }
-                .swipe-hint { text-align: center; color: #666; font-size: 0.8em; padding: 5px; margin-bottom: 5px; }
-            </style>
-            '''
-            
-            html += "<thead>"
-            html += '<tr><th colspan="3" style="background-color: #e6f2ff;">类别</th>'
-            # 日期列标题 (从第4列到最后1列)
-            for col_idx in range(3, len(df.columns)):
-                header_val = df.iloc[1, col_idx] # 第2行是日期/均价标题
-                html += f'<th style="background-color: #e6f2ff;">{str(header_val) if pd.notna(header_val) else ""}</th>'
-            html += "</tr></thead>"
-            
-            html += "<tbody>"
-            
-            categories = OrderedDict()
-            current_main_category_name = None
-            current_main_category_last_calc_method = ""
-
-            for r_idx in range(2, len(df)): # 从Excel的第3行开始数据
-                main_cat_val_raw = df.iloc[r_idx, 0]
-                main_cat_val = str(main_cat_val_raw).strip() if pd.notna(main_cat_val_raw) else ""
-                
-                factory_val_raw = df.iloc[r_idx, 1]
-                factory_val = str(factory_val_raw).strip() if pd.notna(factory_val_raw) else ""
-                
-                calc_method_val_raw = df.iloc[r_idx, 2]
-                calc_method_val = str(calc_method_val_raw).strip() if pd.notna(calc_method_val_raw) else ""
-
-                is_genuine_data_row = False
-                if factory_val != "" or calc_method_val != "":
-                    is_genuine_data_row = True
-                else:
-                    for c_idx_check in range(3, len(df.columns)):
-                        if pd.notna(df.iloc[r_idx, c_idx_check]):
-                            is_genuine_data_row = True
-                            break
-                if not is_genuine_data_row:
-                    continue
-
-                if main_cat_val != "":
-                    current_main_category_name = main_cat_val
-                    if current_main_category_name not in categories:
-                        categories[current_main_category_name] = OrderedDict()
-                    current_main_category_last_calc_method = "" 
-                
-                if current_main_category_name is None: continue
-
-                effective_calc_method = calc_method_val
-                if effective_calc_method == "":
-                    effective_calc_method = current_main_category_last_calc_method
-                else:
-                    current_main_category_last_calc_method = effective_calc_method
-                
-                if effective_calc_method not in categories[current_main_category_name]:
-                    categories[current_main_category_name][effective_calc_method] = []
-                categories[current_main_category_name][effective_calc_method].append(r_idx)
-
-            # 渲染HTML表格
-            for main_cat_name, calc_methods_dict in categories.items():
-                total_rows_for_main_cat = sum(len(idx_list) for idx_list in calc_methods_dict.values())
-                if total_rows_for_main_cat == 0: continue
-
-                is_first_html_row_for_main_cat = True
-                
-                avg_price_cell_html = ""
-                # 确定均价列 (最后一列)
-                avg_price_col_idx = len(df.columns) - 1
-                if avg_price_col_idx >= 3: #确保有均价列
-                    # 从这个主分类的第一个实际数据行获取均价
-                    first_data_row_original_idx = -1
-                    for _, row_idx_list_for_calc_method in calc_methods_dict.items():
-                        if row_idx_list_for_calc_method:
-                            first_data_row_original_idx = row_idx_list_for_calc_method[0]
-                            break
-                    
-                    if first_data_row_original_idx != -1:
-                        avg_price_val = df.iloc[first_data_row_original_idx, avg_price_col_idx]
-                        cell_content = f"{int(avg_price_val):,}" if pd.notna(avg_price_val) and isinstance(avg_price_val, (int, float)) else (str(avg_price_val) if pd.notna(avg_price_val) else "")
-                        avg_price_cell_html = f'<td rowspan="{total_rows_for_main_cat}" class="price-value { "empty-cell" if cell_content == "" else ""}">{cell_content}</td>'
-                    else: # Should not happen if total_rows_for_main_cat > 0
-                        avg_price_cell_html = f'<td rowspan="{total_rows_for_main_cat}" class="empty-cell"></td>'
-
-
-                for calc_method_name, row_indices_list in calc_methods_dict.items():
-                    rows_for_this_calc_method = len(row_indices_list)
-                    if rows_for_this_calc_method == 0: continue
-
-                    for i, current_row_original_idx in enumerate(row_indices_list):
-                        html += "<tr>"
-                        
-                        if is_first_html_row_for_main_cat:
-                            html += f'<td rowspan="{total_rows_for_main_cat}" class="price-category">{main_cat_name}</td>'
-                        
-                        factory_val_on_row = df.iloc[current_row_original_idx, 1]
-                        html += f'<td>{str(factory_val_on_row) if pd.notna(factory_val_on_row) else ""}</td>'
-                        
-                        if i == 0: # First row for this specific calc_method_name group
-                            html += f'<td rowspan="{rows_for_this_calc_method}" class="calculation-method { "empty-cell" if calc_method_name == "" else ""}">{calc_method_name}</td>'
-                        
-                        # 数据值 (从第4列到倒数第2列)
-                        for data_col_df_idx in range(3, len(df.columns) - 1):
-                            data_val = df.iloc[current_row_original_idx, data_col_df_idx]
-                            cell_content = f"{int(data_val):,}" if pd.notna(data_val) and isinstance(data_val, (int, float)) else (str(data_val) if pd.notna(data_val) else "")
-                            html += f'<td class="price-value { "empty-cell" if cell_content == "" else ""}">{cell_content}</td>'
-                        
-                        if is_first_html_row_for_main_cat:
-                            html += avg_price_cell_html
-                        
-                        html += "</tr>"
-                        is_first_html_row_for_main_cat = False
-            
-            html += "</tbody>"
-            html += '''
-                    </table>
-                </div>
-                <div class="swipe-hint"><i class="bi bi-arrow-left-right"></i> 左右滑动查看更多</div>
-                <div class="description">
-                    <p style="text-align: left; font-size: 13px; color: #666; margin-top: 10px; border-left: 3px solid #1976D2; padding-left: 10px; background-color: #f9f9f9; padding: 8px;">
-                        <strong>说明：</strong>''' + explanation_text.replace("说明：", "") + '''
-                    </p>
-                </div>
-            </div>
-            '''
+            # 解析结果同时写入输出目录的 comprehensive_price.json，源文件未变时直接复用
+            price_sheet, price_sheet_json = load_price_sheet(comprehensive_price_file, date_label=date_str,
+                                                             cache_dir=output_dir)
+            if price_sheet_json:
+                price_files.append(price_sheet_json)
+            html += _render_price_sheet(price_sheet)
         except Exception as e:
             print(f"处理综合售价文件时出错: {str(e)}")
             import traceback
             traceback.print_exc()
+            remove_price_sheet_json(output_dir)
             html += f'<div class="subsection"><h3>综合售价</h3><p>无法加载综合售价数据: {str(e)}</p></div>'
     else:
         print(f"综合售价文件未找到或无效: {comprehensive_price_file}")
+        # 上次生成的解析结果已过期，不留在输出目录中
+        remove_price_sheet_json(output_dir)
         html += '<div class="subsection"><h3>综合售价</h3><p>未找到综合售价数据文件</p></div>'
 
     # Add sales trend chart
@@ -216,7 +148,7 @@ def _generate_sales_content(daily_sales, comprehensive_price_file, output_dir):
         <div class="subsection">
             <h3>销售趋势</h3>
             <div class="chart-container">
-                 {generate_image_tag(sales_trend_chart_filename, alt_text="每日销量和实际销售均价趋势", css_class="chart")}
+                 {generate_image_tag(sales_trend_chart_filename, alt_text="每日销量和实际销售均价趋势", css_class="chart", output_dir=output_dir)}
             </div>
             <p style="text-align: right; font-size: 12px; color: #666; margin-top: 5px;">注：销量去除副产品和鲜品，销售均价为实际总金额/总重量得到的含税价格</p>
             <p style="text-align: right; font-size: 12px; color: #666; margin-top: 2px;">数据来源：销售发票执行查询（排除客户名称为空、副产品、鲜品的记录）</p>
@@ -236,7 +168,7 @@ def _generate_sales_content(daily_sales, comprehensive_price_file, output_dir):
         </div> <!-- Close section-body -->
     </div> <!-- Close section -->
     '''
-    return html
+    return html, price_files
 
 def generate_sales_page(daily_sales, comprehensive_price_file, output_dir):
     """生成 sales.html 页面
@@ -245,17 +177,23 @@ def generate_sales_page(daily_sales, comprehensive_price_file, output_dir):
         daily_sales (dict): 每日销售数据。
         comprehensive_price_file (str): 综合售价文件路径。
         output_dir (str): HTML 文件输出目录。
+    Returns:
+        list: [页面路径, 本次写出的综合售价 JSON 路径...]，页面写入失败时返回 None。
     """
     print("开始生成 sales.html 页面...")
     page_title = "春雪食品生品产销分析报告 - 销售情况"
     header_html = generate_header(title=page_title, output_dir=output_dir)
     nav_html = generate_navigation(active_page="sales")
-    sales_content_html = _generate_sales_content(daily_sales, comprehensive_price_file, output_dir)
+    sales_content_html, price_files = _generate_sales_content(daily_sales, comprehensive_price_file, output_dir)
     footer_html = generate_footer()
 
-    full_html = header_html + nav_html + sales_content_html + footer_html
+    page = PAGE_TEMPLATE.render(header=header_html, navigation=nav_html, content=sales_content_html,
+                                footer=footer_html)
 
-    write_html_report(full_html, "sales.html", output_dir)
+    report_path = write_html_report(page, "sales.html", output_dir)
+    if report_path is None:
+        return None
+    return [report_path] + price_files
 
 # # --- Example Usage (for testing) ---
 # if __name__ == '__main__':
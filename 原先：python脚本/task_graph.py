@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+任务图调度模块，按依赖关系执行报表构建任务
+
+任务之间只通过可序列化（pickle）的输入输出传递数据；
+jobs > 1 时独立任务在进程池中并行执行，总耗时趋近关键路径而不是各任务耗时之和。
+jobs == 1 时在当前进程内按拓扑顺序执行（--profile 逐阶段分析需要此模式）。
+传入 BuildCache 时只执行输入指纹变化的输出任务及其上游（见 build_cache）。
+"""
+
+import os
+import sys
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# 阶段追踪模块位于项目根目录
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stage_tracer import trace_span, get_tracer
+
+
+class TaskGraphError(Exception):
+    """任务图定义错误（未知依赖、循环依赖、重名任务）"""
+
+
+class ReportBuildError(Exception):
+    """任务无法产出可用结果（如必需的数据源加载失败）"""
+
+
+@dataclass
+class Task:
+    """构建任务：func(**kwargs, **{参数名: 依赖任务的结果})"""
+    name: str
+    func: Callable
+    inputs: Dict[str, str] = field(default_factory=dict)  # 参数名 -> 依赖任务名，结果作为参数传入
+    kwargs: Dict[str, Any] = field(default_factory=dict)  # 固定参数
+    after: Tuple[str, ...] = ()  # 仅要求先执行（如页面引用的图表文件），不传结果，失败也不阻塞
+    kind: str = 'task'  # load / analyze / chart / page
+    required: bool = False  # 失败时终止整个构建
+    sources: Tuple[str, ...] = ()  # 读取的源数据文件（可为 glob 模式），参与缓存指纹
+    cache: bool = False  # 结果为输出文件路径，指纹未变且文件存在时沿用上次的输出
+
+    @property
+    def dependencies(self) -> Tuple[str, ...]:
+        return tuple(self.inputs.values()) + tuple(self.after)
+
+
+@dataclass
+class TaskResult:
+    """任务执行结果"""
+    name: str
+    status: str = 'done'  # done / failed / skipped / cached
+    value: Any = None
+    error: Optional[str] = None
+    traceback: Optional[str] = None
+    start: float = 0.0  # time.time() 墙钟时间
+    end: float = 0.0
+    pid: int = 0
+    rows: Optional[int] = None
+
+    @property
+    def duration(self) -> float:
+        return max(self.end - self.start, 0.0)
+
+
+def _row_count(value) -> Optional[int]:
+    """DataFrame 类结果的行数（用于阶段追踪）"""
+    shape = getattr(value, 'shape', None)
+    if shape:
+        return int(shape[0])
+    return None
+
+
+def run_task(name: str, func: Callable, kwargs: Dict[str, Any]) -> TaskResult:
+    """执行单个任务（可在工作进程中运行），异常转换为失败结果"""
+    start = time.time()
+    try:
+        value = func(**kwargs)
+        return TaskResult(name=name, value=value, start=start, end=time.time(),
+                          pid=os.getpid(), rows=_row_count(value))
+    except Exception as e:
+        return TaskResult(name=name, status='failed', error=f"{type(e).__name__}: {e}",
+                          traceback=traceback.format_exc(), start=start, end=time.time(), pid=os.getpid())
+
+
+class TaskGraph:
+    """有向无环任务图"""
+
+    def __init__(self):
+        self.tasks: Dict[str, Task] = {}
+
+    def add(self, name: str, func: Callable, inputs: Optional[Dict[str, str]] = None,
+            kwargs: Optional[Dict[str, Any]] = None, after: Tuple[str, ...] = (),
+            kind: str = 'task', required: bool = False, sources: Tuple[str, ...] = (),
+            cache: bool = False) -> Task:
+        """添加任务"""
+        if name in self.tasks:
+            raise TaskGraphError(f"任务重名: {name}")
+        task = Task(name, func, dict(inputs or {}), dict(kwargs or {}), tuple(after), kind, required,
+                    tuple(sources), cache)
+        self.tasks[name] = task
+        return task
+
+    def topological_order(self) -> List[str]:
+        """按添加顺序稳定的拓扑排序；依赖缺失或有环时抛出 TaskGraphError"""
+        for task in self.tasks.values():
+            missing = [dep for dep in task.dependencies if dep not in self.tasks]
+            if missing:
+                raise TaskGraphError(f"任务 {task.name} 依赖未定义的任务: {', '.join(missing)}")
+
+        order = []
+        state: Dict[str, int] = {}  # 1 = 访问中, 2 = 已完成
+
+        def visit(name: str, chain: List[str]):
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise TaskGraphError(f"循环依赖: {' -> '.join(chain + [name])}")
+            state[name] = 1
+            for dep in self.tasks[name].dependencies:
+                visit(dep, chain + [name])
+            state[name] = 2
+            order.append(name)
+
+        for name in self.tasks:
+            visit(name, [])
+        return order
+
+    def critical_path(self, durations: Dict[str, float]) -> Tuple[float, List[str]]:
+        """
+        按实际耗时计算关键路径
+
+        返回:
+            (关键路径总耗时, 路径上的任务名列表)
+        """
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for name in self.topological_order():
+            deps = self.tasks[name].dependencies
+            slowest = max(deps, key=lambda dep: finish[dep], default=None)
+            finish[name] = (finish[slowest] if slowest else 0.0) + durations.get(name, 0.0)
+            previous[name] = slowest
+
+        if not finish:
+            return 0.0, []
+        name = max(finish, key=finish.get)
+        total = finish[name]
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return total, path[::-1]
+
+
+class TaskRunner:
+    """任务图执行器"""
+
+    def __init__(self, graph: TaskGraph, jobs: Optional[int] = None, cache=None):
+        """
+        参数:
+            graph: 任务图
+            jobs: 并行进程数，默认 CPU 核数；1 表示在当前进程内顺序执行
+            cache: 可选的 BuildCache，用于增量构建
+        """
+        self.graph = graph
+        self.jobs = jobs if jobs is not None else (os.cpu_count() or 1)
+        self.cache = cache
+        self.results: Dict[str, TaskResult] = {}
+        self.aborted = False
+        self.wall_time = 0.0
+
+    def run(self) -> Dict[str, TaskResult]:
+        """执行全部任务，返回 {任务名: 结果}"""
+        order = self.graph.topological_order()
+        self.results = {}
+        self.aborted = False
+        start = time.time()
+        if self.cache is not None:
+            needed = self.cache.plan(self.graph, order)
+            for name in order:
+                if name not in needed:
+                    self.results[name] = TaskResult(name=name, status='cached',
+                                                    value=self.cache.cached_value(name))
+        if self.jobs <= 1:
+            self._run_serial(order)
+        else:
+            self._run_parallel(order)
+        if self.cache is not None:
+            self.cache.save()
+        self.wall_time = time.time() - start
+        return self.results
+
+    def _inputs_for(self, task: Task) -> Optional[Dict[str, Any]]:
+        """组装任务参数；有输入依赖未成功时返回 None"""
+        kwargs = dict(task.kwargs)
+        for param, dep in task.inputs.items():
+            result = self.results[dep]
+            if result.status not in ('done', 'cached'):
+                return None
+            kwargs[param] = result.value
+        return kwargs
+
+    def _skip(self, task: Task):
+        if self.aborted:
+            reason = 'build aborted'
+        else:
+            failed = [dep for dep in task.inputs.values() if self.results[dep].status not in ('done', 'cached')]
+            reason = f"dependency {', '.join(failed)} did not complete"
+        print(f"Skipping {task.name}: {reason}")
+        self.results[task.name] = TaskResult(name=task.name, status='skipped', error=reason)
+
+    def _finish(self, task: Task, result: TaskResult):
+        self.results[task.name] = result
+        if self.cache is not None:
+            self.cache.record(task, result)
+        if result.status == 'failed':
+            print(f"Error in {task.name}: {result.error}")
+            if task.required:
+                print(f"{task.name} is required. Aborting build.")
+                self.aborted = True
+
+    def _run_serial(self, order: List[str]):
+        for name in order:
+            if name in self.results:
+                continue
+            task = self.graph.tasks[name]
+            kwargs = None if self.aborted else self._inputs_for(task)
+            if kwargs is None:
+                self._skip(task)
+                continue
+            with trace_span(name, kind=task.kind) as span:
+                result = run_task(name, task.func, kwargs)
+                if result.rows is not None:
+                    span.set_rows(result.rows)
+            self._finish(task, result)
+
+    def _run_parallel(self, order: List[str]):
+        pending = [name for name in order if name not in self.results]
+        if not pending:
+            return
+        running = {}
+        tracer = get_tracer()
+
+        with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            def submit_ready():
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name in list(pending):
+                        task = self.graph.tasks[name]
+                        if not all(dep in self.results for dep in task.dependencies):
+                            continue
+                        pending.remove(name)
+                        progressed = True
+                        kwargs = None if self.aborted else self._inputs_for(task)
+                        if kwargs is None:
+                            self._skip(task)
+                            continue
+                        running[pool.submit(run_task, name, task.func, kwargs)] = name
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # 结果无法序列化或工作进程异常退出
+                        result = TaskResult(name=name, status='failed', error=f"{type(e).__name__}: {e}")
+                    if result.start:
+                        tracer.add_span(name, result.start, result.end, pid=result.pid, rows=result.rows,
+                                        error=result.error, kind=self.graph.tasks[name].kind)
+                    self._finish(self.graph.tasks[name], result)
+                submit_ready()
+
+        # 终止构建后仍未调度的任务
+        for name in pending:
+            self._skip(self.graph.tasks[name])
+
+    def format_summary(self) -> str:
+        """构建耗时摘要：墙钟时间、任务耗时之和、关键路径"""
+        durations = {name: result.duration for name, result in self.results.items()}
+        counts = {status: sum(1 for r in self.results.values() if r.status == status)
+                  for status in ('done', 'cached', 'failed', 'skipped')}
+        total = sum(durations.values())
+        critical, path = self.graph.critical_path(durations)
+        lines = [
+            f"Build summary ({self.jobs} job{'s' if self.jobs != 1 else ''}): "
+            f"{counts['done']} done, {counts['cached']} cached, {counts['failed']} failed, {counts['skipped']} skipped",
+            f"  Wall time:        {self.wall_time:.2f}s",
+            f"  Sum of tasks:     {total:.2f}s",
+            f"  Critical path:    {critical:.2f}s ({' -> '.join(path)})",
+        ]
+        slowest = sorted(durations.items(), key=lambda item: item[1], reverse=True)[:5]
+        lines.append("  Slowest tasks:    " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in slowest))
+        return "\n".join(lines)
@@ -26,19 +26,23 @@ matplotlib.rcParams['axes.titlesize'] = 14  # 增大标题字体大小
 matplotlib.rcParams['axes.labelsize'] = 12  # 增大轴标签字体大小
 
 import config
+from chart_cache import ChartCache
+from responsive_images import process_images
 
 
 class DataVisualizer:
     """数据可视化类，负责生成各种图表"""
     
-    def __init__(self, output_dir=None):
+    def __init__(self, output_dir=None, chart_cache=None):
         """
         初始化可视化器
         
         参数:
             output_dir: 输出目录
+            chart_cache: 图表缓存（ChartCache），默认按内容哈希跳过未变化的图表
         """
         self.output_dir = output_dir or config.OUTPUT_DIR
+        self.chart_cache = chart_cache or ChartCache()
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
     
@@ -98,12 +102,18 @@ class DataVisualizer:
             return None
         
         try:
-            plt.figure(figsize=(12, 7))
             # Assuming '库存量' is the column to plot
             # Let's plot top N items by inventory
             top_n = 15
             plot_data = inventory_data.nlargest(top_n, '库存量')
 
+            chart_path = os.path.join(self.output_dir, 'inventory_top_items.png')
+            cache_key = self.chart_cache.key(plot_data[['品名', '库存量']],
+                                             {'figsize': (12, 7), 'dpi': 150}, __file__)
+            if self.chart_cache.is_fresh(chart_path, cache_key):
+                return chart_path
+
+            plt.figure(figsize=(12, 7))
             bars = plt.bar(plot_data['品名'], plot_data['库存量'], color='skyblue') # Store the bars
             plt.xlabel('产品名称')
             plt.ylabel('库存量')
@@ -124,9 +134,9 @@ class DataVisualizer:
 
             plt.tight_layout()
 
-            chart_path = os.path.join(self.output_dir, 'inventory_top_items.png')
             plt.savefig(chart_path, dpi=150)
             plt.close()
+            self.chart_cache.store(chart_path, cache_key)
             print(f"Inventory visualization saved to {chart_path}")
             return chart_path
         except Exception as e:
@@ -161,6 +171,12 @@ class DataVisualizer:
                     numeric_prices.append(None) # Treat unconvertible values as None
             avg_prices = numeric_prices
 
+            chart_path = os.path.join(self.output_dir, 'daily_sales_trend.png')
+            cache_key = self.chart_cache.key([dates, volumes, avg_prices],
+                                             {'figsize': (15, 8), 'dpi': 300}, __file__)
+            if self.chart_cache.is_fresh(chart_path, cache_key):
+                return chart_path
+
             # Create figure and axes
             fig, ax1 = plt.subplots(figsize=(15, 8)) # Keep standard size
 
@@ -217,9 +233,9 @@ class DataVisualizer:
             plt.tight_layout(pad=1.2) # Keep padding
 
             # Save the chart
-            chart_path = os.path.join(self.output_dir, 'daily_sales_trend.png')
             plt.savefig(chart_path, dpi=300, bbox_inches='tight') # Keep high DPI
             plt.close()
+            self.chart_cache.store(chart_path, cache_key)
             print(f"Daily sales trend chart saved to {chart_path}")
             return chart_path
         except Exception as e:
@@ -248,6 +264,10 @@ class DataVisualizer:
             dates = sorted(ratio_summary.keys())
             ratios = np.array([ratio_summary[d].get('ratio', 0) for d in dates])
 
+            cache_key = self.chart_cache.key([dates, ratios], {'figsize': (15, 8), 'dpi': 300}, __file__)
+            if self.chart_cache.is_fresh(chart_path, cache_key):
+                return chart_path
+
             # 增加图表尺寸以提高清晰度
             plt.figure(figsize=(15, 8))
             ax = plt.gca()
@@ -319,6 +339,7 @@ class DataVisualizer:
             # 增加DPI以提高图表清晰度
             plt.savefig(chart_path, dpi=300, bbox_inches='tight')
             plt.close()
+            self.chart_cache.store(chart_path, cache_key)
             print(f"Production/Sales ratio chart saved to {chart_path}")
             return chart_path
         except Exception as e:
@@ -420,39 +441,21 @@ class DataVisualizer:
             return None 
 
     def generate_responsive_image(self, standard_image_path, output_dir):
-        """为移动端生成优化版本的图片"""
-        try:
-            from PIL import Image
-            import os
-          
-            # 获取原图路径
-            base_name = os.path.basename(standard_image_path)
-            file_name, file_ext = os.path.splitext(base_name)
-          
-            # 生成移动端版本路径
-            mobile_path = os.path.join(output_dir, f"{file_name}_mobile{file_ext}")
-          
-            # 使用PIL打开图片
-            img = Image.open(standard_image_path)
-          
-            # 获取原始尺寸
-            width, height = img.size
-          
-            # 移动端尺寸（保持宽高比）
-            mobile_width = 600  # 适合大多数移动设备
-            mobile_height = int(height * (mobile_width / width))
-          
-            # 调整大小并保存
-            mobile_img = img.resize((mobile_width, mobile_height), Image.LANCZOS) # Use Image.LANCZOS for high quality resize
-            mobile_img.save(mobile_path, quality=85, optimize=True)
-          
-            return mobile_path
-        except ImportError:
-            print("Pillow library not found. Skipping responsive image generation. Install with: pip install Pillow")
-            return standard_image_path # Return original path if Pillow is missing
-        except Exception as e:
-            print(f"生成响应式图像失败: {e}")
+        """
+        为移动端生成优化版本的图片（多个宽度的 PNG 和 WebP，源图未变时跳过，见 responsive_images）
+        
+        参数:
+            standard_image_path: 原图路径
+            output_dir: 输出目录
+        
+        返回:
+            mobile_path: 最小宽度的 PNG 版本路径；未安装 Pillow 或生成失败时返回原图路径
+        """
+        image = process_images([standard_image_path], output_dir).get(standard_image_path)
+        png_variants = [variant for variant in image.variants if variant.format == 'png'] if image else []
+        if not png_variants:
             return standard_image_path
+        return os.path.join(output_dir, min(png_variants, key=lambda variant: variant.width).src)
 
 
 # Example usage (if run directly)